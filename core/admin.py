@@ -17,6 +17,8 @@ from .models import (
     SchoolConfiguration, AnalyticsCache, GradeAnalytics, AttendanceAnalytics,
     TimeSlot, Timetable, TimetableEntry,
 )
+from .services.context_fragments import invalidate_notifications
+from .services.notification_counter import reconcile as reconcile_unread_counts
 
 # ===========================================
 # CUSTOM FORMS FOR VALIDATION
@@ -697,14 +699,20 @@ class NotificationAdmin(admin.ModelAdmin):
     # Admin action to mark as read
     def mark_as_read(self, request, queryset):
         """Mark selected notifications as read"""
+        recipient_ids = set(queryset.values_list('recipient_id', flat=True))
         updated_count = queryset.update(is_read=True)
+        invalidate_notifications(*recipient_ids)
+        reconcile_unread_counts(recipient_ids)
         self.message_user(request, f"✅ Marked {updated_count} notifications as read.")
     mark_as_read.short_description = "Mark as read"
     
     # Admin action to mark as unread
     def mark_as_unread(self, request, queryset):
         """Mark selected notifications as unread"""
+        recipient_ids = set(queryset.values_list('recipient_id', flat=True))
         updated_count = queryset.update(is_read=False)
+        invalidate_notifications(*recipient_ids)
+        reconcile_unread_counts(recipient_ids)
         self.message_user(request, f"✅ Marked {updated_count} notifications as unread.")
     mark_as_unread.short_description = "Mark as unread"
 
@@ -16,22 +16,8 @@ from .models import (
     StudentAttendance, Fee, StudentAssignment, Assignment
 )
 
-# Permission functions
-def is_admin(user):
-    """Check if user is an admin/superuser"""
-    return user.is_authenticated and (user.is_superuser or user.is_staff)
-
-def is_teacher(user):
-    """Check if user is a teacher"""
-    return user.is_authenticated and hasattr(user, 'teacher') and user.teacher is not None
-
-def is_parent(user):
-    """Check if user is a parent"""
-    return user.is_authenticated and hasattr(user, 'parentguardian') and user.parentguardian is not None
-
-def is_student(user):
-    """Check if user is a student"""
-    return user.is_authenticated and hasattr(user, 'student') and user.student is not None
+# Permission functions - same checks as core.utils, served by the role resolver
+from core.utils import is_admin, is_teacher, is_parent, is_student
 
 # ==============================
 # STUDENT API ENDPOINTS
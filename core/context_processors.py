@@ -2,21 +2,56 @@
 import logging
 from django.db.models import Prefetch, Count, Q, Sum, Avg
 from django.conf import settings
-from django.core.cache import cache
 from .models import (
     Notification, ParentGuardian, Student, Teacher, 
     ParentMessage, ParentAnnouncement, ParentEvent,
     Fee, StudentAttendance, Grade, ClassAssignment, Timetable, TimeSlot
 )
 from .utils import is_admin, is_teacher, is_student, is_parent
+from .services.user_roles import get_user_roles
+from .services import context_fragments as fragments
+from .services.context_fragments import LazyFragment
+from .services.period_clock import get_period_clock
+from .services.notification_counter import get_unread_count
 from django.utils import timezone
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+NOTIFICATION_DEFAULTS = {
+    'unread_notifications_count': 0,
+    'recent_notifications': [],
+}
+
+PARENT_DEFAULTS = {
+    'parent_children_count': 0,
+    'parent_unread_messages_count': 0,
+    'parent_upcoming_events_count': 0,
+    'parent_pending_fees_total': 0,
+    'parent_recent_announcements': [],
+    'parent_children': [],
+    'parent_dashboard_stats': {},
+}
+
+TIMETABLE_DEFAULTS = {
+    'today_timetable': None,
+    'teacher_timetable_stats': {},
+    'student_timetable_stats': {},
+    'admin_timetable_stats': {},
+    'available_timeslots': [],
+}
+
+PERIOD_DEFAULTS = {
+    'current_timetable_period': None,
+    'next_period': None,
+}
+
+
 def global_context(request):
     """
-    Fixed context processor that properly handles user profiles
+    Role flags plus lazily loaded, cached fragments for notifications, the
+    parent sidebar and timetables. A fragment is only computed (or read from
+    the cache) when a template actually uses one of its values.
     """
     context = {
         'is_admin': False,
@@ -49,50 +84,40 @@ def global_context(request):
     user = request.user
     
     try:
-        # Check user profiles safely
-        has_student_profile = hasattr(user, 'student') and user.student is not None
-        has_teacher_profile = hasattr(user, 'teacher') and user.teacher is not None
-        
-        # Get parent status safely
-        parent_obj = None
-        try:
-            parent_obj = ParentGuardian.objects.filter(user=user).select_related('user').first()
-        except (ParentGuardian.DoesNotExist, AttributeError):
-            pass
+        # Roles are resolved once per request (and cached between requests)
+        roles = get_user_roles(user)
         
-        is_parent_user = parent_obj is not None
-        
-        # Set user roles with safe defaults
         context.update({
-            'is_admin': is_admin(user),
-            'is_teacher': has_teacher_profile,
-            'is_student': has_student_profile,
-            'is_parent': is_parent_user,
-            'user_parentguardian': parent_obj,
-            'dashboard_url': get_dashboard_url(user, is_parent_user, parent_obj)
+            'is_admin': roles.is_admin,
+            'is_teacher': roles.is_teacher,
+            'is_student': roles.is_student,
+            'is_parent': roles.is_parent,
+            'dashboard_url': roles.dashboard_url,
         })
         
-        # Get notifications safely
-        try:
-            notification_data = get_notification_data(user)
-            context.update(notification_data)
-        except Exception as e:
-            logger.error(f"Error loading notifications: {str(e)}")
-        
-        # Get parent-specific data if user is a parent
-        if is_parent_user and parent_obj:
-            try:
-                parent_data = get_parent_context_data(parent_obj)
-                context.update(parent_data)
-            except Exception as e:
-                logger.error(f"Error loading parent context data: {str(e)}")
-        
-        # Get timetable context based on user role
-        try:
-            timetable_context = get_timetable_context(user)
-            context.update(timetable_context)
-        except Exception as e:
-            logger.error(f"Error loading timetable context: {str(e)}")
+        LazyFragment(
+            'notification', lambda: get_cached_notification_data(user), NOTIFICATION_DEFAULTS
+        ).bind(context)
+        
+        if roles.is_parent:
+            LazyFragment(
+                'parent guardian',
+                lambda: {'user_parentguardian': ParentGuardian.objects.filter(
+                    pk=roles.parent_id).select_related('user').first()},
+                {'user_parentguardian': None},
+            ).bind(context)
+            LazyFragment(
+                'parent', lambda: get_cached_parent_context_data(user, roles.parent_id), PARENT_DEFAULTS
+            ).bind(context)
+        
+        # Timetables are for admins, teachers and students
+        has_access = roles.is_admin or roles.is_teacher or roles.is_student
+        context['has_timetable_access'] = has_access
+        if has_access:
+            LazyFragment(
+                'timetable', lambda: get_cached_timetable_context(user), TIMETABLE_DEFAULTS
+            ).bind(context)
+            LazyFragment('current period', get_period_context, PERIOD_DEFAULTS).bind(context)
         
     except Exception as e:
         logger.error(f"Error in global context processor: {str(e)}")
@@ -235,11 +260,12 @@ def get_dashboard_url(user, is_parent_user, parent_obj):
     Safe dashboard URL determination
     """
     try:
-        if user.is_superuser or is_admin(user):
+        roles = get_user_roles(user)
+        if roles.is_admin:
             return 'admin_dashboard'
-        elif hasattr(user, 'teacher') and user.teacher is not None:
+        elif roles.is_teacher:
             return 'teacher_dashboard'
-        elif hasattr(user, 'student') and user.student is not None:
+        elif roles.is_student:
             return 'student_dashboard'
         elif is_parent_user:
             return 'parent_dashboard'
@@ -255,11 +281,10 @@ def get_notification_data(user):
     Get notification data with optimized database queries
     """
     try:
-        # Use a single query to get both count and recent notifications
         notifications = Notification.objects.filter(recipient=user).order_by('-created_at')
         
-        # Get unread count efficiently
-        unread_count = notifications.filter(is_read=False).count()
+        # Unread count comes from the cached counter
+        unread_count = get_unread_count(user.id)
         
         # Get recent notifications (max 5)
         recent_notifications = list(notifications[:5])
@@ -498,9 +523,23 @@ def get_optimized_parent_context_data(parent_obj):
         }
 
 
-def get_timetable_context(user):
+def get_period_context():
+    """Current and next period, which change with the clock rather than the data"""
+    context = dict(PERIOD_DEFAULTS)
+    try:
+        current_period = get_current_period_info()
+        if current_period:
+            context['current_timetable_period'] = current_period
+            context['next_period'] = get_next_period_info(current_period.get('period_number', 0))
+    except Exception as e:
+        logger.error(f"Error getting current period info: {str(e)}")
+    return context
+
+
+def get_timetable_context(user, include_periods=True):
     """
-    Get timetable context based on user role
+    Get timetable context based on user role. ``include_periods=False`` leaves
+    out the clock-dependent current/next period (see ``get_period_context``).
     """
     context = {
         'has_timetable_access': False,
@@ -528,13 +567,8 @@ def get_timetable_context(user):
             logger.error(f"Error loading timeslots: {str(e)}")
         
         # Get current period info
-        try:
-            current_period = get_current_period_info()
-            if current_period:
-                context['current_timetable_period'] = current_period
-                context['next_period'] = get_next_period_info(current_period.get('period_number', 0))
-        except Exception as e:
-            logger.error(f"Error getting current period info: {str(e)}")
+        if include_periods:
+            context.update(get_period_context())
         
         # Role-specific timetable data
         if is_admin(user):
@@ -693,48 +727,7 @@ def get_student_timetable_context(user):
 def get_current_period_info():
     """Get current period information based on time"""
     try:
-        now = timezone.now()
-        current_time = now.time()
-        
-        # Get all active time slots
-        timeslots = TimeSlot.objects.filter(is_active=True).order_by('period_number')
-        
-        for timeslot in timeslots:
-            if timeslot.start_time <= current_time <= timeslot.end_time:
-                return {
-                    'period_number': timeslot.period_number,
-                    'period_name': timeslot.get_period_number_display(),
-                    'start_time': timeslot.start_time.strftime('%H:%M'),
-                    'end_time': timeslot.end_time.strftime('%H:%M'),
-                    'is_break': timeslot.is_break,
-                    'break_name': timeslot.break_name,
-                    'remaining_minutes': calculate_remaining_minutes(timeslot.end_time, current_time)
-                }
-        
-        # Check if before first period
-        if timeslots.exists():
-            first_period = timeslots.first()
-            if current_time < first_period.start_time:
-                return {
-                    'status': 'before_school',
-                    'next_period': {
-                        'period_number': first_period.period_number,
-                        'period_name': first_period.get_period_number_display(),
-                        'start_time': first_period.start_time.strftime('%H:%M'),
-                    }
-                }
-        
-        # Check if after last period
-        if timeslots.exists():
-            last_period = timeslots.last()
-            if current_time > last_period.end_time:
-                return {
-                    'status': 'after_school',
-                    'message': 'School has ended for the day'
-                }
-        
-        return None
-        
+        return get_period_clock().current_period_info()
     except Exception as e:
         logger.error(f"Error getting current period info: {str(e)}")
         return None
@@ -743,22 +736,7 @@ def get_current_period_info():
 def get_next_period_info(current_period_number):
     """Get next period information"""
     try:
-        next_period = TimeSlot.objects.filter(
-            period_number__gt=current_period_number,
-            is_active=True
-        ).order_by('period_number').first()
-        
-        if next_period:
-            return {
-                'period_number': next_period.period_number,
-                'period_name': next_period.get_period_number_display(),
-                'start_time': next_period.start_time.strftime('%H:%M'),
-                'end_time': next_period.end_time.strftime('%H:%M'),
-                'is_break': next_period.is_break,
-                'break_name': next_period.break_name,
-            }
-        
-        return None
+        return get_period_clock().next_period_info(current_period_number)
     except Exception as e:
         logger.error(f"Error getting next period info: {str(e)}")
         return None
@@ -1014,94 +992,57 @@ def get_optimized_notification_data(user):
         }
 
 
-# Cache version for high-traffic scenarios (optional)
+# Cached versions used by global_context. Entries are per user and are
+# dropped by the Notification, ParentMessage, Fee and timetable signals.
 def get_cached_notification_data(user):
     """
-    Cached version for high-traffic applications
+    Cached unread count and recent notifications
     """
     try:
-        cache_key = f"user_{user.id}_notification_data"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is None:
-            # Calculate fresh data
-            notifications = Notification.objects.filter(recipient=user).order_by('-created_at')
-            unread_count = notifications.filter(is_read=False).count()
-            recent_notifications = list(notifications[:5])
-            
-            cached_data = {
-                'unread_count': unread_count,
-                'recent_notifications': recent_notifications
-            }
-            
-            # Cache for 2 minutes
-            cache.set(cache_key, cached_data, 120)
-        
-        return {
-            'unread_notifications_count': cached_data['unread_count'],
-            'recent_notifications': cached_data['recent_notifications']
-        }
+        return fragments.get_or_build(
+            fragments.fragment_key(user.id, fragments.NOTIFICATIONS),
+            lambda: get_notification_data(user),
+        )
     except Exception as e:
         logger.error(f"Error in cached notification data: {str(e)}")
-        return {
-            'unread_notifications_count': 0,
-            'recent_notifications': []
-        }
+        return dict(NOTIFICATION_DEFAULTS)
 
 
-def get_cached_parent_context_data(parent_obj):
+def get_cached_parent_context_data(user, parent_id):
     """
-    Cached version of parent context data for better performance
+    Cached parent portal summary; the ParentGuardian row is only loaded on a miss
     """
+    def build():
+        parent_obj = ParentGuardian.objects.select_related('user').get(pk=parent_id)
+        return get_parent_context_data(parent_obj)
+    
     try:
-        cache_key = f"parent_{parent_obj.id}_context_data"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is None:
-            # Calculate fresh data using optimized function
-            cached_data = get_optimized_parent_context_data(parent_obj)
-            
-            # Cache for 5 minutes (parent data doesn't change frequently)
-            cache.set(cache_key, cached_data, 300)
-        
-        return cached_data
-        
+        return fragments.get_or_build(fragments.fragment_key(user.id, fragments.PARENT), build)
     except Exception as e:
         logger.error(f"Error in cached parent context: {str(e)}")
-        return {
-            'parent_children_count': 0,
-            'parent_unread_messages_count': 0,
-            'parent_upcoming_events_count': 0,
-            'parent_pending_fees_total': 0,
-            'parent_children': [],
-            'parent_dashboard_stats': {}
-        }
+        return dict(PARENT_DEFAULTS)
 
 
 def get_cached_timetable_context(user):
     """
-    Cached version of timetable context for better performance
+    Cached timetable summary for today. The current period is left to
+    ``get_period_context`` and a student's next class is re-read, since both
+    move with the clock.
     """
     try:
-        cache_key = f"user_{user.id}_timetable_context"
-        cached_data = cache.get(cache_key)
+        cached_data = fragments.get_or_build(
+            fragments.timetable_fragment_key(user.id),
+            lambda: get_timetable_context(user, include_periods=False),
+        )
         
-        if cached_data is None:
-            # Calculate fresh data
-            cached_data = get_timetable_context(user)
-            
-            # Cache for 1 minute (timetable data can change during the day)
-            cache.set(cache_key, cached_data, 60)
+        if cached_data.get('student_timetable_stats') and is_student(user):
+            cached_data['student_timetable_stats'] = dict(
+                cached_data['student_timetable_stats'],
+                next_class=get_student_next_class(user.student),
+            )
         
         return cached_data
         
     except Exception as e:
         logger.error(f"Error in cached timetable context: {str(e)}")
-        return {
-            'has_timetable_access': False,
-            'current_timetable_period': None,
-            'next_period': None,
-            'today_timetable': None,
-            'teacher_timetable_stats': {},
-            'student_timetable_stats': {}
-        }
\ No newline at end of file
+        return dict(TIMETABLE_DEFAULTS)
\ No newline at end of file
@@ -1,33 +1,155 @@
-import geoip2.database
+"""
+IP geolocation against the GeoLite2-City database.
+
+One ``geoip2`` reader is opened per process in ``MODE_MMAP`` and shared by
+every lookup, so the database file is mapped once instead of being opened
+and parsed on each cache miss. Results go through two cache tiers: a small
+in-process LRU and the shared Django cache (Redis in production). Use
+``enrich_ips`` when locating many addresses at once; it resolves the whole
+batch with one ``get_many``/``set_many`` round-trip.
+"""
+import ipaddress
+import logging
+import threading
+from collections import OrderedDict
+
 from django.conf import settings
 from django.core.cache import cache
 
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:  # geoip2 is in requirements-security.txt
+    geoip2 = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 86400  # 1 day
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+class _LocationLRU:
+    """Thread-safe LRU of ip -> location dict ({} for unknown addresses)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, ip):
+        with self.lock:
+            location = self.data.get(ip)
+            if location is not None:
+                self.data.move_to_end(ip)
+            return location
+
+    def put_many(self, locations):
+        with self.lock:
+            for ip, location in locations.items():
+                self.data[ip] = location
+                self.data.move_to_end(ip)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_lru = _LocationLRU(getattr(settings, 'GEOIP_LRU_SIZE', 4096))
+
+
+def _cache_key(ip_address):
+    return f'geoip_{ip_address}'
+
+
+def get_reader():
+    """The process-wide reader, opened on first use"""
+    global _reader
+    if _reader is None:
+        if geoip2 is None:
+            raise RuntimeError('geoip2 is not installed')
+        with _reader_lock:
+            if _reader is None:
+                path = f'{settings.GEOIP_PATH}/{settings.GEOIP_CITY}'
+                _reader = geoip2.database.Reader(path, mode=geoip2.database.MODE_MMAP)
+    return _reader
+
+
+def close_reader():
+    """Close the shared reader, e.g. after replacing the database file"""
+    global _reader
+    with _reader_lock:
+        if _reader is not None:
+            _reader.close()
+            _reader = None
+    _lru.clear()
+
+
+def _lookup(reader, ip_address):
+    try:
+        if not ipaddress.ip_address(ip_address).is_global:
+            return {}
+        response = reader.city(ip_address)
+    except (ValueError, geoip2.errors.AddressNotFoundError):
+        return {}
+    return {
+        'city': response.city.name,
+        'country': response.country.name,
+        'iso_code': response.country.iso_code,
+        'latitude': response.location.latitude,
+        'longitude': response.location.longitude,
+        'timezone': response.location.time_zone,
+    }
+
+
+def enrich_ips(ip_addresses):
+    """
+    Locate many IPs at once. Returns {ip: location dict}, where the dict is
+    empty for private, malformed or unknown addresses.
+    """
+    results = {}
+    missing = []
+    for ip in {str(ip) for ip in ip_addresses if ip}:
+        location = _lru.get(ip)
+        if location is None:
+            missing.append(ip)
+        else:
+            results[ip] = location
+    if not missing:
+        return results
+
+    cached = cache.get_many([_cache_key(ip) for ip in missing])
+    found = {}
+    unresolved = []
+    for ip in missing:
+        location = cached.get(_cache_key(ip))
+        if location is None:
+            unresolved.append(ip)
+        else:
+            found[ip] = location
+
+    if unresolved:
+        reader = get_reader()
+        looked_up = {ip: _lookup(reader, ip) for ip in unresolved}
+        cache.set_many({_cache_key(ip): location for ip, location in looked_up.items()}, CACHE_TIMEOUT)
+        found.update(looked_up)
+
+    _lru.put_many(found)
+    results.update(found)
+    return results
+
+
 def get_location_info(ip_address: str) -> dict:
-    cache_key = f'geoip_{ip_address}'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return cached_data
-    
     try:
-        with geoip2.database.Reader(f'{settings.GEOIP_PATH}/{settings.GEOIP_CITY}') as reader:
-            response = reader.city(ip_address)
-            location_data = {
-                'city': response.city.name,
-                'country': response.country.name,
-                'iso_code': response.country.iso_code,
-                'latitude': response.location.latitude,
-                'longitude': response.location.longitude,
-                'timezone': response.location.time_zone,
-            }
-            cache.set(cache_key, location_data, timeout=86400)  # Cache for 1 day
-            return location_data
+        location = enrich_ips([ip_address]).get(str(ip_address))
+        if location:
+            return location
+        return {'error': 'Location not found', 'ip': ip_address}
     except Exception as e:
         return {
             'error': str(e),
             'ip': ip_address
         }
-
-# Add to your existing log_audit function:
-# location = get_location_info(request.META.get('REMOTE_ADDR'))
-# audit_log.location_data = location
\ No newline at end of file
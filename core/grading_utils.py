@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 def get_grading_system():
     """Get the currently active grading system"""
     try:
-        config = SchoolConfiguration.get_config()
+        config = SchoolConfiguration.get_cached()
         return config.grading_system
     except Exception as e:
         logger.error(f"Error getting grading system: {str(e)}")
@@ -167,32 +167,14 @@ def calculate_class_performance(subject, class_level, academic_year, term):
     lowest_score = min(scores)
     
     # Calculate grade distribution based on current system
-    grading_system = get_grading_system()
+    config = SchoolConfiguration.get_cached()
+    grading_system = config.grading_system
+    boundaries = config.grade_boundaries
     
     if grading_system == 'GES':
-        grade_distribution = {
-            '1': len([s for s in scores if s >= 90]),
-            '2': len([s for s in scores if 80 <= s < 90]),
-            '3': len([s for s in scores if 70 <= s < 80]),
-            '4': len([s for s in scores if 60 <= s < 70]),
-            '5': len([s for s in scores if 50 <= s < 60]),
-            '6': len([s for s in scores if 40 <= s < 50]),
-            '7': len([s for s in scores if 30 <= s < 40]),
-            '8': len([s for s in scores if 20 <= s < 30]),
-            '9': len([s for s in scores if s < 20]),
-        }
+        grade_distribution = boundaries.ges.distribution(scores)
     else:  # LETTER or BOTH
-        grade_distribution = {
-            'A+': len([s for s in scores if s >= 90]),
-            'A': len([s for s in scores if 80 <= s < 90]),
-            'B+': len([s for s in scores if 70 <= s < 80]),
-            'B': len([s for s in scores if 60 <= s < 70]),
-            'C+': len([s for s in scores if 50 <= s < 60]),
-            'C': len([s for s in scores if 40 <= s < 50]),
-            'D+': len([s for s in scores if 30 <= s < 40]),
-            'D': len([s for s in scores if 20 <= s < 30]),
-            'F': len([s for s in scores if s < 20]),
-        }
+        grade_distribution = boundaries.letter.distribution(scores)
     
     # Calculate passing rate (40% and above is passing in both systems)
     passing_count = len([s for s in scores if s >= 40])
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from core.models import AuditLog, SecurityEvent
+from core.geo_utils import enrich_ips
+import logging
+
+logger = logging.getLogger(__name__)
+
+# model label -> (model, timestamp field)
+TARGETS = {
+    'audit': (AuditLog, 'timestamp'),
+    'security': (SecurityEvent, 'created_at'),
+}
+
+class Command(BaseCommand):
+    help = "Store GeoIP locations in details['location'] of AuditLog and SecurityEvent rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['audit', 'security', 'all'], default='all')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--days', type=int, help='Only rows from the last N days')
+        parser.add_argument('--force', action='store_true', help='Re-locate rows that already have a location')
+
+    def handle(self, *args, **options):
+        labels = list(TARGETS) if options['model'] == 'all' else [options['model']]
+        for label in labels:
+            model, timestamp_field = TARGETS[label]
+            updated = self.backfill(model, timestamp_field, options)
+            logger.info(f"Backfilled locations on {updated} {model.__name__} rows")
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: located {updated} rows'))
+
+    def backfill(self, model, timestamp_field, options):
+        queryset = model.objects.filter(ip_address__isnull=False)
+        if options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+            queryset = queryset.filter(**{f'{timestamp_field}__gte': since})
+        if not options['force']:
+            queryset = queryset.filter(Q(details__isnull=True) | ~Q(details__has_key='location'))
+
+        updated = 0
+        last_pk = 0
+        batch_size = options['batch_size']
+        while True:
+            # Keyset pagination: rows updated in one batch drop out of the
+            # filter, so offsets would skip rows
+            batch = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', 'ip_address', 'details')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            locations = enrich_ips(row.ip_address for row in batch)
+            for row in batch:
+                details = row.details if isinstance(row.details, dict) else {}
+                # Unknown and private addresses get {} so they are not retried
+                details['location'] = locations.get(row.ip_address, {})
+                row.details = details
+            model.objects.bulk_update(batch, ['details'])
+            updated += len(batch)
+            self.stdout.write(f'  {model.__name__}: {updated} rows')
+        return updated
@@ -1,6 +1,7 @@
 # core/management/commands/backfill_student_assignments.py
 from django.core.management.base import BaseCommand
 from core.models import Assignment, StudentAssignment, Student
+from core.services.assignment_analytics import deferred_assignment_analytics
 from django.db import transaction
 import logging
 from django.utils import timezone
@@ -63,14 +64,15 @@ class Command(BaseCommand):
                     )
                     
                     created_count = 0
-                    for student in students:
-                        obj, created = StudentAssignment.objects.get_or_create(
-                            student=student,
-                            assignment=assignment,
-                            defaults={'status': 'PENDING'}
-                        )
-                        if created:
-                            created_count += 1
+                    with deferred_assignment_analytics():
+                        for student in students:
+                            obj, created = StudentAssignment.objects.get_or_create(
+                                student=student,
+                                assignment=assignment,
+                                defaults={'status': 'PENDING'}
+                            )
+                            if created:
+                                created_count += 1
                     
                     total_created += created_count
                     
@@ -0,0 +1,142 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from asgiref.sync import async_to_sync, sync_to_async
+import asyncio
+import statistics
+import time
+
+from core.middleware.csp import ContentSecurityPolicyMiddleware
+from core.middleware.maintenance import MaintenanceModeMiddleware
+from core.middleware.notification import NotificationMiddleware
+from core.middleware.rate_limit import RateLimitMiddleware
+from core.middleware.security import FinancialSecurityMiddleware
+from core.middleware.security_headers import SecurityHeadersMiddleware
+from core.middleware.security_stack import SecurityStackMiddleware
+from core.middleware.user_block import UserBlockMiddleware
+
+# The middlewares SecurityStackMiddleware replaced, in their old order
+LEGACY_CHAIN = [
+    FinancialSecurityMiddleware,
+    RateLimitMiddleware,
+    UserBlockMiddleware,
+    MaintenanceModeMiddleware,
+    NotificationMiddleware,
+    SecurityHeadersMiddleware,
+    ContentSecurityPolicyMiddleware,
+]
+STACK_CHAIN = [SecurityStackMiddleware]
+
+# Keep the limiter counting without ever tripping during the run
+UNLIMITED_POLICIES = {
+    'general': {'requests': 10 ** 9, 'window': 60},
+    'financial': {'requests': 10 ** 9, 'window': 60},
+}
+
+
+def sync_view(request):
+    return HttpResponse('ok')
+
+
+async def async_view(request):
+    return HttpResponse('ok')
+
+
+def build_sync_chain(classes):
+    handler = sync_view
+    for middleware_class in reversed(classes):
+        handler = middleware_class(handler)
+    return handler
+
+
+def build_async_chain(classes):
+    """Chain the middlewares the way Django's ASGI handler adapts them"""
+    handler = async_view
+    for middleware_class in reversed(classes):
+        if getattr(middleware_class, 'async_capable', False):
+            handler = middleware_class(handler)
+        else:
+            handler = sync_to_async(middleware_class(async_to_sync(handler)), thread_sensitive=True)
+    return handler
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request overhead of the old security middlewares against SecurityStackMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run')
+        parser.add_argument('--path', default='/admin/dashboard/', help='Request path')
+        parser.add_argument('--user', help='Username to authenticate the requests as (default: anonymous)')
+        parser.add_argument('--skip-async', action='store_true', help='Only run the WSGI (sync) benchmark')
+
+    def handle(self, *args, **options):
+        user = AnonymousUser()
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        self.factory = RequestFactory()
+        self.user = user
+        self.path = options['path']
+        count = options['requests']
+
+        results = []
+        with override_settings(RATE_LIMIT_POLICIES=UNLIMITED_POLICIES):
+            for label, classes in (('legacy', LEGACY_CHAIN), ('stack', STACK_CHAIN)):
+                results.append((label, 'sync', self.run_sync(build_sync_chain(classes), count)))
+            if not options['skip_async']:
+                for label, classes in (('legacy', LEGACY_CHAIN), ('stack', STACK_CHAIN)):
+                    timings = asyncio.run(self.run_async(build_async_chain(classes), count))
+                    results.append((label, 'async', timings))
+
+        self.stdout.write(f"{'chain':<8} {'mode':<6} {'mean us':>10} {'p50 us':>10} {'p95 us':>10}")
+        summary = {}
+        for label, mode, timings in results:
+            mean, p50, p95 = self.summarize(timings)
+            summary[(label, mode)] = mean
+            self.stdout.write(f"{label:<8} {mode:<6} {mean:>10.1f} {p50:>10.1f} {p95:>10.1f}")
+
+        for mode in ('sync', 'async'):
+            if ('legacy', mode) in summary:
+                saved = summary[('legacy', mode)] - summary[('stack', mode)]
+                self.stdout.write(self.style.SUCCESS(
+                    f"{mode}: {saved:.1f}us saved per request "
+                    f"({saved * 100 / summary[('legacy', mode)]:.0f}%)"
+                ))
+
+    def make_request(self, index):
+        request = self.factory.get(self.path, REMOTE_ADDR=f'10.0.{index // 250 % 250}.{index % 250 + 1}')
+        request.user = self.user
+        return request
+
+    def run_sync(self, handler, count):
+        # Warm up caches, template loaders and lazy imports before timing
+        for index in range(50):
+            handler(self.make_request(index))
+        timings = []
+        for index in range(count):
+            request = self.make_request(index)
+            started = time.perf_counter()
+            handler(request)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    async def run_async(self, handler, count):
+        for index in range(50):
+            await handler(self.make_request(index))
+        timings = []
+        for index in range(count):
+            request = self.make_request(index)
+            started = time.perf_counter()
+            await handler(request)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    @staticmethod
+    def summarize(timings):
+        micros = sorted(value * 1e6 for value in timings)
+        return statistics.mean(micros), micros[len(micros) // 2], micros[int(len(micros) * 0.95) - 1]
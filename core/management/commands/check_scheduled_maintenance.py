@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.conf import settings
 from core.models import ScheduledMaintenance, AuditLog
+from core.services.security_state import reset_security_state
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,23 +10,21 @@ class Command(BaseCommand):
     help = 'Check and execute scheduled maintenance windows'
     
     def handle(self, *args, **options):
+        # Requests read scheduled windows from the in-memory security state,
+        # which opens and closes them on time by itself. This command records
+        # the transitions and moves the state version so every process
+        # reloads its snapshot once.
         now = timezone.now()
         
         # Check for maintenance that should start
-        starting_maintenance = ScheduledMaintenance.objects.filter(
+        starting_maintenance = list(ScheduledMaintenance.objects.filter(
             is_active=True,
             was_executed=False,
             start_time__lte=now,
             end_time__gte=now
-        )
+        ))
         
         for maintenance in starting_maintenance:
-            # Enable maintenance mode
-            settings.MAINTENANCE_MODE = True
-            settings.MAINTENANCE_MESSAGE = maintenance.message
-            maintenance.was_executed = True
-            maintenance.save()
-            
             logger.info(f"Started scheduled maintenance: {maintenance.title}")
             self.stdout.write(
                 self.style.SUCCESS(f'Started maintenance: {maintenance.title}')
@@ -46,36 +44,38 @@ class Command(BaseCommand):
             )
         
         # Check for maintenance that should end
-        active_maintenance = getattr(settings, 'MAINTENANCE_MODE', False)
-        if active_maintenance:
-            # Check if any maintenance window has ended
-            ended_maintenance = ScheduledMaintenance.objects.filter(
-                is_active=True,
-                was_executed=True,
-                end_time__lt=now
+        ended_maintenance = list(ScheduledMaintenance.objects.filter(
+            is_active=True,
+            was_executed=True,
+            end_time__lt=now
+        ))
+        
+        for maintenance in ended_maintenance:
+            logger.info(f"Ended scheduled maintenance: {maintenance.title}")
+            self.stdout.write(
+                self.style.SUCCESS(f'Ended maintenance: {maintenance.title}')
             )
             
-            if ended_maintenance.exists():
-                # Disable maintenance mode
-                settings.MAINTENANCE_MODE = False
-                
-                for maintenance in ended_maintenance:
-                    maintenance.is_active = False
-                    maintenance.save()
-                    
-                    logger.info(f"Ended scheduled maintenance: {maintenance.title}")
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Ended maintenance: {maintenance.title}')
-                    )
-                    
-                    # Log the action
-                    AuditLog.log_action(
-                        user=maintenance.created_by,
-                        action='MAINTENANCE_END',
-                        model_name='ScheduledMaintenance',
-                        object_id=maintenance.id,
-                        details={
-                            'title': maintenance.title,
-                            'ended_at': now.isoformat()
-                        }
-                    )
\ No newline at end of file
+            # Log the action
+            AuditLog.log_action(
+                user=maintenance.created_by,
+                action='MAINTENANCE_END',
+                model_name='ScheduledMaintenance',
+                object_id=maintenance.id,
+                details={
+                    'title': maintenance.title,
+                    'ended_at': now.isoformat()
+                }
+            )
+        
+        # Bulk updates skip the per-row save signals; one version bump follows
+        if starting_maintenance:
+            ScheduledMaintenance.objects.filter(
+                id__in=[maintenance.id for maintenance in starting_maintenance]
+            ).update(was_executed=True)
+        if ended_maintenance:
+            ScheduledMaintenance.objects.filter(
+                id__in=[maintenance.id for maintenance in ended_maintenance]
+            ).update(is_active=False)
+        if starting_maintenance or ended_maintenance:
+            reset_security_state()
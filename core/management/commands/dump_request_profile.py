@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from core.services import request_profiler
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Dump per-view request profiles (timings, query counts, cache use) collected by the profiling middleware'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
+        parser.add_argument('--sort', default='wall_ms_sum',
+                            help='Column to sort by, e.g. wall_ms_p95, queries_avg, requests')
+        parser.add_argument('--limit', type=int, default=25, help='Number of views to show (0 for all)')
+        parser.add_argument('--slow', action='store_true', help='Include sampled SQL logs of slow requests')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+        parser.add_argument('--reset', action='store_true', help='Clear the collected profiles after dumping')
+    
+    def handle(self, *args, **options):
+        data = request_profiler.report(
+            sort=options['sort'],
+            limit=options['limit'] or None,
+            include_slow=options['slow'],
+        )
+        
+        if options['format'] == 'json':
+            output = json.dumps(data, indent=2, default=str)
+        else:
+            output = self.render_table(data, options['slow'])
+        
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(data['views'])} view profiles to {options['output']}"))
+        else:
+            self.stdout.write(output)
+        
+        if options['reset']:
+            request_profiler.store.reset()
+            logger.info("Request profiles reset")
+            self.stdout.write(self.style.SUCCESS('Request profiles cleared'))
+    
+    def render_table(self, data, include_slow):
+        columns = [
+            ('view', 'View', 40), ('requests', 'Reqs', 7), ('wall_ms_avg', 'Avg ms', 8),
+            ('wall_ms_p95', 'p95 ms', 8), ('queries_avg', 'Avg q', 7), ('queries_max', 'Max q', 6),
+            ('sql_ms_avg', 'SQL ms', 8), ('template_ms_avg', 'Tmpl ms', 8), ('cache_hit_rate', 'Hit %', 6),
+        ]
+        lines = [' '.join(title.ljust(width) for _, title, width in columns)]
+        for row in data['views']:
+            lines.append(' '.join(
+                str(row[key] if row[key] is not None else '-')[:width].ljust(width)
+                for key, _, width in columns
+            ))
+        
+        if include_slow:
+            lines.append('')
+            lines.append(f"Slow requests ({len(data['slow_requests'])} sampled):")
+            for sample in data['slow_requests']:
+                lines.append(
+                    f"  {sample['view']} {sample['status']} {sample['wall_ms']}ms "
+                    f"{sample['queries']} queries / {sample['sql_ms']}ms SQL"
+                )
+                for statement in sample['sql'][:20]:
+                    lines.append(f"    {statement['ms']:>8}ms  {statement['sql'][:160]}")
+        return '\n'.join(lines)
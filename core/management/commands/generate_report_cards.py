@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import CLASS_LEVEL_CHOICES
+from core.services.report_card_batch import OUTPUT_FORMATS, ReportCardBatch
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Generate report cards and PDFs for a class or the whole school'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year', help='Academic year in YYYY/YYYY format')
+        parser.add_argument('term', type=int, choices=[1, 2, 3])
+        parser.add_argument(
+            '--class-level', action='append', dest='class_levels',
+            choices=[code for code, _ in CLASS_LEVEL_CHOICES],
+            help='Class level to generate (repeatable); defaults to every class'
+        )
+        parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='zip',
+                            help='zip: one archive of individual PDFs per class; merged: one PDF per class')
+        parser.add_argument('--output-dir', default=os.path.join(settings.MEDIA_ROOT, 'report_cards'))
+        parser.add_argument('--workers', type=int, default=None, help='PDF rendering processes')
+        parser.add_argument('--force', action='store_true', help='Re-render cards even if their inputs are unchanged')
+    
+    def handle(self, *args, **options):
+        try:
+            batch = ReportCardBatch(
+                options['academic_year'],
+                options['term'],
+                class_levels=options['class_levels'],
+                output_dir=options['output_dir'],
+                output_format=options['output_format'],
+                workers=options['workers'],
+                force=options['force'],
+                progress_callback=self._report_class,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        stats = batch.run()
+        
+        for path in stats['files']:
+            self.stdout.write(f"  {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {stats['cards']} report cards across {stats['classes']} classes "
+            f"({stats['rendered']} rendered, {stats['skipped']} unchanged) in {stats['seconds']}s "
+            f"- {stats['cards_per_second']} cards/sec"
+        ))
+    
+    def _report_class(self, class_level, stats):
+        self.stdout.write(f"{class_level}: {stats['cards']} cards so far, {stats['rendered']} rendered")
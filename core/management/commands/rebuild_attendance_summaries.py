@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import AcademicTerm, AttendancePeriod, Student
+from core.services.attendance_summary import AttendanceSummaryEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recount attendance summaries from attendance records to repair counter drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, help='Academic term ID (defaults to the active term)')
+        parser.add_argument('--all-terms', action='store_true', help='Rebuild summaries for every term')
+        parser.add_argument('--class-level', help='Only rebuild summaries for students in this class level')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+    
+    def handle(self, *args, **options):
+        if options['all_terms']:
+            terms = AcademicTerm.objects.all()
+        elif options['term']:
+            terms = AcademicTerm.objects.filter(pk=options['term'])
+        else:
+            terms = AcademicTerm.objects.filter(is_active=True)
+        
+        if not terms.exists():
+            raise CommandError('No matching academic term found')
+        
+        student_ids = None
+        if options['class_level']:
+            student_ids = list(
+                Student.objects.filter(class_level=options['class_level']).values_list('id', flat=True)
+            )
+        
+        dry_run = options['dry_run']
+        total = 0
+        
+        for term in terms:
+            changed = AttendanceSummaryEngine.rebuild(term.id, student_ids=student_ids, dry_run=dry_run)
+            
+            period_ids = AttendancePeriod.objects.filter(term=term).values_list('id', flat=True)
+            for period_id in period_ids:
+                changed += AttendanceSummaryEngine.rebuild(
+                    term.id, period_id=period_id, student_ids=student_ids, dry_run=dry_run
+                )
+            
+            total += changed
+            self.stdout.write(f'{term}: {changed} summaries out of date')
+        
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run: {total} summaries would be rebuilt'))
+        else:
+            logger.info(f"Rebuilt {total} attendance summaries")
+            self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {total} attendance summaries'))
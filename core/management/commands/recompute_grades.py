@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.models import CLASS_LEVEL_CHOICES
+from core.services.grade_recompute import GradeRecomputeService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute stored grade totals and GES/letter grades from the current configuration'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year in YYYY/YYYY format; defaults to every year')
+        parser.add_argument('--term', type=int, choices=[1, 2, 3])
+        parser.add_argument('--class-level', choices=[code for code, _ in CLASS_LEVEL_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=GradeRecomputeService.CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Report how many grades would change without writing')
+    
+    def handle(self, *args, **options):
+        stats = GradeRecomputeService(
+            academic_year=options['academic_year'],
+            term=options['term'],
+            class_level=options['class_level'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        ).run()
+        
+        verb = 'would change' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['updated']} of {stats['scanned']} grades {verb} in {stats['seconds']}s "
+            f"- {stats['grades_per_second']} grades/sec ({stats['engine']})"
+        ))
@@ -1,38 +1,44 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from django.db.models import Sum
-from core.models import Student, Fee
+from core.models import CLASS_LEVEL_CHOICES
+from core.services.fee_status_refresh import FeeStatusRefreshService
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Refresh all fee payment statuses based on actual payments'
+    help = 'Refresh fee payment totals, balances and statuses from the recorded payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year in YYYY/YYYY format; defaults to every year')
+        parser.add_argument('--term', type=int, choices=[1, 2, 3])
+        parser.add_argument('--class', dest='class_level', choices=[code for code, _ in CLASS_LEVEL_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=FeeStatusRefreshService.CHUNK_SIZE)
+        parser.add_argument('--check', action='store_true', help='Report fees that have drifted without writing')
 
     def handle(self, *args, **options):
         self.stdout.write('Starting fee status refresh...')
-        
-        for student in Student.objects.all():
-            fees = Fee.objects.filter(student=student)
-            for fee in fees:
-                total_paid = fee.payments.aggregate(Sum('amount'))['amount__sum'] or 0
-                fee.amount_paid = total_paid
-                fee.balance = fee.amount_payable - fee.amount_paid
-                
-                if fee.balance <= 0:
-                    fee.payment_status = 'paid'
-                elif fee.amount_paid > 0:
-                    fee.payment_status = 'partial'
-                else:
-                    fee.payment_status = 'unpaid'
-                    
-                if fee.due_date and fee.due_date < timezone.now().date() and fee.payment_status != 'paid':
-                    fee.payment_status = 'overdue'
-                    
-                fee.save()
-            
-            if fees.count() > 0:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Updated {fees.count()} fees for {student.get_full_name()}')
-                )
-        
-        self.stdout.write(
-            self.style.SUCCESS('Successfully refreshed all fee statuses!')
-        )
\ No newline at end of file
+
+        stats = FeeStatusRefreshService(
+            academic_year=options['academic_year'],
+            term=options['term'],
+            class_level=options['class_level'],
+            chunk_size=options['chunk_size'],
+            check=options['check'],
+        ).run()
+
+        if options['check']:
+            for sample in stats['samples']:
+                self.stdout.write(f'  {sample}')
+            self.stdout.write(
+                f"{stats['amount_drift']} fees with a stale amount paid (off by GH₵{stats['drift_amount']:,.2f} in total), "
+                f"{stats['status_drift']} with a stale status"
+            )
+            style = self.style.WARNING if stats['updated'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f"{stats['updated']} of {stats['scanned']} fees out of date ({stats['seconds']}s)"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {stats['updated']} of {stats['scanned']} fees in {stats['seconds']}s"
+        ))
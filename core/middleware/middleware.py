@@ -71,8 +71,6 @@ class RateLimitMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.max_requests = 100  # requests per minute
-        self.window = 60  # seconds
         
     def __call__(self, request):
         # Skip rate limiting for certain paths
@@ -81,34 +79,17 @@ class RateLimitMiddleware(MiddlewareMixin):
             return self.get_response(request)
             
         # Apply rate limiting
-        client_ip = self.get_client_ip(request)
-        key = f"rate_limit:{client_ip}"
-        
-        current = cache.get(key, [])
-        current_time = time.time()
-        
-        # Remove old requests
-        current = [t for t in current if current_time - t < self.window]
-        
-        if len(current) >= self.max_requests:
-            from django.http import JsonResponse
-            return JsonResponse({
-                'error': 'Rate limit exceeded. Please try again later.'
-            }, status=429)
-        
-        current.append(current_time)
-        cache.set(key, current, self.window)
+        from core.security.rate_limiter import check_rate_limit
+        limited = check_rate_limit(request, 'general')
+        if limited is not None:
+            return limited
         
         response = self.get_response(request)
         return response
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        from core.security.rate_limiter import get_client_ip
+        return get_client_ip(request)
 
 
 class UserBlockMiddleware(MiddlewareMixin):
@@ -316,9 +297,12 @@ class SessionTimeoutMiddleware(MiddlewareMixin):
         
         response = self.get_response(request)
         
-        # Update session timestamp on successful requests
+        # Update session timestamp on successful requests, at most once per granularity
         if request.user.is_authenticated and response.status_code < 400:
-            request.session['_session_init_timestamp_'] = time.time()
+            now = time.time()
+            granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 300)
+            if now - request.session.get('_session_init_timestamp_', 0) >= granularity:
+                request.session['_session_init_timestamp_'] = now
             
         return response
 
@@ -0,0 +1,61 @@
+"""
+Request Profiling Middleware
+Per-view wall time, SQL, cache and template timings (see core.services.request_profiler)
+
+Off by default: enabling it hooks database connections, the cache backend and
+template render process-wide and merges stats into Redis every
+PROFILER_FLUSH_INTERVAL seconds. Set REQUEST_PROFILING_ENABLED=true where
+profiles are wanted.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.services import request_profiler
+
+
+class RequestProfilingMiddleware:
+    EXCLUDED_PATHS = ('/static/', '/media/', '/favicon.ico')
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            # Drop out of the chain entirely instead of checking per request
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        request_profiler.install_hooks()
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path.startswith(self.EXCLUDED_PATHS):
+            return self.get_response(request)
+        
+        with request_profiler.profile_request() as profile:
+            response = self.get_response(request)
+        
+        request_profiler.store.record(self.view_name(request), profile, response.status_code)
+        return response
+    
+    async def __acall__(self, request):
+        if request.path.startswith(self.EXCLUDED_PATHS):
+            return await self.get_response(request)
+        
+        with request_profiler.profile_request() as profile:
+            response = await self.get_response(request)
+        
+        # record() may flush to Redis, so keep it off the event loop
+        await sync_to_async(request_profiler.store.record, thread_sensitive=False)(
+            self.view_name(request), profile, response.status_code
+        )
+        return response
+    
+    @staticmethod
+    def view_name(request):
+        # Namespaced url_name, or the view's dotted path for unnamed routes
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else 'unresolved'
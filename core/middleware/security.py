@@ -1,44 +1,30 @@
 # core/middleware/security.py
 from django.utils.deprecation import MiddlewareMixin
-from django.http import JsonResponse, HttpResponse
-from django.core.cache import cache
+from django.http import HttpResponse
 from django.shortcuts import render
 from django.conf import settings
-import time
+
+from core.security.rate_limiter import check_rate_limit, get_client_ip, is_financial_path
 
 class FinancialSecurityMiddleware(MiddlewareMixin):
     """Security middleware for financial endpoints"""
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.rate_limit_requests = 100  # requests per minute
-        self.rate_limit_window = 60  # seconds
         
     def __call__(self, request):
-        # Skip rate limiting for GET requests
-        if request.method != 'GET':
-            # Apply rate limiting
-            client_ip = self.get_client_ip(request)
-            key = f"rate_limit:{client_ip}"
-            
-            current = cache.get(key, [])
-            current_time = time.time()
-            
-            # Remove old requests
-            current = [t for t in current if current_time - t < self.rate_limit_window]
-            
-            if len(current) >= self.rate_limit_requests:
-                return JsonResponse({
-                    'error': 'Rate limit exceeded. Please try again later.'
-                }, status=429)
-            
-            current.append(current_time)
-            cache.set(key, current, self.rate_limit_window)
+        financial = is_financial_path(request.path)
+        
+        # Financial writes get their own, separately counted policy
+        if financial and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            limited = check_rate_limit(request, 'financial')
+            if limited is not None:
+                return limited
         
         response = self.get_response(request)
         
         # Add security headers for financial endpoints
-        if request.path.startswith('/financial/') or request.path.startswith('/bills/') or request.path.startswith('/fees/'):
+        if financial:
             response['X-Content-Type-Options'] = 'nosniff'
             response['X-Frame-Options'] = 'DENY'
             response['X-XSS-Protection'] = '1; mode=block'
@@ -48,12 +34,7 @@ class FinancialSecurityMiddleware(MiddlewareMixin):
         return response
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
@@ -82,8 +63,6 @@ class RateLimitMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.max_requests = 100  # requests per minute
-        self.window = 60  # seconds
         
     def __call__(self, request):
         # Skip rate limiting for certain paths
@@ -92,33 +71,15 @@ class RateLimitMiddleware(MiddlewareMixin):
             return self.get_response(request)
             
         # Apply rate limiting
-        client_ip = self.get_client_ip(request)
-        key = f"rate_limit_general:{client_ip}"
-        
-        current = cache.get(key, [])
-        current_time = time.time()
-        
-        # Remove old requests
-        current = [t for t in current if current_time - t < self.window]
-        
-        if len(current) >= self.max_requests:
-            return JsonResponse({
-                'error': 'Rate limit exceeded. Please try again later.'
-            }, status=429)
-        
-        current.append(current_time)
-        cache.set(key, current, self.window)
+        limited = check_rate_limit(request, 'general')
+        if limited is not None:
+            return limited
         
         response = self.get_response(request)
         return response
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 
 class UserBlockMiddleware(MiddlewareMixin):
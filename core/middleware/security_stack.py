@@ -0,0 +1,115 @@
+# core/middleware/security_stack.py
+"""
+Single-pass security middleware.
+
+Replaces the separate FinancialSecurity, RateLimit, UserBlock, Maintenance,
+Notification, SecurityHeaders and ContentSecurityPolicy middlewares. The
+client context (IP, staff flag, block and maintenance state) is computed
+once per request, the rate limits are applied against it, and every
+security header is set in one pass over the response.
+
+The middleware is natively async: under Daphne the request-side checks run
+in one ``sync_to_async`` hop (they touch the session, cache and database),
+and the response side is plain header assignment done on the event loop.
+"""
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+
+from core.security.client_context import ClientContext
+from core.security.rate_limiter import check_rate_limit
+from core.services.security_state import get_security_state
+
+logger = logging.getLogger(__name__)
+
+CSP_POLICY = (
+    "default-src 'self'",
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com",
+    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://code.jquery.com",
+    "font-src 'self' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com",
+    "img-src 'self' data: https:",
+    "connect-src 'self'",
+    "frame-ancestors 'self'",
+    "form-action 'self'",
+    "base-uri 'self'",
+)
+
+
+class SecurityStackMiddleware:
+    """Rate limits, block/maintenance gates and security headers in one middleware"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        # Headers are fixed for the life of the process, so build them once
+        self.headers = {
+            'X-Content-Type-Options': 'nosniff',
+            'X-Frame-Options': 'DENY',
+            'X-XSS-Protection': '1; mode=block',
+            'Referrer-Policy': 'strict-origin-when-cross-origin',
+        }
+        if getattr(settings, 'SECURITY_STACK_CSP', True):
+            self.headers['Content-Security-Policy'] = '; '.join(CSP_POLICY)
+        self.financial_headers = {'Permissions-Policy': 'payment=(self)'}
+        # HSTS is left to SecurityMiddleware and the SECURE_HSTS_* settings
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await sync_to_async(self.process_request)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        client = ClientContext.from_request(request)
+        request.client_context = client
+        if client.is_static:
+            return None
+
+        limited = check_rate_limit(request, 'general', identity=client.ip)
+        if limited is not None:
+            return limited
+        # Financial writes get their own, separately counted policy
+        if client.is_financial and client.is_write:
+            limited = check_rate_limit(request, 'financial', identity=client.ip)
+            if limited is not None:
+                return limited
+
+        if client.blocked_here:
+            logger.warning(f"Blocked user {client.user_id} denied access to {client.path}")
+            return render(request, 'security/user_blocked.html', status=403)
+
+        if client.maintenance_here:
+            return render(request, 'security/maintenance.html', {
+                'message': get_security_state().maintenance_message(),
+                'maintenance_mode': True,
+                'user_can_bypass': False,
+            }, status=503)
+        return None
+
+    def process_response(self, request, response):
+        for header, value in self.headers.items():
+            response.setdefault(header, value)
+
+        client = getattr(request, 'client_context', None)
+        if client is not None and client.is_financial:
+            for header, value in self.financial_headers.items():
+                response[header] = value
+        if 'Server' in response:
+            del response['Server']
+        return response
@@ -3,15 +3,12 @@ import logging
 import asyncio
 from asgiref.sync import sync_to_async
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.sessions.models import Session
-from django.contrib.sessions.backends.base import CreateError
-import json
 
 logger = logging.getLogger(__name__)
 
 class SessionProtectionMiddleware(MiddlewareMixin):
     """
-    Middleware to protect against session corruption and fix issues
+    Middleware that keeps session data small
     - Async compatible version
     """
     sync_capable = True
@@ -38,102 +35,15 @@ class SessionProtectionMiddleware(MiddlewareMixin):
     
     async def process_request_async(self, request):
         """Async version of process_request"""
-        # Skip for non-authenticated users and static files
-        if (not hasattr(request, 'user') or 
-            request.path.startswith('/static/') or 
-            request.path.startswith('/media/')):
-            return None
-        
-        # Check if session exists and is valid
-        if hasattr(request, 'session'):
-            try:
-                session_key = request.session.session_key
-                
-                # If no session key, create one
-                if not session_key:
-                    await sync_to_async(request.session.create)()
-                    logger.info("Created new session for request")
-                    return None
-                
-                # Verify session exists in database and is not corrupted
-                try:
-                    session_obj = await sync_to_async(Session.objects.get)(session_key=session_key)
-                    # Test session data decoding
-                    await sync_to_async(session_obj.get_decoded)()
-                    
-                except Session.DoesNotExist:
-                    logger.warning(f"Session {session_key} not found in database")
-                    # Create new session
-                    await sync_to_async(request.session.flush)()
-                    await sync_to_async(request.session.create)()
-                    logger.info("Created new session after database lookup failed")
-                    
-                except (ValueError, json.JSONDecodeError) as e:
-                    logger.error(f"Session data corrupted for {session_key}: {str(e)}")
-                    # Delete corrupted session and create new one
-                    try:
-                        await sync_to_async(Session.objects.filter(session_key=session_key).delete)()
-                    except:
-                        pass
-                    await sync_to_async(request.session.flush)()
-                    await sync_to_async(request.session.create)()
-                    logger.info("Created new session after corruption detection")
-                    
-            except CreateError as e:
-                logger.error(f"Failed to create session: {str(e)}")
-                # Continue without session
-                request.session = {}
-                
-            except Exception as e:
-                logger.error(f"Unexpected session error: {str(e)}")
-                # Continue without modifying session
-        
-        return None
+        return self.process_request(request)
     
     def process_request(self, request):
-        """Sync version of process_request"""
-        # Same logic but sync
-        if (not hasattr(request, 'user') or 
-            request.path.startswith('/static/') or 
-            request.path.startswith('/media/')):
-            return None
-        
-        if hasattr(request, 'session'):
-            try:
-                session_key = request.session.session_key
-                
-                if not session_key:
-                    request.session.create()
-                    logger.info("Created new session for request")
-                    return None
-                
-                try:
-                    session_obj = Session.objects.get(session_key=session_key)
-                    session_obj.get_decoded()
-                    
-                except Session.DoesNotExist:
-                    logger.warning(f"Session {session_key} not found in database")
-                    request.session.flush()
-                    request.session.create()
-                    logger.info("Created new session after database lookup failed")
-                    
-                except (ValueError, json.JSONDecodeError) as e:
-                    logger.error(f"Session data corrupted for {session_key}: {str(e)}")
-                    try:
-                        Session.objects.filter(session_key=session_key).delete()
-                    except:
-                        pass
-                    request.session.flush()
-                    request.session.create()
-                    logger.info("Created new session after corruption detection")
-                    
-            except CreateError as e:
-                logger.error(f"Failed to create session: {str(e)}")
-                request.session = {}
-                
-            except Exception as e:
-                logger.error(f"Unexpected session error: {str(e)}")
-        
+        """
+        Corrupted or missing sessions are handled by the session store while
+        decoding (see core.session_backend), so there is nothing to look up
+        here. Sessions are no longer created eagerly either: Django creates
+        one as soon as something is stored in it.
+        """
         return None
     
     async def process_response_async(self, request, response):
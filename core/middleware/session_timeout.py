@@ -8,15 +8,19 @@ from django.conf import settings
 class SessionTimeoutMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        # Only persist last_activity when it has moved by at least this much,
+        # so ordinary page views and AJAX polls don't rewrite the session
+        self.granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 300)
     
     def __call__(self, request):
         if request.user.is_authenticated:
             # Check session expiry
+            current_time = time.time()
             last_activity = request.session.get('last_activity')
             if last_activity:
-                current_time = time.time()
                 timeout = getattr(settings, 'SESSION_COOKIE_AGE', 1209600)
                 if current_time - last_activity > timeout:
                     logout(request)
-            request.session['last_activity'] = time.time()
+            if not last_activity or current_time - last_activity >= self.granularity:
+                request.session['last_activity'] = current_time
         return self.get_response(request)
@@ -0,0 +1,18 @@
+"""
+User Roles Middleware
+"""
+from django.utils.functional import SimpleLazyObject
+
+from core.services.user_roles import get_user_roles
+
+
+class UserRolesMiddleware:
+    """Attach the current user's resolved roles to ``request.user_roles``"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Lazy: requests that never check a role pay nothing
+        request.user_roles = SimpleLazyObject(lambda: get_user_roles(request.user))
+        return self.get_response(request)
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.26 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    """Fill the new counters for existing rows with one grouped aggregate."""
+    from django.db.models import Count, F, Q, Sum
+
+    AssignmentAnalytics = apps.get_model('core', 'AssignmentAnalytics')
+    StudentAssignment = apps.get_model('core', 'StudentAssignment')
+
+    graded_with_score = Q(status='GRADED', score__isnull=False)
+    rows = (
+        StudentAssignment.objects.order_by()
+        .values('assignment_id')
+        .annotate(
+            submitted_count=Count('id', filter=~Q(status='PENDING')),
+            on_time_count=Count('id', filter=Q(
+                status__in=['SUBMITTED', 'GRADED'],
+                submitted_date__lte=F('assignment__due_date'),
+            )),
+            scored_count=Count('id', filter=graded_with_score),
+            score_total=Sum('score', filter=graded_with_score),
+        )
+    )
+    counts = {row.pop('assignment_id'): row for row in rows}
+
+    to_update = []
+    for analytics in AssignmentAnalytics.objects.all():
+        row = counts.get(analytics.assignment_id)
+        if not row:
+            continue
+        analytics.submitted_count = row['submitted_count']
+        analytics.on_time_count = row['on_time_count']
+        analytics.scored_count = row['scored_count']
+        analytics.score_total = row['score_total'] or 0
+        to_update.append(analytics)
+    AssignmentAnalytics.objects.bulk_update(
+        to_update, ['submitted_count', 'on_time_count', 'scored_count', 'score_total'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_remove_schoolconfiguration_academic_period_system_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignmentanalytics',
+            name='on_time_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentanalytics',
+            name='score_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='assignmentanalytics',
+            name='scored_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentanalytics',
+            name='submitted_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
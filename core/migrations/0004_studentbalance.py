@@ -0,0 +1,93 @@
+# Generated by Django 4.2.26 on 2026-10-16 22:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_balances(apps, schema_editor):
+    """Fill the table with one grouped aggregate per source."""
+    from collections import defaultdict
+    from decimal import Decimal
+    from django.db.models import Count, Max, Min, Q, Sum
+    from django.utils import timezone
+
+    Fee = apps.get_model('core', 'Fee')
+    Bill = apps.get_model('core', 'Bill')
+    FeePayment = apps.get_model('core', 'FeePayment')
+    BillPayment = apps.get_model('core', 'BillPayment')
+    StudentBalance = apps.get_model('core', 'StudentBalance')
+
+    balances = defaultdict(dict)
+
+    def merge(student_id, field, value, pick=None):
+        if value is None:
+            return
+        current = balances[student_id].get(field)
+        balances[student_id][field] = value if current is None or pick is None else pick(current, value)
+
+    sources = (
+        (Fee, 'payment_status', ['unpaid', 'partial', 'overdue'], 'fee'),
+        (Bill, 'status', ['issued', 'partial', 'overdue'], 'bill'),
+    )
+    for model, status_field, outstanding, prefix in sources:
+        is_outstanding = Q(**{f'{status_field}__in': outstanding})
+        rows = (
+            model.objects.order_by().values('student_id')
+            .annotate(
+                balance=Sum('balance', filter=is_outstanding),
+                overdue=Count('id', filter=Q(**{status_field: 'overdue'})),
+                oldest=Min('due_date', filter=is_outstanding),
+            )
+        )
+        for row in rows:
+            merge(row['student_id'], f'{prefix}_balance', row['balance'])
+            merge(row['student_id'], f'overdue_{prefix}s', row['overdue'])
+            merge(row['student_id'], 'oldest_due_date', row['oldest'], min)
+
+    for row in FeePayment.objects.order_by().values('fee__student_id').annotate(last=Max('payment_date')):
+        last = row['last']
+        if last is not None:
+            last = timezone.localdate(last) if timezone.is_aware(last) else last.date()
+            merge(row['fee__student_id'], 'last_payment_date', last, max)
+    for row in BillPayment.objects.order_by().values('bill__student_id').annotate(last=Max('payment_date')):
+        merge(row['bill__student_id'], 'last_payment_date', row['last'], max)
+
+    to_create = []
+    for student_id, values in balances.items():
+        values.setdefault('fee_balance', Decimal('0.00'))
+        values.setdefault('bill_balance', Decimal('0.00'))
+        values['total_balance'] = values['fee_balance'] + values['bill_balance']
+        to_create.append(StudentBalance(student_id=student_id, **values))
+    StudentBalance.objects.bulk_create(to_create, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_assignmentanalytics_running_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fee_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bill_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('overdue_fees', models.PositiveIntegerField(default=0)),
+                ('overdue_bills', models.PositiveIntegerField(default=0)),
+                ('oldest_due_date', models.DateField(blank=True, null=True)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_summary', to='core.student')),
+            ],
+            options={
+                'verbose_name': 'Student Balance',
+                'verbose_name_plural': 'Student Balances',
+                'ordering': ['-total_balance'],
+                'indexes': [models.Index(fields=['total_balance'], name='core_studen_total_b_635066_idx')],
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
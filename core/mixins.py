@@ -8,24 +8,26 @@ from django.shortcuts import redirect
 from django.utils import timezone
 import logging
 
+from core.services.user_roles import get_user_roles
+
 logger = logging.getLogger(__name__)
 
 # Helper functions for role checking
 def is_admin(user):
     """Check if user is an admin"""
-    return hasattr(user, 'admin') or user.is_superuser or user.is_staff
+    return get_user_roles(user).is_admin
 
 def is_teacher(user):
     """Check if user is a teacher"""
-    return hasattr(user, 'teacher')
+    return get_user_roles(user).is_teacher
 
 def is_student(user):
     """Check if user is a student"""
-    return hasattr(user, 'student')
+    return get_user_roles(user).is_student
 
 def is_parent(user):
     """Check if user is a parent"""
-    return hasattr(user, 'parentguardian')
+    return get_user_roles(user).is_parent
 
 
 class TwoFactorLoginRequiredMixin(LoginRequiredMixin):
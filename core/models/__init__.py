@@ -77,6 +77,7 @@ from .financial import (
     Fee,
     FeePayment,
     StudentCredit,
+    StudentBalance,
     FeeDiscount,
     FeeInstallment,
     PaymentGateway,
@@ -189,6 +190,7 @@ __all__ = [
     'Fee',
     'FeePayment',
     'StudentCredit',
+    'StudentBalance',
     'FeeDiscount',
     'FeeInstallment',
     'PaymentGateway',
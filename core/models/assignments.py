@@ -170,6 +170,10 @@ class Assignment(models.Model):
                 StudentAssignment.objects.bulk_create(student_assignments)
                 logger.info(f"Created {len(student_assignments)} student assignments for assignment {self.id}")
                 
+                # bulk_create skips the post_save handler that maintains analytics
+                from core.services.assignment_analytics import AssignmentAnalyticsEngine
+                AssignmentAnalyticsEngine.recompute([self.id])
+                
         except Exception as e:
             logger.error(f"Error creating student assignments for assignment {self.id}: {str(e)}")
     
@@ -288,6 +292,17 @@ class StudentAssignment(models.Model):
     def __str__(self):
         return f"{self.student} - {self.assignment.title} ({self.status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so analytics can apply just the delta on save
+        loaded = instance.__dict__
+        if {'assignment_id', 'status', 'score', 'submitted_date'} <= loaded.keys():
+            instance._loaded_analytics_fields = (
+                loaded['assignment_id'], loaded['status'], loaded['score'], loaded['submitted_date']
+            )
+        return instance
+    
     def clean(self):
         """Model-level validation"""
         super().clean()
@@ -657,6 +672,12 @@ class AssignmentAnalytics(models.Model):
     graded_students = models.PositiveIntegerField(default=0)
     pending_students = models.PositiveIntegerField(default=0)
     late_submissions = models.PositiveIntegerField(default=0)
+    
+    # Running counters maintained by AssignmentAnalyticsEngine
+    submitted_count = models.PositiveIntegerField(default=0)
+    on_time_count = models.PositiveIntegerField(default=0)
+    scored_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     last_calculated = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -668,44 +689,13 @@ class AssignmentAnalytics(models.Model):
         return f"Analytics for {self.assignment.title}"
     
     def calculate_analytics(self):
-        """Calculate and update analytics data with error handling"""
+        """Recount analytics from scratch with a single aggregate query"""
         try:
-            student_assignments = self.assignment.student_assignments.all()
-            self.total_students = student_assignments.count()
-            
-            # Count students by status
-            self.pending_students = student_assignments.filter(status='PENDING').count()
-            self.graded_students = student_assignments.filter(status='GRADED').count()
-            self.late_submissions = student_assignments.filter(status='LATE').count()
-            
-            # Calculate score statistics
-            graded_with_scores = student_assignments.filter(
-                status='GRADED', 
-                score__isnull=False
-            )
-            
-            if graded_with_scores.exists():
-                scores = [float(sa.score) for sa in graded_with_scores]
-                self.average_score = sum(scores) / len(scores)
-                self.highest_score = max(scores)
-                self.lowest_score = min(scores)
-            else:
-                self.average_score = None
-                self.highest_score = None
-                self.lowest_score = None
-            
-            # Calculate submission rates
-            submitted_assignments = student_assignments.exclude(status='PENDING')
-            on_time_assignments = student_assignments.filter(
-                status__in=['SUBMITTED', 'GRADED'],
-                submitted_date__lte=self.assignment.due_date
-            ) if self.assignment.due_date else submitted_assignments
-            
-            if self.total_students > 0:
-                self.submission_rate = (submitted_assignments.count() / self.total_students) * 100
-                self.on_time_submission_rate = (on_time_assignments.count() / self.total_students) * 100
+            from core.services.assignment_analytics import AssignmentAnalyticsEngine
             
-            self.save()
+            AssignmentAnalyticsEngine.recompute([self.assignment_id])
+            if self.pk:
+                self.refresh_from_db()
             return True
             
         except Exception as e:
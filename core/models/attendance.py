@@ -128,28 +128,51 @@ class StudentAttendance(GhanaEducationMixin):
                 if original.period != self.period or original.date != self.date:
                     raise ValidationError("Cannot modify attendance for a locked period")
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Read the raw values: attribute access on a deferred field would
+        # load it through refresh_from_db, which comes back here
+        loaded = instance.__dict__
+        if {'student_id', 'term_id', 'period_id', 'status'} <= loaded.keys():
+            instance._loaded_summary_key = (
+                loaded['student_id'], loaded['term_id'], loaded['period_id'], loaded['status']
+            )
+        return instance
+    
+    def _summary_key(self):
+        return (self.student_id, self.term_id, self.period_id, self.status)
+    
     def save(self, *args, **kwargs):
+        from core.services.attendance_summary import AttendanceSummaryEngine
+        
+        previous = getattr(self, '_loaded_summary_key', None)
+        if previous is None and not self._state.adding:
+            # Loaded through .only()/.defer() without the tracked fields
+            previous = StudentAttendance.objects.filter(pk=self.pk).values_list(
+                'student_id', 'term_id', 'period_id', 'status'
+            ).first()
         super().save(*args, **kwargs)
-        self.update_attendance_summary()
+        # Only the status delta is applied; see AttendanceSummaryEngine
+        AttendanceSummaryEngine.record_change(self, previous)
+        self._loaded_summary_key = self._summary_key()
+    
+    def delete(self, *args, **kwargs):
+        from core.services.attendance_summary import AttendanceSummaryEngine
+        
+        result = super().delete(*args, **kwargs)
+        AttendanceSummaryEngine.record_delete(self)
+        return result
     
     def update_attendance_summary(self):
-        """Update attendance summary for this student and term"""
-        # Update term summary
-        term_summary, created = AttendanceSummary.objects.get_or_create(
-            student=self.student,
-            term=self.term,
-            period=None
-        )
-        term_summary.calculate_summary()
+        """Recount the term and period summaries for this student"""
+        from core.services.attendance_summary import AttendanceSummaryEngine
         
-        # Update period summary if period exists
-        if self.period:
-            period_summary, created = AttendanceSummary.objects.get_or_create(
-                student=self.student,
-                term=self.term,
-                period=self.period
+        AttendanceSummaryEngine.rebuild(self.term_id, student_ids=[self.student_id])
+        if self.period_id:
+            AttendanceSummaryEngine.rebuild(
+                self.term_id, period_id=self.period_id, student_ids=[self.student_id]
             )
-            period_summary.calculate_summary()
     
     def is_ghana_school_day(self):
         """Check if the attendance date is a valid Ghana school day"""
@@ -203,41 +226,13 @@ class AttendanceSummary(models.Model):
         return f"{self.student} - {period_name} - {self.attendance_rate}%"
     
     def calculate_summary(self):
-        """Calculate and update attendance summary"""
-        filters = {
-            'student': self.student,
-            'term': self.term,
-        }
-        
-        if self.period:
-            filters['period'] = self.period
-            attendance_records = StudentAttendance.objects.filter(
-                **filters,
-                date__range=[self.period.start_date, self.period.end_date]
-            )
-        else:
-            attendance_records = StudentAttendance.objects.filter(
-                **filters,
-                date__range=[self.term.start_date, self.term.end_date]
-            )
-        
-        # Count by status
-        self.days_present = attendance_records.filter(status='present').count()
-        self.days_absent = attendance_records.filter(status='absent').count()
-        self.days_late = attendance_records.filter(status='late').count()
-        self.days_excused = attendance_records.filter(status='excused').count()
-        self.days_sick = attendance_records.filter(status='sick').count()
-        self.days_other = attendance_records.filter(status='other').count()
-        
-        # Calculate totals and rates
-        self.total_days = attendance_records.count()
-        
-        if self.total_days > 0:
-            present_days = self.days_present + self.days_late + self.days_excused
-            self.present_rate = (present_days / self.total_days) * 100
-            self.attendance_rate = (self.days_present / self.total_days) * 100
+        """Recalculate this summary from its attendance records in one aggregate query"""
+        from core.services.attendance_summary import AttendanceSummaryEngine
         
-        self.save()
+        if self.pk is None:
+            self.save()
+        AttendanceSummaryEngine.rebuild(self.term_id, period_id=self.period_id, student_ids=[self.student_id])
+        self.refresh_from_db()
     
     def get_ges_compliance(self):
         """Check if attendance meets Ghana Education Service requirements (80% minimum)"""
@@ -367,7 +367,8 @@ class Notification(models.Model):
                 # Unknown type or None, return 0
                 return 0
             
-            return cls.objects.filter(recipient=user, is_read=False).count()
+            from core.services.notification_counter import get_unread_count
+            return get_unread_count(user.id)
             
         except Exception as e:
             logger.error(f"Error getting unread count: {str(e)}")
@@ -376,8 +377,11 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Mark notification as read and send WebSocket update"""
         if not self.is_read:
+            from core.services.notification_counter import adjust
+            
             self.is_read = True
             self.save(update_fields=['is_read'])
+            adjust(self.recipient_id, -1)
             self.send_websocket_update()
             return True
         return False
@@ -385,45 +389,18 @@ class Notification(models.Model):
     def send_websocket_update(self):
         """Send WebSocket update for this notification"""
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from core.services.notification_push import push
             
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'notifications_{self.recipient.id}',
-                {
-                    'type': 'notification_update',
-                    'action': 'single_read',
-                    'notification_id': self.id,
-                    'unread_count': self.get_unread_count_for_user(self.recipient)
-                }
-            )
+            push(self.recipient_id, 'single_read', notification_id=self.id)
         except Exception as e:
             logger.error(f"WebSocket update failed for notification {self.id}: {str(e)}")
     
     def send_new_notification_ws(self):
         """Send WebSocket notification when a new notification is created"""
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from core.services.notification_push import notification_payload, push
             
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'notifications_{self.recipient.id}',
-                {
-                    'type': 'notification_update',
-                    'action': 'new_notification',
-                    'notification': {
-                        'id': self.id,
-                        'title': self.title,
-                        'message': self.message,
-                        'notification_type': self.notification_type,
-                        'created_at': self.created_at.isoformat(),
-                        'is_read': self.is_read,
-                    },
-                    'unread_count': self.get_unread_count_for_user(self.recipient)
-                }
-            )
+            push(self.recipient_id, 'new_notification', notification_payload(self))
         except Exception as e:
             logger.error(f"WebSocket new notification failed: {str(e)}")
     
@@ -444,9 +421,7 @@ class Notification(models.Model):
                 notification.related_content_type = related_object._meta.model_name
                 notification.save()
             
-            # Send WebSocket notification
-            notification.send_new_notification_ws()
-            
+            # save() already pushed the new notification
             logger.info(f"Notification created successfully for {recipient.username}: {title}")
             return notification
             
@@ -1,8 +1,10 @@
 """
 System configuration models - LINKED TO STANDALONE ACADEMIC SYSTEM
 """
+import copy
 import logging
 import re
+import time
 from decimal import Decimal
 from django.db import models
 from django.contrib.auth import get_user_model
@@ -20,10 +22,24 @@ from core.models.base import (
 
 # IMPORT STANDALONE ACADEMIC MODELS
 from core.models.academic_term import AcademicYear, AcademicTerm, ACADEMIC_PERIOD_SYSTEM_CHOICES
+from core.services.grade_boundaries import GradeBoundaries
+from core.services.version_counter import VersionCounter
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Every worker keeps its own copy of the configuration row, stamped with the
+# version counter held in the shared cache. Saving the row bumps the counter,
+# so other gunicorn/Celery processes reload on their next version check.
+CONFIG_VERSION = VersionCounter('school_config:version')
+CONFIG_VERSION_CHECK_INTERVAL = 1.0  # seconds between shared-cache checks
+
+_config_state = {
+    'instance': None,
+    'version': None,
+    'checked_at': 0.0,
+}
+
 
 class SchoolConfiguration(models.Model):
     """Main school configuration model with comprehensive grading system settings."""
@@ -369,6 +385,13 @@ class SchoolConfiguration(models.Model):
                 logger.error(f"Error auto-syncing academic system: {str(e)}")
         
         super().save(*args, **kwargs)
+        self.__dict__.pop('_grade_boundaries', None)
+        self.invalidate_cache()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache()
+        return result
     
     def clean(self):
         """Additional validation for configuration."""
@@ -430,7 +453,45 @@ class SchoolConfiguration(models.Model):
     
     @classmethod
     def get_config(cls):
-        """Get or create the single configuration instance."""
+        """Get or create the single configuration instance.
+        
+        Returns a private copy of the process-local cached row, so callers
+        may modify and save it without affecting other readers.
+        """
+        config = copy.copy(cls.get_cached())
+        # The copy may be edited, so it compiles its own boundary table
+        config.__dict__.pop('_grade_boundaries', None)
+        return config
+    
+    @classmethod
+    def get_cached(cls):
+        """
+        Shared, read-only configuration for hot paths.
+        
+        Served from process memory while the version counter in the shared
+        cache is unchanged; the counter itself is checked at most once every
+        CONFIG_VERSION_CHECK_INTERVAL seconds.
+        """
+        state = _config_state
+        now = time.monotonic()
+        if state['instance'] is not None and now - state['checked_at'] < CONFIG_VERSION_CHECK_INTERVAL:
+            return state['instance']
+        
+        version = CONFIG_VERSION.get()
+        if state['instance'] is not None and version is not None and version == state['version']:
+            state['checked_at'] = now
+            return state['instance']
+        
+        obj = cls._load_config()
+        state.update(instance=obj, version=version, checked_at=now)
+        return obj
+    
+    @classmethod
+    def _load_config(cls):
+        obj = cls.objects.select_related('current_academic_year').filter(pk=1).first()
+        if obj is not None:
+            return obj
+        
         obj, created = cls.objects.get_or_create(pk=1)
         
         # Auto-sync on first get
@@ -443,6 +504,12 @@ class SchoolConfiguration(models.Model):
         
         return obj
     
+    @classmethod
+    def invalidate_cache(cls):
+        """Drop this process's copy and tell every other worker to reload."""
+        _config_state.update(instance=None, version=None, checked_at=0.0)
+        CONFIG_VERSION.bump()
+    
     # ========================
     # UPDATED METHODS FOR STANDALONE SYSTEM
     # ========================
@@ -519,61 +586,25 @@ class SchoolConfiguration(models.Model):
             logger.error(f"❌ Error in auto-sync: {str(e)}")
             return False, f"Sync error: {str(e)}"
     
+    @property
+    def grade_boundaries(self):
+        """Compiled boundary table, built once per loaded configuration."""
+        boundaries = self.__dict__.get('_grade_boundaries')
+        if boundaries is None:
+            boundaries = self.__dict__['_grade_boundaries'] = GradeBoundaries.from_config(self)
+        return boundaries
+    
     def get_ges_grade_for_score(self, score):
         """Get GES grade (1-9) for a given score."""
-        if score is None:
-            return 'N/A'
-        
-        try:
-            score = float(score)
-            if score >= float(self.grade_1_min):
-                return '1'
-            elif score >= float(self.grade_2_min):
-                return '2'
-            elif score >= float(self.grade_3_min):
-                return '3'
-            elif score >= float(self.grade_4_min):
-                return '4'
-            elif score >= float(self.grade_5_min):
-                return '5'
-            elif score >= float(self.grade_6_min):
-                return '6'
-            elif score >= float(self.grade_7_min):
-                return '7'
-            elif score >= float(self.grade_8_min):
-                return '8'
-            else:
-                return '9'
-        except (ValueError, TypeError):
-            return 'N/A'
+        return self.grade_boundaries.ges.classify(score)
     
     def get_letter_grade_for_score(self, score):
         """Get letter grade for a given score."""
-        if score is None:
-            return 'N/A'
-        
-        try:
-            score = float(score)
-            if score >= float(self.letter_a_plus_min):
-                return 'A+'
-            elif score >= float(self.letter_a_min):
-                return 'A'
-            elif score >= float(self.letter_b_plus_min):
-                return 'B+'
-            elif score >= float(self.letter_b_min):
-                return 'B'
-            elif score >= float(self.letter_c_plus_min):
-                return 'C+'
-            elif score >= float(self.letter_c_min):
-                return 'C'
-            elif score >= float(self.letter_d_plus_min):
-                return 'D+'
-            elif score >= float(self.letter_d_min):
-                return 'D'
-            else:
-                return 'F'
-        except (ValueError, TypeError):
-            return 'N/A'
+        return self.grade_boundaries.letter.classify(score)
+    
+    def grade_many(self, scores):
+        """(ges_grade, letter_grade) for each score, in one pass."""
+        return self.grade_boundaries.grade_many(scores)
     
     def get_all_grades_for_score(self, score):
         """Get both GES and letter grades for a score."""
@@ -1212,14 +1243,8 @@ class MaintenanceMode(models.Model):
     @classmethod
     def can_user_access(cls, user):
         """Check if user can access the system (bypass maintenance)."""
-        maintenance = cls.get_current_maintenance()
-        
-        # No active maintenance - everyone can access
-        if not maintenance or not maintenance.is_currently_active():
-            return True
-            
-        # Check if user can bypass maintenance
-        return maintenance.can_user_bypass(user)
+        from core.services.security_state import get_security_state
+        return get_security_state().can_access(user)
 
 
 class ScheduledMaintenance(models.Model):
@@ -848,6 +848,30 @@ class StudentCredit(models.Model):
         return f"{self.student} - GH₵{self.credit_amount} Credit"
 
 
+class StudentBalance(models.Model):
+    """Outstanding fee and bill figures per student, kept current by core.services.student_arrears"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='balance_summary')
+    fee_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bill_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    overdue_fees = models.PositiveIntegerField(default=0)
+    overdue_bills = models.PositiveIntegerField(default=0)
+    oldest_due_date = models.DateField(null=True, blank=True)
+    last_payment_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Student Balance'
+        verbose_name_plural = 'Student Balances'
+        ordering = ['-total_balance']
+        indexes = [
+            models.Index(fields=['total_balance']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student} - GH₵{self.total_balance} outstanding"
+
+
 class FeeDiscount(models.Model):
     DISCOUNT_TYPES = [
         ('PERCENT', 'Percentage'),
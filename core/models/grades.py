@@ -343,7 +343,7 @@ class Grade(models.Model):
     def calculate_total_score(self):
         """Calculate weighted total score using SchoolConfiguration weights"""
         try:
-            config = SchoolConfiguration.get_config()
+            config = SchoolConfiguration.get_cached()
             
             # Get weights (these are already percentages, e.g., 20, 30, 10, 40)
             homework_weight = config.homework_weight / Decimal('100.00')  # 20% → 0.20
@@ -381,10 +381,9 @@ class Grade(models.Model):
                 self.letter_grade = 'N/A'
                 return
 
-            config = SchoolConfiguration.get_config()
+            config = SchoolConfiguration.get_cached()
             
-            self.ges_grade = config.get_ges_grade_for_score(self.total_score)
-            self.letter_grade = config.get_letter_grade_for_score(self.total_score)
+            self.ges_grade, self.letter_grade = config.grade_boundaries.grade(self.total_score)
             
             logger.debug(f"Grades determined - GES: {self.ges_grade}, Letter: {self.letter_grade}")
             
@@ -398,7 +397,7 @@ class Grade(models.Model):
     def get_weighted_contributions(self):
         """Get weighted contributions for display - used in templates"""
         try:
-            config = SchoolConfiguration.get_config()
+            config = SchoolConfiguration.get_cached()
             
             homework_contribution = (self.homework_percentage or Decimal('0.00')) * config.homework_weight / Decimal('100.00')
             classwork_contribution = (self.classwork_percentage or Decimal('0.00')) * config.classwork_weight / Decimal('100.00')
@@ -438,7 +437,7 @@ class Grade(models.Model):
     
     def get_display_grade(self):
         """Get display grade based on grading system"""
-        config = SchoolConfiguration.get_config()
+        config = SchoolConfiguration.get_cached()
         
         if config.grading_system == 'BOTH':
             return f"{self.ges_grade} ({self.letter_grade})"
@@ -453,7 +452,7 @@ class Grade(models.Model):
             if self.total_score is None:
                 return False
                 
-            config = SchoolConfiguration.get_config()
+            config = SchoolConfiguration.get_cached()
             return self.total_score >= config.passing_mark
         except:
             return self.total_score >= Decimal('40.00') if self.total_score else False
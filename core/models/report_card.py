@@ -10,6 +10,14 @@ from django.utils import timezone
 # OLD: from core.models.academic import AcademicTerm
 # NEW: Import from academic_term instead
 from core.models.academic_term import AcademicTerm
+from core.services.grade_boundaries import BoundaryTable
+
+# Fixed scale used when the school configuration is unavailable
+DEFAULT_REPORT_CARD_GRADES = BoundaryTable(
+    [(90, 'A+'), (80, 'A'), (70, 'B+'), (60, 'B'), (50, 'C+'), (40, 'C'), (30, 'D+'), (20, 'D')],
+    floor_label='E',
+    invalid_label='',
+)
 
 class ReportCard(models.Model):
     TERM_CHOICES = [
@@ -181,7 +189,7 @@ class ReportCard(models.Model):
                     # Determine overall grade
                     try:
                         from core.models.configuration import SchoolConfiguration
-                        config = SchoolConfiguration.get_config()
+                        config = SchoolConfiguration.get_cached()
                         self.overall_grade = config.get_letter_grade_for_score(self.average_score)
                     except Exception as config_error:
                         # Fallback calculation - NEVER return empty string
@@ -210,31 +218,7 @@ class ReportCard(models.Model):
     @staticmethod
     def calculate_grade(score):
         """Calculate letter grade based on score"""
-        if score is None:
-            return ''
-            
-        try:
-            score = float(score)
-            if score >= 90:
-                return 'A+'
-            elif score >= 80:
-                return 'A'
-            elif score >= 70:
-                return 'B+'
-            elif score >= 60:
-                return 'B'
-            elif score >= 50:
-                return 'C+'
-            elif score >= 40:
-                return 'C'
-            elif score >= 30:
-                return 'D+'
-            elif score >= 20:
-                return 'D'
-            else:
-                return 'E'
-        except (ValueError, TypeError):
-            return ''
+        return DEFAULT_REPORT_CARD_GRADES.classify(score)
     
     def get_absolute_url(self):
         """Get URL for viewing this report card"""
@@ -448,64 +432,10 @@ class ReportCard(models.Model):
             }
     
     def get_position_in_class(self):
-        """Calculate student's position in class"""
-        try:
-            from django.apps import apps
-            from django.db.models import Avg
-            from core.models import Student, Grade
-            
-            # Get all students in same class
-            classmates = Student.objects.filter(
-                class_level=self.student.class_level,
-                is_active=True
-            )
-            
-            # Calculate average scores for all students
-            student_scores = []
-            for student in classmates:
-                grades = Grade.objects.filter(
-                    student=student,
-                    academic_year=self.academic_year,
-                    term=self.term
-                )
-                
-                if grades.exists():
-                    avg_score = grades.aggregate(avg=Avg('total_score'))['avg'] or 0
-                else:
-                    avg_score = 0
-                
-                student_scores.append({
-                    'student_id': student.id,
-                    'average': float(avg_score)
-                })
-            
-            # Sort by average score (descending)
-            student_scores.sort(key=lambda x: x['average'], reverse=True)
-            
-            # Find this student's position
-            for index, score_data in enumerate(student_scores, 1):
-                if score_data['student_id'] == self.student.id:
-                    total_students = len(student_scores)
-                    
-                    # Format position with ordinal
-                    if index == 1:
-                        ordinal = "1st"
-                    elif index == 2:
-                        ordinal = "2nd"
-                    elif index == 3:
-                        ordinal = "3rd"
-                    else:
-                        ordinal = f"{index}th"
-                    
-                    return f"{ordinal} of {total_students}"
-            
-            return "Not ranked"
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error calculating position in class: {e}")
-            return "Not available"
+        """Position among the class's graded students, e.g. '3rd of 40', or 'Not ranked'"""
+        from core.services.class_ranking import get_class_position
+        
+        return get_class_position(self.student, self.academic_year, self.term)
     
     @classmethod
     def get_for_student(cls, student, academic_year=None, term=None):
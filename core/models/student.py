@@ -228,6 +228,15 @@ class Student(models.Model):
                 })
             self.phone_number = cleaned_phone
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the class and active flag so a move can drop class rankings
+        loaded = instance.__dict__
+        if {'class_level', 'is_active'} <= loaded.keys():
+            instance._loaded_ranking_fields = (loaded['class_level'], loaded['is_active'])
+        return instance
+
     def save(self, *args, **kwargs):
         # Generate student ID if this is a new student
         if not self.student_id:
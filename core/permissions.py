@@ -7,23 +7,25 @@ from django.db import transaction
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from core.services.user_roles import get_user_roles
+
 # ===== ROLE CHECK FUNCTIONS =====
 
 def is_admin(user):
     """Check if user is an admin/superuser"""
-    return user.is_authenticated and (user.is_superuser or user.is_staff)
+    return get_user_roles(user).is_admin
 
 def is_teacher(user):
     """Check if user is a teacher"""
-    return user.is_authenticated and hasattr(user, 'teacher') and user.teacher is not None
+    return get_user_roles(user).is_teacher
 
 def is_student(user):
     """Check if user is a student"""
-    return user.is_authenticated and hasattr(user, 'student') and user.student is not None
+    return get_user_roles(user).is_student
 
 def is_parent(user):
     """Check if user is a parent"""
-    return user.is_authenticated and hasattr(user, 'parentguardian') and user.parentguardian is not None
+    return get_user_roles(user).is_parent
 
 # ===== PERMISSION CHECK FUNCTIONS =====
 
@@ -90,13 +90,17 @@ class SecurityAuditor:
         checks = []
         
         # Check rate limiting
-        if 'core.middleware.security.FinancialSecurityMiddleware' not in settings.MIDDLEWARE:
+        financial_middleware = (
+            'core.middleware.security_stack.SecurityStackMiddleware',
+            'core.middleware.security.FinancialSecurityMiddleware',
+        )
+        if not any(path in settings.MIDDLEWARE for path in financial_middleware):
             checks.append({
                 'level': 'high',
                 'check': 'Financial Rate Limiting',
                 'status': 'FAILED',
                 'message': 'Financial rate limiting middleware not enabled',
-                'recommendation': 'Add FinancialSecurityMiddleware to MIDDLEWARE'
+                'recommendation': 'Add SecurityStackMiddleware to MIDDLEWARE'
             })
         
         # Check 2FA configuration
@@ -0,0 +1,88 @@
+# core/security/client_context.py
+"""
+Per-request client context for the security middleware.
+
+The client IP, the user's role flags and the maintenance/block state used to
+be worked out again by each middleware that needed them. ``ClientContext``
+derives them once, from the request as it stands after authentication, and
+is attached as ``request.client_context`` for anything later in the chain.
+"""
+import logging
+from dataclasses import dataclass
+
+from core.security.rate_limiter import get_client_ip, is_financial_path
+from core.services.security_state import get_security_state
+
+logger = logging.getLogger(__name__)
+
+STATIC_PREFIXES = ('/static/', '/media/', '/favicon.ico')
+
+# Paths a blocked user can still reach
+BLOCK_EXEMPT_PREFIXES = (
+    '/accounts/signout/', '/admin/blocked/', '/django-admin/logout/',
+) + STATIC_PREFIXES
+
+# Paths that stay up during maintenance, so staff can still sign in
+MAINTENANCE_EXEMPT_PREFIXES = (
+    '/accounts/signin/', '/accounts/signout/', '/login/', '/django-admin/',
+    '/admin/maintenance/', '/admin/emergency-bypass/', '/admin/clear-bypass/',
+    '/api/',
+) + STATIC_PREFIXES
+
+@dataclass(frozen=True)
+class ClientContext:
+    ip: str
+    method: str
+    path: str
+    is_static: bool
+    is_financial: bool
+    is_authenticated: bool
+    user_id: int = None
+    is_staff: bool = False
+    is_blocked: bool = False
+    # Maintenance is on and this client is not allowed past it
+    maintenance: bool = False
+
+    @property
+    def is_write(self):
+        return self.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Build the context. Touches ``request.user`` (and possibly the cache
+        and database), so under ASGI it must run in a sync thread.
+        """
+        path = request.path
+        ip = get_client_ip(request)
+        is_static = path.startswith(STATIC_PREFIXES)
+        user = getattr(request, 'user', None)
+        is_authenticated = bool(user is not None and not is_static and user.is_authenticated)
+
+        is_blocked = maintenance = False
+        if not is_static:
+            state = get_security_state()
+            is_blocked = is_authenticated and state.is_blocked(user.pk)
+            maintenance = state.is_maintenance_active() and not state.can_bypass(user, ip)
+
+        return cls(
+            ip=ip,
+            method=request.method,
+            path=path,
+            is_static=is_static,
+            is_financial=is_financial_path(path),
+            is_authenticated=is_authenticated,
+            user_id=user.pk if is_authenticated else None,
+            is_staff=is_authenticated and (user.is_staff or user.is_superuser),
+            is_blocked=is_blocked,
+            maintenance=maintenance,
+        )
+
+    @property
+    def blocked_here(self):
+        """Blocked users only see the logout and blocked pages"""
+        return self.is_blocked and not self.path.startswith(BLOCK_EXEMPT_PREFIXES)
+
+    @property
+    def maintenance_here(self):
+        return self.maintenance and not self.path.startswith(MAINTENANCE_EXEMPT_PREFIXES)
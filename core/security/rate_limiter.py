@@ -0,0 +1,172 @@
+# core/security/rate_limiter.py
+"""
+Shared sliding-window rate limiter.
+
+Each policy counts requests per client in fixed windows and estimates the
+sliding-window rate as ``previous * (1 - elapsed / window) + current``.
+Counting is a single atomic ``INCR`` (plus ``EXPIRE`` and a ``GET`` of the
+previous window, pipelined into one Redis round-trip), so concurrent workers
+never overwrite each other's counts and the stored value stays one integer
+however busy the client is. Without Redis (LocMem in development and
+tests) the same counters go through ``cache.add``/``cache.incr``.
+"""
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+FINANCIAL_PATH_RE = re.compile(r'^/(?:admin/)?(?:financial|fees|fee-[\w-]+|bills)/')
+
+RATE_PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def is_financial_path(path):
+    return bool(FINANCIAL_PATH_RE.match(path))
+
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    name: str
+    limit: int
+    window: int  # seconds
+
+    @classmethod
+    def from_rate(cls, name, rate):
+        """Build a policy from a DRF-style rate such as '100/day' or '30/min'"""
+        count, period = rate.split('/')
+        return cls(name, int(count), RATE_PERIODS[period.strip().lower()])
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # seconds; 0 when allowed
+
+
+def get_policy(name):
+    """Named policies from settings.RATE_LIMIT_POLICIES, falling back to defaults"""
+    policies = {
+        'general': RatePolicy(
+            'general',
+            getattr(settings, 'RATE_LIMIT_REQUESTS', 100),
+            getattr(settings, 'RATE_LIMIT_WINDOW', 60),
+        ),
+        'financial': RatePolicy('financial', 100, 60),
+    }
+    configured = getattr(settings, 'RATE_LIMIT_POLICIES', {}).get(name)
+    if configured:
+        return RatePolicy(name, configured['requests'], configured['window'])
+    return policies[name]
+
+
+def _redis_client():
+    """The raw Redis client behind the default cache, or None"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+class RateLimiter:
+    """Counts hits for one policy"""
+
+    def __init__(self, policy):
+        self.policy = policy
+
+    def _keys(self, identity, now):
+        window_index = int(now // self.policy.window)
+        base = f"{KEY_PREFIX}:{self.policy.name}:{identity}"
+        return f"{base}:{window_index}", f"{base}:{window_index - 1}", now - window_index * self.policy.window
+
+    def _count_redis(self, client, current_key, previous_key):
+        pipe = client.pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, self.policy.window * 2)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def _count_cache(self, current_key, previous_key):
+        cache.add(current_key, 0, self.policy.window * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(current_key, 1, self.policy.window * 2)
+            current = 1
+        return current, cache.get(previous_key, 0)
+
+    def hit(self, identity):
+        """Record one request from ``identity`` and decide whether to allow it"""
+        policy = self.policy
+        now = time.time()
+        current_key, previous_key, elapsed = self._keys(identity, now)
+
+        try:
+            client = _redis_client()
+            if client is not None:
+                current, previous = self._count_redis(client, current_key, previous_key)
+            else:
+                current, previous = self._count_cache(current_key, previous_key)
+        except Exception as e:
+            # Never turn a cache outage into an outage of the site
+            logger.warning(f"Rate limiter unavailable for {policy.name}: {str(e)}")
+            return RateLimitResult(True, policy.limit, policy.limit, 0)
+
+        weight = 1 - elapsed / policy.window
+        estimated = previous * weight + current
+        if estimated <= policy.limit:
+            return RateLimitResult(True, policy.limit, int(policy.limit - estimated), 0)
+        return RateLimitResult(False, policy.limit, 0, self._retry_after(current, previous, elapsed))
+
+    def _retry_after(self, current, previous, elapsed):
+        """Seconds until the estimated rate falls back under the limit"""
+        window, limit = self.policy.window, self.policy.limit
+        if current >= limit or not previous:
+            wait = window - elapsed
+        else:
+            # previous * (1 - t / window) + current <= limit
+            wait = window * (1 - (limit - current) / previous) - elapsed
+        return max(1, math.ceil(wait))
+
+
+def rate_limit_response(result, message='Rate limit exceeded. Please try again later.'):
+    response = JsonResponse({'error': message, 'retry_after': result.retry_after}, status=429)
+    response['Retry-After'] = str(result.retry_after)
+    response['X-RateLimit-Limit'] = str(result.limit)
+    response['X-RateLimit-Remaining'] = '0'
+    return response
+
+
+def check_rate_limit(request, policy_name, identity=None):
+    """
+    Count the request against ``policy_name``. Returns a 429 response when
+    the client is over the limit, otherwise None.
+    """
+    identity = identity or get_client_ip(request)
+    if not identity:
+        return None
+    result = RateLimiter(get_policy(policy_name)).hit(identity)
+    if result.allowed:
+        return None
+    logger.warning(f"Rate limit '{policy_name}' exceeded by {identity} on {request.path}")
+    return rate_limit_response(result)
@@ -0,0 +1,47 @@
+# core/security/throttling.py
+"""
+DRF throttles backed by the shared sliding-window limiter, so API limits are
+counted atomically like the middleware limits instead of as cached
+timestamp lists.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.security.rate_limiter import RateLimiter, RatePolicy
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with the cache history replaced by RateLimiter"""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        identity = self.get_cache_key(request, view)
+        if identity is None:
+            return True
+
+        policy = RatePolicy(f"drf_{self.scope}", self.num_requests, self.duration)
+        self.result = RateLimiter(policy).hit(identity)
+        return self.result.allowed
+
+    def wait(self):
+        result = getattr(self, 'result', None)
+        return result.retry_after if result else None
+
+
+class AnonSlidingWindowThrottle(SlidingWindowRateThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
@@ -0,0 +1,206 @@
+# core/services/announcement_fanout.py
+"""
+Background delivery of announcement notifications.
+
+Recipients are resolved per audience group (everyone, a role, or a class),
+their Notification rows are written with chunked ``bulk_create``, and each
+group gets a single channel-layer broadcast instead of one message per user.
+Delivery progress is kept in the cache for the announcement pages to poll,
+and a retried run skips recipients that were already notified.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Announcement, Notification
+from core.services.context_fragments import invalidate_notifications
+from core.services.notification_counter import add_unread
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def progress_key(announcement_id):
+    return f"announcement_fanout:{announcement_id}"
+
+
+def broadcast_group(audience):
+    """Channel-layer group for an audience: 'all', a role, 'students_P1' or 'class_P1'."""
+    return f"announcements_{audience}"
+
+
+def broadcast_groups_for_user(user):
+    """Every announcement group a connected user should listen on."""
+    groups = [broadcast_group('all')]
+    if user.is_staff:
+        groups.append(broadcast_group('admins'))
+
+    rows = User.objects.filter(pk=user.pk).values_list(
+        'student__class_level', 'teacher__id', 'parentguardian__students__class_level'
+    )
+    class_levels = set()
+    own_class = None
+    is_teacher = False
+    for student_class, teacher_id, child_class in rows:
+        if student_class:
+            own_class = student_class
+            class_levels.add(student_class)
+        if teacher_id:
+            is_teacher = True
+        if child_class:
+            class_levels.add(child_class)
+
+    if own_class:
+        groups.append(broadcast_group('students'))
+        groups.append(broadcast_group(f'students_{own_class}'))
+    if is_teacher:
+        groups.append(broadcast_group('teachers'))
+    # Class announcements reach students and the parents of students in the class
+    groups.extend(broadcast_group(f'class_{level}') for level in sorted(class_levels))
+    return groups
+
+
+class AnnouncementFanout:
+    """Deliver one announcement to its audience"""
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, announcement_id):
+        self.announcement_id = announcement_id
+
+    @property
+    def progress(self):
+        return cache.get(progress_key(self.announcement_id)) or {}
+
+    def _update(self, **fields):
+        data = self.progress
+        data.update(fields)
+        cache.set(progress_key(self.announcement_id), data, PROGRESS_TIMEOUT)
+        return data
+
+    def queue(self):
+        self._update(status='queued', total=None, delivered=0)
+
+    def mark_failed(self, error, retrying=False):
+        self._update(
+            status='retrying' if retrying else 'failed',
+            error=str(error),
+            completed_at=None if retrying else timezone.now().isoformat(),
+        )
+
+    def audience(self, announcement):
+        """{group name: queryset of recipient users} for the announcement's target"""
+        users = User.objects.filter(is_active=True)
+        class_levels = [level for level in announcement.get_target_class_levels() if level]
+        target = announcement.target_roles
+
+        if target == 'ALL':
+            return {broadcast_group('all'): users}
+        if target == 'TEACHERS':
+            return {broadcast_group('teachers'): users.filter(teacher__isnull=False)}
+        if target == 'ADMINS':
+            return {broadcast_group('admins'): users.filter(is_staff=True)}
+        if target == 'STUDENTS' and not class_levels:
+            return {broadcast_group('students'): users.filter(student__isnull=False)}
+        if target in ('STUDENTS', 'CLASS'):
+            groups = {}
+            for level in class_levels:
+                if target == 'CLASS':
+                    # Class announcements also reach the children's parents
+                    members = Q(student__class_level=level) | Q(parentguardian__students__class_level=level)
+                    groups[broadcast_group(f'class_{level}')] = users.filter(members)
+                else:
+                    groups[broadcast_group(f'students_{level}')] = users.filter(student__class_level=level)
+            return groups
+        return {}
+
+    def run(self):
+        try:
+            announcement = Announcement.objects.get(pk=self.announcement_id)
+        except Announcement.DoesNotExist:
+            logger.warning(f"Announcement {self.announcement_id} no longer exists; nothing to deliver")
+            return self._update(status='cancelled')
+
+        groups = self.audience(announcement)
+        recipient_ids = set()
+        for users in groups.values():
+            recipient_ids.update(users.values_list('id', flat=True))
+
+        already_notified = set(
+            Notification.objects.filter(
+                notification_type='ANNOUNCEMENT',
+                related_content_type='announcement',
+                related_object_id=announcement.id,
+                recipient_id__in=recipient_ids,
+            ).values_list('recipient_id', flat=True)
+        )
+        pending = sorted(recipient_ids - already_notified)
+
+        state = self._update(
+            status='delivering',
+            total=len(recipient_ids),
+            delivered=len(already_notified),
+            started_at=self.progress.get('started_at') or timezone.now().isoformat(),
+            completed_at=None,
+        )
+
+        title = f"New Announcement: {announcement.title}"
+        message = announcement.message
+        if len(message) > 200:
+            message = message[:200] + "..."
+        link = reverse('announcement_detail', kwargs={'pk': announcement.pk})
+
+        delivered = state['delivered']
+        for start in range(0, len(pending), self.CHUNK_SIZE):
+            chunk = pending[start:start + self.CHUNK_SIZE]
+            Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=user_id,
+                    notification_type='ANNOUNCEMENT',
+                    title=title,
+                    message=message,
+                    link=link,
+                    related_object_id=announcement.id,
+                    related_content_type='announcement',
+                )
+                for user_id in chunk
+            ], batch_size=self.CHUNK_SIZE)
+            invalidate_notifications(*chunk)
+            add_unread(chunk)
+            delivered += len(chunk)
+            self._update(delivered=delivered)
+
+        self._broadcast(announcement, groups, title, message, link)
+        logger.info(
+            f"Announcement {announcement.id} delivered to {delivered} users "
+            f"via {len(groups)} broadcast group(s)"
+        )
+        return self._update(status='completed', delivered=delivered, completed_at=timezone.now().isoformat())
+
+    def _broadcast(self, announcement, groups, title, message, link):
+        """One channel-layer message per audience group"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        event = {
+            'type': 'announcement_broadcast',
+            'announcement_id': announcement.id,
+            'title': title,
+            'message': message,
+            'priority': announcement.priority,
+            'link': link,
+            'timestamp': timezone.now().isoformat(),
+        }
+        for group in groups:
+            try:
+                async_to_sync(channel_layer.group_send)(group, event)
+            except Exception as e:
+                logger.error(f"Announcement broadcast to {group} failed: {str(e)}")
@@ -0,0 +1,255 @@
+# core/services/assignment_analytics.py
+"""
+Incremental maintenance of AssignmentAnalytics.
+
+Grading or submitting one StudentAssignment only moves that row from one
+status (and score) to another, so the assignment's counters are adjusted by
+that delta rather than recounted. When a full recount is needed it is a
+single conditional aggregate per batch of assignments, and bulk grading
+defers the work so each assignment is recounted at most once per block.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from core.models import AssignmentAnalytics, StudentAssignment
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = [
+    'total_students', 'pending_students', 'graded_students', 'late_submissions',
+    'submitted_count', 'on_time_count', 'scored_count', 'score_total',
+    'average_score', 'highest_score', 'lowest_score',
+    'submission_rate', 'on_time_submission_rate',
+]
+
+_state = threading.local()
+
+
+def _percentage(part, total):
+    if not total:
+        return Decimal('0.00')
+    return (Decimal(part) * 100 / Decimal(total)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _recalculate_rates(analytics):
+    """Derive the average and rates from the stored counters."""
+    if analytics.scored_count:
+        analytics.average_score = (analytics.score_total / analytics.scored_count).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+    else:
+        analytics.average_score = analytics.highest_score = analytics.lowest_score = None
+    analytics.submission_rate = _percentage(analytics.submitted_count, analytics.total_students)
+    analytics.on_time_submission_rate = _percentage(analytics.on_time_count, analytics.total_students)
+
+
+def analytics_state(student_assignment, due_date):
+    """The part of a StudentAssignment that feeds its assignment's analytics."""
+    status = student_assignment.status
+    submitted_date = student_assignment.submitted_date
+    on_time = (
+        status in ('SUBMITTED', 'GRADED')
+        and submitted_date is not None
+        and (due_date is None or submitted_date <= due_date)
+    )
+    score = student_assignment.score if status == 'GRADED' else None
+    if score is not None:
+        score = Decimal(str(score))
+    return (student_assignment.assignment_id, status, score, on_time)
+
+
+def _contribution(state):
+    """Counter increments for one StudentAssignment state."""
+    _, status, score, on_time = state
+    return {
+        'total_students': 1,
+        'pending_students': int(status == 'PENDING'),
+        'graded_students': int(status == 'GRADED'),
+        'late_submissions': int(status == 'LATE'),
+        'submitted_count': int(status != 'PENDING'),
+        'on_time_count': int(on_time),
+        'scored_count': int(score is not None),
+        'score_total': score if score is not None else Decimal('0'),
+    }
+
+
+class AssignmentAnalyticsEngine:
+    """Keeps AssignmentAnalytics rows in step with StudentAssignment writes."""
+
+    @staticmethod
+    def is_deferred():
+        return getattr(_state, 'pending', None) is not None
+
+    @classmethod
+    def record_change(cls, student_assignment, previous=None):
+        """
+        Apply the change from ``previous`` (as returned by ``analytics_state``)
+        to the row's current state. ``previous`` is None for new rows.
+        """
+        current = analytics_state(student_assignment, student_assignment.assignment.due_date)
+        student_assignment._loaded_analytics_state = current
+        if previous == current:
+            return
+
+        if cls.is_deferred():
+            _state.pending.update({current[0], previous[0]} if previous else {current[0]})
+            return
+
+        with transaction.atomic():
+            if previous and previous[0] != current[0]:
+                cls._apply_delta(previous[0], remove=previous)
+                cls._apply_delta(current[0], add=current)
+            else:
+                cls._apply_delta(current[0], remove=previous, add=current)
+
+    @classmethod
+    def record_delete(cls, student_assignment, previous=None):
+        if previous is None:
+            previous = analytics_state(student_assignment, student_assignment.assignment.due_date)
+        if cls.is_deferred():
+            _state.pending.add(previous[0])
+            return
+        with transaction.atomic():
+            cls._apply_delta(previous[0], remove=previous)
+
+    @classmethod
+    def _apply_delta(cls, assignment_id, remove=None, add=None):
+        analytics = AssignmentAnalytics.objects.select_for_update().filter(assignment_id=assignment_id).first()
+        if analytics is None:
+            # No baseline to apply a delta to. A pure removal with no row is
+            # usually the assignment itself being deleted, so leave it be.
+            if add is not None:
+                cls.recompute([assignment_id])
+            return
+
+        for state, step in ((remove, -1), (add, 1)):
+            if state is None:
+                continue
+            for field, value in _contribution(state).items():
+                setattr(analytics, field, max(getattr(analytics, field) + step * value, 0))
+
+        removed_score = remove[2] if remove else None
+        if removed_score is not None and removed_score in (analytics.highest_score, analytics.lowest_score):
+            # The extreme may have been the score that left; only a recount knows the new one
+            cls.recompute([assignment_id])
+            return
+
+        added_score = add[2] if add else None
+        if added_score is not None:
+            if analytics.highest_score is None or added_score > analytics.highest_score:
+                analytics.highest_score = added_score
+            if analytics.lowest_score is None or added_score < analytics.lowest_score:
+                analytics.lowest_score = added_score
+
+        _recalculate_rates(analytics)
+        analytics.save(update_fields=COUNTER_FIELDS + ['last_calculated'])
+
+    @classmethod
+    def recompute(cls, assignment_ids):
+        """
+        Recount analytics for ``assignment_ids`` with one grouped conditional
+        aggregate. Returns the number of analytics rows written.
+        """
+        assignment_ids = set(assignment_ids)
+        if not assignment_ids:
+            return 0
+
+        graded_with_score = Q(status='GRADED', score__isnull=False)
+        rows = (
+            StudentAssignment.objects.filter(assignment_id__in=assignment_ids)
+            .order_by()
+            .values('assignment_id')
+            .annotate(
+                total_students=Count('id'),
+                pending_students=Count('id', filter=Q(status='PENDING')),
+                graded_students=Count('id', filter=Q(status='GRADED')),
+                late_submissions=Count('id', filter=Q(status='LATE')),
+                submitted_count=Count('id', filter=~Q(status='PENDING')),
+                on_time_count=Count('id', filter=Q(
+                    status__in=['SUBMITTED', 'GRADED'],
+                    submitted_date__lte=F('assignment__due_date'),
+                )),
+                scored_count=Count('id', filter=graded_with_score),
+                score_total=Sum('score', filter=graded_with_score),
+                highest_score=Max('score', filter=graded_with_score),
+                lowest_score=Min('score', filter=graded_with_score),
+            )
+        )
+        counts = {row.pop('assignment_id'): row for row in rows}
+
+        existing = {
+            analytics.assignment_id: analytics
+            for analytics in AssignmentAnalytics.objects.filter(assignment_id__in=assignment_ids)
+        }
+        to_create, to_update = [], []
+        for assignment_id in assignment_ids:
+            analytics = existing.get(assignment_id)
+            if analytics is None:
+                if assignment_id not in counts:
+                    # Nothing to report, and the assignment may be mid-delete
+                    continue
+                analytics = AssignmentAnalytics(assignment_id=assignment_id)
+                to_create.append(analytics)
+            else:
+                to_update.append(analytics)
+
+            row = counts.get(assignment_id, {})
+            for field in ('total_students', 'pending_students', 'graded_students',
+                          'late_submissions', 'submitted_count', 'on_time_count', 'scored_count'):
+                setattr(analytics, field, row.get(field, 0))
+            analytics.score_total = row.get('score_total') or Decimal('0')
+            analytics.highest_score = row.get('highest_score')
+            analytics.lowest_score = row.get('lowest_score')
+            _recalculate_rates(analytics)
+
+        if to_create:
+            AssignmentAnalytics.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+        if to_update:
+            # bulk_update skips auto_now, so touch last_calculated explicitly
+            now = timezone.now()
+            for analytics in to_update:
+                analytics.last_calculated = now
+            AssignmentAnalytics.objects.bulk_update(to_update, COUNTER_FIELDS + ['last_calculated'], batch_size=500)
+
+        return len(to_create) + len(to_update)
+
+    @classmethod
+    def flush(cls, pending):
+        """Recount every assignment collected while deferred, once each."""
+        if pending:
+            cls.recompute(pending)
+
+
+@contextmanager
+def deferred_assignment_analytics():
+    """
+    Collect analytics changes for the duration of the block and recount each
+    touched assignment once on exit, e.g. while grading a whole class.
+
+    The recount also runs when the block raises: rows saved before the error
+    may already be committed, and their assignments would otherwise keep
+    stale counters until the next write.
+    """
+    if AssignmentAnalyticsEngine.is_deferred():
+        yield
+        return
+
+    _state.pending = set()
+    try:
+        yield
+    except BaseException:
+        pending, _state.pending = _state.pending, None
+        try:
+            AssignmentAnalyticsEngine.flush(pending)
+        except Exception as e:
+            # Keep the original error rather than the recount's
+            logger.error(f"Error recounting analytics for assignments {sorted(pending)}: {str(e)}")
+        raise
+    pending, _state.pending = _state.pending, None
+    AssignmentAnalyticsEngine.flush(pending)
@@ -0,0 +1,167 @@
+# core/services/attendance_recorder.py
+"""
+Class-level attendance write path.
+
+Saving a roster one ``update_or_create`` at a time fires the full post_save
+fan-out per student. This service reads the existing rows once, writes the
+roster with one ``bulk_create`` and one ``bulk_update``, and then emits the
+side effects (summaries, audit trail, parent alerts) once per submission.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from core.models import AuditLog, ParentGuardian, StudentAttendance
+from core.services.attendance_summary import AttendanceSummaryEngine
+from core.services.notification_push import coalesce
+
+logger = logging.getLogger(__name__)
+
+
+class BulkAttendanceService:
+    """Save attendance for a whole class in a constant number of queries"""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, term, date, period=None, recorded_by=None, request=None):
+        self.term = term
+        self.date = date
+        self.period = period
+        self.recorded_by = recorded_by
+        self.request = request
+
+    def save(self, entries):
+        """
+        Persist ``entries``, a mapping of student_id -> (status, notes).
+        Returns a dict with created/updated/unchanged counts.
+        """
+        valid_statuses = {choice[0] for choice in StudentAttendance.STATUS_CHOICES}
+        entries = {
+            student_id: (status, notes or '')
+            for student_id, (status, notes) in entries.items()
+            if status in valid_statuses
+        }
+        if not entries:
+            return {'created': 0, 'updated': 0, 'unchanged': 0}
+
+        existing = {
+            record.student_id: record
+            for record in StudentAttendance.objects.filter(
+                student_id__in=entries.keys(),
+                date=self.date,
+                period=self.period,
+            )
+        }
+
+        to_create, to_update, newly_absent = [], [], []
+        # Summary scopes to recount, including the ones rows are moved out of
+        period_id = self.period.id if self.period else None
+        touched = set()
+        for student_id, (status, notes) in entries.items():
+            record = existing.get(student_id)
+            if record is None:
+                to_create.append(StudentAttendance(
+                    student_id=student_id,
+                    date=self.date,
+                    term=self.term,
+                    period=self.period,
+                    status=status,
+                    notes=notes,
+                    recorded_by=self.recorded_by,
+                ))
+                if status == 'absent':
+                    newly_absent.append(student_id)
+                touched.add((student_id, self.term.id, period_id))
+                continue
+
+            if (record.status, record.notes, record.term_id) == (status, notes, self.term.id):
+                continue
+            if status == 'absent' and record.status != 'absent':
+                newly_absent.append(student_id)
+            touched.add((student_id, record.term_id, record.period_id))
+            touched.add((student_id, self.term.id, period_id))
+            record.status = status
+            record.notes = notes
+            record.term = self.term
+            record.recorded_by = self.recorded_by
+            to_update.append(record)
+
+        with transaction.atomic():
+            StudentAttendance.objects.bulk_create(to_create, batch_size=self.BATCH_SIZE)
+            StudentAttendance.objects.bulk_update(
+                to_update, ['status', 'notes', 'term', 'recorded_by'], batch_size=self.BATCH_SIZE
+            )
+
+            if touched:
+                AttendanceSummaryEngine.rebuild_scopes(touched)
+                self._log_audit(to_create, to_update)
+
+            if newly_absent:
+                transaction.on_commit(lambda: self._notify_parents(newly_absent))
+
+        return {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'unchanged': len(entries) - len(to_create) - len(to_update),
+        }
+
+    def _log_audit(self, created, updated):
+        """Write one audit row per changed record in a single insert"""
+        ip_address = user_agent = None
+        if self.request is not None:
+            from core.signals import get_client_ip
+            ip_address = get_client_ip(self.request)
+            user_agent = self.request.META.get('HTTP_USER_AGENT', '')[:255]
+
+        user = self.recorded_by if self.recorded_by and self.recorded_by.is_authenticated else None
+        model_name = f"{StudentAttendance._meta.app_label}.{StudentAttendance._meta.model_name}"
+        # bulk_create only backfills primary keys on some backends
+        created_ids = dict(
+            StudentAttendance.objects.filter(
+                student_id__in=[r.student_id for r in created], date=self.date, period=self.period
+            ).values_list('student_id', 'id')
+        ) if created else {}
+
+        logs = []
+        for action, records in (('CREATE', created), ('UPDATE', updated)):
+            for record in records:
+                logs.append(AuditLog(
+                    user=user,
+                    action=action,
+                    model_name=model_name,
+                    object_id=str(record.pk or created_ids.get(record.student_id, '')),
+                    details={
+                        'student_id': record.student_id,
+                        'date': self.date.isoformat(),
+                        'status': record.status,
+                        'bulk': True,
+                    },
+                    ip_address=ip_address,
+                    user_agent=user_agent,
+                ))
+        AuditLog.objects.bulk_create(logs, batch_size=self.BATCH_SIZE)
+
+    def _notify_parents(self, student_ids):
+        """Send each parent a single alert listing all of their absent children"""
+        from core.signals import send_websocket_notification
+
+        student_ids = set(student_ids)
+        absent_by_parent = defaultdict(list)
+        links = ParentGuardian.objects.filter(
+            students__id__in=student_ids,
+            user__isnull=False,
+        ).values_list('user_id', 'students__id', 'students__first_name', 'students__last_name')
+        for user_id, student_id, first_name, last_name in links:
+            if student_id in student_ids:
+                absent_by_parent[user_id].append(f"{first_name} {last_name}".strip())
+
+        with coalesce():
+            for user_id, names in absent_by_parent.items():
+                send_websocket_notification(
+                    user_id,
+                    'ATTENDANCE',
+                    'Student Absent',
+                    f"{', '.join(sorted(names))} {'was' if len(names) == 1 else 'were'} absent on {self.date}",
+                )
+        logger.info(f"Sent absence alerts to {len(absent_by_parent)} parents for {self.date}")
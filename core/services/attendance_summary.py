@@ -0,0 +1,176 @@
+# core/services/attendance_summary.py
+"""
+Incremental maintenance of AttendanceSummary counters.
+
+A single StudentAttendance save only moves one day from one status bucket to
+another, so the summaries are adjusted by that delta instead of being
+recounted. Bulk submissions (a whole class at once) rebuild every affected
+summary with one grouped aggregate per summary scope.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from core.models import AttendanceSummary, StudentAttendance
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELDS = {
+    'present': 'days_present',
+    'absent': 'days_absent',
+    'late': 'days_late',
+    'excused': 'days_excused',
+    'sick': 'days_sick',
+    'other': 'days_other',
+}
+
+COUNTER_FIELDS = list(STATUS_FIELDS.values()) + ['total_days', 'attendance_rate', 'present_rate']
+
+def _percentage(part, total):
+    if not total:
+        return Decimal('0.00')
+    return (Decimal(part) * 100 / Decimal(total)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _recalculate_rates(summary):
+    """Derive totals and rates from the per-status counters."""
+    summary.total_days = sum(getattr(summary, field) for field in STATUS_FIELDS.values())
+    present_days = summary.days_present + summary.days_late + summary.days_excused
+    summary.present_rate = _percentage(present_days, summary.total_days)
+    summary.attendance_rate = _percentage(summary.days_present, summary.total_days)
+
+
+def _scopes(student_id, term_id, period_id):
+    """Summary keys touched by one attendance row: the term row and, if any, the period row."""
+    scopes = [(student_id, term_id, None)]
+    if period_id:
+        scopes.append((student_id, term_id, period_id))
+    return scopes
+
+
+class AttendanceSummaryEngine:
+    """Keeps AttendanceSummary rows in step with StudentAttendance writes."""
+
+    @classmethod
+    def record_change(cls, attendance, previous=None):
+        """
+        Apply the change from ``previous`` (student_id, term_id, period_id, status)
+        to the attendance row's current state. ``previous`` is None for new rows.
+        """
+        current = (attendance.student_id, attendance.term_id, attendance.period_id, attendance.status)
+        if previous == current:
+            return
+
+        with transaction.atomic():
+            # A scope rebuilt from the database already reflects the new
+            # state, so neither delta may touch it again
+            rebuilt = set()
+            if previous:
+                cls._apply_delta(previous, -1, rebuilt)
+            cls._apply_delta(current, 1, rebuilt)
+
+    @classmethod
+    def record_delete(cls, attendance):
+        previous = (attendance.student_id, attendance.term_id, attendance.period_id, attendance.status)
+        with transaction.atomic():
+            cls._apply_delta(previous, -1)
+
+    @classmethod
+    def _apply_delta(cls, key, step, rebuilt=None):
+        student_id, term_id, period_id, status = key
+        field = STATUS_FIELDS.get(status)
+        if field is None:
+            return
+        if rebuilt is None:
+            rebuilt = set()
+
+        for scope in _scopes(student_id, term_id, period_id):
+            if scope in rebuilt:
+                continue
+            summary, created = AttendanceSummary.objects.select_for_update().get_or_create(
+                student_id=scope[0], term_id=scope[1], period_id=scope[2]
+            )
+            if created:
+                # A missing row means we have no baseline to apply a delta to.
+                cls.rebuild(term_id, period_id=scope[2], student_ids=[student_id])
+                rebuilt.add(scope)
+                continue
+
+            setattr(summary, field, max(getattr(summary, field) + step, 0))
+            _recalculate_rates(summary)
+            summary.save(update_fields=COUNTER_FIELDS + ['last_updated'])
+
+    @classmethod
+    def rebuild(cls, term_id, period_id=None, student_ids=None, dry_run=False):
+        """
+        Recount summaries for one (term, period) scope with a single grouped
+        aggregate, counting only records dated within the term's or period's
+        current dates. Returns the number of summaries that changed.
+        """
+        records = StudentAttendance.objects.filter(term_id=term_id)
+        if period_id:
+            records = records.filter(
+                period_id=period_id,
+                date__gte=F('period__start_date'),
+                date__lte=F('period__end_date'),
+            )
+        else:
+            records = records.filter(date__gte=F('term__start_date'), date__lte=F('term__end_date'))
+        if student_ids is not None:
+            records = records.filter(student_id__in=student_ids)
+
+        aggregates = {
+            field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+        }
+        counts = {
+            row.pop('student_id'): row
+            for row in records.order_by().values('student_id').annotate(**aggregates)
+        }
+
+        existing = AttendanceSummary.objects.filter(term_id=term_id, period_id=period_id)
+        if student_ids is not None:
+            existing = existing.filter(student_id__in=student_ids)
+        existing = {summary.student_id: summary for summary in existing}
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for student_id in set(counts) | set(existing):
+            row = counts.get(student_id, dict.fromkeys(STATUS_FIELDS.values(), 0))
+            summary = existing.get(student_id)
+            if summary is None:
+                summary = AttendanceSummary(student_id=student_id, term_id=term_id, period_id=period_id)
+                to_create.append(summary)
+            elif all(getattr(summary, field) == value for field, value in row.items()):
+                continue
+            else:
+                to_update.append(summary)
+
+            for field, value in row.items():
+                setattr(summary, field, value)
+            _recalculate_rates(summary)
+            summary.last_updated = now
+
+        if not dry_run:
+            if to_create:
+                AttendanceSummary.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+            if to_update:
+                AttendanceSummary.objects.bulk_update(to_update, COUNTER_FIELDS + ['last_updated'], batch_size=500)
+
+        return len(to_create) + len(to_update)
+
+    @classmethod
+    def rebuild_scopes(cls, keys):
+        """
+        Rebuild every summary touched by ``keys``, (student_id, term_id,
+        period_id) tuples, with one grouped aggregate per (term, period).
+        """
+        pending = defaultdict(set)
+        for key in keys:
+            for student_id, term_id, period_id in _scopes(*key):
+                pending[(term_id, period_id)].add(student_id)
+        for (term_id, period_id), student_ids in pending.items():
+            cls.rebuild(term_id, period_id=period_id, student_ids=student_ids)
@@ -3,14 +3,15 @@ import logging
 from datetime import datetime, timedelta
 from decimal import Decimal
 from django.utils import timezone
-from django.db import transaction
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 
-from core.models import Fee, Bill, Student, FeePayment, AcademicTerm
+from core.models import Fee, Bill, FeePayment, AcademicTerm
 from core.models.audit import FinancialAuditTrail
 from core.utils.financial import FinancialCalculator
+from core.services import fee_generation
+from core.services.context_fragments import invalidate_parent_context_for_students
 
 logger = logging.getLogger(__name__)
 
@@ -24,80 +25,39 @@ class FinancialAutomationService:
     def generate_term_fees_automatically(self):
         """Automatically generate fees for new term"""
         try:
-            current_term = AcademicTerm.objects.filter(is_active=True).first()
+            current_term = AcademicTerm.objects.filter(is_active=True).select_related('academic_year').first()
             if not current_term:
                 logger.warning("No active academic term found")
                 return 0
             
-            # Get all active students
-            students = Student.objects.filter(is_active=True)
+            system_user = fee_generation.system_user()
+            if not system_user:
+                logger.warning("No superuser available to record auto-generated fees")
+                return 0
             
-            # Get mandatory fee categories
-            categories = FeeCategory.objects.filter(
-                is_active=True,
-                is_mandatory=True
+            # Due 2 weeks after the term starts
+            generator = fee_generation.TermFeeGenerator.for_term(
+                current_term,
+                system_user,
+                due_date=current_term.start_date + timedelta(days=14)
             )
+            result = generator.generate(
+                fee_generation.active_students(),
+                fee_generation.mandatory_categories()
+            )
+            created_count = result.created
             
-            created_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                for student in students:
-                    try:
-                        for category in categories:
-                            # Check if category applies to student's class
-                            if not category.is_applicable_to_class(student.class_level):
-                                continue
-                            
-                            # Check if fee already exists
-                            if Fee.objects.filter(
-                                student=student,
-                                category=category,
-                                academic_year=current_term.academic_year,
-                                term=current_term.term
-                            ).exists():
-                                continue
-                            
-                            # Calculate due date (e.g., 2 weeks after term starts)
-                            due_date = current_term.start_date + timedelta(days=14)
-                            
-                            # Create the fee
-                            fee = Fee.objects.create(
-                                student=student,
-                                category=category,
-                                academic_year=current_term.academic_year,
-                                term=current_term.term,
-                                amount_payable=category.default_amount,
-                                due_date=due_date,
-                                recorded_by=None,  # System action
-                                payment_status='unpaid'
-                            )
-                            
-                            # Log automation
-                            FinancialAuditTrail.log_action(
-                                action='CREATE',
-                                model_name='Fee',
-                                object_id=fee.id,
-                                user=None,
-                                notes=f'Auto-generated fee for {student.get_full_name()} - {category.get_name_display()}'
-                            )
-                            
-                            created_count += 1
-                            
-                    except Exception as e:
-                        errors.append(f"Student {student.student_id}: {str(e)}")
-                        logger.error(f"Error generating fee for student {student.student_id}: {str(e)}")
-                        continue
-            
-            logger.info(f"Auto-generated {created_count} fee records")
-            
-            # Send notification if many errors
-            if errors and len(errors) > 10:
-                self._send_automation_alert(
-                    "Fee Generation Errors",
-                    f"Encountered {len(errors)} errors during fee generation"
+            # One audit entry for the run rather than one per fee
+            if created_count:
+                FinancialAuditTrail.log_action(
+                    action='CREATE',
+                    model_name='Fee',
+                    object_id=f'{generator.academic_year}-T{generator.term}',
+                    user=system_user,
+                    notes=f'Auto-generated {created_count} fees totalling GH₵{result.total_amount:,.2f}'
                 )
             
+            logger.info(f"Auto-generated {created_count} fee records")
             return created_count
             
         except Exception as e:
@@ -214,7 +174,9 @@ class FinancialAutomationService:
                 payment_status__in=['unpaid', 'partial']
             )
             
+            overdue_student_ids = set(overdue_fees.values_list('student_id', flat=True))
             updated_fee_count = overdue_fees.update(payment_status='overdue')
+            invalidate_parent_context_for_students(overdue_student_ids)
             
             # Update overdue bills
             overdue_bills = Bill.objects.filter(
@@ -0,0 +1,146 @@
+# core/services/class_ranking.py
+"""
+Class ranking computed in one grouped query per (class, year, term).
+
+Every student's average total score and rank is derived from a single
+``GROUP BY student`` aggregate and cached, so rendering a whole class's report
+cards reads positions from memory instead of re-aggregating each classmate.
+The cache entry is dropped whenever a Grade in that class changes, and every
+term of a class is dropped at once (through a per-class version) when a
+student joins, leaves or is deactivated.
+
+Only active students with at least one graded subject are ranked, and "Nth of
+M" counts those students, as the report card view always did. The old
+ReportCard.get_position_in_class also counted ungraded classmates (at a 0
+average); they now read "Not ranked" and are left out of M.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import Avg, Count
+
+from core.models import Grade
+from core.services.version_counter import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+RANKING_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def class_version(class_level):
+    return VersionCounter(f"class_ranking:{class_level}:version".replace(' ', '_'))
+
+
+def ordinal(number):
+    """1 -> '1st', 12 -> '12th', 22 -> '22nd'"""
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+class ClassRanking:
+    """Averages and positions for every ranked student in one class and term"""
+
+    def __init__(self, class_level, academic_year, term, entries):
+        self.class_level = class_level
+        self.academic_year = academic_year
+        self.term = int(term)
+        # student_id -> {'average', 'subjects', 'rank', 'dense_rank'}
+        self.entries = entries
+
+    @staticmethod
+    def cache_key(class_level, academic_year, term):
+        version = class_version(class_level).get()
+        return f"class_ranking:{class_level}:{version}:{academic_year}:{term}".replace(' ', '_')
+
+    @classmethod
+    def for_class(cls, class_level, academic_year, term):
+        key = cls.cache_key(class_level, academic_year, term)
+        entries = cache.get(key)
+        if entries is None:
+            entries = cls._compute(class_level, academic_year, term)
+            cache.set(key, entries, RANKING_CACHE_TIMEOUT)
+        return cls(class_level, academic_year, term, entries)
+
+    @classmethod
+    def for_student(cls, student, academic_year, term):
+        return cls.for_class(student.class_level, academic_year, term)
+
+    @classmethod
+    def invalidate(cls, class_level, academic_year, term):
+        cache.delete(cls.cache_key(class_level, academic_year, term))
+
+    @staticmethod
+    def invalidate_class(class_level):
+        """Drop the rankings of every year and term for ``class_level``"""
+        class_version(class_level).bump()
+
+    @staticmethod
+    def _compute(class_level, academic_year, term):
+        rows = (
+            Grade.objects.filter(
+                student__class_level=class_level,
+                student__is_active=True,
+                academic_year=academic_year,
+                term=term,
+                total_score__isnull=False,
+            )
+            .order_by()
+            .values('student_id')
+            .annotate(average=Avg('total_score'), subjects=Count('id'))
+        )
+
+        averages = sorted(
+            ((row['student_id'], round(float(row['average']), 2), row['subjects']) for row in rows),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+        entries = {}
+        rank = dense_rank = 0
+        previous = None
+        for index, (student_id, average, subjects) in enumerate(averages, 1):
+            if average != previous:
+                rank = index
+                dense_rank += 1
+                previous = average
+            entries[student_id] = {
+                'average': average,
+                'subjects': subjects,
+                'rank': rank,
+                'dense_rank': dense_rank,
+            }
+        return entries
+
+    @property
+    def total(self):
+        return len(self.entries)
+
+    def average_for(self, student_id):
+        entry = self.entries.get(student_id)
+        return entry['average'] if entry else None
+
+    def position_for(self, student_id, dense=False):
+        entry = self.entries.get(student_id)
+        if entry is None:
+            return None
+        return entry['dense_rank'] if dense else entry['rank']
+
+    def position_display(self, student_id, dense=False):
+        """'3rd of 42', or 'Not ranked' if the student has no graded subjects"""
+        position = self.position_for(student_id, dense=dense)
+        if position is None:
+            return "Not ranked"
+        return f"{ordinal(position)} of {self.total}"
+
+
+def get_class_position(student, academic_year, term, dense=False):
+    """Position string for ``student`` from the cached class ranking"""
+    try:
+        ranking = ClassRanking.for_student(student, academic_year, term)
+        return ranking.position_display(student.id, dense=dense)
+    except Exception as e:
+        logger.error(f"Error calculating position in class: {str(e)}")
+        return "Not available"
@@ -0,0 +1,133 @@
+# core/services/context_fragments.py
+"""
+Cached, lazily evaluated fragments of the global template context.
+
+``global_context`` runs on every rendered page, but most pages only show a
+handful of its values. Each group of values (notifications, the parent
+sidebar, timetable summaries) is a fragment: it is loaded the first time a
+template reads one of its keys, served from a per-user cache entry, and
+dropped by the signals of the models it is built from instead of expiring
+after a few minutes.
+"""
+import logging
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.services.version_counter import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+# Invalidation is event-driven; the timeout only bounds sources without a hook
+FRAGMENT_TIMEOUT = 60 * 60
+
+NOTIFICATIONS = 'notifications'
+PARENT = 'parent'
+TIMETABLE = 'timetable'
+
+TIMETABLE_VERSION = VersionCounter('context:timetable:version')
+
+
+def fragment_key(user_id, name, *parts):
+    return ':'.join(['context', str(user_id), name, *map(str, parts)])
+
+
+def timetable_fragment_key(user_id):
+    """Timetable fragments roll over daily and on any timetable change"""
+    return fragment_key(user_id, TIMETABLE, timezone.localdate().isoformat(), TIMETABLE_VERSION.get())
+
+
+def get_or_build(key, builder):
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, FRAGMENT_TIMEOUT)
+    return data
+
+
+# ----- invalidation -----
+
+def invalidate_notifications(*user_ids):
+    cache.delete_many([fragment_key(user_id, NOTIFICATIONS) for user_id in user_ids if user_id])
+
+
+def invalidate_parent_context(*user_ids):
+    cache.delete_many([fragment_key(user_id, PARENT) for user_id in user_ids if user_id])
+
+
+def invalidate_parent_context_for_students(student_ids):
+    """Drop the parent sidebar of every parent of the given students"""
+    from core.models import ParentGuardian
+
+    user_ids = (
+        ParentGuardian.objects.filter(students__in=list(student_ids), user__isnull=False)
+        .values_list('user_id', flat=True).distinct()
+    )
+    invalidate_parent_context(*user_ids)
+
+
+def invalidate_parent_context_for_classes(class_levels=None):
+    """Drop the parent sidebar of parents with a child in ``class_levels``, or of every parent"""
+    from core.models import ParentGuardian
+
+    parents = ParentGuardian.objects.filter(user__isnull=False)
+    if class_levels is not None:
+        parents = parents.filter(students__class_level__in=[level for level in class_levels if level])
+    invalidate_parent_context(*parents.values_list('user_id', flat=True).distinct())
+
+
+def bump_timetable_version():
+    """
+    Timetable changes reach a whole class, so rather than deleting each
+    member's entry the shared version in every timetable key moves on.
+    """
+    TIMETABLE_VERSION.bump()
+
+
+# ----- lazy evaluation -----
+
+class LazyFragment:
+    """A group of context values loaded together on first access"""
+
+    def __init__(self, name, loader, defaults):
+        self.name = name
+        self.loader = loader
+        self.defaults = defaults
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            try:
+                self._data = self.loader()
+            except Exception as e:
+                logger.error(f"Error loading {self.name} context: {str(e)}")
+                self._data = self.defaults
+        return self._data
+
+    def get(self, key):
+        return self.data.get(key, self.defaults.get(key))
+
+    def bind(self, context):
+        """Put a lazy value for each of the fragment's keys into ``context``"""
+        for key in self.defaults:
+            context[key] = LazyValue(self, key)
+        return context
+
+
+class LazyValue:
+    """
+    Stands in for one context value. Templates call callables they look up,
+    so the fragment is only loaded when a template actually reads the key.
+    """
+    __slots__ = ('fragment', 'key')
+
+    def __init__(self, fragment, key):
+        self.fragment = fragment
+        self.key = key
+
+    def __call__(self):
+        return self.fragment.get(self.key)
+
+    def __repr__(self):
+        return f"<LazyValue {self.fragment.name}.{self.key}>"
@@ -0,0 +1,232 @@
+# core/services/fee_generation.py
+"""
+Set-based fee generation for a term.
+
+Generating a term used to loop over students x categories, re-splitting
+``class_levels``, running an ``exists()`` check and a ``Fee.objects.create``
+(whose ``save`` looked up the AcademicTerm again) for every pair. The
+generator below works out which categories apply to each class level once,
+loads the (student, category) pairs that already have a fee for the year and
+term in one query, and writes the new fees with chunked ``bulk_create``,
+keeping the batch totals as it goes. A dry run walks the same path and
+reports the counts without writing anything.
+"""
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import AcademicTerm, Fee, FeeCategory, FeeGenerationBatch, Student
+from core.services.context_fragments import invalidate_parent_context_for_students
+from core.services.fee_statistics import bump_fee_stats_version
+from core.services.student_arrears import refresh_student_balances
+
+logger = logging.getLogger(__name__)
+
+# Draft fees get a far-future due date; locking sets the real one
+DRAFT_DUE_DAYS = 365
+
+
+@dataclass
+class FeeGenerationResult:
+    students: int = 0
+    students_billed: int = 0
+    created: int = 0
+    skipped: int = 0
+    total_amount: Decimal = Decimal('0.00')
+    by_category: Counter = field(default_factory=Counter)
+    dry_run: bool = False
+    batch: object = None
+
+    def summary(self):
+        verb = 'Would generate' if self.dry_run else 'Generated'
+        return (
+            f"{verb} {self.created} fees (GH₵{self.total_amount:,.2f}) for "
+            f"{self.students_billed} of {self.students} students; "
+            f"{self.skipped} already existed."
+        )
+
+
+def system_user():
+    """Owner for fees generated without a request user"""
+    return get_user_model().objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+
+
+def find_academic_term(academic_year, term):
+    """The AcademicTerm Fee.save would have linked, looked up once per run"""
+    return AcademicTerm.objects.filter(
+        academic_year__name=academic_year,
+        period_system='TERM',
+        period_number=term,
+    ).select_related('academic_year').first()
+
+
+class TermFeeGenerator:
+    """Create fees for many students in a constant number of queries"""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, academic_year, term, recorded_by, academic_term=None,
+                 due_date=None, generation_status='DRAFT', notes='', dry_run=False):
+        self.academic_year = str(academic_year)
+        self.term = int(term)
+        self.recorded_by = recorded_by
+        self.academic_term = academic_term
+        self.due_date = due_date or timezone.now().date() + timedelta(days=DRAFT_DUE_DAYS)
+        self.generation_status = generation_status
+        self.notes = notes
+        self.dry_run = dry_run
+
+    @classmethod
+    def for_term(cls, academic_term, recorded_by, **kwargs):
+        return cls(
+            academic_term.academic_year.name,
+            academic_term.period_number,
+            recorded_by,
+            academic_term=academic_term,
+            **kwargs
+        )
+
+    @staticmethod
+    def applicability(categories, class_levels):
+        """Map each class level to the categories that apply to it"""
+        return {
+            level: [category for category in categories if category.is_applicable_to_class(level)]
+            for level in class_levels
+        }
+
+    def existing_keys(self, category_ids, student_ids=None):
+        """(student_id, category_id) pairs that already have a live fee this term"""
+        queryset = Fee.objects.filter(
+            academic_year=self.academic_year,
+            term=self.term,
+            category_id__in=category_ids,
+        ).exclude(generation_status='CANCELLED')
+        if student_ids is not None:
+            queryset = queryset.filter(student_id__in=student_ids)
+        return set(queryset.order_by().values_list('student_id', 'category_id'))
+
+    def generate(self, students, categories, amount=None, batch=None, by_class_level=True):
+        """
+        Create one fee per applicable (student, category) pair that does not
+        exist yet. ``students`` is an iterable of (pk, class_level) pairs;
+        ``amount`` overrides each category's default amount, and
+        ``by_class_level=False`` charges every category to every student.
+        """
+        students = list(students)
+        categories = list(categories)
+        result = FeeGenerationResult(students=len(students), dry_run=self.dry_run, batch=batch)
+        if not students or not categories:
+            return result
+
+        student_ids = [pk for pk, _ in students]
+        if by_class_level:
+            by_level = self.applicability(categories, {level for _, level in students})
+        else:
+            by_level = {level: categories for _, level in students}
+        existing = self.existing_keys(
+            [category.pk for category in categories],
+            # A run over every active student checks the whole term instead
+            # of sending thousands of ids back to the database
+            student_ids if len(student_ids) <= self.BATCH_SIZE else None,
+        )
+
+        pending = []
+        billed = []
+        with transaction.atomic():
+            for student_id, class_level in students:
+                student_created = 0
+                for category in by_level[class_level]:
+                    if (student_id, category.pk) in existing:
+                        result.skipped += 1
+                        continue
+                    payable = amount if amount is not None else category.default_amount
+                    result.created += 1
+                    result.total_amount += payable
+                    result.by_category[category.get_name_display()] += 1
+                    student_created += 1
+                    if not self.dry_run:
+                        pending.append(self.build_fee(student_id, category, payable, batch))
+                        if len(pending) >= self.BATCH_SIZE:
+                            Fee.objects.bulk_create(pending)
+                            pending = []
+                if student_created:
+                    result.students_billed += 1
+                    billed.append(student_id)
+
+            if self.dry_run:
+                return result
+            if pending:
+                Fee.objects.bulk_create(pending)
+
+            if batch is not None:
+                batch.total_students = result.students
+                batch.total_fees = result.created
+                batch.total_amount = result.total_amount
+                batch.status = 'GENERATED'
+                batch.save()
+
+            # bulk_create skips the post_save hooks that refresh parent
+            # sidebars, the fee list figures and student balances
+            transaction.on_commit(lambda: invalidate_parent_context_for_students(billed))
+            bump_fee_stats_version()
+            transaction.on_commit(lambda: refresh_student_balances(billed))
+
+        logger.info(
+            f"Generated {result.created} fees for {self.academic_year} term {self.term} "
+            f"({result.skipped} already existed)"
+        )
+        return result
+
+    def build_fee(self, student_id, category, amount, batch=None):
+        # bulk_create bypasses Fee.save, so set what it would have derived
+        return Fee(
+            student_id=student_id,
+            category=category,
+            academic_year=self.academic_year,
+            term=self.term,
+            academic_term=self.academic_term,
+            generation_batch=batch,
+            amount_payable=amount,
+            amount_paid=Decimal('0.00'),
+            balance=amount,
+            payment_status='unpaid',
+            generation_status=self.generation_status,
+            due_date=self.due_date,
+            notes=self.notes,
+            recorded_by=self.recorded_by,
+        )
+
+
+def active_students():
+    return Student.objects.filter(is_active=True).order_by().values_list('pk', 'class_level')
+
+
+def mandatory_categories():
+    return list(FeeCategory.objects.filter(is_active=True, is_mandatory=True))
+
+
+def generate_term_batch(academic_term, recorded_by, notes='', dry_run=False):
+    """
+    Generate DRAFT fees for every active student's mandatory categories in a
+    new FeeGenerationBatch. A dry run creates neither the batch nor the fees.
+    """
+    generator = TermFeeGenerator.for_term(academic_term, recorded_by, dry_run=dry_run)
+    students = active_students()
+    categories = mandatory_categories()
+    if dry_run:
+        return generator.generate(students, categories)
+
+    with transaction.atomic():
+        batch = FeeGenerationBatch.objects.create(
+            academic_term=academic_term,
+            generated_by=recorded_by,
+            status='DRAFT',
+            notes=notes,
+        )
+        return generator.generate(students, categories, batch=batch)
@@ -0,0 +1,477 @@
+# core/services/fee_import.py
+"""
+Streaming bulk fee import.
+
+The spreadsheet is stored on disk and read row by row (openpyxl in
+``read_only`` mode, or the csv reader) by a Celery task, so a large import
+never sits in memory or in a web worker. Categories are resolved from a
+dictionary loaded once per run and students from one query per chunk; each
+chunk's upserts go out as one ``bulk_create`` and one ``bulk_update`` in
+their own transaction. Progress and per-row errors live in the cache, in the
+same shape as GradeUploadJob, and a retried task resumes after the last
+committed row.
+"""
+import csv
+import io
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Fee, FeeCategory, Student
+from core.services.context_fragments import invalidate_parent_context_for_students
+from core.services.fee_generation import find_academic_term
+from core.services.fee_statistics import bump_fee_stats_version
+from core.services.student_arrears import refresh_student_balances
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+MAX_STORED_ERRORS = 200
+MAX_STORED_WARNINGS = 50
+
+REQUIRED_COLUMNS = ['student_id', 'category_name', 'amount_payable']
+COLUMN_ALIASES = {
+    'student_id': ['student_id', 'student', 'student id', 'id'],
+    'category_name': ['category', 'fee_category', 'category_name', 'fee type', 'fee_type'],
+    'amount_payable': ['amount', 'amount_payable', 'payable', 'fee_amount', 'total'],
+    'amount_paid': ['amount_paid', 'paid', 'paid_amount'],
+    'due_date': ['due_date', 'due date', 'due'],
+    'payment_status': ['payment_status', 'status', 'payment status'],
+    'description': ['description', 'notes', 'remarks'],
+}
+VALID_PAYMENT_STATUSES = ['paid', 'unpaid', 'partial', 'overdue']
+
+# Short forms people type for categories whose code they don't remember
+CATEGORY_SHORT_NAMES = {
+    'tech': 'TECHNOLOGY',
+    'exam': 'EXAMINATION',
+    'extra': 'EXTRA_CLASSES',
+    'extraclass': 'EXTRA_CLASSES',
+}
+
+UPDATE_FIELDS = [
+    'amount_payable', 'amount_paid', 'balance', 'due_date',
+    'payment_status', 'payment_date', 'notes', 'last_updated',
+]
+
+
+def progress_key(import_id):
+    return f"fee_import:{import_id}"
+
+
+def user_import_key(user_id):
+    return f"fee_import_user:{user_id}"
+
+
+def _clean(name):
+    return str(name).lower().replace(' ', '').replace('-', '').replace('_', '')
+
+
+class CategoryResolver:
+    """
+    In-memory version of ``find_fee_category``: the same exact, alias and
+    partial matching against categories loaded once, memoised per spelling.
+    """
+
+    def __init__(self):
+        self.categories = list(FeeCategory.objects.all())
+        self.by_name = {category.name.lower(): category for category in self.categories}
+        self.by_clean = {_clean(category.name): category for category in self.categories}
+        self.resolved = {}
+
+    def resolve(self, raw_name):
+        """Return (category, error) like find_fee_category"""
+        name = str(raw_name or '').strip()
+        if not name:
+            return None, "Category name is required"
+        if name not in self.resolved:
+            self.resolved[name] = self._match(name)
+        return self.resolved[name]
+
+    def _match(self, name):
+        category = self.by_name.get(name.lower())
+        if category is not None:
+            return category, None
+
+        # "Tuition Fee", "tuition_fee" and "TUITION" all clean to "tuition"
+        cleaned = _clean(name)
+        base = cleaned[:-3] if cleaned.endswith('fee') else cleaned
+        for key in (cleaned, base, _clean(CATEGORY_SHORT_NAMES.get(base, ''))):
+            if key and key in self.by_clean:
+                return self.by_clean[key], None
+
+        if len(name) >= 3:
+            partial = [category for category in self.categories if name.lower() in category.name.lower()]
+            if len(partial) == 1:
+                return partial[0], None
+            if partial:
+                suggestions = ", ".join(category.name for category in partial)
+                return None, f"Multiple categories found. Did you mean one of: {suggestions}?"
+
+        available = ", ".join(category.name for category in self.categories)
+        return None, f"Fee category '{name}' not found. Available categories: {available}"
+
+
+class FeeImportJob:
+    """A bulk fee import tracked through the cache"""
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, import_id):
+        self.import_id = import_id
+
+    # ----- lifecycle -----
+
+    @classmethod
+    def create(cls, uploaded_file, file_type, academic_year, term, user,
+               update_existing=False, generation_status='DRAFT'):
+        """Store the uploaded file and register a pending import for ``user``"""
+        import_id = uuid.uuid4().hex
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        if file_type == 'csv':
+            extension = '.csv'
+        elif extension not in ('.xlsx', '.xlsm'):
+            extension = '.xlsx'
+        path = default_storage.save(f"fee_imports/{import_id}{extension}", uploaded_file)
+
+        job = cls(import_id)
+        job._write({
+            'import_id': import_id,
+            'status': 'queued',
+            'file_path': path,
+            'file_name': uploaded_file.name,
+            'academic_year': str(academic_year),
+            'term': int(term),
+            'generation_status': generation_status or 'DRAFT',
+            'update_existing': bool(update_existing),
+            'user_id': user.id,
+            'total': 0,
+            'processed': 0,
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'committed_row': 1,  # header row
+            'errors': [],
+            'error_count': 0,
+            'warnings': [],
+            'started_at': None,
+            'completed_at': None,
+        })
+        cache.set(user_import_key(user.id), import_id, PROGRESS_TIMEOUT)
+        return job
+
+    @classmethod
+    def latest_for_user(cls, user_id):
+        import_id = cache.get(user_import_key(user_id))
+        return cls(import_id) if import_id else None
+
+    @property
+    def progress(self):
+        return cache.get(progress_key(self.import_id)) or {}
+
+    def public_progress(self):
+        """Progress without internal bookkeeping, for the polling API"""
+        data = self.progress
+        for field in ('file_path', 'user_id'):
+            data.pop(field, None)
+        return data
+
+    def _write(self, data):
+        cache.set(progress_key(self.import_id), data, PROGRESS_TIMEOUT)
+
+    def _update(self, **fields):
+        data = self.progress
+        data.update(fields)
+        self._write(data)
+        return data
+
+    def requeue(self):
+        self._update(status='queued', error=None, completed_at=None)
+
+    def mark_failed(self, error, retrying=False):
+        self._update(
+            status='retrying' if retrying else 'failed',
+            error=str(error),
+            completed_at=None if retrying else timezone.now().isoformat(),
+        )
+
+    # ----- processing -----
+
+    def run(self):
+        """Import the remaining rows, resuming after the last committed row"""
+        state = self.progress
+        if not state:
+            raise ValueError(f"Unknown fee import {self.import_id}")
+        if state['status'] == 'completed':
+            return state
+
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.get(pk=state['user_id'])
+        self.academic_year = state['academic_year']
+        self.term = state['term']
+        self.generation_status = state['generation_status']
+        self.update_existing = state['update_existing']
+        self.academic_term = find_academic_term(self.academic_year, self.term)
+        self.categories = CategoryResolver()
+
+        state = self._update(
+            status='processing',
+            started_at=state.get('started_at') or timezone.now().isoformat(),
+            total=state.get('total') or self._count_rows(state['file_path']),
+        )
+
+        rows = self._iter_rows(state['file_path'])
+        missing = self._missing_columns(next(rows))
+        if missing:
+            rows.close()
+            state = self._update(
+                status='failed',
+                errors=[f"Missing required columns: {', '.join(missing)}"],
+                error_count=1,
+                completed_at=timezone.now().isoformat(),
+            )
+            default_storage.delete(state['file_path'])
+            return state
+
+        resume_after = state['committed_row']
+        chunk = []
+        for row_num, row in rows:
+            if row_num <= resume_after:
+                continue
+            chunk.append((row_num, row))
+            if len(chunk) >= self.CHUNK_SIZE:
+                self._commit_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._commit_chunk(chunk)
+
+        state = self._update(status='completed', completed_at=timezone.now().isoformat())
+        default_storage.delete(state['file_path'])
+        return state
+
+    def _commit_chunk(self, chunk):
+        students = dict(
+            Student.objects.filter(
+                student_id__in={str(row.get('student_id') or '').strip() for _, row in chunk}
+            ).values_list('student_id', 'pk')
+        )
+
+        errors, warnings, valid = [], [], []
+        for row_num, row in chunk:
+            try:
+                valid.append((row_num, self._validate_row(row, students)))
+            except ValueError as e:
+                errors.append(f"Row {row_num}: {str(e)}")
+
+        existing = {
+            (fee.student_id, fee.category_id): fee
+            for fee in Fee.objects.filter(
+                academic_year=self.academic_year,
+                term=self.term,
+                student_id__in={data['student'] for _, data in valid},
+                category_id__in={data['category'].pk for _, data in valid},
+            )
+        }
+
+        to_create, to_update = {}, {}
+        skipped = 0
+        now = timezone.now()
+        for row_num, data in valid:
+            key = (data['student'], data['category'].pk)
+            fee = to_create.get(key) or existing.get(key)
+            if fee is not None and not self.update_existing:
+                skipped += 1
+                if len(warnings) < MAX_STORED_WARNINGS:
+                    warnings.append(
+                        f"Row {row_num}: Fee already exists for student {data['student_id']} "
+                        f"and category {data['category'].name}"
+                    )
+                continue
+            if fee is None:
+                fee = Fee(
+                    student_id=data['student'],
+                    category=data['category'],
+                    academic_year=self.academic_year,
+                    term=self.term,
+                    academic_term=self.academic_term,
+                    generation_status=self.generation_status,
+                    recorded_by=self.user,
+                )
+                to_create[key] = fee
+            elif key not in to_create:
+                fee.last_updated = now
+                to_update[key] = fee
+            self._apply(fee, data)
+
+        with transaction.atomic():
+            if to_create:
+                Fee.objects.bulk_create(to_create.values(), batch_size=self.CHUNK_SIZE)
+            if to_update:
+                Fee.objects.bulk_update(to_update.values(), UPDATE_FIELDS, batch_size=self.CHUNK_SIZE)
+
+        touched = {key[0] for key in to_create} | {key[0] for key in to_update}
+        if touched:
+            # bulk writes skip the post_save hooks that refresh parent sidebars,
+            # the fee list figures and student balances
+            invalidate_parent_context_for_students(touched)
+            bump_fee_stats_version()
+            refresh_student_balances(touched)
+
+        # The chunk is committed; record it so a retry starts after it
+        state = self.progress
+        self._update(
+            committed_row=chunk[-1][0],
+            processed=state['processed'] + len(chunk),
+            created=state['created'] + len(to_create),
+            updated=state['updated'] + len(to_update),
+            skipped=state['skipped'] + skipped,
+            errors=(state['errors'] + errors)[:MAX_STORED_ERRORS],
+            error_count=state['error_count'] + len(errors),
+            warnings=(state['warnings'] + warnings)[:MAX_STORED_WARNINGS],
+        )
+
+    @staticmethod
+    def _apply(fee, data):
+        # bulk writes bypass Fee.save, so derive balance, status and payment date here
+        fee.amount_payable = data['amount_payable']
+        fee.amount_paid = data['amount_paid']
+        fee.balance = data['amount_payable'] - data['amount_paid']
+        fee.due_date = data['due_date']
+        fee.payment_status = data['payment_status']
+        if fee.generation_status not in ('DRAFT', 'GENERATED'):
+            # Billable fees take the status their amounts imply, not the sheet's
+            fee.update_payment_status()
+        if fee.payment_status == 'paid':
+            fee.payment_date = fee.payment_date or timezone.now().date()
+        else:
+            fee.payment_date = None
+        fee.notes = data['description']
+
+    def _validate_row(self, row, students):
+        student_id = str(row.get('student_id') or '').strip()
+        if not student_id:
+            raise ValueError("Student ID is required")
+        student = students.get(student_id)
+        if student is None:
+            raise ValueError(f"Student with ID {student_id} not found")
+
+        category, error = self.categories.resolve(row.get('category_name'))
+        if error:
+            raise ValueError(error)
+
+        amount_payable = self._decimal(row.get('amount_payable'), 'amount payable')
+        amount_paid = self._decimal(row.get('amount_paid') or 0, 'amount paid')
+
+        due_date = row.get('due_date')
+        if due_date in (None, ''):
+            due_date = timezone.now().date() + timedelta(days=30)
+        elif isinstance(due_date, datetime):
+            due_date = due_date.date()
+        elif not isinstance(due_date, date):
+            try:
+                due_date = datetime.strptime(str(due_date).strip(), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError('Invalid due date format. Use YYYY-MM-DD')
+
+        payment_status = str(row.get('payment_status') or 'unpaid').strip().lower()
+        if payment_status not in VALID_PAYMENT_STATUSES:
+            raise ValueError(f'Invalid payment status. Must be one of: {", ".join(VALID_PAYMENT_STATUSES)}')
+
+        return {
+            'student_id': student_id,
+            'student': student,
+            'category': category,
+            'amount_payable': amount_payable,
+            'amount_paid': amount_paid,
+            'due_date': due_date,
+            'payment_status': payment_status,
+            'description': str(row.get('description') or '').strip(),
+        }
+
+    @staticmethod
+    def _decimal(value, label):
+        try:
+            amount = Decimal(str(value).strip())
+        except (InvalidOperation, ValueError, TypeError):
+            raise ValueError(f'Invalid {label}')
+        if amount < 0:
+            raise ValueError(f'{label.capitalize()} cannot be negative')
+        return amount
+
+    # ----- file reading -----
+
+    @staticmethod
+    def _column_map(headers):
+        """Map each header position to the field it holds"""
+        column_map = {}
+        for index, header in enumerate(headers):
+            if header is None:
+                continue
+            header = str(header).lower().strip()
+            for field, names in COLUMN_ALIASES.items():
+                if header in names and field not in column_map.values():
+                    column_map[index] = field
+                    break
+        return column_map
+
+    @staticmethod
+    def _missing_columns(column_map):
+        return [column for column in REQUIRED_COLUMNS if column not in column_map.values()]
+
+    def _iter_rows(self, path):
+        """
+        Yield the column map, then (row_number, row_dict) without loading the
+        whole file
+        """
+        if path.endswith('.csv'):
+            with default_storage.open(path, 'rb') as raw:
+                text = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+                reader = csv.reader(text)
+                column_map = self._column_map(next(reader, []))
+                yield column_map
+                for row_num, values in enumerate(reader, 2):
+                    if not any(value.strip() for value in values):
+                        continue
+                    yield row_num, {
+                        field: values[index] for index, field in column_map.items() if index < len(values)
+                    }
+            return
+
+        from openpyxl import load_workbook
+        with default_storage.open(path, 'rb') as raw:
+            workbook = load_workbook(raw, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                column_map = self._column_map(next(rows, None) or [])
+                yield column_map
+                for row_num, values in enumerate(rows, 2):
+                    if not any(value not in (None, '') for value in values):
+                        continue
+                    yield row_num, {
+                        field: values[index] for index, field in column_map.items() if index < len(values)
+                    }
+            finally:
+                workbook.close()
+
+    def _count_rows(self, path):
+        try:
+            if path.endswith('.csv'):
+                with default_storage.open(path, 'rb') as raw:
+                    return max(sum(1 for _ in raw) - 1, 0)
+            from openpyxl import load_workbook
+            with default_storage.open(path, 'rb') as raw:
+                workbook = load_workbook(raw, read_only=True)
+                total = max((workbook.active.max_row or 1) - 1, 0)
+                workbook.close()
+                return total
+        except Exception as e:
+            logger.warning(f"Could not estimate total rows for fee import {self.import_id}: {str(e)}")
+            return 0
@@ -0,0 +1,84 @@
+# core/services/fee_statistics.py
+"""
+Summary figures for the fee list.
+
+The fee list showed a dozen counts and sums, each its own query over the
+filtered fees. ``compute_fee_statistics`` gets them all from one conditional
+aggregate, and ``get_fee_statistics`` caches the result per filter set and
+viewer scope. Fee and FeePayment writes move a shared version that is part of
+every key, so all cached figures go stale at once; bulk writers that skip
+signals call ``bump_fee_stats_version`` themselves.
+"""
+import hashlib
+import logging
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from core.services.version_counter import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+FEE_STATS_VERSION = VersionCounter('fee_stats:version')
+# Writes invalidate through the version; the timeout only bounds queryset.update() paths
+FEE_STATS_TIMEOUT = 60 * 15
+
+GENERATION_STATUSES = ('DRAFT', 'GENERATED', 'VERIFIED', 'LOCKED')
+PAYMENT_STATUSES = ('paid', 'unpaid', 'partial', 'overdue')
+PENDING_STATUSES = ('unpaid', 'partial', 'overdue')
+
+# GET parameters that change which fees are counted
+FILTER_PARAMS = (
+    'academic_year', 'term', 'payment_status', 'category',
+    'student', 'has_bill', 'generation_status',
+)
+
+
+def bump_fee_stats_version():
+    FEE_STATS_VERSION.bump()
+
+
+def stats_cache_key(params, scope):
+    """``params`` is the request's GET data, ``scope`` what limits the viewer's fees"""
+    filters = '&'.join(
+        f"{name}={params.get(name, '')}" for name in FILTER_PARAMS if params.get(name)
+    )
+    digest = hashlib.md5(f"{scope}|{filters}".encode()).hexdigest()
+    return f"fee_stats:{FEE_STATS_VERSION.get()}:{digest}"
+
+
+def compute_fee_statistics(queryset):
+    """All fee list figures for ``queryset`` in a single query"""
+    aggregates = {
+        'total_payable': Sum('amount_payable'),
+        'total_paid': Sum('amount_paid'),
+        'pending_count': Count('id', filter=Q(payment_status__in=PENDING_STATUSES)),
+    }
+    for status in GENERATION_STATUSES:
+        aggregates[f'{status.lower()}_count'] = Count('id', filter=Q(generation_status=status))
+    for status in PAYMENT_STATUSES:
+        aggregates[f'{status}_count'] = Count('id', filter=Q(payment_status=status))
+
+    stats = queryset.order_by().aggregate(**aggregates)
+    stats['total_payable'] = stats['total_payable'] or Decimal('0.00')
+    stats['total_paid'] = stats['total_paid'] or Decimal('0.00')
+    stats['total_balance'] = stats['total_payable'] - stats['total_paid']
+    if stats['total_payable'] > 0:
+        stats['completion_rate'] = (stats['total_paid'] / stats['total_payable']) * 100
+    else:
+        stats['completion_rate'] = 0
+    return stats
+
+
+def get_fee_statistics(queryset, params, scope):
+    key = stats_cache_key(params, scope)
+    try:
+        stats = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Fee statistics cache read failed: {str(e)}")
+        return compute_fee_statistics(queryset)
+    if stats is None:
+        stats = compute_fee_statistics(queryset)
+        cache.set(key, stats, FEE_STATS_TIMEOUT)
+    return stats
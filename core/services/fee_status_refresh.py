@@ -0,0 +1,195 @@
+# core/services/fee_status_refresh.py
+"""
+Set-based recalculation of Fee.amount_paid, balance and payment_status.
+
+Re-saving every fee with its own ``Sum`` over payments kept the refresh
+running (and holding row locks) for minutes. This service reads fees in
+primary-key chunks with the payment total for each fee attached by one
+grouped FeePayment subquery, derives balance and status in Python with the
+same rules ``Fee.save`` applies, and writes back only the rows that differ
+with ``bulk_update`` in a short transaction per chunk. ``check=True`` reports
+the drift without writing.
+"""
+import logging
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Fee, FeePayment
+from core.services.context_fragments import invalidate_parent_context_for_students
+from core.services.fee_statistics import bump_fee_stats_version
+from core.services.student_arrears import refresh_student_balances
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+# Statuses set by hand that a refresh must not overwrite
+FROZEN_STATUSES = ('cancelled', 'refunded')
+# Workflow states in which Fee.save leaves payment_status to the caller
+DRAFT_STATES = ('DRAFT', 'GENERATED')
+UPDATE_FIELDS = ['amount_paid', 'balance', 'payment_status', 'payment_date', 'last_updated']
+MAX_SAMPLES = 20
+
+
+def paid_total_subquery():
+    """Total of the outer fee's payments, grouped in the database"""
+    totals = (
+        FeePayment.objects.filter(fee=OuterRef('pk'))
+        .order_by().values('fee').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(
+        Subquery(totals, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def derive_status(amount_payable, amount_paid, due_date, generation_status, current_status, payment_date, today):
+    """(payment_status, payment_date) as a refresh followed by Fee.save would leave them"""
+    if current_status in FROZEN_STATUSES:
+        status = current_status
+    elif generation_status in DRAFT_STATES:
+        balance = amount_payable - amount_paid
+        if balance <= 0:
+            status = 'paid'
+        elif amount_paid > 0:
+            status = 'partial'
+        else:
+            status = 'unpaid'
+        if due_date and due_date < today and status != 'paid':
+            status = 'overdue'
+    else:
+        # Billable fees follow Fee.update_payment_status (tolerance, grace period)
+        fee = Fee(
+            amount_payable=amount_payable,
+            amount_paid=amount_paid,
+            due_date=due_date,
+            payment_status=current_status,
+            payment_date=payment_date,
+        )
+        fee.update_payment_status()
+        status, payment_date = fee.payment_status, fee.payment_date
+
+    if status == 'paid':
+        payment_date = payment_date or today
+    else:
+        payment_date = None
+    return status, payment_date
+
+
+class FeeStatusRefreshService:
+    """Bring stored payment totals and statuses in line with FeePayment rows"""
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, academic_year=None, term=None, class_level=None, chunk_size=None, check=False):
+        self.academic_year = academic_year
+        self.term = term
+        self.class_level = class_level
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.check = check
+
+    def get_queryset(self):
+        fees = Fee.objects.all()
+        if self.academic_year:
+            fees = fees.filter(academic_year=self.academic_year)
+        if self.term:
+            fees = fees.filter(term=self.term)
+        if self.class_level:
+            fees = fees.filter(student__class_level=self.class_level)
+        return fees
+
+    def run(self):
+        started = time.monotonic()
+        today = timezone.now().date()
+        stats = {
+            'scanned': 0, 'updated': 0, 'amount_drift': 0, 'status_drift': 0,
+            'drift_amount': ZERO, 'samples': [], 'check': self.check,
+        }
+        students = set()
+
+        columns = ['pk', 'student_id', 'amount_payable', 'amount_paid', 'balance', 'due_date',
+                   'generation_status', 'payment_status', 'payment_date', 'paid_total']
+        queryset = self.get_queryset().annotate(paid_total=paid_total_subquery()).order_by('pk')
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values_list(*columns)[:self.chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            stats['scanned'] += len(rows)
+
+            changed = self._refresh_chunk(rows, today, stats)
+            if changed and not self.check:
+                with transaction.atomic():
+                    # Re-read the fees under row locks, so a payment recorded
+                    # since the scan is not overwritten with a stale total
+                    locked = list(
+                        Fee.objects.select_for_update()
+                        .filter(pk__in=[fee.pk for fee in changed])
+                        .annotate(paid_total=paid_total_subquery())
+                        .order_by('pk').values_list(*columns)
+                    )
+                    changed = self._refresh_chunk(locked, today)
+                    Fee.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=500)
+                students.update(fee.student_id for fee in changed)
+            stats['updated'] += len(changed)
+
+        stats['seconds'] = round(time.monotonic() - started, 2)
+
+        if students:
+            # bulk_update skips the post_save hooks that keep these up to date
+            invalidate_parent_context_for_students(students)
+            bump_fee_stats_version()
+            refresh_student_balances(students)
+
+        logger.info(
+            f"Fee status refresh{' (check)' if self.check else ''}: {stats['updated']} of "
+            f"{stats['scanned']} fees out of date in {stats['seconds']}s"
+        )
+        return stats
+
+    def _refresh_chunk(self, rows, today, stats=None):
+        """
+        Return unsaved Fee instances for the rows whose stored values differ,
+        counting the drift into ``stats`` when given
+        """
+        now = timezone.now()
+        changed = []
+        for (pk, student_id, payable, stored_paid, stored_balance, due_date,
+             generation_status, stored_status, stored_payment_date, paid) in rows:
+            balance = payable - paid
+            status, payment_date = derive_status(
+                payable, paid, due_date, generation_status, stored_status, stored_payment_date, today
+            )
+            if (stored_paid, stored_balance, stored_status, stored_payment_date) == (paid, balance, status, payment_date):
+                continue
+
+            if stats is not None:
+                self._count_drift(stats, pk, stored_paid, paid, stored_status, status)
+            changed.append(Fee(
+                pk=pk,
+                student_id=student_id,
+                amount_paid=paid,
+                balance=balance,
+                payment_status=status,
+                payment_date=payment_date,
+                last_updated=now,
+            ))
+        return changed
+
+    @staticmethod
+    def _count_drift(stats, pk, stored_paid, paid, stored_status, status):
+        if stored_paid != paid:
+            stats['amount_drift'] += 1
+            stats['drift_amount'] += abs(paid - stored_paid)
+        if stored_status != status:
+            stats['status_drift'] += 1
+        if len(stats['samples']) < MAX_SAMPLES:
+            stats['samples'].append(
+                f"Fee {pk}: paid {stored_paid} -> {paid}, status {stored_status} -> {status}"
+            )
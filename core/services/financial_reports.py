@@ -3,12 +3,13 @@ import logging
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg, Q, F
+from django.db.models import Sum, Count, Avg, F
 from django.db import connection
 from collections import defaultdict
 import calendar
 
-from core.models import Fee, FeePayment, Bill, BillPayment, Student, FeeCategory
+from core.models import Fee, FeePayment, Bill, BillPayment, FeeCategory
+from core.services.student_arrears import iter_student_arrears
 from core.utils.financial import FinancialCalculator
 
 logger = logging.getLogger(__name__)
@@ -135,71 +136,92 @@ class FinancialReportGenerator:
             }
         }
     
-    def generate_student_arrears_report(self):
-        """Generate detailed student arrears report"""
-        # Get students with outstanding balances
-        students_with_arrears = Student.objects.filter(
-            Q(fees__payment_status__in=['unpaid', 'partial', 'overdue']) |
-            Q(bills__status__in=['issued', 'partial', 'overdue'])
-        ).distinct().annotate(
-            total_fee_balance=Sum('fees__balance', filter=Q(fees__payment_status__in=['unpaid', 'partial', 'overdue'])),
-            total_bill_balance=Sum('bills__balance', filter=Q(bills__status__in=['issued', 'partial', 'overdue']))
-        )
-        
+    def generate_student_arrears_report(self, class_level=None, limit=100, use_balance_table=False):
+        """
+        Generate detailed student arrears report
+        
+        Totals and summaries cover every student in arrears; ``students`` holds
+        the ``limit`` largest balances (all of them when ``limit`` is None).
+        ``use_balance_table`` reads the maintained StudentBalance rows instead
+        of computing the figures from fees and bills.
+        """
         report_data = []
         total_arrears = Decimal('0.00')
-        
-        for student in students_with_arrears:
-            fee_balance = student.total_fee_balance or Decimal('0.00')
-            bill_balance = student.total_bill_balance or Decimal('0.00')
-            total_balance = fee_balance + bill_balance
+        total_students = 0
+        by_class = defaultdict(lambda: {'students': 0, 'total_arrears': Decimal('0.00'), 'high_risk': 0})
+        risk_counts = defaultdict(int)
+        plan_eligible = 0
+        
+        # Rows arrive largest balance first, one query for the whole list
+        for student_data in iter_student_arrears(class_level, use_balance_table=use_balance_table):
+            total_students += 1
+            total_arrears += student_data['total_balance']
             
-            if total_balance > 0:
-                # Get overdue details
-                overdue_fees = student.fees.filter(
-                    payment_status='overdue'
-                ).count()
-                
-                overdue_bills = student.bills.filter(
-                    status='overdue'
-                ).count()
-                
-                # Calculate days overdue for oldest item
-                oldest_due_date = self._get_oldest_due_date(student)
-                days_overdue = (timezone.now().date() - oldest_due_date).days if oldest_due_date else 0
-                
-                student_data = {
-                    'student_id': student.student_id,
-                    'name': student.get_full_name(),
-                    'class': student.get_class_level_display(),
-                    'contact_phone': student.parent_phone or '',
-                    'fee_balance': fee_balance,
-                    'bill_balance': bill_balance,
-                    'total_balance': total_balance,
-                    'overdue_fees': overdue_fees,
-                    'overdue_bills': overdue_bills,
-                    'days_overdue': days_overdue,
-                    'risk_level': self._calculate_risk_level(total_balance, days_overdue),
-                    'last_payment_date': self._get_last_payment_date(student),
-                    'payment_plan_eligible': total_balance > Decimal('1000.00')  # Example criteria
-                }
-                
+            class_summary = by_class[student_data['class']]
+            class_summary['students'] += 1
+            class_summary['total_arrears'] += student_data['total_balance']
+            if student_data['risk_level'] == 'high':
+                class_summary['high_risk'] += 1
+            risk_counts[student_data['risk_level']] += 1
+            if student_data['payment_plan_eligible']:
+                plan_eligible += 1
+            
+            if limit is None or len(report_data) < limit:
                 report_data.append(student_data)
-                total_arrears += total_balance
-        
-        # Sort by highest balance
-        report_data.sort(key=lambda x: x['total_balance'], reverse=True)
         
         return {
             'generated_date': timezone.now().date(),
-            'total_students': len(report_data),
+            'total_students': total_students,
             'total_arrears': total_arrears,
-            'average_arrears': total_arrears / len(report_data) if report_data else Decimal('0.00'),
-            'students': report_data[:100],  # Limit for performance
-            'summary_by_class': self._summarize_arrears_by_class(report_data),
-            'collection_strategies': self._generate_collection_strategies(report_data)
+            'average_arrears': total_arrears / total_students if total_students else Decimal('0.00'),
+            'students': report_data,
+            'summary_by_class': self._summarize_arrears_by_class(by_class),
+            'collection_strategies': self._generate_collection_strategies(risk_counts, plan_eligible)
         }
     
+    def _summarize_arrears_by_class(self, by_class):
+        """Per-class totals, largest arrears first"""
+        summary = []
+        for class_name, data in by_class.items():
+            summary.append({
+                'class': class_name,
+                'students': data['students'],
+                'total_arrears': data['total_arrears'],
+                'average_arrears': data['total_arrears'] / data['students'],
+                'high_risk': data['high_risk'],
+            })
+        summary.sort(key=lambda x: x['total_arrears'], reverse=True)
+        return summary
+    
+    def _generate_collection_strategies(self, risk_counts, plan_eligible):
+        """Suggested follow-up for each group of debtors"""
+        strategies = []
+        if risk_counts['high']:
+            strategies.append({
+                'priority': 'High',
+                'students': risk_counts['high'],
+                'strategy': 'Call parents directly and agree a settlement date for balances overdue beyond 90 days'
+            })
+        if plan_eligible:
+            strategies.append({
+                'priority': 'Medium',
+                'students': plan_eligible,
+                'strategy': 'Offer instalment payment plans for balances above GH₵1,000'
+            })
+        if risk_counts['medium']:
+            strategies.append({
+                'priority': 'Medium',
+                'students': risk_counts['medium'],
+                'strategy': 'Send written reminders with the outstanding breakdown'
+            })
+        if risk_counts['low']:
+            strategies.append({
+                'priority': 'Low',
+                'students': risk_counts['low'],
+                'strategy': 'Include balances in routine SMS and email reminders'
+            })
+        return strategies
+    
     def generate_fee_collection_analysis(self):
         """Analyze fee collection patterns and performance"""
         # Collection by month
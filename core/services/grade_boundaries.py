@@ -0,0 +1,84 @@
+# core/services/grade_boundaries.py
+"""
+Compiled grade-boundary lookup.
+
+The configured minimum scores are converted to floats and sorted once, so
+classifying a score is a single ``bisect`` instead of an if/elif chain that
+re-converts every ``Decimal`` threshold. SchoolConfiguration builds one
+``GradeBoundaries`` per loaded configuration and reuses it until the row
+changes.
+"""
+from bisect import bisect_right
+from collections import Counter
+
+NOT_AVAILABLE = 'N/A'
+
+
+class BoundaryTable:
+    """Maps a score to the label of the highest boundary it reaches"""
+
+    def __init__(self, boundaries, floor_label, invalid_label=NOT_AVAILABLE):
+        """
+        ``boundaries`` is an iterable of (minimum_score, label); scores below
+        every minimum get ``floor_label`` and unparseable ones ``invalid_label``.
+        """
+        ordered = sorted((float(minimum), label) for minimum, label in boundaries)
+        self.minimums = [minimum for minimum, _ in ordered]
+        self.labels = [floor_label] + [label for _, label in ordered]
+        self.invalid_label = invalid_label
+
+    def classify(self, score):
+        if score is None:
+            return self.invalid_label
+        try:
+            return self.labels[bisect_right(self.minimums, float(score))]
+        except (ValueError, TypeError):
+            return self.invalid_label
+
+    def classify_many(self, scores):
+        return [self.classify(score) for score in scores]
+
+    def distribution(self, scores):
+        """Count of scores per label, highest label first, including zeros"""
+        counts = Counter(self.classify_many(scores))
+        return {label: counts.get(label, 0) for label in reversed(self.labels)}
+
+
+class GradeBoundaries:
+    """GES (1-9) and letter boundaries for one configuration version"""
+
+    def __init__(self, ges_minimums, letter_minimums, passing_mark):
+        self.ges = BoundaryTable(zip(ges_minimums, '12345678'), '9')
+        self.letter = BoundaryTable(
+            zip(letter_minimums, ['A+', 'A', 'B+', 'B', 'C+', 'C', 'D+', 'D']), 'F'
+        )
+        self.passing_mark = float(passing_mark)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            ges_minimums=[
+                config.grade_1_min, config.grade_2_min, config.grade_3_min, config.grade_4_min,
+                config.grade_5_min, config.grade_6_min, config.grade_7_min, config.grade_8_min,
+            ],
+            letter_minimums=[
+                config.letter_a_plus_min, config.letter_a_min, config.letter_b_plus_min,
+                config.letter_b_min, config.letter_c_plus_min, config.letter_c_min,
+                config.letter_d_plus_min, config.letter_d_min,
+            ],
+            passing_mark=config.passing_mark,
+        )
+
+    def grade(self, score):
+        """(ges_grade, letter_grade) for one score"""
+        return self.ges.classify(score), self.letter.classify(score)
+
+    def grade_many(self, scores):
+        """(ges_grade, letter_grade) for each score, in order"""
+        ges, letter = self.ges.classify, self.letter.classify
+        return [(ges(score), letter(score)) for score in scores]
+
+    def is_passing(self, score):
+        if score is None:
+            return False
+        return float(score) >= self.passing_mark
@@ -0,0 +1,189 @@
+# core/services/grade_recompute.py
+"""
+Bulk recomputation of stored Grade totals and grades.
+
+Changing the assessment weights or grade boundaries leaves every saved
+``total_score``, ``ges_grade`` and ``letter_grade`` stale. Re-saving each
+Grade runs validation, a ClassAssignment lookup and the notification signal
+per row; this service instead reads the percentage columns in primary-key
+chunks, recomputes the whole chunk at once and writes back only the rows
+that changed with ``bulk_update``.
+
+Totals are computed in integer hundredths, so the result is identical to
+``Grade.calculate_total_score`` (Decimal, rounded half-even to 0.01). NumPy
+is used when installed; otherwise the same arithmetic runs row by row.
+"""
+import logging
+import time
+from decimal import Decimal
+
+from django.db import transaction
+
+from core.models import AuditLog, Grade, SchoolConfiguration
+from core.services.class_ranking import ClassRanking
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional speed-up
+    np = None
+
+logger = logging.getLogger(__name__)
+
+PERCENTAGE_FIELDS = ['homework_percentage', 'classwork_percentage', 'test_percentage', 'exam_percentage']
+WEIGHT_FIELDS = ['homework_weight', 'classwork_weight', 'test_weight', 'exam_weight']
+HUNDREDTH = Decimal('0.01')
+
+
+def _hundredths(value):
+    """Decimal('75.50') -> 7550; None -> 0"""
+    if value is None:
+        return 0
+    return int((Decimal(value) * 100).to_integral_value())
+
+
+def _round_half_even(numerators, denominator):
+    """Integer division rounded half-to-even, matching Decimal.quantize"""
+    quotient, remainder = divmod(numerators, denominator)
+    twice = remainder * 2
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+class GradeRecomputeService:
+    """Recompute totals and grades for every Grade matching the filters"""
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, academic_year=None, term=None, class_level=None,
+                 chunk_size=None, dry_run=False, user=None):
+        self.academic_year = academic_year
+        self.term = term
+        self.class_level = class_level
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.dry_run = dry_run
+        self.user = user
+
+        # Not get_cached(): this runs straight after the weights or boundaries
+        # change, possibly before this process's cached copy notices
+        config = SchoolConfiguration._load_config()
+        self.boundaries = config.grade_boundaries
+        # total_score * 100 == sum(percentage_hundredths * weight_hundredths) / 10000
+        self.weights = [_hundredths(getattr(config, field)) for field in WEIGHT_FIELDS]
+
+    def get_queryset(self):
+        grades = Grade.objects.all()
+        if self.academic_year:
+            grades = grades.filter(academic_year=self.academic_year)
+        if self.term:
+            grades = grades.filter(term=self.term)
+        if self.class_level:
+            grades = grades.filter(student__class_level=self.class_level)
+        return grades
+
+    def run(self):
+        started = time.monotonic()
+        stats = {'scanned': 0, 'updated': 0, 'unchanged': 0, 'dry_run': self.dry_run,
+                 'engine': 'numpy' if np is not None else 'python'}
+        rankings = set()
+
+        columns = ['id', *PERCENTAGE_FIELDS, 'total_score', 'ges_grade', 'letter_grade',
+                   'student__class_level', 'academic_year', 'term']
+        queryset = self.get_queryset().order_by('pk')
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values_list(*columns)[:self.chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            stats['scanned'] += len(rows)
+
+            changed = self._recompute_chunk(rows)
+            stats['updated'] += len(changed)
+            rankings.update((row[8], row[9], row[10]) for row in rows)
+
+            if changed and not self.dry_run:
+                with transaction.atomic():
+                    Grade.objects.bulk_update(changed, ['total_score', 'ges_grade', 'letter_grade'],
+                                              batch_size=500)
+
+        stats['unchanged'] = stats['scanned'] - stats['updated']
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        stats['grades_per_second'] = round(stats['scanned'] / stats['seconds'], 1) if stats['seconds'] else stats['scanned']
+
+        if not self.dry_run and stats['updated']:
+            # bulk_update skips the post_save handlers that normally drop these
+            for class_level, academic_year, term in rankings:
+                ClassRanking.invalidate(class_level, academic_year, term)
+            self._log_audit(stats)
+
+        logger.info(
+            f"Grade recompute: {stats['updated']} of {stats['scanned']} grades changed "
+            f"in {stats['seconds']}s ({stats['engine']})"
+        )
+        return stats
+
+    def _recompute_chunk(self, rows):
+        """Return unsaved Grade instances for the rows whose stored values differ"""
+        if np is not None:
+            totals, ges_grades, letter_grades = self._compute_numpy(rows)
+        else:
+            totals, ges_grades, letter_grades = self._compute_python(rows)
+
+        changed = []
+        for row, total, ges_grade, letter_grade in zip(rows, totals, ges_grades, letter_grades):
+            total_score = (Decimal(total) / 100).quantize(HUNDREDTH)
+            if (row[5], row[6], row[7]) == (total_score, ges_grade, letter_grade):
+                continue
+            changed.append(Grade(pk=row[0], total_score=total_score,
+                                 ges_grade=ges_grade, letter_grade=letter_grade))
+        return changed
+
+    def _compute_numpy(self, rows):
+        percentages = np.array(
+            [[_hundredths(value) for value in row[1:5]] for row in rows], dtype=np.int64
+        )
+        numerators = percentages @ np.array(self.weights, dtype=np.int64)
+        quotients, remainders = np.divmod(numerators, 10000)
+        round_up = (remainders * 2 > 10000) | ((remainders * 2 == 10000) & (quotients % 2 == 1))
+        totals = quotients + round_up
+
+        scores = totals / 100
+        grades = []
+        for table in (self.boundaries.ges, self.boundaries.letter):
+            positions = np.searchsorted(np.array(table.minimums), scores, side='right')
+            grades.append(np.array(table.labels, dtype=object)[positions].tolist())
+        return totals.tolist(), grades[0], grades[1]
+
+    def _compute_python(self, rows):
+        totals = [
+            _round_half_even(
+                sum(_hundredths(value) * weight for value, weight in zip(row[1:5], self.weights)),
+                10000,
+            )
+            for row in rows
+        ]
+        scores = [total / 100 for total in totals]
+        return (
+            totals,
+            self.boundaries.ges.classify_many(scores),
+            self.boundaries.letter.classify_many(scores),
+        )
+
+    def _log_audit(self, stats):
+        AuditLog.objects.create(
+            user=self.user,
+            action='UPDATE',
+            model_name='Grade',
+            object_id='bulk_recompute',
+            details={
+                'academic_year': self.academic_year,
+                'term': self.term,
+                'class_level': self.class_level,
+                'weights': {
+                    field: str(Decimal(weight) / 100) for field, weight in zip(WEIGHT_FIELDS, self.weights)
+                },
+                'scanned': stats['scanned'],
+                'updated': stats['updated'],
+            },
+        )
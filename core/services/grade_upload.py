@@ -0,0 +1,341 @@
+# core/services/grade_upload.py
+"""
+Chunked, resumable bulk grade upload.
+
+The uploaded spreadsheet is stored on disk and processed by a Celery task in
+chunks, each committed in its own transaction. Progress lives in the cache so
+BulkUploadProgressAPI can poll it while the task runs, and the index of the
+last committed row lets a retried task carry on where the previous attempt
+stopped.
+"""
+import csv
+import io
+import logging
+import os
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Assignment, Grade, Notification, Student, StudentAssignment
+from core.services.assignment_analytics import deferred_assignment_analytics
+from core.services.context_fragments import invalidate_notifications
+from core.services.notification_counter import add_unread
+from core.services.notification_push import coalesce
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+MAX_STORED_ERRORS = 200
+
+REQUIRED_COLUMNS = ['student_id', 'score']
+
+
+def progress_key(upload_id):
+    return f"bulk_upload:{upload_id}"
+
+
+def user_upload_key(user_id):
+    return f"bulk_upload_user:{user_id}"
+
+
+class GradeUploadJob:
+    """A bulk grade upload tracked through the cache"""
+
+    CHUNK_SIZE = 200
+
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+
+    # ----- lifecycle -----
+
+    @classmethod
+    def create(cls, uploaded_file, assignment, term, user):
+        """Store the uploaded file and register a pending job for ``user``"""
+        upload_id = uuid.uuid4().hex
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        path = default_storage.save(f"grade_uploads/{upload_id}{extension}", uploaded_file)
+
+        job = cls(upload_id)
+        job._write({
+            'upload_id': upload_id,
+            'status': 'queued',
+            'file_path': path,
+            'file_name': uploaded_file.name,
+            'assignment_id': assignment.id,
+            'term': int(term),
+            'user_id': user.id,
+            'total': 0,
+            'processed': 0,
+            'success': 0,
+            'committed_row': 1,  # header row
+            'errors': [],
+            'error_count': 0,
+            'notify_students': [],
+            'started_at': None,
+            'completed_at': None,
+        })
+        cache.set(user_upload_key(user.id), upload_id, PROGRESS_TIMEOUT)
+        return job
+
+    @classmethod
+    def latest_for_user(cls, user_id):
+        upload_id = cache.get(user_upload_key(user_id))
+        return cls(upload_id) if upload_id else None
+
+    @property
+    def progress(self):
+        return cache.get(progress_key(self.upload_id)) or {}
+
+    def public_progress(self):
+        """Progress without internal bookkeeping, for the polling API"""
+        data = self.progress
+        for field in ('file_path', 'notify_students', 'user_id'):
+            data.pop(field, None)
+        return data
+
+    def _write(self, data):
+        cache.set(progress_key(self.upload_id), data, PROGRESS_TIMEOUT)
+
+    def _update(self, **fields):
+        data = self.progress
+        data.update(fields)
+        self._write(data)
+        return data
+
+    def requeue(self):
+        self._update(status='queued', error=None, completed_at=None)
+
+    def mark_failed(self, error, retrying=False):
+        self._update(
+            status='retrying' if retrying else 'failed',
+            error=str(error),
+            completed_at=None if retrying else timezone.now().isoformat(),
+        )
+
+    # ----- processing -----
+
+    def run(self):
+        """Process the remaining rows, resuming after the last committed row"""
+        state = self.progress
+        if not state:
+            raise ValueError(f"Unknown bulk upload {self.upload_id}")
+        if state['status'] == 'completed':
+            return state
+
+        assignment = Assignment.objects.select_related('subject', 'class_assignment').get(pk=state['assignment_id'])
+        state = self._update(
+            status='processing',
+            started_at=state.get('started_at') or timezone.now().isoformat(),
+            total=state.get('total') or self._count_rows(state['file_path']),
+        )
+
+        rows = self._iter_rows(state['file_path'])
+        missing = self._missing_columns(next(rows))
+        if missing:
+            rows.close()
+            state = self._update(
+                status='failed',
+                errors=[f"Missing required columns: {', '.join(missing)}"],
+                error_count=1,
+                completed_at=timezone.now().isoformat(),
+            )
+            default_storage.delete(state['file_path'])
+            return state
+
+        resume_after = state['committed_row']
+        chunk = []
+        for row_num, row in rows:
+            if row_num <= resume_after:
+                continue
+            chunk.append((row_num, row))
+            if len(chunk) >= self.CHUNK_SIZE:
+                self._commit_chunk(chunk, assignment, state['term'])
+                chunk = []
+        if chunk:
+            self._commit_chunk(chunk, assignment, state['term'])
+
+        self._send_notifications(assignment)
+        state = self._update(status='completed', completed_at=timezone.now().isoformat())
+        default_storage.delete(state['file_path'])
+        return state
+
+    def _commit_chunk(self, chunk, assignment, term):
+        students = {
+            student.student_id: student
+            for student in Student.objects.filter(
+                student_id__in=[str(row.get('student_id') or '').strip() for _, row in chunk]
+            ).select_related('user')
+        }
+
+        success, errors, touched = 0, [], set()
+        with deferred_assignment_analytics(), transaction.atomic():
+            for row_num, row in chunk:
+                try:
+                    student, score = self._validate_row(row, students, assignment)
+                    # Savepoint per row so one bad row doesn't poison the chunk
+                    with transaction.atomic():
+                        self._save_grade(student, assignment, term, score)
+                    success += 1
+                    if student.user_id:
+                        touched.add(student.user_id)
+                except Exception as e:
+                    errors.append(f"Row {row_num}: {str(e)}")
+
+        # The chunk is committed; record it so a retry starts after it
+        state = self.progress
+        stored_errors = (state['errors'] + errors)[:MAX_STORED_ERRORS]
+        self._update(
+            committed_row=chunk[-1][0],
+            processed=state['processed'] + len(chunk),
+            success=state['success'] + success,
+            errors=stored_errors,
+            error_count=state['error_count'] + len(errors),
+            notify_students=sorted(set(state['notify_students']) | touched),
+        )
+
+    def _validate_row(self, row, students, assignment):
+        student_id = str(row.get('student_id') or '').strip()
+        if not student_id:
+            raise ValueError("Missing student ID")
+        student = students.get(student_id)
+        if student is None:
+            raise ValueError(f"Student with ID '{student_id}' not found")
+
+        raw_score = row.get('score')
+        if raw_score in (None, ''):
+            raise ValueError("Missing score")
+        try:
+            score = Decimal(str(raw_score).strip())
+        except InvalidOperation:
+            raise ValueError(f"Invalid score format: '{raw_score}'. Must be a number.")
+        if score < 0 or score > assignment.max_score:
+            raise ValueError(f"Score {score} is outside valid range (0-{assignment.max_score})")
+
+        return student, score
+
+    def _save_grade(self, student, assignment, term, score):
+        percentage = (score * 100 / Decimal(assignment.max_score or 100)).quantize(Decimal('0.01'))
+        academic_year = assignment.class_assignment.academic_year.replace('-', '/')
+        component = f"{assignment.assignment_type.lower()}_percentage"
+
+        grade = Grade.objects.filter(
+            student=student,
+            subject=assignment.subject,
+            academic_year=academic_year,
+            term=term,
+        ).first() or Grade(
+            student=student,
+            subject=assignment.subject,
+            academic_year=academic_year,
+            term=term,
+        )
+        grade.class_assignment = assignment.class_assignment
+        setattr(grade, component, percentage)
+        # Notifications are sent once per student when the upload completes
+        grade._skip_notification = True
+        grade.save()
+
+        StudentAssignment.objects.update_or_create(
+            student=student,
+            assignment=assignment,
+            defaults={
+                'score': score,
+                'status': 'GRADED',
+                'graded_date': timezone.now(),
+            },
+        )
+
+    def _send_notifications(self, assignment):
+        """One notification per student for the whole upload"""
+        user_ids = self.progress.get('notify_students', [])
+        if not user_ids:
+            return
+
+        message = f'Your {assignment.subject.name} grade has been updated'
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=user_id,
+                notification_type='GRADE',
+                title='Grade Updated',
+                message=message,
+                related_object_id=assignment.id,
+                related_content_type='assignment',
+            )
+            for user_id in user_ids
+        ], batch_size=500)
+        # bulk_create skips the signals that drop the cached notification
+        # context and move the unread counters
+        invalidate_notifications(*user_ids)
+        add_unread(user_ids)
+
+        from core.signals import send_websocket_notification
+        with coalesce():
+            for user_id in user_ids:
+                send_websocket_notification(user_id, 'GRADE', 'Grade Updated', message, assignment.id)
+        self._update(notify_students=[])
+
+    # ----- file reading -----
+
+    @staticmethod
+    def _header(key):
+        return str(key).lower().strip().replace(' ', '_')
+
+    @classmethod
+    def _normalize(cls, row):
+        normalized = {}
+        for key, value in row.items():
+            if key is None:
+                continue
+            normalized[cls._header(key)] = value
+        return normalized
+
+    @classmethod
+    def _missing_columns(cls, headers):
+        return [column for column in REQUIRED_COLUMNS if column not in headers]
+
+    def _iter_rows(self, path):
+        """
+        Yield the normalized headers, then (row_number, row_dict) without
+        loading the whole file
+        """
+        if path.endswith('.csv'):
+            with default_storage.open(path, 'rb') as raw:
+                text = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+                reader = csv.DictReader(text)
+                yield [self._header(key) for key in reader.fieldnames or []]
+                for row_num, row in enumerate(reader, 2):
+                    yield row_num, self._normalize(row)
+            return
+
+        from openpyxl import load_workbook
+        with default_storage.open(path, 'rb') as raw:
+            workbook = load_workbook(raw, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                headers = next(rows, None) or []
+                yield [self._header(key) for key in headers if key is not None]
+                for row_num, values in enumerate(rows, 2):
+                    if not any(value not in (None, '') for value in values):
+                        continue
+                    yield row_num, self._normalize(dict(zip(headers, values)))
+            finally:
+                workbook.close()
+
+    def _count_rows(self, path):
+        try:
+            if path.endswith('.csv'):
+                with default_storage.open(path, 'rb') as raw:
+                    return max(sum(1 for _ in raw) - 1, 0)
+            from openpyxl import load_workbook
+            with default_storage.open(path, 'rb') as raw:
+                workbook = load_workbook(raw, read_only=True)
+                total = max((workbook.active.max_row or 1) - 1, 0)
+                workbook.close()
+                return total
+        except Exception as e:
+            logger.warning(f"Could not estimate total rows for upload {self.upload_id}: {str(e)}")
+            return 0
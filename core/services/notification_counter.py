@@ -0,0 +1,156 @@
+# core/services/notification_counter.py
+"""
+Per-user unread notification counters kept in the cache.
+
+Every WebSocket connect, count request and notification push used to run
+``COUNT(*)`` over the user's unread notifications. The count now lives in a
+cache counter that the Notification lifecycle moves with atomic
+increments: creating an unread notification adds one, reading or deleting
+one takes one away, and bulk operations adjust by the per-user totals.
+
+A counter only moves once it exists (``incr`` on a missing key is a no-op
+here), and a missing counter is seeded from the database on its next read.
+Anything that slips between a seed and an increment is corrected by
+``reconcile``, which the ``reconcile_unread_counters`` task runs for
+recently active users.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COUNTER_TIMEOUT = 7 * 24 * 60 * 60
+
+# (event loop, client): redis.asyncio connections belong to the loop that opened them
+_async_client = (None, None)
+
+
+def counter_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _count_from_db(user_ids):
+    from core.models import Notification
+
+    counts = dict(
+        Notification.objects.filter(recipient_id__in=list(user_ids), is_read=False)
+        .order_by().values_list('recipient_id').annotate(total=Count('id'))
+    )
+    return {user_id: counts.get(user_id, 0) for user_id in user_ids}
+
+
+def seed(user_id):
+    """Create the counter from the database unless another process beat us to it"""
+    count = _count_from_db([user_id])[user_id]
+    cache.add(counter_key(user_id), count, COUNTER_TIMEOUT)
+    value = cache.get(counter_key(user_id))
+    return count if value is None else int(value)
+
+
+def get_unread_count(user_id):
+    try:
+        value = cache.get(counter_key(user_id))
+        if value is not None:
+            return max(int(value), 0)
+        return seed(user_id)
+    except Exception as e:
+        logger.error(f"Error reading unread counter for user {user_id}: {str(e)}")
+        return _count_from_db([user_id])[user_id]
+
+
+def _redis_async_client():
+    """A redis.asyncio client on the cache's database, or None without Redis"""
+    global _async_client
+    backend = settings.CACHES['default']['BACKEND']
+    if not backend.startswith('django_redis'):
+        return None
+    loop = asyncio.get_running_loop()
+    if _async_client[0] is not loop:
+        from redis import asyncio as aioredis
+
+        location = settings.CACHES['default']['LOCATION']
+        _async_client = (loop, aioredis.from_url(location if isinstance(location, str) else location[0]))
+    return _async_client[1]
+
+
+async def aget_unread_count(user_id):
+    """
+    Read the counter from an async consumer without leaving the event loop.
+    Only a missing counter falls back to the (threaded) database seed.
+    """
+    from asgiref.sync import sync_to_async
+
+    key = counter_key(user_id)
+    try:
+        client = _redis_async_client()
+        if client is not None:
+            # django_redis stores integers unencoded, so the raw value is the count
+            value = await client.get(cache.make_key(key))
+        else:
+            value = await cache.aget(key)
+        if value is not None:
+            return max(int(value), 0)
+    except Exception as e:
+        logger.warning(f"Async unread counter read failed for user {user_id}: {str(e)}")
+    return await sync_to_async(get_unread_count)(user_id)
+
+
+def adjust(user_id, delta):
+    """Move an existing counter by ``delta``; missing counters are left to seeding"""
+    if not user_id or not delta:
+        return
+    key = counter_key(user_id)
+    try:
+        value = cache.incr(key, delta)
+        if value < 0:
+            cache.set(key, 0, COUNTER_TIMEOUT)
+    except ValueError:
+        pass
+    except Exception as e:
+        logger.error(f"Error adjusting unread counter for user {user_id}: {str(e)}")
+
+
+def adjust_many(deltas):
+    """``deltas`` maps user id to change, e.g. Counter(recipient_ids) after a bulk create"""
+    for user_id, delta in deltas.items():
+        adjust(user_id, delta)
+
+
+def add_unread(recipient_ids):
+    """One new unread notification for each id in ``recipient_ids`` (repeats count)"""
+    adjust_many(Counter(recipient_ids))
+
+
+def set_unread_count(user_id, count):
+    cache.set(counter_key(user_id), count, COUNTER_TIMEOUT)
+
+
+def reconcile(user_ids):
+    """Overwrite the counters of ``user_ids`` with the database counts"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    counts = _count_from_db(user_ids)
+    cache.set_many({counter_key(user_id): count for user_id, count in counts.items()}, COUNTER_TIMEOUT)
+    return counts
+
+
+def reconcile_active_users(hours=24, batch_size=500):
+    """Reconcile everyone who signed in within ``hours``; returns how many"""
+    from django.contrib.auth import get_user_model
+
+    since = timezone.now() - timedelta(hours=hours)
+    user_ids = list(
+        get_user_model().objects.filter(is_active=True, last_login__gte=since)
+        .values_list('id', flat=True)
+    )
+    for start in range(0, len(user_ids), batch_size):
+        reconcile(user_ids[start:start + batch_size])
+    return len(user_ids)
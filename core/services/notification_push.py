@@ -0,0 +1,87 @@
+# core/services/notification_push.py
+"""
+WebSocket pushes to a user's ``notifications_<id>`` group.
+
+Pushes carry what happened (new notification, marked read, ...) but no
+unread count: the consumer reads the count from the counter in
+``core.services.notification_counter`` when it sends its frame, and it
+debounces pushes that arrive close together into a single frame. Code that
+creates many notifications in one go can wrap the work in ``coalesce()`` so
+each user also gets a single channel-layer message for the whole batch.
+"""
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def notification_group(user_id):
+    return f'notifications_{user_id}'
+
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'link': notification.link,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        'is_read': notification.is_read,
+    }
+
+
+def push(user_id, action, notification=None, notification_id=None):
+    """Tell ``user_id``'s open sockets that something changed"""
+    if not user_id:
+        return
+    event = {'action': action}
+    if notification is not None:
+        event['notification'] = notification
+        notification_id = notification_id or notification.get('id')
+    if notification_id is not None:
+        event['notification_id'] = notification_id
+
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is not None:
+        buffer[user_id].append(event)
+    else:
+        _send(user_id, [event])
+
+
+@contextmanager
+def coalesce():
+    """Hold pushes made inside the block and send one message per user at the end"""
+    if getattr(_local, 'buffer', None) is not None:
+        # Already coalescing further up the stack
+        yield
+        return
+    _local.buffer = defaultdict(list)
+    try:
+        yield
+    finally:
+        buffer, _local.buffer = _local.buffer, None
+        for user_id, events in buffer.items():
+            _send(user_id, events)
+
+
+def _send(user_id, events):
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            notification_group(user_id),
+            {
+                'type': 'notification_update',
+                'events': events,
+                'timestamp': timezone.now().isoformat(),
+            }
+        )
+    except Exception as e:
+        logger.error(f"WebSocket push failed for user {user_id}: {str(e)}")
@@ -0,0 +1,191 @@
+# core/services/period_clock.py
+"""
+Process-wide clock for the school day's periods.
+
+The active TimeSlot table is tiny and rarely changes, but the current and
+next period were looked up from it on every page render. ``get_period_clock``
+loads it once per process into sorted start/end boundaries, so "which period
+is it now" is a ``bisect``. Saving or deleting a TimeSlot bumps a shared
+version, and each process rebuilds its clock on the next check.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Optional
+
+from django.utils import timezone
+
+from core.services.version_counter import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+PERIOD_CLOCK_VERSION = VersionCounter('period_clock:version')
+PERIOD_CLOCK_CHECK_INTERVAL = 5.0  # seconds between shared-cache checks
+
+_clock_state = {
+    'clock': None,
+    'version': None,
+    'checked_at': 0.0,
+}
+_clock_lock = threading.Lock()
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+@dataclass(frozen=True)
+class Period:
+    period_number: int
+    period_name: str
+    start_time: object
+    end_time: object
+    is_break: bool = False
+    break_name: Optional[str] = None
+
+    @property
+    def start(self):
+        return _seconds(self.start_time)
+
+    @property
+    def end(self):
+        return _seconds(self.end_time)
+
+    def minutes_remaining(self, at):
+        """Whole minutes from ``at`` (a time) until the period ends"""
+        return max(self.end - _seconds(at), 0) // 60
+
+    def minutes_until(self, at):
+        return max(self.start - _seconds(at), 0) // 60
+
+    def as_dict(self):
+        return {
+            'period_number': self.period_number,
+            'period_name': self.period_name,
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M'),
+            'is_break': self.is_break,
+            'break_name': self.break_name,
+        }
+
+
+class PeriodClock:
+    """Answers current/next period questions against a fixed slot table"""
+
+    def __init__(self, periods):
+        self.periods = sorted(periods, key=lambda period: (period.start, period.period_number))
+        self.starts = [period.start for period in self.periods]
+        self.by_number_order = sorted(self.periods, key=lambda period: period.period_number)
+
+    @classmethod
+    def from_timeslots(cls, timeslots):
+        return cls(
+            Period(
+                period_number=slot.period_number,
+                period_name=slot.get_period_number_display(),
+                start_time=slot.start_time,
+                end_time=slot.end_time,
+                is_break=slot.is_break,
+                break_name=slot.break_name,
+            )
+            for slot in timeslots
+        )
+
+    @staticmethod
+    def now():
+        return timezone.localtime().time()
+
+    def current(self, at=None):
+        """The period running at ``at`` (default: now), or None"""
+        at = _seconds(at or self.now())
+        index = bisect_right(self.starts, at) - 1
+        if index >= 0 and at <= self.periods[index].end:
+            return self.periods[index]
+        return None
+
+    def upcoming(self, at=None):
+        """The first period starting after ``at``, or None"""
+        index = bisect_right(self.starts, _seconds(at or self.now()))
+        return self.periods[index] if index < len(self.periods) else None
+
+    def after(self, period_number):
+        """The next period by number, as the timetable grids order them"""
+        for period in self.by_number_order:
+            if period.period_number > period_number:
+                return period
+        return None
+
+    def is_current(self, start_time, end_time, at=None):
+        at = _seconds(at or self.now())
+        return _seconds(start_time) <= at <= _seconds(end_time)
+
+    def current_period_info(self, at=None):
+        """Status dict used by the timetable widgets and context processor"""
+        if not self.periods:
+            return None
+        at = at or self.now()
+        period = self.current(at)
+        if period is not None:
+            return dict(period.as_dict(), remaining_minutes=period.minutes_remaining(at))
+
+        first = self.periods[0]
+        if _seconds(at) < first.start:
+            return {
+                'status': 'before_school',
+                'next_period': {
+                    'period_number': first.period_number,
+                    'period_name': first.period_name,
+                    'start_time': first.start_time.strftime('%H:%M'),
+                },
+            }
+        if _seconds(at) > max(period.end for period in self.periods):
+            return {
+                'status': 'after_school',
+                'message': 'School has ended for the day',
+            }
+        return None
+
+    def next_period_info(self, current_period_number):
+        period = self.after(current_period_number)
+        return period.as_dict() if period else None
+
+    def time_slot_labels(self, fmt='%I:%M %p'):
+        return [
+            f"{period.start_time.strftime(fmt)} - {period.end_time.strftime(fmt)}"
+            for period in self.by_number_order
+        ]
+
+
+def _load_clock():
+    from core.models import TimeSlot
+
+    return PeriodClock.from_timeslots(TimeSlot.objects.filter(is_active=True).order_by('period_number'))
+
+
+def get_period_clock():
+    """
+    The process's PeriodClock, rebuilt when another process has changed the
+    slot table (checked at most every PERIOD_CLOCK_CHECK_INTERVAL seconds).
+    """
+    state = _clock_state
+    now = time.monotonic()
+    if state['clock'] is not None and now - state['checked_at'] < PERIOD_CLOCK_CHECK_INTERVAL:
+        return state['clock']
+
+    with _clock_lock:
+        version = PERIOD_CLOCK_VERSION.get()
+        if state['clock'] is not None and version is not None and version == state['version']:
+            state['checked_at'] = now
+            return state['clock']
+
+        clock = _load_clock()
+        state.update(clock=clock, version=version, checked_at=now)
+        return clock
+
+
+def reset_period_clock():
+    """Rebuild this process's clock and tell the others to rebuild theirs"""
+    _clock_state.update(clock=None, version=None, checked_at=0.0)
+    PERIOD_CLOCK_VERSION.bump()
@@ -0,0 +1,417 @@
+# core/services/report_card_batch.py
+"""
+End-of-term report card generation for a class or the whole school.
+
+Inputs (grades, attendance summaries, class rankings, existing report cards)
+are loaded in bulk per class, ReportCard rows are brought up to date with
+bulk writes, and PDFs are rendered across a process pool. Each card's inputs
+are fingerprinted, so re-running the batch only re-renders cards whose data
+changed since the previous run.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+
+from django.db import connections, transaction
+
+from core.models import (
+    AcademicTerm, AttendanceSummary, CLASS_LEVEL_CHOICES, Grade, ReportCard, Student,
+)
+from core.models.configuration import SchoolConfiguration
+from core.services.class_ranking import ClassRanking, ordinal
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ('zip', 'merged')
+MANIFEST_NAME = '.manifest.json'
+
+
+# ----- rendering (runs in worker processes; payloads are plain data) -----
+
+def _namespaces(payload):
+    student = payload['student']
+    student_ns = SimpleNamespace(
+        student_id=student['student_id'],
+        class_level=student['class_level'],
+        get_full_name=lambda: student['full_name'],
+        get_gender_display=lambda: student['gender_display'],
+    )
+    grades = [
+        SimpleNamespace(subject=SimpleNamespace(name=grade['subject']), **{
+            key: (Decimal(value) if value is not None else None)
+            for key, value in grade.items() if key not in ('subject', 'letter_grade')
+        }, letter_grade=grade['letter_grade'])
+        for grade in payload['grades']
+    ]
+    return student_ns, grades
+
+
+def _story(payload):
+    from core.views.reportcard_views import ReportCardPDFView
+
+    student, grades = _namespaces(payload)
+    return ReportCardPDFView().build_story(
+        student,
+        payload['academic_year'],
+        payload['term'],
+        grades,
+        payload['average_score'],
+        payload['overall_grade'],
+        payload['attendance'],
+        payload['additional_info'],
+        SimpleNamespace(school_name=payload['school_name']),
+    )
+
+
+def _document(buffer):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+
+
+def render_report_card(payload):
+    """Render one report card; returns (student_id, pdf_bytes)"""
+    buffer = BytesIO()
+    _document(buffer).build(_story(payload))
+    return payload['student']['id'], buffer.getvalue()
+
+
+def render_class_document(payloads):
+    """Render a whole class into a single PDF, one card per page run"""
+    from reportlab.platypus import PageBreak
+
+    story = []
+    for index, payload in enumerate(payloads):
+        if index:
+            story.append(PageBreak())
+        story.extend(_story(payload))
+    buffer = BytesIO()
+    _document(buffer).build(story)
+    return buffer.getvalue()
+
+
+# ----- batch orchestration -----
+
+class ReportCardBatch:
+    """Generate report cards and PDFs for one term across one or more classes"""
+
+    def __init__(self, academic_year, term, class_levels=None, output_dir='report_cards',
+                 output_format='zip', workers=None, force=False, user=None, progress_callback=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+        self.academic_year = academic_year
+        self.term = int(term)
+        self.class_levels = class_levels or [code for code, _ in CLASS_LEVEL_CHOICES]
+        self.output_dir = os.path.join(output_dir, academic_year.replace('/', '-'), f"term{self.term}")
+        self.output_format = output_format
+        self.workers = workers or max((os.cpu_count() or 2) - 1, 1)
+        self.force = force
+        self.user = user
+        self.progress_callback = progress_callback
+
+    def run(self):
+        started = time.monotonic()
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        stats = {'classes': 0, 'cards': 0, 'rendered': 0, 'skipped': 0, 'files': []}
+
+        academic_term = AcademicTerm.objects.filter(
+            academic_year__name=self.academic_year,
+            period_system='TERM',
+            period_number=self.term,
+        ).select_related('academic_year').first()
+        additional = self._calendar_info(academic_term)
+        self.config = SchoolConfiguration.get_config()
+        school_name = self.config.school_name
+
+        with self._executor() as executor:
+            merged_jobs = []
+            for class_level in self.class_levels:
+                payloads = self._prepare_class(class_level, academic_term, additional, school_name)
+                if not payloads:
+                    continue
+                stats['classes'] += 1
+                stats['cards'] += len(payloads)
+
+                if self.output_format == 'merged':
+                    # Queue every class before waiting on any so the pool renders them side by side
+                    merged_jobs.append(self._submit_merged(class_level, payloads, manifest, executor))
+                    continue
+                rendered, path = self._render_class(class_level, payloads, manifest, executor)
+                self._record(class_level, len(payloads), rendered, path, stats, manifest)
+
+            for job in merged_jobs:
+                rendered, path = self._finish_merged(job, manifest)
+                self._record(job['class_level'], job['cards'], rendered, path, stats, manifest)
+
+        elapsed = time.monotonic() - started
+        stats['seconds'] = round(elapsed, 2)
+        stats['cards_per_second'] = round(stats['cards'] / elapsed, 2) if elapsed else 0.0
+        logger.info(
+            f"Report card batch {self.academic_year} term {self.term}: {stats['cards']} cards, "
+            f"{stats['rendered']} rendered, {stats['skipped']} unchanged, {stats['cards_per_second']} cards/s"
+        )
+        return stats
+
+    # ----- data loading -----
+
+    def _prepare_class(self, class_level, academic_term, additional, school_name):
+        """Load one class's inputs in bulk and sync its ReportCard rows"""
+        students = list(
+            Student.objects.filter(class_level=class_level, is_active=True).order_by('last_name', 'first_name')
+        )
+        if not students:
+            return []
+        student_ids = [student.id for student in students]
+
+        grades_by_student = defaultdict(list)
+        for grade in Grade.objects.filter(
+            student_id__in=student_ids, academic_year=self.academic_year, term=self.term
+        ).select_related('subject').order_by('subject__name'):
+            grades_by_student[grade.student_id].append(grade)
+
+        attendance = {}
+        if academic_term:
+            attendance = {
+                summary.student_id: summary
+                for summary in AttendanceSummary.objects.filter(
+                    student_id__in=student_ids, term=academic_term, period__isnull=True
+                )
+            }
+
+        ranking = ClassRanking.for_class(class_level, self.academic_year, self.term)
+        report_cards = self._sync_report_cards(students, grades_by_student)
+
+        payloads = []
+        for student in students:
+            grades = grades_by_student.get(student.id)
+            if not grades:
+                continue
+            report_card = report_cards.get(student.id)
+            if report_card is None:
+                continue
+            position = ranking.position_for(student.id)
+            payloads.append({
+                'student': {
+                    'id': student.id,
+                    'student_id': student.student_id,
+                    'full_name': student.get_full_name(),
+                    'class_level': student.class_level,
+                    'gender_display': student.get_gender_display(),
+                },
+                'academic_year': self.academic_year,
+                'term': self.term,
+                'school_name': school_name,
+                'grades': [self._grade_data(grade) for grade in grades],
+                'average_score': float(report_card.average_score),
+                'overall_grade': report_card.overall_grade,
+                'attendance': self._attendance_data(attendance.get(student.id)),
+                'additional_info': dict(
+                    additional,
+                    position_in_class=f"{ordinal(position)} of {ranking.total}" if position else "Not ranked",
+                ),
+            })
+        return payloads
+
+    def _sync_report_cards(self, students, grades_by_student):
+        """Create or refresh ReportCard rows for the class with bulk writes"""
+        existing = {
+            card.student_id: card
+            for card in ReportCard.objects.filter(
+                student__in=students, academic_year=self.academic_year, term=self.term
+            )
+        }
+        to_create, to_update = [], []
+        for student in students:
+            scores = [grade.total_score for grade in grades_by_student.get(student.id, []) if grade.total_score is not None]
+            if not scores and student.id not in existing:
+                continue
+            average = (sum(scores) / len(scores)).quantize(Decimal('0.01')) if scores else Decimal('0.00')
+            overall = self.config.get_letter_grade_for_score(average) if scores else 'E'
+
+            card = existing.get(student.id)
+            if card is None:
+                card = ReportCard(
+                    student=student, academic_year=self.academic_year, term=self.term, created_by=self.user
+                )
+                to_create.append(card)
+                existing[student.id] = card
+            elif (card.average_score, card.overall_grade, card.subjects_count) == (average, overall, len(scores)):
+                continue
+            else:
+                to_update.append(card)
+            card.average_score, card.overall_grade, card.subjects_count = average, overall, len(scores)
+
+        with transaction.atomic():
+            ReportCard.objects.bulk_create(to_create, batch_size=500)
+            ReportCard.objects.bulk_update(
+                to_update, ['average_score', 'overall_grade', 'subjects_count'], batch_size=500
+            )
+        return existing
+
+    @staticmethod
+    def _grade_data(grade):
+        def text(value):
+            return str(value) if value is not None else None
+        return {
+            'subject': grade.subject.name,
+            'homework_percentage': text(grade.homework_percentage),
+            'classwork_percentage': text(grade.classwork_percentage),
+            'test_percentage': text(grade.test_percentage),
+            'exam_percentage': text(grade.exam_percentage),
+            'total_score': text(grade.total_score),
+            'letter_grade': grade.letter_grade,
+        }
+
+    @staticmethod
+    def _attendance_data(summary):
+        if summary is None:
+            return {'present_days': 0, 'total_days': 0, 'attendance_rate': 0.0, 'absence_count': 0}
+        present = summary.days_present + summary.days_late + summary.days_excused
+        return {
+            'present_days': present,
+            'total_days': summary.total_days,
+            'attendance_rate': float(summary.present_rate),
+            'absence_count': summary.total_days - present,
+        }
+
+    def _calendar_info(self, academic_term):
+        from core.utils import format_date
+
+        if academic_term is None:
+            return {'vacation_date': "To be announced", 'reopening_date': "To be announced"}
+        next_term = AcademicTerm.objects.filter(
+            start_date__gt=academic_term.end_date
+        ).order_by('start_date').first()
+        return {
+            'vacation_date': format_date(academic_term.end_date),
+            'reopening_date': format_date(next_term.start_date) if next_term else "To be announced",
+        }
+
+    # ----- rendering -----
+
+    def _executor(self):
+        # Celery prefork workers are daemonic and may not spawn children
+        if self.workers <= 1 or multiprocessing.current_process().daemon:
+            return _InlineExecutor()
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+
+    @staticmethod
+    def _fingerprint(payload):
+        return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _record(self, class_level, cards, rendered, path, stats, manifest):
+        stats['rendered'] += rendered
+        stats['skipped'] += cards - rendered
+        if path:
+            stats['files'].append(path)
+        self._save_manifest(manifest)
+
+        if self.progress_callback:
+            self.progress_callback(class_level, stats)
+
+    def _submit_merged(self, class_level, payloads, manifest, executor):
+        """Queue a class's merged PDF unless it is up to date; returns the pending job"""
+        fingerprints = {str(p['student']['id']): self._fingerprint(p) for p in payloads}
+        path = os.path.join(self.output_dir, f"{class_level}.pdf")
+        job = {'class_level': class_level, 'cards': len(payloads), 'path': path,
+               'fingerprints': fingerprints, 'future': None}
+        if not self.force and manifest.get(class_level) == fingerprints and os.path.exists(path):
+            return job
+        if isinstance(executor, ProcessPoolExecutor):
+            # Forked workers must not share the parent's database sockets
+            connections.close_all()
+        job['future'] = executor.submit(render_class_document, payloads)
+        return job
+
+    def _finish_merged(self, job, manifest):
+        """Write a queued class PDF; returns (cards rendered, output path)"""
+        if job['future'] is None:
+            return 0, job['path']
+        pdf = job['future'].result()
+        with open(job['path'], 'wb') as handle:
+            handle.write(pdf)
+        manifest[job['class_level']] = job['fingerprints']
+        return job['cards'], job['path']
+
+    def _render_class(self, class_level, payloads, manifest, executor):
+        """Render a class's stale cards and zip them; returns (cards rendered, output path)"""
+        fingerprints = {str(p['student']['id']): self._fingerprint(p) for p in payloads}
+        class_manifest = manifest.setdefault(class_level, {})
+        if isinstance(executor, ProcessPoolExecutor):
+            # Forked workers must not share the parent's database sockets
+            connections.close_all()
+
+        card_dir = os.path.join(self.output_dir, class_level)
+        os.makedirs(card_dir, exist_ok=True)
+        stale = [
+            p for p in payloads
+            if self.force
+            or class_manifest.get(str(p['student']['id'])) != fingerprints[str(p['student']['id'])]
+            or not os.path.exists(os.path.join(card_dir, f"{p['student']['student_id']}.pdf"))
+        ]
+        filenames = {p['student']['id']: f"{p['student']['student_id']}.pdf" for p in payloads}
+        for student_id, pdf in executor.map(render_report_card, stale, chunksize=8):
+            with open(os.path.join(card_dir, filenames[student_id]), 'wb') as handle:
+                handle.write(pdf)
+            class_manifest[str(student_id)] = fingerprints[str(student_id)]
+
+        # Stream the class's cards into the archive one file at a time
+        path = os.path.join(self.output_dir, f"{class_level}.zip")
+        if stale or not os.path.exists(path):
+            with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for filename in sorted(filenames.values()):
+                    archive.write(os.path.join(card_dir, filename), arcname=filename)
+        return len(stale), path
+
+    # ----- manifest -----
+
+    def _load_manifest(self):
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        if self.force or not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as handle:
+                manifest = json.load(handle)
+            return manifest.get(self.output_format, {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                data = {}
+        data[self.output_format] = manifest
+        with open(path, 'w') as handle:
+            json.dump(data, handle)
+
+
+class _InlineExecutor:
+    """Executor stand-in that renders in the current process"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        return SimpleNamespace(result=lambda: fn(*args))
+
+    def map(self, fn, iterable, chunksize=1):
+        return map(fn, iterable)
@@ -0,0 +1,419 @@
+# core/services/request_profiler.py
+"""
+Per-view request profiling.
+
+Each request gets a ``RequestProfile`` that counts SQL queries and SQL time
+(through an execute wrapper on every connection), cache hits and misses, and
+template render time. Finished profiles are folded into fixed-bucket
+histograms per resolved ``url_name``. The histograms are kept in process
+memory and merged into Redis every few seconds, so the request path never
+waits on a cache write. Requests slower than ``PROFILER_SLOW_REQUEST_MS``
+keep their full SQL log as a sample.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'profiler'
+VIEWS_KEY = f'{KEY_PREFIX}:views'
+SLOW_KEY = f'{KEY_PREFIX}:slow'
+
+# Upper bounds of the histogram buckets; the last bucket is open-ended
+TIME_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 250]
+
+HISTOGRAMS = {
+    'wall_ms': TIME_BUCKETS_MS,
+    'sql_ms': TIME_BUCKETS_MS,
+    'template_ms': TIME_BUCKETS_MS,
+    'queries': QUERY_BUCKETS,
+}
+COUNTERS = ['requests', 'errors', 'cache_hits', 'cache_misses']
+
+MAX_SQL_LOG = 200
+
+_current = ContextVar('request_profile', default=None)
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestProfile:
+    """Measurements for one request"""
+
+    __slots__ = ('started', 'wall_ms', 'queries', 'sql_ms', 'cache_hits', 'cache_misses',
+                 'template_ms', 'sql_log', 'template_depth', 'cache_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_ms = 0.0
+        self.sql_log = []
+        self.template_depth = 0
+        self.cache_depth = 0
+
+    def record_query(self, sql, duration_ms):
+        self.queries += 1
+        self.sql_ms += duration_ms
+        if len(self.sql_log) < MAX_SQL_LOG:
+            # Keep the statement object itself; it is only formatted for slow samples
+            self.sql_log.append((sql, duration_ms))
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+        return self
+
+
+def current_profile():
+    return _current.get()
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def profile_request():
+    """Profile the enclosed block; yields the RequestProfile"""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.finish()
+        _current.reset(token)
+
+
+def _attach_query_wrapper(connection, **kwargs):
+    # Connections are per thread and async views run the ORM in sync_to_async
+    # worker threads, so the wrapper goes on each connection as it opens and
+    # checks the request's ContextVar, which those threads inherit
+    if _query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_wrapper)
+
+
+# ----- cache and template hooks -----
+
+_MISSING = object()
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+
+def install_hooks():
+    """
+    Count SQL queries, cache hits/misses and template render time for
+    profiled requests. Patches the classes once per process; unprofiled calls
+    pay one ContextVar lookup.
+    """
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        _install_query_hooks()
+        _install_cache_hooks()
+        _install_template_hooks()
+        _hooks_installed = True
+
+
+def _install_query_hooks():
+    connection_created.connect(_attach_query_wrapper, dispatch_uid='request_profiler_query_wrapper')
+    # Connections this thread opened before the hook was connected
+    for connection in connections.all(initialized_only=True):
+        _attach_query_wrapper(connection)
+
+
+def _install_cache_hooks():
+    from django.core.cache import caches
+
+    backend_class = type(caches['default'])
+    original_get = backend_class.get
+    original_get_many = backend_class.get_many
+
+    def get(self, key, default=None, *args, **kwargs):
+        profile = _current.get()
+        if profile is None or profile.cache_depth:
+            return original_get(self, key, default, *args, **kwargs)
+        value = original_get(self, key, _MISSING, *args, **kwargs)
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+
+    def get_many(self, keys, *args, **kwargs):
+        profile = _current.get()
+        if profile is None or profile.cache_depth:
+            return original_get_many(self, keys, *args, **kwargs)
+        keys = list(keys)
+        # The default get_many loops over get(); count the batch only once
+        profile.cache_depth += 1
+        try:
+            found = original_get_many(self, keys, *args, **kwargs)
+        finally:
+            profile.cache_depth -= 1
+        profile.cache_hits += len(found)
+        profile.cache_misses += max(len(keys) - len(found), 0)
+        return found
+
+    backend_class.get = get
+    backend_class.get_many = get_many
+
+
+def _install_template_hooks():
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None or profile.template_depth:
+            return original_render(self, context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            profile.template_ms += (time.perf_counter() - started) * 1000
+
+    Template.render = render
+
+
+# ----- aggregation -----
+
+def _bucket(value, bounds):
+    return bisect_left(bounds, value)
+
+
+def _empty_stats():
+    stats = {name: 0 for name in COUNTERS}
+    for name, bounds in HISTOGRAMS.items():
+        stats[f'{name}_sum'] = 0.0
+        stats[f'{name}_max'] = 0.0
+        for index in range(len(bounds) + 1):
+            stats[f'{name}_b{index}'] = 0
+    return stats
+
+
+class ProfileStore:
+    """
+    Per-process aggregation, merged into Redis (or kept in this process when
+    the cache is not Redis) at most every PROFILER_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.pending_slow = []
+        self.local = {}
+        self.local_slow = []
+        self.last_flush = time.monotonic()
+
+    def record(self, view_name, profile, status_code):
+        with self.lock:
+            stats = self.pending.setdefault(view_name, _empty_stats())
+            stats['requests'] += 1
+            stats['errors'] += int(status_code >= 500)
+            stats['cache_hits'] += profile.cache_hits
+            stats['cache_misses'] += profile.cache_misses
+            for name, value in (('wall_ms', profile.wall_ms), ('sql_ms', profile.sql_ms),
+                                ('template_ms', profile.template_ms), ('queries', profile.queries)):
+                stats[f'{name}_sum'] += value
+                stats[f'{name}_max'] = max(stats[f'{name}_max'], value)
+                stats[f'{name}_b{_bucket(value, HISTOGRAMS[name])}'] += 1
+
+            if profile.wall_ms >= setting('PROFILER_SLOW_REQUEST_MS', 1000):
+                self.pending_slow.append(self._sample(view_name, profile, status_code))
+
+            due = time.monotonic() - self.last_flush >= setting('PROFILER_FLUSH_INTERVAL', 10)
+        if due:
+            self.flush()
+
+    @staticmethod
+    def _sample(view_name, profile, status_code):
+        return {
+            'view': view_name,
+            'status': status_code,
+            'at': time.time(),
+            'wall_ms': round(profile.wall_ms, 1),
+            'sql_ms': round(profile.sql_ms, 1),
+            'queries': profile.queries,
+            'sql': [{'sql': str(sql), 'ms': round(ms, 2)} for sql, ms in profile.sql_log],
+        }
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            slow, self.pending_slow = self.pending_slow, []
+            self.last_flush = time.monotonic()
+        if not pending and not slow:
+            return
+
+        client = _redis_client()
+        if client is None:
+            with self.lock:
+                for view_name, stats in pending.items():
+                    _merge(self.local.setdefault(view_name, _empty_stats()), stats)
+                self.local_slow = (slow + self.local_slow)[:setting('PROFILER_SLOW_SAMPLES', 50)]
+            return
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            for view_name, stats in pending.items():
+                key = f'{KEY_PREFIX}:view:{view_name}'
+                pipe.sadd(VIEWS_KEY, view_name)
+                for field, value in stats.items():
+                    if field.endswith('_max'):
+                        continue
+                    if isinstance(value, float):
+                        pipe.hincrbyfloat(key, field, value)
+                    elif value:
+                        pipe.hincrby(key, field, value)
+            for sample in slow:
+                pipe.lpush(SLOW_KEY, json.dumps(sample))
+            if slow:
+                pipe.ltrim(SLOW_KEY, 0, setting('PROFILER_SLOW_SAMPLES', 50) - 1)
+            pipe.execute()
+            for view_name, stats in pending.items():
+                key = f'{KEY_PREFIX}:view:{view_name}'
+                for field, value in stats.items():
+                    if field.endswith('_max'):
+                        _redis_max(client, key, field, value)
+        except Exception as e:
+            logger.warning(f"Could not flush request profiles: {str(e)}")
+
+    def snapshot(self):
+        """{view_name: stats} and slow samples across all processes"""
+        self.flush()
+        client = _redis_client()
+        if client is None:
+            with self.lock:
+                return {name: dict(stats) for name, stats in self.local.items()}, list(self.local_slow)
+
+        views = {}
+        for raw_name in client.smembers(VIEWS_KEY):
+            name = raw_name.decode() if isinstance(raw_name, bytes) else raw_name
+            stats = _empty_stats()
+            for field, value in client.hgetall(f'{KEY_PREFIX}:view:{name}').items():
+                field = field.decode() if isinstance(field, bytes) else field
+                stats[field] = float(value) if field.endswith(('_sum', '_max')) else int(value)
+            views[name] = stats
+        slow = [json.loads(item) for item in client.lrange(SLOW_KEY, 0, -1)]
+        return views, slow
+
+    def reset(self):
+        with self.lock:
+            self.pending, self.pending_slow = {}, []
+            self.local, self.local_slow = {}, []
+        client = _redis_client()
+        if client is not None:
+            names = client.smembers(VIEWS_KEY)
+            keys = [f'{KEY_PREFIX}:view:{name.decode() if isinstance(name, bytes) else name}' for name in names]
+            client.delete(VIEWS_KEY, SLOW_KEY, *keys)
+
+
+def _merge(target, stats):
+    for field, value in stats.items():
+        if field.endswith('_max'):
+            target[field] = max(target[field], value)
+        else:
+            target[field] += value
+
+
+def _redis_max(client, key, field, value):
+    current = client.hget(key, field)
+    if current is None or float(current) < value:
+        client.hset(key, field, value)
+
+
+def _redis_client():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+store = ProfileStore()
+
+
+# ----- reporting -----
+
+def _percentile(stats, name, fraction):
+    """Upper bound of the bucket holding the given fraction of requests"""
+    bounds = HISTOGRAMS[name]
+    total = stats['requests']
+    if not total:
+        return 0
+    target = total * fraction
+    seen = 0
+    for index in range(len(bounds) + 1):
+        seen += stats.get(f'{name}_b{index}', 0)
+        if seen >= target:
+            return bounds[index] if index < len(bounds) else stats[f'{name}_max']
+    return stats[f'{name}_max']
+
+
+def summarize(views, sort='wall_ms_sum', limit=None):
+    """One row per view with averages and approximate percentiles"""
+    rows = []
+    for name, stats in views.items():
+        count = stats['requests'] or 1
+        cache_lookups = stats['cache_hits'] + stats['cache_misses']
+        rows.append({
+            'view': name,
+            'requests': stats['requests'],
+            'errors': stats['errors'],
+            'wall_ms_avg': round(stats['wall_ms_sum'] / count, 1),
+            'wall_ms_p50': _percentile(stats, 'wall_ms', 0.5),
+            'wall_ms_p95': _percentile(stats, 'wall_ms', 0.95),
+            'wall_ms_max': round(stats['wall_ms_max'], 1),
+            'wall_ms_sum': round(stats['wall_ms_sum'], 1),
+            'queries_avg': round(stats['queries_sum'] / count, 1),
+            'queries_p95': _percentile(stats, 'queries', 0.95),
+            'queries_max': int(stats['queries_max']),
+            'sql_ms_avg': round(stats['sql_ms_sum'] / count, 1),
+            'template_ms_avg': round(stats['template_ms_sum'] / count, 1),
+            'cache_hits': stats['cache_hits'],
+            'cache_misses': stats['cache_misses'],
+            'cache_hit_rate': round(stats['cache_hits'] * 100 / cache_lookups, 1) if cache_lookups else None,
+            'histograms': {
+                name_: [stats.get(f'{name_}_b{index}', 0) for index in range(len(bounds) + 1)]
+                for name_, bounds in HISTOGRAMS.items()
+            },
+        })
+    rows.sort(key=lambda row: row.get(sort) or 0, reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def report(sort='wall_ms_sum', limit=None, include_slow=True):
+    views, slow = store.snapshot()
+    return {
+        'buckets': {'time_ms': TIME_BUCKETS_MS, 'queries': QUERY_BUCKETS},
+        'views': summarize(views, sort=sort, limit=limit),
+        'slow_requests': slow if include_slow else [],
+    }
@@ -0,0 +1,189 @@
+# core/services/security_state.py
+"""
+Process-wide snapshot of maintenance windows and blocked users.
+
+Middleware and template tags asked the database on every request (and
+sometimes twice per render) whether maintenance was on and whether the user
+was blocked. ``get_security_state`` loads the active MaintenanceMode row,
+the pending ScheduledMaintenance windows and the blocked user IDs once per
+process; afterwards every question is a set lookup or a comparison against
+the snapshot's window times, so scheduled windows open and close on time
+without a reload. Saves of the underlying models bump a shared version and
+each process reloads on its next check, following the period clock.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.services.version_counter import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+SECURITY_STATE_VERSION = VersionCounter('security_state:version')
+SECURITY_STATE_CHECK_INTERVAL = 5.0  # seconds between shared-cache checks
+
+_state = {
+    'snapshot': None,
+    'version': None,
+    'checked_at': 0.0,
+}
+_state_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MaintenanceWindow:
+    """A maintenance period, manual (MaintenanceMode) or scheduled"""
+    id: int
+    message: str
+    start_time: Optional[object] = None
+    end_time: Optional[object] = None
+    title: str = ''
+    scheduled: bool = False
+    allowed_ips: frozenset = frozenset()
+    allowed_user_ids: frozenset = frozenset()
+    allow_staff: bool = True
+    allow_superuser: bool = True
+
+    def is_open(self, now):
+        if self.start_time and now < self.start_time:
+            return False
+        if self.end_time and now > self.end_time:
+            return False
+        return True
+
+    def can_bypass(self, user, ip=None):
+        if ip and ip in self.allowed_ips:
+            return True
+        if not user or not user.is_authenticated:
+            return False
+        if self.allow_superuser and user.is_superuser:
+            return True
+        if self.allow_staff and user.is_staff:
+            return True
+        return user.pk in self.allowed_user_ids
+
+
+@dataclass(frozen=True)
+class SecurityState:
+    maintenance: Optional[MaintenanceWindow] = None
+    scheduled: tuple = ()
+    blocked_user_ids: frozenset = field(default_factory=frozenset)
+
+    @classmethod
+    def load(cls):
+        from core.models import MaintenanceMode, ScheduledMaintenance, UserProfile
+
+        maintenance = None
+        record = (
+            MaintenanceMode.objects.filter(is_active=True)
+            .prefetch_related('allowed_users').first()
+        )
+        if record is not None:
+            maintenance = MaintenanceWindow(
+                id=record.id,
+                message=record.message,
+                start_time=record.start_time,
+                end_time=record.end_time,
+                allowed_ips=frozenset(ip.strip() for ip in record.allowed_ips.split(',') if ip.strip()),
+                allowed_user_ids=frozenset(user.id for user in record.allowed_users.all()),
+                allow_staff=record.allow_staff_access,
+                allow_superuser=record.allow_superuser_access,
+            )
+
+        scheduled = tuple(
+            MaintenanceWindow(
+                id=window.id,
+                message=window.message,
+                start_time=window.start_time,
+                end_time=window.end_time,
+                title=window.title,
+                scheduled=True,
+            )
+            for window in ScheduledMaintenance.objects.filter(
+                is_active=True, end_time__gte=timezone.now()
+            ).order_by('start_time')
+        )
+
+        blocked = frozenset(
+            UserProfile.objects.filter(is_blocked=True).values_list('user_id', flat=True)
+        )
+        return cls(maintenance=maintenance, scheduled=scheduled, blocked_user_ids=blocked)
+
+    def is_blocked(self, user_id):
+        return user_id in self.blocked_user_ids
+
+    def active_maintenance(self, now=None):
+        """The window in force right now (manual first, then scheduled), or None"""
+        now = now or timezone.now()
+        if self.maintenance is not None and self.maintenance.is_open(now):
+            return self.maintenance
+        for window in self.scheduled:
+            if window.start_time > now:
+                break
+            if window.is_open(now):
+                return window
+        return None
+
+    def upcoming_maintenance(self, now=None):
+        now = now or timezone.now()
+        return [window for window in self.scheduled if window.start_time > now]
+
+    def is_maintenance_active(self, now=None):
+        return getattr(settings, 'MAINTENANCE_MODE', False) or self.active_maintenance(now) is not None
+
+    def maintenance_message(self, now=None):
+        window = self.active_maintenance(now)
+        if window is not None and window.message:
+            return window.message
+        return getattr(settings, 'MAINTENANCE_MESSAGE', '')
+
+    def can_bypass(self, user, ip=None, now=None):
+        """Whether ``user`` may use the site during the current maintenance"""
+        window = self.active_maintenance(now)
+        if window is not None:
+            return window.can_bypass(user, ip)
+        # MAINTENANCE_MODE from settings: staff and superusers only
+        return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
+
+    def can_access(self, user, ip=None, now=None):
+        return not self.is_maintenance_active(now) or self.can_bypass(user, ip, now)
+
+
+def get_security_state():
+    """
+    The process's SecurityState, reloaded when another process has changed
+    maintenance or block state (checked at most every
+    SECURITY_STATE_CHECK_INTERVAL seconds).
+    """
+    state = _state
+    now = time.monotonic()
+    if state['snapshot'] is not None and now - state['checked_at'] < SECURITY_STATE_CHECK_INTERVAL:
+        return state['snapshot']
+
+    with _state_lock:
+        version = SECURITY_STATE_VERSION.get()
+        if state['snapshot'] is not None and version is not None and version == state['version']:
+            state['checked_at'] = now
+            return state['snapshot']
+
+        try:
+            snapshot = SecurityState.load()
+        except Exception as e:
+            logger.error(f"Error loading security state: {str(e)}")
+            # Keep serving the last snapshot rather than failing every request
+            snapshot = state['snapshot'] or SecurityState()
+            version = None
+        state.update(snapshot=snapshot, version=version, checked_at=now)
+        return snapshot
+
+
+def reset_security_state():
+    """Reload this process's snapshot and tell the others to reload theirs"""
+    _state.update(snapshot=None, version=None, checked_at=0.0)
+    # After commit, so no process reloads uncommitted rows under the new version
+    SECURITY_STATE_VERSION.bump()
@@ -0,0 +1,322 @@
+# core/services/student_arrears.py
+"""
+Per-student arrears built from one independent subquery per source.
+
+The arrears report used to annotate ``Sum('fees__balance')`` and
+``Sum('bills__balance')`` on the same Student queryset. Both joins landed in
+one SELECT, so each fee row repeated once per bill row (and the reverse),
+which inflated both totals. Every student then cost four more queries for
+overdue counts, the oldest due date and the last payment. Here each figure
+is a correlated subquery grouped on the student, so no join can multiply
+another, and the whole list comes back in one query ordered by balance. Rows
+are yielded lazily, so the full list can be streamed to CSV or XLSX.
+
+``StudentBalance`` stores the same figures. Fee, bill and payment writes
+refresh the row of the student they touch, and the bulk fee writers refresh
+their students in chunks.
+"""
+import csv
+import logging
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import (
+    Count, DateField, DateTimeField, DecimalField, ExpressionWrapper, F, IntegerField,
+    Max, Min, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import (
+    CLASS_LEVEL_CHOICES, Bill, BillPayment, Fee, FeePayment, ParentGuardian, Student, StudentBalance,
+)
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+OUTSTANDING_FEE_STATUSES = ('unpaid', 'partial', 'overdue')
+OUTSTANDING_BILL_STATUSES = ('issued', 'partial', 'overdue')
+# Balances above this can be offered an instalment plan
+PAYMENT_PLAN_THRESHOLD = Decimal('1000.00')
+
+BALANCE_FIELDS = [
+    'fee_balance', 'bill_balance', 'total_balance', 'overdue_fees', 'overdue_bills',
+    'oldest_due_date', 'last_payment_date',
+]
+STUDENT_FIELDS = ['number', 'first_name', 'middle_name', 'last_name', 'class_level', 'phone_number', 'parent_phone']
+
+EXPORT_COLUMNS = [
+    ('student_id', 'Student ID'),
+    ('name', 'Name'),
+    ('class', 'Class'),
+    ('contact_phone', 'Contact Phone'),
+    ('fee_balance', 'Fee Balance'),
+    ('bill_balance', 'Bill Balance'),
+    ('total_balance', 'Total Balance'),
+    ('overdue_fees', 'Overdue Fees'),
+    ('overdue_bills', 'Overdue Bills'),
+    ('oldest_due_date', 'Oldest Due Date'),
+    ('days_overdue', 'Days Overdue'),
+    ('risk_level', 'Risk Level'),
+    ('last_payment_date', 'Last Payment'),
+]
+
+CLASS_LEVEL_NAMES = dict(CLASS_LEVEL_CHOICES)
+
+
+def _per_student(queryset, student_lookup, aggregate, output_field):
+    """``aggregate`` over the outer student's rows of ``queryset``"""
+    rows = (
+        queryset.filter(**{student_lookup: OuterRef('pk')})
+        .order_by().values(student_lookup).annotate(value=aggregate).values('value')
+    )
+    return Subquery(rows, output_field=output_field)
+
+
+def _balance(queryset):
+    return Coalesce(_per_student(queryset, 'student', Sum('balance'), MONEY), Value(ZERO), output_field=MONEY)
+
+
+def _count(queryset):
+    return Coalesce(_per_student(queryset, 'student', Count('pk'), IntegerField()), Value(0))
+
+
+def arrears_annotations():
+    """Student annotations for every arrears figure, one subquery each"""
+    fees = Fee.objects.filter(payment_status__in=OUTSTANDING_FEE_STATUSES)
+    bills = Bill.objects.filter(status__in=OUTSTANDING_BILL_STATUSES)
+    return {
+        'fee_balance': _balance(fees),
+        'bill_balance': _balance(bills),
+        'overdue_fees': _count(Fee.objects.filter(payment_status='overdue')),
+        'overdue_bills': _count(Bill.objects.filter(status='overdue')),
+        'oldest_fee_due': _per_student(fees, 'student', Min('due_date'), DateField()),
+        'oldest_bill_due': _per_student(bills, 'student', Min('due_date'), DateField()),
+        'last_fee_payment': _per_student(FeePayment.objects.all(), 'fee__student', Max('payment_date'), DateTimeField()),
+        'last_bill_payment': _per_student(BillPayment.objects.all(), 'bill__student', Max('payment_date'), DateField()),
+    }
+
+
+def _as_date(value):
+    if value is None or not hasattr(value, 'date'):
+        return value
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _combine(values, pick):
+    values = [value for value in values if value is not None]
+    return pick(values) if values else None
+
+
+def _merge_sources(row):
+    """Fold the per-source dates of a live row into the stored column names"""
+    row['oldest_due_date'] = _combine([row.pop('oldest_fee_due'), row.pop('oldest_bill_due')], min)
+    row['last_payment_date'] = _combine(
+        [_as_date(row.pop('last_fee_payment')), row.pop('last_bill_payment')], max
+    )
+    return row
+
+
+def live_arrears_queryset(class_level=None):
+    """Students owing anything, largest balance first, computed from fees and bills"""
+    first_parent_phone = (
+        ParentGuardian.objects.filter(students=OuterRef('pk'))
+        .exclude(phone_number='').order_by('pk').values('phone_number')[:1]
+    )
+    students = Student.objects.all()
+    if class_level:
+        students = students.filter(class_level=class_level)
+    return (
+        students.annotate(**arrears_annotations())
+        .annotate(
+            total_balance=ExpressionWrapper(F('fee_balance') + F('bill_balance'), output_field=MONEY),
+            number=F('student_id'),
+            parent_phone=Subquery(first_parent_phone),
+        )
+        .filter(total_balance__gt=0)
+        .order_by('-total_balance', 'pk')
+        .values(*STUDENT_FIELDS, 'fee_balance', 'bill_balance', 'total_balance', 'overdue_fees',
+                'overdue_bills', 'oldest_fee_due', 'oldest_bill_due', 'last_fee_payment', 'last_bill_payment')
+    )
+
+
+def stored_arrears_queryset(class_level=None):
+    """The same rows read from StudentBalance"""
+    first_parent_phone = (
+        ParentGuardian.objects.filter(students=OuterRef('student_id'))
+        .exclude(phone_number='').order_by('pk').values('phone_number')[:1]
+    )
+    balances = StudentBalance.objects.filter(total_balance__gt=0)
+    if class_level:
+        balances = balances.filter(student__class_level=class_level)
+    return (
+        balances.annotate(
+            number=F('student__student_id'),
+            first_name=F('student__first_name'),
+            middle_name=F('student__middle_name'),
+            last_name=F('student__last_name'),
+            class_level=F('student__class_level'),
+            phone_number=F('student__phone_number'),
+            parent_phone=Subquery(first_parent_phone),
+        )
+        .order_by('-total_balance', 'student_id')
+        .values(*STUDENT_FIELDS, *BALANCE_FIELDS)
+    )
+
+
+def risk_level(total_balance, days_overdue):
+    if days_overdue > 90 or total_balance > Decimal('5000.00'):
+        return 'high'
+    if days_overdue > 30 or total_balance > PAYMENT_PLAN_THRESHOLD:
+        return 'medium'
+    return 'low'
+
+
+def arrears_row(values, today):
+    """Report row for one student from a live or stored queryset row"""
+    oldest = values['oldest_due_date']
+    days_overdue = max((today - oldest).days, 0) if oldest else 0
+    total_balance = values['total_balance']
+    return {
+        'student_id': values['number'],
+        'name': f"{values['first_name']} {values['middle_name']} {values['last_name']}".strip(),
+        'class': CLASS_LEVEL_NAMES.get(values['class_level'], values['class_level']),
+        'class_level': values['class_level'],
+        'contact_phone': values['parent_phone'] or values['phone_number'] or '',
+        'fee_balance': values['fee_balance'],
+        'bill_balance': values['bill_balance'],
+        'total_balance': total_balance,
+        'overdue_fees': values['overdue_fees'],
+        'overdue_bills': values['overdue_bills'],
+        'oldest_due_date': oldest,
+        'days_overdue': days_overdue,
+        'risk_level': risk_level(total_balance, days_overdue),
+        'last_payment_date': values['last_payment_date'],
+        'payment_plan_eligible': total_balance > PAYMENT_PLAN_THRESHOLD,
+    }
+
+
+def iter_student_arrears(class_level=None, use_balance_table=False, chunk_size=2000):
+    """Yield report rows for every student in arrears without loading them all"""
+    today = timezone.now().date()
+    if use_balance_table:
+        for values in stored_arrears_queryset(class_level).iterator(chunk_size=chunk_size):
+            yield arrears_row(values, today)
+    else:
+        for values in live_arrears_queryset(class_level).iterator(chunk_size=chunk_size):
+            yield arrears_row(_merge_sources(values), today)
+
+
+def export_values(row):
+    return [row[key] if row[key] is not None else '' for key, _ in EXPORT_COLUMNS]
+
+
+class _Echo:
+    """File-like object whose write hands the line straight back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_arrears_csv(rows):
+    """CSV lines for ``rows``, suitable for a StreamingHttpResponse"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for _, header in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(export_values(row))
+
+
+def write_arrears_xlsx(rows, output):
+    """Write ``rows`` to ``output`` with a write-only workbook, one row in memory at a time"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Student Arrears')
+    sheet.append([header for _, header in EXPORT_COLUMNS])
+    count = 0
+    for row in rows:
+        sheet.append(export_values(row))
+        count += 1
+    workbook.save(output)
+    return count
+
+
+def refresh_student_balances(student_ids=None, chunk_size=2000):
+    """
+    Recompute StudentBalance rows. ``student_ids`` limits the work to the
+    students a write touched; without it every student is rebuilt in
+    primary-key chunks.
+    """
+    students = Student.objects.annotate(**arrears_annotations()).order_by('pk')
+    columns = ['pk', 'fee_balance', 'bill_balance', 'overdue_fees', 'overdue_bills',
+               'oldest_fee_due', 'oldest_bill_due', 'last_fee_payment', 'last_bill_payment']
+
+    if student_ids is not None:
+        student_ids = sorted({pk for pk in student_ids if pk})
+        chunks = (
+            students.filter(pk__in=student_ids[start:start + chunk_size]).values(*columns)
+            for start in range(0, len(student_ids), chunk_size)
+        )
+    else:
+        chunks = _keyset_chunks(students.values(*columns), chunk_size)
+
+    refreshed = 0
+    for rows in chunks:
+        rows = [_merge_sources(row) for row in rows]
+        if not rows:
+            continue
+        now = timezone.now()
+        balances = [
+            StudentBalance(
+                student_id=row['pk'],
+                fee_balance=row['fee_balance'],
+                bill_balance=row['bill_balance'],
+                total_balance=row['fee_balance'] + row['bill_balance'],
+                overdue_fees=row['overdue_fees'],
+                overdue_bills=row['overdue_bills'],
+                oldest_due_date=row['oldest_due_date'],
+                last_payment_date=row['last_payment_date'],
+                updated_at=now,
+            )
+            for row in rows
+        ]
+        _upsert_balances(balances)
+        refreshed += len(rows)
+    return refreshed
+
+
+def _upsert_balances(balances):
+    """
+    Insert or overwrite StudentBalance rows in one statement, so concurrent
+    refreshes of a student without a row cannot both try to insert it
+    """
+    options = {'update_conflicts': True, 'update_fields': BALANCE_FIELDS + ['updated_at']}
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+    if connections[StudentBalance.objects.db].features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['student']
+    StudentBalance.objects.bulk_create(balances, **options)
+
+
+def _keyset_chunks(rows, chunk_size):
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1]['pk']
+        yield chunk
+
+
+def schedule_balance_refresh(student_id):
+    """Refresh one student's StudentBalance once the current transaction commits"""
+    if not student_id:
+        return
+
+    def refresh():
+        try:
+            refresh_student_balances([student_id])
+        except Exception as e:
+            logger.error(f"Error refreshing balance for student {student_id}: {str(e)}")
+
+    transaction.on_commit(refresh)
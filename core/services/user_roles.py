@@ -0,0 +1,113 @@
+# core/services/user_roles.py
+"""
+Role resolution for the current user.
+
+``hasattr(user, 'teacher')`` and friends each cost a query on first access,
+and a typical page asks the same questions from the context processors,
+permission mixins and helpers several times over. ``get_user_roles`` loads
+the teacher, student and parent profile links in one query, keeps the answer
+in the cache for later requests and memoizes it on the user object for the
+rest of this one. Profile saves and deletes drop the cached entry.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.cache import cache
+
+ROLES_CACHE_TIMEOUT = 60 * 60 * 12
+
+
+def roles_cache_key(user_id):
+    return f"user_roles:{user_id}"
+
+
+@dataclass(frozen=True)
+class UserRoles:
+    """Immutable snapshot of what a user is"""
+    user_id: Optional[int] = None
+    is_admin: bool = False
+    teacher_id: Optional[int] = None
+    student_id: Optional[int] = None
+    parent_id: Optional[int] = None
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_teacher(self):
+        return self.teacher_id is not None
+
+    @property
+    def is_student(self):
+        return self.student_id is not None
+
+    @property
+    def is_parent(self):
+        return self.parent_id is not None
+
+    @property
+    def primary_role(self):
+        if self.is_admin:
+            return 'admin'
+        if self.is_teacher:
+            return 'teacher'
+        if self.is_student:
+            return 'student'
+        if self.is_parent:
+            return 'parent'
+        return 'unknown' if self.is_authenticated else 'anonymous'
+
+    @property
+    def dashboard_url(self):
+        return {
+            'admin': 'admin_dashboard',
+            'teacher': 'teacher_dashboard',
+            'student': 'student_dashboard',
+            'parent': 'parent_dashboard',
+        }.get(self.primary_role, 'home')
+
+
+ANONYMOUS_ROLES = UserRoles()
+
+
+def _load_profile_links(user_id):
+    from django.contrib.auth import get_user_model
+
+    links = cache.get(roles_cache_key(user_id))
+    if links is None:
+        row = (
+            get_user_model().objects.filter(pk=user_id)
+            .values_list('teacher__id', 'student__id', 'parentguardian__id')
+            .first()
+        ) or (None, None, None)
+        links = {'teacher_id': row[0], 'student_id': row[1], 'parent_id': row[2]}
+        cache.set(roles_cache_key(user_id), links, ROLES_CACHE_TIMEOUT)
+    return links
+
+
+def get_user_roles(user):
+    """Roles for ``user``, resolved at most once per request"""
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return ANONYMOUS_ROLES
+
+    roles = getattr(user, '_user_roles', None)
+    if roles is not None:
+        return roles
+
+    roles = UserRoles(
+        user_id=user.pk,
+        # Staff flags live on the user row itself, so they are never stale
+        is_admin=bool(user.is_staff or user.is_superuser),
+        **_load_profile_links(user.pk),
+    )
+    try:
+        user._user_roles = roles
+    except AttributeError:
+        pass
+    return roles
+
+
+def invalidate_user_roles(user_id):
+    if user_id:
+        cache.delete(roles_cache_key(user_id))
@@ -0,0 +1,51 @@
+# core/services/version_counter.py
+"""
+Shared version counters for process-local copies and versioned cache keys.
+
+The school configuration, period clock and security state are held in each
+process and stamped with a version from the shared cache; timetable
+fragments and fee list figures fold a version into their cache keys. Moving
+the version on makes every process reload or miss. ``bump`` waits for the
+surrounding transaction to commit, so another process cannot reload rows that
+are not committed yet and keep them under the new version.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCounter:
+    """An integer in the shared cache that moves on when the data it guards changes"""
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        """The current version, or None when the cache cannot be reached"""
+        try:
+            version = cache.get(self.key)
+            if version is None:
+                cache.add(self.key, 1, None)
+                version = cache.get(self.key, 1)
+            return version
+        except Exception as e:
+            logger.warning(f"Version check for {self.key} failed: {str(e)}")
+            return None
+
+    def bump(self):
+        """Move the version on once the current transaction, if any, commits"""
+        transaction.on_commit(self.bump_now)
+
+    def bump_now(self):
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            # Key evicted or never set
+            cache.add(self.key, 1, None)
+            return cache.incr(self.key)
+        except Exception as e:
+            logger.warning(f"Version bump for {self.key} failed: {str(e)}")
+            return None
@@ -0,0 +1,43 @@
+# core/session_backend.py
+"""
+Cache-first session store with write-through to the database.
+
+Reads come from the cache (Redis in production) and only fall back to the
+``django_session`` table on a miss; writes go to both, so the database stays
+the source of truth across restarts. Corrupted session data is detected
+while decoding: the row is removed and the request continues with a fresh
+session, so no separate per-request lookup is needed to find it.
+
+Enable with ``SESSION_ENGINE = 'core.session_backend'``.
+"""
+import logging
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(CachedDBStore):
+    _corrupted = False
+
+    def decode(self, session_data):
+        try:
+            return signing.loads(session_data, salt=self.key_salt, serializer=self.serializer)
+        except Exception as e:
+            logger.error(f"Session data corrupted for {self.session_key}: {str(e)}")
+            self._corrupted = True
+            return {}
+
+    def load(self):
+        data = super().load()
+        if self._corrupted:
+            self._corrupted = False
+            # Drop the bad row and continue with a new, empty session
+            try:
+                self.delete(self.session_key)
+            except Exception as e:
+                logger.error(f"Could not delete corrupted session: {str(e)}")
+            self._session_key = None
+            return {}
+        return data
@@ -1,9 +1,7 @@
 # core/signals.py
-from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.db.models import Sum
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import logging
 from django.utils import timezone
 from django.conf import settings
@@ -54,20 +52,15 @@ def log_audit(action, instance, user, request=None):
 
 def send_websocket_notification(recipient_id, notification_type, title, message, related_object_id=None):
     try:
-        channel_layer = get_channel_layer()
-        notification_data = {
-            'type': 'send_notification',
+        from core.services.notification_push import push
+        
+        push(recipient_id, 'new_notification', {
             'notification_type': notification_type,
             'title': title,
             'message': message,
             'related_object_id': related_object_id,
             'timestamp': str(timezone.now()),
-        }
-        
-        async_to_sync(channel_layer.group_send)(
-            f'notifications_{recipient_id}',
-            notification_data
-        )
+        })
         logger.debug(f"WebSocket notification sent to user {recipient_id}")
     except Exception as e:
         logger.error(f"WebSocket notification failed: {str(e)}")
@@ -276,6 +269,9 @@ def handle_assignment_creation(sender, instance, created, **kwargs):
                     if assignments_to_create:
                         StudentAssignment.objects.bulk_create(assignments_to_create)
                         logger.info(f"Created {len(assignments_to_create)} student assignments for {instance.title}")
+                        
+                        from core.services.assignment_analytics import AssignmentAnalyticsEngine
+                        AssignmentAnalyticsEngine.recompute([instance.id])
                     
                     for student in students:
                         send_websocket_notification(
@@ -294,11 +290,49 @@ def handle_assignment_creation(sender, instance, created, **kwargs):
         except Exception as e:
             logger.error(f"Error in assignment creation signal: {str(e)}")
 
+@receiver(post_save, sender='core.Assignment')
+def refresh_assignment_analytics(sender, instance, created, **kwargs):
+    """A new due date changes which submissions count as on time"""
+    if created:
+        return
+    try:
+        from core.services.assignment_analytics import AssignmentAnalyticsEngine
+        AssignmentAnalyticsEngine.recompute([instance.id])
+    except Exception as e:
+        logger.error(f"Error refreshing assignment analytics: {str(e)}")
+
+def _previous_analytics_state(instance):
+    loaded = getattr(instance, '_loaded_analytics_state', None)
+    if loaded is not None:
+        return loaded
+    fields = getattr(instance, '_loaded_analytics_fields', None)
+    if fields is None:
+        return None
+    from types import SimpleNamespace
+    from core.models import Assignment
+    from core.services.assignment_analytics import analytics_state
+    assignment_id, status, score, submitted_date = fields
+    previous = SimpleNamespace(assignment_id=assignment_id, status=status, score=score, submitted_date=submitted_date)
+    if assignment_id == instance.assignment_id:
+        due_date = instance.assignment.due_date
+    else:
+        due_date = Assignment.objects.filter(pk=assignment_id).values_list('due_date', flat=True).first()
+    return analytics_state(previous, due_date)
+
 @receiver(post_save, sender='core.StudentAssignment')
 def handle_student_assignment_update(sender, instance, created, **kwargs):
     try:
-        if hasattr(instance.assignment, 'analytics'):
-            instance.assignment.analytics.calculate_analytics()
+        from core.services.assignment_analytics import AssignmentAnalyticsEngine, analytics_state
+        
+        previous = None if created else _previous_analytics_state(instance)
+        if created or previous is not None:
+            AssignmentAnalyticsEngine.record_change(instance, previous)
+        elif AssignmentAnalyticsEngine.is_deferred():
+            AssignmentAnalyticsEngine.record_change(instance, None)
+        else:
+            # Loaded without the fields we track; fall back to a recount
+            AssignmentAnalyticsEngine.recompute([instance.assignment_id])
+            instance._loaded_analytics_state = analytics_state(instance, instance.assignment.due_date)
         
         if instance.status in ['SUBMITTED', 'LATE'] and instance.submitted_date:
             send_websocket_notification(
@@ -312,6 +346,14 @@ def handle_student_assignment_update(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error in student assignment update signal: {str(e)}")
 
+@receiver(post_delete, sender='core.StudentAssignment')
+def handle_student_assignment_delete(sender, instance, **kwargs):
+    try:
+        from core.services.assignment_analytics import AssignmentAnalyticsEngine
+        AssignmentAnalyticsEngine.record_delete(instance, _previous_analytics_state(instance))
+    except Exception as e:
+        logger.error(f"Error updating analytics after student assignment delete: {str(e)}")
+
 @receiver(post_save, sender='core.StudentAssignment')
 def handle_student_assignment_graded(sender, instance, **kwargs):
     try:
@@ -328,6 +370,9 @@ def handle_student_assignment_graded(sender, instance, **kwargs):
 
 @receiver(post_save, sender='core.Grade')
 def handle_grade_update(sender, instance, created, **kwargs):
+    if getattr(instance, '_skip_notification', False):
+        return
+    
     try:
         from core.models import Notification
         
@@ -355,6 +400,263 @@ def handle_grade_update(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error in grade update signal: {str(e)}")
 
+@receiver(post_save, sender='core.Grade')
+@receiver(post_delete, sender='core.Grade')
+def invalidate_class_ranking(sender, instance, **kwargs):
+    """Drop the cached class ranking for the grade's class and term"""
+    try:
+        from core.services.class_ranking import ClassRanking
+        
+        class_level = instance.class_level or instance.student.class_level
+        ClassRanking.invalidate(class_level, instance.academic_year, instance.term)
+        if instance.class_level and instance.class_level != instance.student.class_level:
+            ClassRanking.invalidate(instance.student.class_level, instance.academic_year, instance.term)
+    except Exception as e:
+        logger.error(f"Error invalidating class ranking: {str(e)}")
+
+@receiver(post_save, sender='core.Student')
+def invalidate_student_class_rankings(sender, instance, created, **kwargs):
+    """A student changing class or active state moves every ranking of both classes"""
+    try:
+        from core.services.class_ranking import ClassRanking
+        from core.services.fee_statistics import bump_fee_stats_version
+        
+        current = (instance.class_level, instance.is_active)
+        loaded = getattr(instance, '_loaded_ranking_fields', None)
+        if created or loaded == current:
+            # A new student has no grades, so no ranking includes them yet
+            instance._loaded_ranking_fields = current
+            return
+        ClassRanking.invalidate_class(instance.class_level)
+        if loaded and loaded[0] != instance.class_level:
+            ClassRanking.invalidate_class(loaded[0])
+        if not loaded or loaded[0] != instance.class_level:
+            # Teachers' fee list figures are scoped by the classes they teach
+            bump_fee_stats_version()
+        instance._loaded_ranking_fields = current
+    except Exception as e:
+        logger.error(f"Error invalidating class rankings: {str(e)}")
+
+@receiver(post_save, sender='core.Teacher')
+@receiver(post_delete, sender='core.Teacher')
+@receiver(post_save, sender='core.Student')
+@receiver(post_delete, sender='core.Student')
+@receiver(post_save, sender='core.ParentGuardian')
+@receiver(post_delete, sender='core.ParentGuardian')
+def invalidate_cached_user_roles(sender, instance, **kwargs):
+    """Drop the cached role lookup when a profile is linked or removed"""
+    try:
+        from core.services.user_roles import invalidate_user_roles
+        
+        invalidate_user_roles(instance.user_id)
+    except Exception as e:
+        logger.error(f"Error invalidating cached user roles: {str(e)}")
+
+# ===== GLOBAL CONTEXT FRAGMENTS =====
+
+@receiver(post_save, sender='core.Notification')
+@receiver(post_delete, sender='core.Notification')
+def invalidate_notification_context(sender, instance, **kwargs):
+    """Drop the recipient's cached notification count and list"""
+    try:
+        from core.services.context_fragments import invalidate_notifications
+        
+        invalidate_notifications(instance.recipient_id)
+    except Exception as e:
+        logger.error(f"Error invalidating notification context: {str(e)}")
+
+@receiver(post_save, sender='core.Notification')
+def count_new_notification(sender, instance, created, **kwargs):
+    """New unread notifications move the recipient's unread counter"""
+    try:
+        if created and not instance.is_read:
+            from core.services.notification_counter import adjust
+            
+            adjust(instance.recipient_id, 1)
+    except Exception as e:
+        logger.error(f"Error updating unread counter: {str(e)}")
+
+@receiver(post_delete, sender='core.Notification')
+def count_deleted_notification(sender, instance, **kwargs):
+    try:
+        if not instance.is_read:
+            from core.services.notification_counter import adjust
+            
+            adjust(instance.recipient_id, -1)
+    except Exception as e:
+        logger.error(f"Error updating unread counter: {str(e)}")
+
+@receiver(post_save, sender='core.ParentMessage')
+@receiver(post_delete, sender='core.ParentMessage')
+def invalidate_parent_message_context(sender, instance, **kwargs):
+    """Unread message counts live in the parent sidebar of both parties"""
+    try:
+        from core.services.context_fragments import invalidate_parent_context
+        
+        invalidate_parent_context(instance.receiver_id, instance.sender_id)
+    except Exception as e:
+        logger.error(f"Error invalidating parent message context: {str(e)}")
+
+@receiver(post_save, sender='core.Fee')
+@receiver(post_delete, sender='core.Fee')
+def invalidate_fee_parent_context(sender, instance, **kwargs):
+    """Pending fee totals are shown to the student's parents"""
+    try:
+        from core.services.context_fragments import invalidate_parent_context_for_students
+        
+        invalidate_parent_context_for_students([instance.student_id])
+    except Exception as e:
+        logger.error(f"Error invalidating fee parent context: {str(e)}")
+
+@receiver(post_save, sender='core.Fee')
+@receiver(post_delete, sender='core.Fee')
+@receiver(post_save, sender='core.FeePayment')
+@receiver(post_delete, sender='core.FeePayment')
+def invalidate_fee_statistics(sender, instance, **kwargs):
+    """Cached fee list figures are keyed by a version that any fee write moves on"""
+    try:
+        from core.services.fee_statistics import bump_fee_stats_version
+        
+        bump_fee_stats_version()
+    except Exception as e:
+        logger.error(f"Error invalidating fee statistics: {str(e)}")
+
+@receiver(post_save, sender='core.Fee')
+@receiver(post_delete, sender='core.Fee')
+@receiver(post_save, sender='core.Bill')
+@receiver(post_delete, sender='core.Bill')
+@receiver(post_save, sender='core.FeePayment')
+@receiver(post_delete, sender='core.FeePayment')
+@receiver(post_save, sender='core.BillPayment')
+@receiver(post_delete, sender='core.BillPayment')
+def refresh_student_balance(sender, instance, **kwargs):
+    """Keep the student's StudentBalance row in step with their fees, bills and payments"""
+    try:
+        from core.services.student_arrears import schedule_balance_refresh
+        
+        if hasattr(instance, 'student_id'):
+            student_id = instance.student_id
+        elif getattr(instance, 'fee_id', None):
+            student_id = instance.fee.student_id
+        else:
+            student_id = instance.bill.student_id
+        schedule_balance_refresh(student_id)
+    except Exception as e:
+        logger.error(f"Error scheduling student balance refresh: {str(e)}")
+
+@receiver(m2m_changed, sender='core.ParentGuardian_students')
+def invalidate_parent_children_context(sender, instance, action, pk_set, **kwargs):
+    """Linking or unlinking children changes the whole parent sidebar"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    try:
+        from core.models import ParentGuardian
+        from core.services.context_fragments import (
+            invalidate_parent_context, invalidate_parent_context_for_students,
+        )
+        
+        if isinstance(instance, ParentGuardian):
+            invalidate_parent_context(instance.user_id)
+        else:
+            invalidate_parent_context_for_students([instance.pk])
+            if pk_set:
+                invalidate_parent_context(*ParentGuardian.objects.filter(
+                    pk__in=pk_set).values_list('user_id', flat=True))
+    except Exception as e:
+        logger.error(f"Error invalidating parent children context: {str(e)}")
+
+def _parent_audience(instance):
+    """Class levels whose parents see a ParentAnnouncement or ParentEvent; None for every parent"""
+    if instance._meta.model_name == 'parentevent':
+        return None if instance.is_whole_school else {instance.class_level}
+    if instance.target_type == 'ALL':
+        return None
+    if instance.target_type == 'CLASS':
+        return {instance.target_class}
+    # INDIVIDUAL announcements reach their target_parents only
+    return set()
+
+def _invalidate_parent_audience(instance, audience):
+    from core.services.context_fragments import (
+        invalidate_parent_context, invalidate_parent_context_for_classes,
+    )
+    
+    if audience is None:
+        invalidate_parent_context_for_classes()
+        return
+    if audience:
+        invalidate_parent_context_for_classes(audience)
+    if instance._meta.model_name == 'parentannouncement' and instance.pk:
+        invalidate_parent_context(*instance.target_parents.values_list('user_id', flat=True))
+
+@receiver(pre_save, sender='core.ParentAnnouncement')
+@receiver(pre_save, sender='core.ParentEvent')
+def remember_parent_audience(sender, instance, **kwargs):
+    """Parents who saw the old version need their sidebar dropped too"""
+    try:
+        previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+        instance._previous_parent_audience = _parent_audience(previous) if previous else set()
+    except Exception as e:
+        logger.error(f"Error reading previous parent audience: {str(e)}")
+
+@receiver(post_save, sender='core.ParentAnnouncement')
+@receiver(post_save, sender='core.ParentEvent')
+def invalidate_parent_audience_context(sender, instance, **kwargs):
+    """Recent announcements and upcoming event counts live in the parent sidebar"""
+    try:
+        audience = _parent_audience(instance)
+        previous = getattr(instance, '_previous_parent_audience', set())
+        if audience is not None and previous is not None:
+            audience = audience | previous
+        else:
+            audience = None
+        _invalidate_parent_audience(instance, audience)
+    except Exception as e:
+        logger.error(f"Error invalidating parent audience context: {str(e)}")
+
+@receiver(pre_delete, sender='core.ParentAnnouncement')
+@receiver(pre_delete, sender='core.ParentEvent')
+def invalidate_deleted_parent_audience_context(sender, instance, **kwargs):
+    # Before the delete, while an announcement's target_parents can still be read
+    try:
+        _invalidate_parent_audience(instance, _parent_audience(instance))
+    except Exception as e:
+        logger.error(f"Error invalidating parent audience context: {str(e)}")
+
+@receiver(m2m_changed, sender='core.ParentAnnouncement_target_parents')
+def invalidate_targeted_parent_context(sender, instance, action, reverse, pk_set, **kwargs):
+    """Adding or removing individual recipients changes their sidebar"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    try:
+        from core.models import ParentGuardian
+        from core.services.context_fragments import invalidate_parent_context
+        
+        if reverse:
+            invalidate_parent_context(instance.user_id)
+        elif action == 'pre_clear':
+            invalidate_parent_context(*instance.target_parents.values_list('user_id', flat=True))
+        elif pk_set:
+            invalidate_parent_context(*ParentGuardian.objects.filter(
+                pk__in=pk_set).values_list('user_id', flat=True))
+    except Exception as e:
+        logger.error(f"Error invalidating targeted parent context: {str(e)}")
+
+@receiver(post_save, sender='core.TimetableEntry')
+@receiver(post_delete, sender='core.TimetableEntry')
+@receiver(post_save, sender='core.Timetable')
+@receiver(post_delete, sender='core.Timetable')
+@receiver(post_save, sender='core.TimeSlot')
+@receiver(post_delete, sender='core.TimeSlot')
+def invalidate_timetable_context(sender, instance, **kwargs):
+    """Move every user's cached timetable summary on to a new version"""
+    try:
+        from core.services.context_fragments import bump_timetable_version
+        
+        bump_timetable_version()
+    except Exception as e:
+        logger.error(f"Error invalidating timetable context: {str(e)}")
+
 @receiver(post_save, sender='core.FeePayment')
 def update_fee_after_payment(sender, instance, created, **kwargs):
     try:
@@ -465,44 +767,16 @@ def notify_new_parent_message(sender, instance, created, **kwargs):
 def notify_new_announcement(sender, instance, created, **kwargs):
     if created:
         try:
-            from core.models import Notification
-            from django.contrib.auth import get_user_model
+            from core.services.announcement_fanout import AnnouncementFanout
+            from core.tasks import fan_out_announcement, run_task
             
-            User = get_user_model()
-            
-            if instance.target_roles == 'ALL':
-                users = User.objects.filter(is_active=True)
-            elif instance.target_roles == 'STUDENTS':
-                users = User.objects.filter(student__isnull=False, is_active=True)
-            elif instance.target_roles == 'TEACHERS':
-                users = User.objects.filter(teacher__isnull=False, is_active=True)
-            elif instance.target_roles == 'ADMINS':
-                users = User.objects.filter(is_staff=True, is_active=True)
-            else:
-                users = User.objects.none()
-            
-            for user in users:
-                Notification.objects.create(
-                    recipient=user,
-                    notification_type='ANNOUNCEMENT',
-                    title='New Announcement',
-                    message=instance.title,
-                    related_object_id=instance.id,
-                    related_content_type='announcement'
-                )
-                
-                send_websocket_notification(
-                    user.id,
-                    'ANNOUNCEMENT',
-                    'New Announcement',
-                    instance.title,
-                    instance.id
-                )
-                
-            logger.info(f"Created notifications for announcement: {instance.title}")
+            AnnouncementFanout(instance.id).queue()
+            # Deliver in the background once the announcement is committed
+            transaction.on_commit(lambda: run_task(fan_out_announcement, instance.id))
+            logger.info(f"Queued notifications for announcement: {instance.title}")
             
         except Exception as e:
-            logger.error(f"Failed to create announcement notifications: {str(e)}")
+            logger.error(f"Failed to queue announcement notifications: {str(e)}")
 
 @receiver(post_save, sender='core.Teacher')
 def handle_teacher_save(sender, instance, created, **kwargs):
@@ -634,6 +908,10 @@ def handle_timeslot_save(sender, instance, created, **kwargs):
     """Handle timeslot changes"""
     try:
         from core.models import AuditLog
+        from core.services.period_clock import reset_period_clock
+        
+        # The period clock holds the slot table in memory
+        reset_period_clock()
         
         request = getattr(instance, '_request', None)
         user = getattr(instance, '_request_user', None) or (request.user if request and hasattr(request, 'user') else None)
@@ -645,6 +923,43 @@ def handle_timeslot_save(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error in timeslot save signal: {str(e)}")
 
+@receiver(post_delete, sender='core.TimeSlot')
+def handle_timeslot_delete(sender, instance, **kwargs):
+    """Drop the deleted slot from the period clock"""
+    try:
+        from core.services.period_clock import reset_period_clock
+        
+        reset_period_clock()
+    except Exception as e:
+        logger.error(f"Error in timeslot delete signal: {str(e)}")
+
+@receiver(post_save, sender='core.MaintenanceMode')
+@receiver(post_delete, sender='core.MaintenanceMode')
+@receiver(post_save, sender='core.ScheduledMaintenance')
+@receiver(post_delete, sender='core.ScheduledMaintenance')
+@receiver(m2m_changed, sender='core.MaintenanceMode_allowed_users')
+def reset_security_state_on_maintenance_change(sender, instance, **kwargs):
+    """Maintenance windows are served from the in-memory security state"""
+    try:
+        from core.services.security_state import reset_security_state
+        
+        reset_security_state()
+    except Exception as e:
+        logger.error(f"Error resetting security state: {str(e)}")
+
+@receiver(post_save, sender='core.UserProfile')
+@receiver(post_delete, sender='core.UserProfile')
+def reset_security_state_on_block_change(sender, instance, **kwargs):
+    """Reload the blocked user set unless an unblocked profile was simply saved"""
+    try:
+        from core.services.security_state import get_security_state, reset_security_state
+        
+        # Profiles are saved on every login attempt; most are not and were not blocked
+        if instance.is_blocked or get_security_state().is_blocked(instance.user_id):
+            reset_security_state()
+    except Exception as e:
+        logger.error(f"Error resetting security state: {str(e)}")
+
 def initialize_signals():
     try:
         # Import models to ensure signals are registered
@@ -76,4 +76,135 @@ def cleanup_old_backups():
         
     except Exception as e:
         logger.error(f"Backup cleanup failed: {str(e)}")
-        return f"Cleanup failed: {str(e)}"
\ No newline at end of file
+        return f"Cleanup failed: {str(e)}"
+
+def run_task(task, *args, **kwargs):
+    """Queue ``task`` on Celery, running it inline when no broker is reachable"""
+    try:
+        return task.delay(*args, **kwargs)
+    except Exception as e:
+        logger.warning(f"Could not queue {task.name}, running synchronously: {str(e)}")
+        return task.apply(args=args, kwargs=kwargs)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_bulk_grade_upload(self, upload_id):
+    """Process a bulk grade upload in committed chunks, resuming on retry"""
+    from core.services.grade_upload import GradeUploadJob
+    
+    job = GradeUploadJob(upload_id)
+    try:
+        state = job.run()
+        logger.info(f"Bulk grade upload {upload_id} completed: {state['success']} grades saved")
+        return {'success': state['success'], 'errors': state['error_count']}
+    except Exception as e:
+        retrying = self.request.retries < self.max_retries
+        job.mark_failed(e, retrying=retrying)
+        logger.error(f"Bulk grade upload {upload_id} failed: {str(e)}", exc_info=True)
+        if retrying:
+            raise self.retry(exc=e)
+        raise
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_bulk_fee_import(self, import_id):
+    """Import a fee spreadsheet in committed chunks, resuming on retry"""
+    from core.services.fee_import import FeeImportJob
+    
+    job = FeeImportJob(import_id)
+    try:
+        state = job.run()
+        logger.info(
+            f"Bulk fee import {import_id} {state['status']}: "
+            f"{state['created']} created, {state['updated']} updated, {state['error_count']} errors"
+        )
+        return {'created': state['created'], 'updated': state['updated'], 'errors': state['error_count']}
+    except Exception as e:
+        retrying = self.request.retries < self.max_retries
+        job.mark_failed(e, retrying=retrying)
+        logger.error(f"Bulk fee import {import_id} failed: {str(e)}", exc_info=True)
+        if retrying:
+            raise self.retry(exc=e)
+        raise
+
+
+@shared_task
+def generate_report_cards_batch(academic_year, term, class_levels=None, output_format='zip', force=False):
+    """Generate report cards and PDFs for one term; returns run statistics"""
+    from core.services.report_card_batch import ReportCardBatch
+    
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'report_cards')
+    stats = ReportCardBatch(
+        academic_year,
+        term,
+        class_levels=class_levels,
+        output_dir=output_dir,
+        output_format=output_format,
+        force=force,
+    ).run()
+    logger.info(f"Report card batch finished: {stats['cards']} cards at {stats['cards_per_second']} cards/sec")
+    return stats
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def fan_out_announcement(self, announcement_id):
+    """Write and broadcast an announcement's notifications, resuming on retry"""
+    from core.services.announcement_fanout import AnnouncementFanout
+    
+    fanout = AnnouncementFanout(announcement_id)
+    try:
+        state = fanout.run()
+        return {'delivered': state.get('delivered', 0), 'total': state.get('total', 0)}
+    except Exception as e:
+        retrying = self.request.retries < self.max_retries
+        fanout.mark_failed(e, retrying=retrying)
+        logger.error(f"Announcement {announcement_id} fan-out failed: {str(e)}", exc_info=True)
+        if retrying:
+            raise self.retry(exc=e)
+        raise
+
+
+@shared_task
+def recompute_grades(academic_year=None, term=None, class_level=None, user_id=None):
+    """Bring stored grade totals in line with the current weights and boundaries"""
+    from django.contrib.auth import get_user_model
+    from core.services.grade_recompute import GradeRecomputeService
+    
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+    return GradeRecomputeService(
+        academic_year=academic_year,
+        term=term,
+        class_level=class_level,
+        user=user,
+    ).run()
+
+
+@shared_task
+def refresh_fee_statuses(academic_year=None, term=None):
+    """Nightly catch-up of fee payment totals and overdue statuses"""
+    from core.services.fee_status_refresh import FeeStatusRefreshService
+    
+    stats = FeeStatusRefreshService(academic_year=academic_year, term=term).run()
+    stats.pop('samples', None)
+    stats['drift_amount'] = str(stats['drift_amount'])
+    return stats
+
+
+@shared_task
+def rebuild_student_balances():
+    """Nightly rebuild of StudentBalance, catching writes made with queryset.update()"""
+    from core.services.student_arrears import refresh_student_balances
+    
+    count = refresh_student_balances()
+    logger.info(f"Rebuilt balances for {count} students")
+    return count
+
+
+@shared_task
+def reconcile_unread_counters(hours=24):
+    """Correct the cached unread notification counters of recently active users"""
+    from core.services.notification_counter import reconcile_active_users
+    
+    count = reconcile_active_users(hours=hours)
+    logger.info(f"Reconciled unread notification counters for {count} users")
+    return count
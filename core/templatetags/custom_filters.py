@@ -2,6 +2,7 @@
 from django import template
 from django.utils import timezone
 from core.models import Subject
+from core.services.user_roles import get_user_roles
 from datetime import datetime, date
 
 register = template.Library()
@@ -23,24 +24,18 @@ def get_item(dictionary, key):
 
 @register.filter
 def is_admin(user):
-    """Check if user is in Admin group or is superuser"""
-    if not user or not user.is_authenticated:
-        return False
-    return user.groups.filter(name='Admin').exists() or user.is_superuser
+    """Check if user is staff or superuser, from the per-request role lookup"""
+    return get_user_roles(user).is_admin
 
 @register.filter
 def is_teacher(user):
-    """Check if user is in Teacher group"""
-    if not user or not user.is_authenticated:
-        return False
-    return user.groups.filter(name='Teacher').exists()
+    """Check if user has a teacher profile, from the per-request role lookup"""
+    return get_user_roles(user).is_teacher
 
 @register.filter
 def is_student(user):
-    """Check if user is in Student group"""
-    if not user or not user.is_authenticated:
-        return False
-    return user.groups.filter(name='Student').exists()
+    """Check if user has a student profile, from the per-request role lookup"""
+    return get_user_roles(user).is_student
 
 @register.filter
 def multiply(value, arg):
@@ -1,7 +1,9 @@
 from django import template
 
+from core.services.notification_counter import get_unread_count
+
 register = template.Library()
 
 @register.filter
 def unread_notifications_count(user):
-    return user.notifications.filter(is_read=False).count()
+    return get_unread_count(user.id)
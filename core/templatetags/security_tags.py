@@ -22,9 +22,8 @@ def can_view_sensitive(user):
 def is_maintenance_mode():
     """Check if maintenance mode is active"""
     try:
-        from core.models import MaintenanceMode
-        maintenance = MaintenanceMode.objects.filter(is_active=True).first()
-        return maintenance and maintenance.is_currently_active()
+        from core.services.security_state import get_security_state
+        return get_security_state().is_maintenance_active()
     except:
         return False
 
@@ -32,9 +31,9 @@ def is_maintenance_mode():
 def can_bypass_maintenance(user):
     """Check if user can bypass maintenance mode"""
     try:
-        from core.models import MaintenanceMode
-        maintenance = MaintenanceMode.objects.filter(is_active=True).first()
-        return maintenance and maintenance.can_user_bypass(user)
+        from core.services.security_state import get_security_state
+        state = get_security_state()
+        return state.is_maintenance_active() and state.can_bypass(user)
     except:
         return False
 
@@ -0,0 +1,34 @@
+from django.core.exceptions import ValidationError
+from django.test import TransactionTestCase
+
+from core.models import AssignmentAnalytics
+from core.services.assignment_analytics import AssignmentAnalyticsEngine, deferred_assignment_analytics
+from core.tests.factories import AssignmentFactory, StudentAssignmentFactory
+
+
+class DeferredAssignmentAnalyticsTests(TransactionTestCase):
+    # The failing save must not doom an enclosing atomic block, as it would
+    # inside TestCase; grading views run under autocommit
+    def setUp(self):
+        self.assignment = AssignmentFactory()
+        self.rows = [StudentAssignmentFactory(assignment=self.assignment) for _ in range(3)]
+        AssignmentAnalyticsEngine.recompute([self.assignment.id])
+
+    def _analytics(self):
+        return AssignmentAnalytics.objects.get(assignment=self.assignment)
+
+    def test_block_that_raises_still_recounts_saved_rows(self):
+        # Like BulkGradeAssignmentView: autocommit, and a bad score halfway through
+        scores = ['80', '90', 'not-a-score']
+        with self.assertRaises(ValidationError):
+            with deferred_assignment_analytics():
+                for student_assignment, score in zip(self.rows, scores):
+                    student_assignment.score = score
+                    student_assignment.status = 'GRADED'
+                    student_assignment.save()
+
+        self.assertFalse(AssignmentAnalyticsEngine.is_deferred())
+        analytics = self._analytics()
+        self.assertEqual(analytics.graded_students, 2)
+        self.assertEqual(analytics.pending_students, 1)
+        self.assertEqual(analytics.scored_count, 2)
@@ -0,0 +1,72 @@
+from datetime import date
+
+from django.test import TestCase
+
+from core.models import AcademicTerm, AcademicYear, AttendanceSummary, StudentAttendance
+from core.services.attendance_summary import STATUS_FIELDS, AttendanceSummaryEngine
+from core.tests.factories import StudentFactory
+
+
+class AttendanceSummaryDeltaTests(TestCase):
+    def setUp(self):
+        year = AcademicYear.objects.create(
+            name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31)
+        )
+        self.term = AcademicTerm.objects.create(
+            academic_year=year, period_number=1, name='First Term',
+            start_date=date(2024, 9, 2), end_date=date(2024, 12, 20),
+        )
+        self.student = StudentFactory()
+
+    def _counts(self):
+        summary = AttendanceSummary.objects.get(student=self.student, term=self.term, period=None)
+        return {field: getattr(summary, field) for field in STATUS_FIELDS.values()}
+
+    def test_edit_without_summary_row_matches_rebuild(self):
+        record = StudentAttendance.objects.create(
+            student=self.student, term=self.term, date=date(2024, 9, 10), status='absent'
+        )
+        StudentAttendance.objects.create(
+            student=self.student, term=self.term, date=date(2024, 9, 11), status='present'
+        )
+        # Legacy data: attendance rows with no summary behind them
+        AttendanceSummary.objects.filter(student=self.student).delete()
+
+        record = StudentAttendance.objects.get(pk=record.pk)
+        record.status = 'present'
+        record.save()
+        counts = self._counts()
+
+        AttendanceSummaryEngine.rebuild(self.term.id, student_ids=[self.student.id])
+        self.assertEqual(counts, self._counts())
+        self.assertEqual(counts['days_present'], 2)
+        self.assertEqual(counts['days_absent'], 0)
+
+    def test_edit_of_partially_loaded_row_applies_the_delta(self):
+        record = StudentAttendance.objects.create(
+            student=self.student, term=self.term, date=date(2024, 9, 10), status='absent'
+        )
+
+        record = StudentAttendance.objects.only('id', 'date').get(pk=record.pk)
+        record.status = 'present'
+        record.save()
+
+        counts = self._counts()
+        self.assertEqual(counts['days_present'], 1)
+        self.assertEqual(counts['days_absent'], 0)
+
+    def test_rebuild_skips_records_outside_the_term_dates(self):
+        StudentAttendance.objects.create(
+            student=self.student, term=self.term, date=date(2024, 9, 10), status='absent'
+        )
+        StudentAttendance.objects.create(
+            student=self.student, term=self.term, date=date(2024, 9, 20), status='present'
+        )
+        # The term's start was moved after the first record was taken
+        AcademicTerm.objects.filter(pk=self.term.pk).update(start_date=date(2024, 9, 15))
+
+        AttendanceSummaryEngine.rebuild(self.term.id, student_ids=[self.student.id])
+
+        counts = self._counts()
+        self.assertEqual(counts['days_present'], 1)
+        self.assertEqual(counts['days_absent'], 0)
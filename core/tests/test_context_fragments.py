@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import ParentAnnouncement, ParentEvent, ParentGuardian
+from core.services.context_fragments import PARENT, fragment_key
+from core.tests.factories import StudentFactory, UserFactory
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'context-fragment-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class ParentFragmentInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = UserFactory()
+        self.p5_parent = self._parent(StudentFactory(class_level='P5'))
+        self.p6_parent = self._parent(StudentFactory(class_level='P6'))
+
+    def _parent(self, child):
+        parent = ParentGuardian.objects.create(
+            user=UserFactory(), relationship='M', phone_number=f'024{child.pk:07d}'
+        )
+        parent.students.add(child)
+        return parent
+
+    def _cache_fragments(self):
+        for parent in (self.p5_parent, self.p6_parent):
+            cache.set(fragment_key(parent.user_id, PARENT), {'parent_upcoming_events_count': 0})
+
+    def _cached(self):
+        return {
+            parent.user_id for parent in (self.p5_parent, self.p6_parent)
+            if cache.get(fragment_key(parent.user_id, PARENT)) is not None
+        }
+
+    def _announcement(self, **kwargs):
+        return ParentAnnouncement.objects.create(title='Notice', content='...', created_by=self.staff, **kwargs)
+
+    def test_class_announcement_drops_only_that_class(self):
+        self._cache_fragments()
+        announcement = self._announcement(target_type='CLASS', target_class='P5')
+        self.assertEqual(self._cached(), {self.p6_parent.user_id})
+
+        # Moving it to another class drops the sidebar of both audiences
+        self._cache_fragments()
+        announcement.target_class = 'P6'
+        announcement.save()
+        self.assertEqual(self._cached(), set())
+
+    def test_individual_announcement_drops_its_recipients(self):
+        announcement = self._announcement(target_type='INDIVIDUAL')
+        self._cache_fragments()
+
+        announcement.target_parents.add(self.p6_parent)
+        self.assertEqual(self._cached(), {self.p5_parent.user_id})
+
+        self._cache_fragments()
+        announcement.delete()
+        self.assertEqual(self._cached(), {self.p5_parent.user_id})
+
+    def test_whole_school_event_drops_every_parent(self):
+        self._cache_fragments()
+        start = timezone.now() + timedelta(days=2)
+        ParentEvent.objects.create(
+            title='Open day', start_date=start, end_date=start + timedelta(hours=3),
+            is_whole_school=True, created_by=self.staff,
+        )
+        self.assertEqual(self._cached(), set())
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import AcademicTerm, AcademicYear, Fee, FeeCategory, FeeGenerationBatch
+from core.services.automation import FinancialAutomationService
+from core.services.fee_generation import TermFeeGenerator, active_students, generate_term_batch, system_user
+from core.tests.factories import StudentFactory, UserFactory
+
+
+class TermFeeGeneratorTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        year = AcademicYear.objects.create(
+            name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31)
+        )
+        self.term = AcademicTerm.objects.create(
+            academic_year=year, period_number=1, name='First Term',
+            start_date=date(2024, 9, 2), end_date=date(2024, 12, 20),
+        )
+        self.students = [StudentFactory(class_level='P5') for _ in range(3)]
+        self.tuition = FeeCategory.objects.create(name='TUITION', default_amount=Decimal('500.00'))
+        self.library = FeeCategory.objects.create(name='LIBRARY', default_amount=Decimal('40.00'))
+        # Applies to another class only
+        FeeCategory.objects.create(
+            name='SPORTS', default_amount=Decimal('25.00'), applies_to_all=False, class_levels='P1,P2',
+        )
+
+    def _generator(self, **kwargs):
+        return TermFeeGenerator.for_term(self.term, self.user, **kwargs)
+
+    def _existing_fee(self, student, category, **kwargs):
+        return Fee.objects.create(
+            student=student, category=category, academic_year='2024/2025', term=1,
+            amount_payable=category.default_amount, due_date=date(2024, 10, 1),
+            recorded_by=self.user, **kwargs
+        )
+
+    def test_dry_run_writes_nothing(self):
+        result = generate_term_batch(self.term, self.user, dry_run=True)
+
+        self.assertTrue(result.dry_run)
+        self.assertEqual((result.students, result.students_billed, result.created), (3, 3, 6))
+        self.assertEqual(result.total_amount, Decimal('1620.00'))
+        self.assertFalse(Fee.objects.exists())
+        self.assertFalse(FeeGenerationBatch.objects.exists())
+
+    def test_existing_pairs_are_skipped_but_cancelled_fees_are_not(self):
+        first, second, _ = self.students
+        self._existing_fee(first, self.tuition)
+        self._existing_fee(first, self.library)
+        self._existing_fee(second, self.tuition, generation_status='CANCELLED')
+
+        result = self._generator().generate(active_students(), FeeCategory.objects.all())
+
+        self.assertEqual((result.created, result.skipped, result.students_billed), (4, 2, 2))
+        self.assertEqual(result.by_category, {'Tuition Fees': 2, 'Library Fees': 2})
+        self.assertEqual(
+            Fee.objects.filter(student=second, category=self.tuition).exclude(generation_status='CANCELLED').count(), 1
+        )
+        self.assertEqual(Fee.objects.filter(student=first).count(), 2)
+
+    def test_batch_totals(self):
+        self._existing_fee(self.students[0], self.tuition)
+
+        result = generate_term_batch(self.term, self.user, notes='Term one')
+
+        batch = result.batch
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'GENERATED')
+        self.assertEqual((batch.total_students, batch.total_fees), (3, 5))
+        self.assertEqual(batch.total_amount, Decimal('1120.00'))
+        self.assertEqual(Fee.objects.filter(generation_batch=batch).count(), 5)
+
+    def test_bulk_created_fees_match_fee_save(self):
+        generator = self._generator()
+        generator.generate(active_students(), [self.tuition])
+        fee = Fee.objects.filter(category=self.tuition).first()
+
+        expected = generator.build_fee(self.students[0].pk, self.library, self.tuition.default_amount)
+        expected.save()
+
+        for field in ('amount_payable', 'amount_paid', 'balance', 'payment_status', 'payment_date',
+                      'academic_term_id', 'generation_status', 'due_date'):
+            self.assertEqual(getattr(fee, field), getattr(expected, field), field)
+        self.assertEqual(fee.academic_term, self.term)
+        self.assertEqual(fee.balance, Decimal('500.00'))
+
+    def test_system_user_is_the_first_active_superuser(self):
+        self.assertIsNone(system_user())
+
+        UserFactory(is_superuser=True, is_active=False)
+        owner = UserFactory(is_superuser=True)
+        UserFactory(is_superuser=True)
+
+        self.assertEqual(system_user(), owner)
+
+    def test_automated_generation_bills_the_active_term(self):
+        owner = UserFactory(is_superuser=True)
+        self.term.is_active = True
+        self.term.save()
+
+        created = FinancialAutomationService().generate_term_fees_automatically()
+
+        self.assertEqual(created, 6)
+        fees = Fee.objects.all()
+        self.assertEqual(fees.count(), 6)
+        self.assertEqual({fee.recorded_by_id for fee in fees}, {owner.pk})
+        self.assertEqual({fee.due_date for fee in fees}, {self.term.start_date + timedelta(days=14)})
@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Fee, FeeCategory
+from core.services.fee_import import FeeImportJob
+from core.tests.factories import StudentFactory, UserFactory
+
+HEADER = 'student_id,category,amount,amount_paid,due_date,status,description'
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fee-import-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class FeeImportJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserFactory()
+        self.first = StudentFactory(student_id='FEE001')
+        self.second = StudentFactory(student_id='FEE002')
+        self.tuition = FeeCategory.objects.create(name='TUITION', default_amount=Decimal('500.00'))
+        self.transport = FeeCategory.objects.create(name='TRANSPORT', default_amount=Decimal('100.00'))
+
+    def _job(self, content, name='fees.csv', file_type='csv', **options):
+        upload = SimpleUploadedFile(name, content)
+        return FeeImportJob.create(upload, file_type, '2024/2025', 1, self.user, **options)
+
+    def _csv(self, *lines):
+        return '\n'.join((HEADER,) + lines).encode()
+
+    def _fee(self, student, category):
+        return Fee.objects.get(student=student, category=category, academic_year='2024/2025', term=1)
+
+    def test_csv_rows_with_errors_do_not_stop_the_import(self):
+        job = self._job(self._csv(
+            'FEE001,Tuition Fee,500,200,2024-10-01,partial,First term',
+            'MISSING,TUITION,500,0,,,',
+            'FEE002,TUITION,not-money,0,,,',
+            'FEE002,transport,100,0,,,',
+        ))
+
+        state = job.run()
+
+        self.assertEqual(state['status'], 'completed')
+        self.assertEqual((state['processed'], state['created'], state['error_count']), (4, 2, 2))
+        self.assertIn('Row 3:', state['errors'][0])
+        self.assertIn('Row 4:', state['errors'][1])
+        fee = self._fee(self.first, self.tuition)
+        self.assertEqual(fee.balance, Decimal('300.00'))
+        self.assertEqual(fee.due_date, date(2024, 10, 1))
+        self.assertEqual(fee.payment_status, 'partial')
+        self.assertEqual(self._fee(self.second, self.transport).balance, Decimal('100.00'))
+        self.assertFalse(default_storage.exists(state['file_path']))
+
+    def test_xlsx_is_imported(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER.split(','))
+        sheet.append(['FEE001', 'TUITION', 500, 500, date(2024, 10, 1), 'paid', ''])
+        sheet.append([None] * 7)
+        sheet.append(['FEE002', 'TUITION', 450, None, None, None, None])
+        output = BytesIO()
+        workbook.save(output)
+
+        state = self._job(output.getvalue(), name='fees.xlsx', file_type='excel').run()
+
+        self.assertEqual(state['status'], 'completed')
+        self.assertEqual((state['created'], state['error_count']), (2, 0))
+        paid = self._fee(self.first, self.tuition)
+        self.assertEqual(paid.balance, Decimal('0.00'))
+        self.assertIsNotNone(paid.payment_date)
+        self.assertEqual(self._fee(self.second, self.tuition).amount_payable, Decimal('450.00'))
+
+    def _existing_fee(self):
+        return Fee.objects.create(
+            student=self.first, category=self.tuition, academic_year='2024/2025', term=1,
+            amount_payable=Decimal('500.00'), due_date=date(2024, 10, 1), recorded_by=self.user,
+        )
+
+    def test_existing_fee_is_skipped_without_update_existing(self):
+        self._existing_fee()
+
+        state = self._job(self._csv('FEE001,TUITION,650,0,,,')).run()
+
+        self.assertEqual((state['created'], state['updated'], state['skipped']), (0, 0, 1))
+        self.assertIn('Fee already exists', state['warnings'][0])
+        self.assertEqual(self._fee(self.first, self.tuition).amount_payable, Decimal('500.00'))
+
+    def test_existing_fee_is_overwritten_with_update_existing(self):
+        self._existing_fee()
+
+        state = self._job(self._csv('FEE001,TUITION,650,50,,,'), update_existing=True).run()
+
+        self.assertEqual((state['created'], state['updated'], state['skipped']), (0, 1, 0))
+        fee = self._fee(self.first, self.tuition)
+        self.assertEqual(fee.amount_payable, Decimal('650.00'))
+        self.assertEqual(fee.balance, Decimal('600.00'))
+
+    def test_verified_import_derives_status_from_amounts(self):
+        due = (timezone.now().date() + timedelta(days=30)).isoformat()
+
+        state = self._job(
+            self._csv(f'FEE001,TUITION,500,200,{due},paid,', f'FEE002,TUITION,500,500,{due},unpaid,'),
+            generation_status='VERIFIED',
+        ).run()
+
+        self.assertEqual(state['created'], 2)
+        partial = self._fee(self.first, self.tuition)
+        self.assertEqual(partial.payment_status, 'partial')
+        self.assertIsNone(partial.payment_date)
+        paid = self._fee(self.second, self.tuition)
+        self.assertEqual(paid.payment_status, 'paid')
+        self.assertIsNotNone(paid.payment_date)
+
+    def test_duplicate_rows_in_one_chunk_create_one_fee(self):
+        rows = ('FEE001,TUITION,500,0,,,', 'FEE001,Tuition,550,0,,,')
+
+        state = self._job(self._csv(*rows)).run()
+        self.assertEqual((state['created'], state['skipped']), (1, 1))
+        self.assertEqual(self._fee(self.first, self.tuition).amount_payable, Decimal('500.00'))
+
+        Fee.objects.all().delete()
+        state = self._job(self._csv(*rows), update_existing=True).run()
+        # The later row wins and the fee is still inserted only once
+        self.assertEqual((state['created'], state['updated']), (1, 0))
+        self.assertEqual(self._fee(self.first, self.tuition).amount_payable, Decimal('550.00'))
+
+    def test_retry_resumes_after_committed_row(self):
+        job = self._job(self._csv(
+            'FEE001,TUITION,500,0,,,',
+            'FEE002,TUITION,500,0,,,',
+            'FEE001,TRANSPORT,100,0,,,',
+        ))
+        # A previous attempt committed rows 2 and 3 before failing
+        job._update(committed_row=3, processed=2, created=2)
+
+        state = job.run()
+
+        self.assertEqual((state['processed'], state['created']), (3, 3))
+        self.assertEqual(state['committed_row'], 4)
+        self.assertEqual(list(Fee.objects.values_list('category__name', flat=True)), ['TRANSPORT'])
+
+    def test_chunks_commit_progress_as_they_go(self):
+        job = self._job(self._csv(
+            'FEE001,TUITION,500,0,,,',
+            'FEE002,TUITION,500,0,,,',
+            'FEE001,TRANSPORT,100,0,,,',
+        ))
+        job.CHUNK_SIZE = 2
+
+        state = job.run()
+
+        self.assertEqual((state['processed'], state['created'], state['committed_row']), (3, 3, 4))
+        self.assertEqual(Fee.objects.count(), 3)
+
+    def test_missing_required_columns_fail_the_import(self):
+        job = self._job(b'student_id,category\nFEE001,TUITION\n')
+
+        state = job.run()
+
+        self.assertEqual(state['status'], 'failed')
+        self.assertEqual(state['errors'], ['Missing required columns: amount_payable'])
+        self.assertFalse(Fee.objects.exists())
+        self.assertFalse(default_storage.exists(state['file_path']))
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Fee, FeeCategory, FeePayment
+from core.services.fee_status_refresh import FeeStatusRefreshService, derive_status
+from core.tests.factories import StudentFactory, UserFactory
+
+
+class DeriveStatusTests(SimpleTestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def derive(self, paid, generation_status='DRAFT', due_in=30, current='unpaid', payment_date=None):
+        return derive_status(
+            Decimal('100.00'), Decimal(paid), self.today + timedelta(days=due_in),
+            generation_status, current, payment_date, self.today,
+        )
+
+    def test_frozen_statuses_are_kept(self):
+        for status in ('cancelled', 'refunded'):
+            self.assertEqual(self.derive('100.00', current=status), (status, None))
+            self.assertEqual(self.derive('0.00', 'VERIFIED', current=status), (status, None))
+
+    def test_draft_fees_follow_the_plain_rules(self):
+        self.assertEqual(self.derive('100.00'), ('paid', self.today))
+        self.assertEqual(self.derive('99.50'), ('partial', None))
+        self.assertEqual(self.derive('0.00'), ('unpaid', None))
+        # No grace period before a draft fee is overdue
+        self.assertEqual(self.derive('0.00', due_in=-1), ('overdue', None))
+        self.assertEqual(self.derive('40.00', due_in=-1), ('overdue', None))
+
+    def test_billable_fees_follow_update_payment_status(self):
+        # Within the payment tolerance
+        self.assertEqual(self.derive('99.50', 'VERIFIED'), ('paid', self.today))
+        # Inside the grace period, and past it
+        self.assertEqual(self.derive('0.00', 'LOCKED', due_in=-3), ('unpaid', None))
+        self.assertEqual(self.derive('0.00', 'LOCKED', due_in=-10), ('overdue', None))
+        self.assertEqual(self.derive('40.00', 'VERIFIED', due_in=-10), ('partial', None))
+
+    def test_existing_payment_date_is_kept_for_paid_fees(self):
+        paid_on = self.today - timedelta(days=7)
+        self.assertEqual(self.derive('100.00', 'VERIFIED', payment_date=paid_on), ('paid', paid_on))
+        self.assertEqual(self.derive('100.00', payment_date=paid_on), ('paid', paid_on))
+
+
+class FeeStatusRefreshServiceTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        student = StudentFactory()
+        due_date = timezone.now().date() + timedelta(days=30)
+        self.stale, self.current = [
+            Fee.objects.create(
+                student=student, category=FeeCategory.objects.create(name=name), academic_year='2024/2025',
+                term=1, amount_payable=Decimal('100.00'), due_date=due_date, recorded_by=self.user,
+            )
+            for name in ('TUITION', 'LIBRARY')
+        ]
+        # bulk_create skips everything that would keep the fee in step
+        FeePayment.objects.bulk_create([
+            FeePayment(fee=self.stale, amount=Decimal('100.00'), payment_mode='cash', receipt_number='RCPT-T1'),
+        ])
+
+    def test_check_writes_nothing(self):
+        output = StringIO()
+        call_command('refresh_fee_statuses', '--check', stdout=output)
+
+        self.assertIn('1 of 2 fees out of date', output.getvalue())
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.amount_paid, Decimal('0.00'))
+        self.assertEqual(self.stale.payment_status, 'unpaid')
+
+    def test_only_changed_fees_are_written(self):
+        last_updated = self.current.last_updated
+
+        stats = FeeStatusRefreshService().run()
+
+        self.assertEqual((stats['scanned'], stats['updated']), (2, 1))
+        self.assertEqual((stats['amount_drift'], stats['status_drift']), (1, 1))
+        self.assertEqual(stats['drift_amount'], Decimal('100.00'))
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.amount_paid, Decimal('100.00'))
+        self.assertEqual(self.stale.balance, Decimal('0.00'))
+        self.assertEqual(self.stale.payment_status, 'paid')
+        self.assertIsNotNone(self.stale.payment_date)
+        self.current.refresh_from_db()
+        self.assertEqual(self.current.last_updated, last_updated)
+
+        # A second run finds nothing left to fix
+        self.assertEqual(FeeStatusRefreshService().run()['updated'], 0)
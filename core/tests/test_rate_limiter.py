@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.security import rate_limiter
+from core.security.rate_limiter import RateLimiter, RatePolicy, check_rate_limit
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limiter-tests'}}
+POLICIES = {
+    'general': {'requests': 3, 'window': 60},
+    'financial': {'requests': 1, 'window': 60},
+}
+
+
+@override_settings(CACHES=LOCMEM, RATE_LIMIT_POLICIES=POLICIES)
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        rate_limiter.cache.clear()
+        # No Redis: the counters go through cache.add/cache.incr
+        patcher = mock.patch.object(rate_limiter, '_redis_client', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = 6000.0  # the start of a 60 second window
+        clock = mock.patch.object(rate_limiter.time, 'time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.factory = RequestFactory()
+
+    def test_cache_fallback_counts_hits(self):
+        limiter = RateLimiter(RatePolicy('test', 3, 60))
+
+        results = [limiter.hit('10.0.0.1') for _ in range(4)]
+
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual([result.remaining for result in results], [2, 1, 0, 0])
+        # Another client has its own count
+        self.assertTrue(limiter.hit('10.0.0.2').allowed)
+
+    def test_financial_and_general_policies_are_counted_separately(self):
+        request = self.factory.post('/fees/create/', REMOTE_ADDR='10.0.0.1')
+
+        self.assertIsNone(check_rate_limit(request, 'financial'))
+        self.assertEqual(check_rate_limit(request, 'financial').status_code, 429)
+        for _ in range(3):
+            self.assertIsNone(check_rate_limit(request, 'general'))
+        self.assertEqual(check_rate_limit(request, 'general').status_code, 429)
+
+    def test_retry_after_is_the_rest_of_the_window_when_the_current_window_is_full(self):
+        request = self.factory.post('/fees/create/', REMOTE_ADDR='10.0.0.1')
+        check_rate_limit(request, 'financial')
+        self.now += 20
+
+        response = check_rate_limit(request, 'financial')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '40')
+        self.assertEqual(response['X-RateLimit-Limit'], '1')
+
+    def test_retry_after_waits_for_the_previous_window_to_decay(self):
+        limiter = RateLimiter(RatePolicy('test', 10, 60))
+        self.now -= 10
+        for _ in range(8):
+            limiter.hit('10.0.0.1')
+        self.now += 25  # 15 seconds into the next window: 8 * 0.75 carried over
+
+        results = [limiter.hit('10.0.0.1') for _ in range(5)]
+
+        self.assertEqual([result.allowed for result in results], [True, True, True, True, False])
+        # 8 * (1 - t / 60) + 5 <= 10 from t = 22.5, 7.5 seconds away
+        self.assertEqual(results[-1].retry_after, 8)
+
+    def test_cache_outage_allows_the_request(self):
+        limiter = RateLimiter(RatePolicy('test', 1, 60))
+        with mock.patch.object(rate_limiter.cache, 'add', side_effect=ConnectionError):
+            results = [limiter.hit('10.0.0.1') for _ in range(3)]
+
+        self.assertTrue(all(result.allowed for result in results))
@@ -0,0 +1,50 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection, connections
+from django.test import TestCase
+
+from core.models import Student
+from core.services import request_profiler
+
+
+def _select_one():
+    # The worker thread opens a fresh connection, which only sees an empty
+    # database under in-memory sqlite, so run a query that needs no tables
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()
+    finally:
+        # Worker threads open their own connection; don't leave it behind
+        connections.close_all()
+
+
+class RequestProfilerQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        request_profiler.install_hooks()
+
+    def test_queries_in_request_thread_are_counted(self):
+        with request_profiler.profile_request() as profile:
+            Student.objects.count()
+
+        self.assertEqual(profile.queries, 1)
+        self.assertEqual(len(profile.sql_log), 1)
+
+    def test_queries_in_sync_to_async_worker_are_counted(self):
+        # An async request runs the ORM on a worker thread with its own connections
+        async def view():
+            with request_profiler.profile_request() as profile:
+                await sync_to_async(_select_one, thread_sensitive=False)()
+            return profile
+
+        profile = async_to_sync(view)()
+        self.assertGreater(profile.queries, 0)
+        self.assertGreater(profile.sql_ms, 0)
+
+    def test_queries_outside_a_profile_are_not_counted(self):
+        with request_profiler.profile_request() as profile:
+            pass
+        Student.objects.count()
+
+        self.assertEqual(profile.queries, 0)
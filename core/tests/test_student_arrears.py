@@ -0,0 +1,57 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Bill, Fee, FeeCategory, StudentBalance
+from core.services.financial_reports import FinancialReportGenerator
+from core.services.student_arrears import iter_student_arrears, refresh_student_balances
+from core.tests.factories import StudentFactory, UserFactory
+
+
+class StudentArrearsTests(TestCase):
+    def setUp(self):
+        user = UserFactory()
+        self.student = StudentFactory()
+        category = FeeCategory.objects.create(name='TUITION', default_amount=Decimal('100.00'))
+        due_date = timezone.now().date() + timedelta(days=30)
+
+        # Written in bulk so the figures depend only on the rows themselves
+        Fee.objects.bulk_create([
+            Fee(
+                student=self.student, category=category, academic_year='2024/2025', term=1,
+                amount_payable=Decimal('100.00'), balance=Decimal('100.00'),
+                payment_status='unpaid', due_date=due_date, recorded_by=user,
+            )
+            for _ in range(2)
+        ])
+        Bill.objects.bulk_create([
+            Bill(
+                bill_number=f'BILL-TEST-{index}', student=self.student, due_date=due_date,
+                academic_year='2024/2025', term=1, status='issued',
+                total_amount=Decimal('50.00'), balance=Decimal('50.00'), recorded_by=user,
+            )
+            for index in range(3)
+        ])
+
+    def test_fee_and_bill_balances_are_not_multiplied(self):
+        rows = list(iter_student_arrears())
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['fee_balance'], Decimal('200.00'))
+        self.assertEqual(rows[0]['bill_balance'], Decimal('150.00'))
+        self.assertEqual(rows[0]['total_balance'], Decimal('350.00'))
+
+        report = FinancialReportGenerator().generate_student_arrears_report()
+        self.assertEqual(report['total_students'], 1)
+        self.assertEqual(report['total_arrears'], Decimal('350.00'))
+
+    def test_balance_table_matches_live_figures(self):
+        # The second refresh takes the conflict path of the upsert
+        refresh_student_balances([self.student.id])
+        refresh_student_balances([self.student.id])
+
+        self.assertEqual(StudentBalance.objects.filter(student=self.student).count(), 1)
+        stored = list(iter_student_arrears(use_balance_table=True))
+        self.assertEqual(stored, list(iter_student_arrears()))
@@ -199,12 +199,13 @@ from .views.fee_views import (
     FeeCategoryUpdateView, FeeCategoryDeleteView,
     
     # Bulk operations
-    BulkFeeImportView, BulkFeeCreationView, BulkFeeUpdateView,
+    BulkFeeImportView, FeeImportProgressAPI, BulkFeeCreationView, BulkFeeUpdateView,
+    FeeStudentSearchView,
     DownloadFeeTemplateView, GenerateTermFeesView, SendPaymentRemindersView,
     ReviewTermFeesView, GenerateBillsFromFeesView, FeeBatchListView, FeeBatchDetailView, CancelFeeBatchView,
     
     # Reports and analytics
-    FeeReportView, FeeStatusReportView, FeeAnalyticsView,
+    FeeReportView, FeeStatusReportView, FeeAnalyticsView, StudentArrearsExportView,
     FinanceDashboardView, RevenueAnalyticsView, FinancialHealthView,
     PaymentSummaryView, RefreshPaymentDataView,
     
@@ -241,7 +242,7 @@ from .views.announcement_views import (
     DeleteAnnouncementView, get_active_announcements, dismiss_announcement, 
     dismiss_all_announcements, announcement_detail, toggle_announcement_status,
     bulk_action_announcements, AnnouncementStatsView,
-    active_announcements
+    active_announcements, announcement_delivery_status
 )
 
 # ==============================
@@ -254,7 +255,7 @@ from .views.security_views import (
     SecuritySettingsView, security_events_api, maintenance_details_api, security_events,
     security_status_api, security_notifications_api, emergency_maintenance_bypass, clear_maintenance_bypass,
     axes_lockout_management, unlock_user_api, locked_users_api, unlock_all_users_api,
-    system_health_api
+    system_health_api, request_profile_api
 )
 
 # Import API views
@@ -414,6 +415,7 @@ urlpatterns = [
     # ==============================
     path('fees/', include([
         path('', FeeListView.as_view(), name='fee_list'),
+        path('students/search/', FeeStudentSearchView.as_view(), name='fee_student_search'),
         path('dashboard/', FeeDashboardView.as_view(), name='fee_dashboard'),
         path('<int:pk>/', FeeDetailView.as_view(), name='fee_detail'),
         path('<int:pk>/edit/', FeeUpdateView.as_view(), name='fee_update'),
@@ -423,6 +425,7 @@ urlpatterns = [
         path('bulk-update/', BulkFeeUpdateView.as_view(), name='bulk_fee_update'),
         path('send-reminders/', SendPaymentRemindersView.as_view(), name='send_payment_reminders'),
         path('bulk-import/', BulkFeeImportView.as_view(), name='bulk_fee_import'),
+        path('bulk-import/progress/', FeeImportProgressAPI.as_view(), name='bulk_fee_import_progress'),
         path('bulk-creation/', BulkFeeCreationView.as_view(), name='bulk_fee_creation'),
         path('download-template/<str:file_type>/', DownloadFeeTemplateView.as_view(), name='download_fee_template'),
         
@@ -488,6 +491,7 @@ urlpatterns = [
         path('fees/', FeeReportView.as_view(), name='fee_report'),
         path('fee-status/', FeeStatusReportView.as_view(), name='fee_status_report'),
         path('fee-analytics/', FeeAnalyticsView.as_view(), name='fee_analytics'),
+        path('arrears/export/', StudentArrearsExportView.as_view(), name='student_arrears_export'),
     ])),
     
     # ==============================
@@ -909,6 +913,7 @@ urlpatterns = [
         path('<int:pk>/update/', UpdateAnnouncementView.as_view(), name='update_announcement'),
         path('<int:pk>/delete/', DeleteAnnouncementView.as_view(), name='delete_announcement'),
         path('<int:pk>/toggle-status/', toggle_announcement_status, name='toggle_announcement_status'),
+        path('<int:pk>/delivery/', announcement_delivery_status, name='announcement_delivery_status'),
         path('<int:pk>/dismiss/', dismiss_announcement, name='dismiss_announcement'),
         path('dismiss-all/', dismiss_all_announcements, name='dismiss_all_announcements'),
         path('bulk-action/', bulk_action_announcements, name='bulk_action_announcements'),
@@ -947,6 +952,7 @@ urlpatterns = [
         # Security API
         path('security/notifications/', security_notifications_api, name='security_notifications_api'),
         path('system-health/', system_health_api, name='system_health_api'),
+        path('request-profile/', request_profile_api, name='request_profile_api'),
         
         # Class Assignment API
         path('class-assignments/', include([
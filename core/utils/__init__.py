@@ -2,25 +2,24 @@
 Core utilities package - simplified to avoid circular imports.
 """
 
-# Import core functions directly
+from core.services.user_roles import get_user_roles
+
+# Role checks read the per-request resolver, so repeated calls cost no queries
 def is_admin(user):
     """Check if user is admin/superuser"""
-    if not user.is_authenticated:
-        return False
-    # Check for Django superuser/staff OR custom admin attribute
-    return user.is_superuser or user.is_staff or hasattr(user, 'admin')
+    return get_user_roles(user).is_admin
 
 def is_teacher(user):
     """Check if user is teacher"""
-    return hasattr(user, 'teacher')
+    return get_user_roles(user).is_teacher
 
 def is_student(user):
     """Check if user is student"""
-    return hasattr(user, 'student')
+    return get_user_roles(user).is_student
 
 def is_parent(user):
     """Check if user is parent"""
-    return hasattr(user, 'parentguardian')
+    return get_user_roles(user).is_parent
 
 def is_teacher_or_admin(user):
     """Check if user is teacher or admin"""
@@ -32,16 +31,8 @@ def is_student_or_parent(user):
 
 def get_user_role(user):
     """Get user's role"""
-    if is_admin(user):
-        return 'admin'
-    elif is_teacher(user):
-        return 'teacher'
-    elif is_student(user):
-        return 'student'
-    elif is_parent(user):
-        return 'parent'
-    else:
-        return 'unknown'
+    role = get_user_roles(user).primary_role
+    return 'unknown' if role == 'anonymous' else role
 
 # Academic utilities
 def get_current_academic_year():
@@ -188,41 +179,9 @@ def can_edit_grades(user, student):
 
 def get_student_position_in_class(student, academic_year, term):
     """Get student's position in class"""
-    try:
-        from core.models import Grade, Student
-        from django.db.models import Avg
-        
-        # Get all students in the same class
-        class_students = Student.objects.filter(
-            class_level=student.class_level,
-            is_active=True
-        )
-        
-        # Calculate average scores for all students
-        student_averages = []
-        for s in class_students:
-            avg = Grade.objects.filter(
-                student=s,
-                academic_year=academic_year,
-                term=term
-            ).aggregate(avg_score=Avg('total_score'))['avg_score'] or 0
-            
-            student_averages.append({
-                'student': s,
-                'average': avg
-            })
-        
-        # Sort by average score (descending)
-        student_averages.sort(key=lambda x: x['average'], reverse=True)
-        
-        # Find position of current student
-        for i, item in enumerate(student_averages, 1):
-            if item['student'] == student:
-                return f"{i} out of {len(student_averages)}"
-        
-        return "Not ranked"
-    except Exception:
-        return "Not ranked"
+    from core.services.class_ranking import get_class_position
+    
+    return get_class_position(student, academic_year, term)
 
 def get_attendance_summary(student, academic_year, term):
     """Get attendance summary for student"""
@@ -14,6 +14,7 @@ import os
 from core.models import AuditLog
 from core.models import SecurityEvent, AuditAlertRule, AuditReport, DataRetentionPolicy
 from django.contrib.auth.models import User
+from core.geo_utils import enrich_ips
 
 logger = logging.getLogger(__name__)
 
@@ -88,9 +89,29 @@ class RealTimeSecurityMonitor:
         return delete_count >= threshold
     
     def _check_suspicious_ips(self, config, audit_log):
-        """Check for suspicious IP activity"""
+        """Check for suspicious IP activity, by address or by country"""
         suspicious_ips = config.get('suspicious_ips', [])
-        return audit_log.ip_address in suspicious_ips
+        if audit_log.ip_address in suspicious_ips:
+            return True
+        
+        # Optional country rules take ISO codes, e.g. {"blocked_countries": ["XX"]}
+        blocked_countries = config.get('blocked_countries')
+        allowed_countries = config.get('allowed_countries')
+        if not audit_log.ip_address or not (blocked_countries or allowed_countries):
+            return False
+        location = (audit_log.details or {}).get('location')
+        if location is None:
+            try:
+                location = enrich_ips([audit_log.ip_address]).get(audit_log.ip_address, {})
+            except Exception as e:
+                logger.warning(f"GeoIP lookup failed for {audit_log.ip_address}: {str(e)}")
+                return False
+        country = location.get('iso_code')
+        if not country:
+            return False
+        if blocked_countries and country in blocked_countries:
+            return True
+        return bool(allowed_countries) and country not in allowed_countries
     
     def _check_data_exports(self, config, audit_log):
         """Check for large data exports"""
@@ -16,6 +16,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from core.services.user_roles import get_user_roles
 from core.models.subject import Subject
 from core.models.attendance import StudentAttendance
 
@@ -29,19 +30,19 @@ User = get_user_model()
 
 def is_admin(user):
     """Check if user is admin/staff"""
-    return user.is_authenticated and (user.is_staff or user.is_superuser)
+    return get_user_roles(user).is_admin
 
 def is_teacher(user):
     """Check if user is a teacher"""
-    return user.is_authenticated and hasattr(user, 'teacher')
+    return get_user_roles(user).is_teacher
 
 def is_student(user):
     """Check if user is a student"""
-    return user.is_authenticated and hasattr(user, 'student_profile')
+    return get_user_roles(user).is_student
 
 def is_parent(user):
     """Check if user is a parent/guardian"""
-    return user.is_authenticated and hasattr(user, 'parentguardian')
+    return get_user_roles(user).is_parent
 
 def is_teacher_or_admin(user):
     """Check if user is teacher or admin"""
@@ -568,84 +569,10 @@ def get_attendance_summary(student, academic_year, term):
         }
 
 def get_student_position_in_class(student, academic_year, term):
-    """Calculate student's position in class - FIXED VERSION"""
-    try:
-        from core.models.grades import Grade
-        
-        logger.info(f"Calculating position for {student.get_full_name()}")
-        
-        # Get all active students in the same class
-        classmates = student.__class__.objects.filter(
-            class_level=student.class_level,
-            is_active=True
-        )
-        
-        logger.info(f"Found {classmates.count()} classmates in {student.get_class_level_display()}")
-        
-        if classmates.count() <= 1:
-            return "1st (Only student in class)"
-        
-        # Calculate average scores for all students
-        student_scores = []
-        
-        for classmate in classmates:
-            # Get grades for the specific period
-            grades = Grade.objects.filter(
-                student=classmate,
-                academic_year=academic_year,
-                term=term
-            )
-            
-            if grades.exists():
-                # Calculate average of total scores
-                total_scores = [float(g.total_score or 0) for g in grades if g.total_score is not None]
-                if total_scores:
-                    avg_score = sum(total_scores) / len(total_scores)
-                else:
-                    avg_score = 0
-            else:
-                avg_score = 0
-            
-            student_scores.append({
-                'student_id': classmate.id,
-                'name': classmate.get_full_name(),
-                'average': avg_score
-            })
-        
-        # Debug: Show top 5
-        sorted_scores = sorted(student_scores, key=lambda x: x['average'], reverse=True)
-        logger.info("Top 5 students:")
-        for i, score in enumerate(sorted_scores[:5], 1):
-            logger.info(f"  {i}. {score['name']}: {score['average']:.1f}%")
-        
-        # Sort by average score (descending)
-        student_scores.sort(key=lambda x: x['average'], reverse=True)
-        
-        # Find this student's position
-        for index, score_data in enumerate(student_scores, 1):
-            if score_data['student_id'] == student.id:
-                total_students = len(student_scores)
-                
-                # Format with ordinal
-                if index == 1:
-                    ordinal = "1st"
-                elif index == 2:
-                    ordinal = "2nd"
-                elif index == 3:
-                    ordinal = "3rd"
-                else:
-                    ordinal = f"{index}th"
-                
-                position = f"{ordinal} of {total_students}"
-                logger.info(f"Position calculated: {position}")
-                return position
-        
-        logger.warning("Student not found in rankings")
-        return "Not ranked"
-        
-    except Exception as e:
-        logger.error(f"Error calculating position: {str(e)}", exc_info=True)
-        return "Error calculating position"
+    """Calculate student's position in class from the cached class ranking"""
+    from core.services.class_ranking import get_class_position
+    
+    return get_class_position(student, academic_year, term)
 
 # ============================================
 # EMAIL UTILITIES
@@ -20,6 +20,13 @@ from ..models import (
     StudentAssignment, ReportCard, Holiday
 )
 from core.utils import send_email
+from core.services.grade_boundaries import BoundaryTable
+
+# Performance bands based on GES standards
+PERFORMANCE_BANDS = BoundaryTable(
+    [(80, 'excellent'), (70, 'very_good'), (60, 'good'), (50, 'satisfactory'), (40, 'fair')],
+    floor_label='poor',
+)
 
 class EnhancedDecimalJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -504,22 +511,17 @@ class ComprehensiveAnalyticsDashboardView(LoginRequiredMixin, UserPassesTestMixi
             stdev = self._safe_stdev(score_values)
             
             # Performance categories based on GES standards
-            performance_categories = {
-                'excellent': len([s for s in score_values if s >= 80]),
-                'very_good': len([s for s in score_values if 70 <= s < 80]),
-                'good': len([s for s in score_values if 60 <= s < 70]),
-                'satisfactory': len([s for s in score_values if 50 <= s < 60]),
-                'fair': len([s for s in score_values if 40 <= s < 50]),
-                'poor': len([s for s in score_values if s < 40]),
-            }
+            performance_categories = PERFORMANCE_BANDS.distribution(score_values)
             
             # Percentiles
-            percentiles = {}
-            for p in [25, 50, 75, 90]:
-                try:
-                    percentiles[f'p{p}'] = statistics.quantiles(score_values, n=100)[p-1]
-                except:
-                    percentiles[f'p{p}'] = mean
+            try:
+                quantiles = statistics.quantiles(score_values, n=100)
+            except statistics.StatisticsError:
+                quantiles = None
+            percentiles = {
+                f'p{p}': quantiles[p-1] if quantiles else mean
+                for p in [25, 50, 75, 90]
+            }
             
             return {
                 'categories': performance_categories,
@@ -6,7 +6,7 @@ from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
-from django.urls import reverse_lazy, reverse
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.db import models
 from django.db.models import Q
@@ -14,7 +14,7 @@ from datetime import timedelta, datetime
 
 import logging
 
-from core.models import Announcement, UserAnnouncementView, Notification
+from core.models import Announcement, UserAnnouncementView
 from core.forms import AnnouncementForm
 
 logger = logging.getLogger(__name__)
@@ -205,16 +205,14 @@ class CreateAnnouncementView(LoginRequiredMixin, UserPassesTestMixin, CreateView
             logger.info(f"Target roles: {form.cleaned_data['target_roles']}")
             logger.info(f"Target class levels: {form.cleaned_data.get('target_class_levels', [])}")
             
-            # Save the announcement first - this will handle target_class_levels in the form's save method
+            # Save the announcement first - this will handle target_class_levels in the form's save method.
+            # Notifications are delivered in the background by the post_save signal.
             response = super().form_valid(form)
             
-            # Send notifications to targeted users
-            notification_count = self.send_announcement_notifications(self.object)
-            
             messages.success(
                 self.request, 
                 f"Announcement '{self.object.title}' created successfully! "
-                f"Notifications sent to {notification_count} users."
+                f"Notifications are being delivered."
             )
             return response
         except Exception as e:
@@ -247,91 +245,6 @@ class CreateAnnouncementView(LoginRequiredMixin, UserPassesTestMixin, CreateView
         messages.error(self.request, "Please correct the errors below.")
         return super().form_invalid(form)
 
-    # In core/views/announcement_views.py - Update the send_announcement_notifications method
-
-    def send_announcement_notifications(self, announcement):
-        """Send notifications to targeted users based on class levels and roles"""
-        try:
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-        
-            target_users = self.get_target_users(announcement)
-            notification_count = 0
-        
-            for user in target_users:
-                # Only send notifications to users who should see this announcement
-                if should_user_see_announcement(user, announcement):
-                    # Create notification using the Notification model method
-                    notification = Notification.create_notification(
-                        recipient=user,
-                        title=f"New Announcement: {announcement.title}",
-                        message=announcement.message[:200] + "..." if len(announcement.message) > 200 else announcement.message,
-                        notification_type="ANNOUNCEMENT",
-                        link=reverse('announcement_detail', kwargs={'pk': announcement.pk}),
-                        related_object=announcement
-                    )
-                    if notification:
-                        notification_count += 1
-        
-            logger.info(f"Sent {notification_count} notifications for announcement {announcement.id}")
-            return notification_count
-        
-        except Exception as e:
-            logger.error(f"Failed to send announcement notifications: {str(e)}")
-            return 0
-    
-    def get_target_users(self, announcement):
-        """Get users who should receive this announcement based on roles and class levels"""
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        target_class_levels = announcement.get_target_class_levels()
-        target_roles = announcement.target_roles
-        
-        # Build query based on target roles and class levels
-        user_query = Q(is_active=True)
-        
-        # Filter by roles
-        role_queries = Q()
-        if 'STUDENT' in target_roles:
-            role_queries |= Q(student__isnull=False)
-        if 'TEACHER' in target_roles:
-            role_queries |= Q(teacher__isnull=False)
-        if 'PARENT' in target_roles:
-            role_queries |= Q(parentguardian__isnull=False)
-        if 'STAFF' in target_roles:
-            role_queries |= Q(is_staff=True)
-        
-        user_query &= role_queries
-        
-        # Filter by class levels if specified
-        if target_class_levels:
-            class_level_query = Q()
-            
-            # Students in target classes
-            if 'STUDENT' in target_roles:
-                class_level_query |= Q(student__class_level__in=target_class_levels)
-            
-            # Parents of students in target classes
-            if 'PARENT' in target_roles:
-                class_level_query |= Q(parentguardian__students__class_level__in=target_class_levels)
-            
-            # Teachers and staff always receive class-specific announcements
-            if 'TEACHER' in target_roles or 'STAFF' in target_roles:
-                class_level_query |= Q(teacher__isnull=False) | Q(is_staff=True)
-            
-            user_query &= class_level_query
-        
-        target_users = User.objects.filter(user_query).distinct()
-        
-        # Log targeting information
-        logger.info(f"Targeting {target_users.count()} users for announcement")
-        logger.info(f"Target roles: {target_roles}")
-        if target_class_levels:
-            logger.info(f"Target class levels: {target_class_levels}")
-        
-        return target_users
-
 
 class UpdateAnnouncementView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Announcement
@@ -605,6 +518,21 @@ def announcement_detail(request, pk):
         messages.error(request, "An error occurred while loading the announcement.")
         return redirect('active_announcements')
 
+@login_required
+def announcement_delivery_status(request, pk):
+    """Progress of an announcement's background notification delivery"""
+    from core.services.announcement_fanout import AnnouncementFanout
+    
+    announcement = get_object_or_404(Announcement, pk=pk)
+    if not (request.user.is_staff or hasattr(request.user, 'teacher') or request.user == announcement.created_by):
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+    
+    progress = AnnouncementFanout(announcement.pk).progress
+    return JsonResponse({
+        'status': 'success',
+        'delivery': progress or {'status': 'unknown'},
+    })
+
 @login_required
 @require_POST
 def toggle_announcement_status(request, pk):
@@ -17,6 +17,7 @@ from ..models import Assignment, StudentAssignment, ClassAssignment, Subject, St
 from .base_views import is_admin, is_teacher, is_student
 from ..forms import AssignmentForm, StudentAssignmentForm
 from core.forms import StudentAssignmentSubmissionForm
+from core.services.assignment_analytics import deferred_assignment_analytics
 
 logger = logging.getLogger(__name__)
 
@@ -1240,32 +1241,35 @@ class BulkGradeAssignmentView(LoginRequiredMixin, UserPassesTestMixin, View):
             grades_data = request.POST.get('grades_data', '{}')
             grades_dict = json.loads(grades_data)
             
-            updated_count = 0
-            for student_id, grade_data in grades_dict.items():
-                try:
-                    student_assignment = StudentAssignment.objects.get(
-                        assignment=assignment,
-                        student_id=student_id
-                    )
-                    
-                    if 'score' in grade_data:
-                        student_assignment.score = grade_data['score']
-                    if 'feedback' in grade_data:
-                        student_assignment.feedback = grade_data['feedback']
-                    
-                    student_assignment.status = 'GRADED'
-                    student_assignment.graded_date = timezone.now()
-                    student_assignment.save()
-                    updated_count += 1
-                    
-                except (StudentAssignment.DoesNotExist, ValueError):
-                    continue
+            student_assignments = {
+                str(sa.student_id): sa
+                for sa in StudentAssignment.objects.filter(
+                    assignment=assignment,
+                    student_id__in=[key for key in grades_dict if str(key).isdigit()]
+                ).select_related('assignment')
+            }
             
-            # Update analytics after bulk grading
-            try:
-                assignment.update_analytics()
-            except Exception as e:
-                logger.error(f"Error updating analytics after bulk grading: {str(e)}")
+            updated_count = 0
+            # Analytics are recounted once for the whole batch on exit
+            with deferred_assignment_analytics():
+                for student_id, grade_data in grades_dict.items():
+                    try:
+                        student_assignment = student_assignments.get(str(student_id))
+                        if student_assignment is None:
+                            continue
+                        
+                        if 'score' in grade_data:
+                            student_assignment.score = grade_data['score']
+                        if 'feedback' in grade_data:
+                            student_assignment.feedback = grade_data['feedback']
+                        
+                        student_assignment.status = 'GRADED'
+                        student_assignment.graded_date = timezone.now()
+                        student_assignment.save()
+                        updated_count += 1
+                        
+                    except ValueError:
+                        continue
             
             return JsonResponse({
                 'success': True,
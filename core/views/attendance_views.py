@@ -16,6 +16,7 @@ from django.urls import reverse
 from django.utils import timezone
 
 from .base_views import is_admin, is_teacher
+from core.services.attendance_recorder import BulkAttendanceService
 
 class AttendanceBaseView(LoginRequiredMixin, UserPassesTestMixin):
     """Base view for attendance-related views with common permissions"""
@@ -955,27 +956,21 @@ class AttendanceRecordView(AttendanceBaseView, GhanaEducationAttendanceMixin, Vi
             )
 
     def _process_attendance_records(self, form_data):
-        """Process attendance records for all students"""
-        for student in form_data['students']:
-            status_key = f"status_{student.id}"
-            notes_key = f"notes_{student.id}"
-            
-            if status_key in form_data['request'].POST:
-                status = form_data['request'].POST[status_key]
-                notes = form_data['request'].POST.get(notes_key, '')
-                
-                # Create or update attendance record
-                attendance, created = StudentAttendance.objects.update_or_create(
-                    student=student,
-                    date=form_data['date'],
-                    term=form_data['term'],
-                    period=form_data['period'],
-                    defaults={
-                        'status': status,
-                        'notes': notes,
-                        'recorded_by': form_data['request'].user
-                    }
-                )
+        """Process attendance records for all students in one bulk write"""
+        request = form_data['request']
+        entries = {}
+        for student_id in form_data['students'].values_list('id', flat=True):
+            status_key = f"status_{student_id}"
+            if status_key in request.POST:
+                entries[student_id] = (request.POST[status_key], request.POST.get(f"notes_{student_id}", ''))
+        
+        return BulkAttendanceService(
+            term=form_data['term'],
+            date=form_data['date'],
+            period=form_data['period'],
+            recorded_by=request.user,
+            request=request,
+        ).save(entries)
 
     def _build_success_redirect_url(self, form_data):
         """Build redirect URL with all parameters after successful submission"""
@@ -12,6 +12,7 @@ from django.db import models
 import json
 from datetime import datetime, timedelta
 import csv
+import logging
 
 from django.contrib.auth.models import User
 from ..models import (
@@ -22,6 +23,9 @@ from ..models import (
 
 # Import your permission functions from base_views
 from .base_views import is_admin, is_student, is_teacher
+from core.geo_utils import enrich_ips
+
+logger = logging.getLogger(__name__)
 
 class AuditLogListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     template_name = 'core/audit/audit_log_list.html'
@@ -174,7 +178,15 @@ class AuditDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             count=Count('id')
         ).filter(count__gt=10)  # More than 10 logins from same IP/user
         
-        context['suspicious_activity'] = list(suspicious_logins)
+        suspicious_activity = list(suspicious_logins)
+        try:
+            locations = enrich_ips(entry['ip_address'] for entry in suspicious_activity)
+        except Exception as e:
+            logger.warning(f"GeoIP lookup failed: {str(e)}")
+            locations = {}
+        for entry in suspicious_activity:
+            entry['location'] = locations.get(entry['ip_address'], {})
+        context['suspicious_activity'] = suspicious_activity
         
         # Daily activity for chart
         daily_activity = AuditLog.objects.filter(
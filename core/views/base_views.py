@@ -2,6 +2,7 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from core.permissions import is_parent, is_admin, is_teacher
 from core.utils.logger import log_view_exception
+from core.services.user_roles import get_user_roles
 from django.db.models import Max, Min
 
 from django.shortcuts import render, redirect
@@ -26,16 +27,16 @@ logger = logging.getLogger(__name__)
 
 # Permission functions
 def is_admin(user):
-    return user.is_authenticated and (user.is_staff or user.is_superuser)
+    return get_user_roles(user).is_admin
 
 def is_teacher(user):
-    return user.is_authenticated and hasattr(user, 'teacher')
+    return get_user_roles(user).is_teacher
 
 def is_student(user):
-    return user.is_authenticated and hasattr(user, 'student')
+    return get_user_roles(user).is_student
 
 def is_parent(user):
-    return user.is_authenticated and hasattr(user, 'parentguardian')
+    return get_user_roles(user).is_parent
 
 # Utility functions for grade views
 def get_current_academic_year():
@@ -9,24 +9,23 @@ from django.views.decorators.csrf import csrf_protect
 
 from django.utils import timezone
 from datetime import timedelta, datetime
-from django.contrib.auth.models import User
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View, TemplateView
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.db.models import Sum, Count, Q, Avg
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from decimal import Decimal, InvalidOperation
-from openpyxl import load_workbook, Workbook
+from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
-from io import BytesIO, StringIO
 from django.db.models import F, ExpressionWrapper, DecimalField
 from django.utils.timezone import make_aware
+from django.forms import HiddenInput
 
 # ADD THIS IMPORT (only once):
 from django.core.serializers.json import DjangoJSONEncoder
@@ -34,6 +33,11 @@ from django.core.serializers.json import DjangoJSONEncoder
 from .base_views import is_admin, is_teacher, is_student
 from ..models import FeeCategory, Fee, FeePayment, AcademicTerm, BillPayment, Bill, Student, ClassAssignment, StudentCredit, Expense, Budget, FeeGenerationBatch 
 from ..forms.billing_forms import BillPaymentForm
+from ..services.fee_generation import TermFeeGenerator, find_academic_term, generate_term_batch, system_user
+from ..services.fee_import import FeeImportJob
+from ..services.fee_statistics import get_fee_statistics
+from ..services.student_arrears import iter_student_arrears, stream_arrears_csv, write_arrears_xlsx
+from ..tasks import run_task, process_bulk_fee_import
 from django.contrib import messages
 
 
@@ -418,15 +422,18 @@ class BulkFeeImportView(LoginRequiredMixin, UserPassesTestMixin, View):
     
     def get(self, request):
         form = BulkFeeImportForm()
+        job = FeeImportJob.latest_for_user(request.user.id)
         context = {
             'form': form,
             'template_headers': self.get_template_headers(),
             'sample_data': self.get_sample_data(),
             'available_categories': self.get_available_categories(),
+            'import_progress': job.public_progress() if job else None,
         }
         return render(request, 'core/finance/fees/bulk_fee_import.html', context)
     
     def post(self, request):
+        """Store the file and import it in a background task; progress is polled via FeeImportProgressAPI"""
         form = BulkFeeImportForm(request.POST, request.FILES)
         
         if not form.is_valid():
@@ -434,29 +441,19 @@ class BulkFeeImportView(LoginRequiredMixin, UserPassesTestMixin, View):
             return render(request, 'core/finance/fees/bulk_fee_import.html', {'form': form})
         
         try:
-            file = request.FILES['file']
-            file_type = form.cleaned_data['file_type']
-            academic_year = form.cleaned_data['academic_year']
-            term = form.cleaned_data['term']
-            update_existing = form.cleaned_data['update_existing']
-            
-            # Process the file based on type
-            if file_type == 'excel':
-                results = self.process_excel_file(file, academic_year, term, update_existing)
-            else:  # CSV
-                results = self.process_csv_file(file, academic_year, term, update_existing)
-            
-            # Show results to user
-            self.show_import_results(request, results)
+            job = FeeImportJob.create(
+                request.FILES['file'],
+                form.cleaned_data['file_type'],
+                form.cleaned_data['academic_year'],
+                form.cleaned_data['term'],
+                request.user,
+                update_existing=form.cleaned_data['update_existing'],
+                generation_status=form.cleaned_data.get('generation_status')
+            )
+            run_task(process_bulk_fee_import, job.import_id)
             
-            if results['success_count'] > 0:
-                return redirect('fee_list')
-            else:
-                return render(request, 'core/finance/fees/bulk_fee_import.html', {
-                    'form': form,
-                    'import_results': results,
-                    'available_categories': self.get_available_categories(),
-                })
+            messages.info(request, 'Your fee file is being imported. Progress is shown below.')
+            return redirect('bulk_fee_import')
                 
         except Exception as e:
             logger.error(f"Bulk import error: {str(e)}")
@@ -475,380 +472,6 @@ class BulkFeeImportView(LoginRequiredMixin, UserPassesTestMixin, View):
             for cat in categories
         ]
     
-    def process_excel_file(self, file, academic_year, term, update_existing):
-        """Process Excel file for bulk fee import"""
-        results = {
-            'success_count': 0,
-            'error_count': 0,
-            'errors': [],
-            'warnings': [],
-            'skipped': 0
-        }
-        
-        try:
-            wb = load_workbook(filename=BytesIO(file.read()))
-            ws = wb.active
-            
-            # Get header row and map columns
-            headers = [cell.value for cell in ws[1]]
-            column_map = self.map_columns(headers)
-            
-            # Validate required columns
-            missing_columns = self.validate_required_columns(column_map)
-            if missing_columns:
-                results['errors'].append(f"Missing required columns: {', '.join(missing_columns)}")
-                return results
-            
-            # Process data rows
-            with transaction.atomic():
-                for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    if not any(row):  # Skip empty rows
-                        continue
-                    
-                    try:
-                        fee_data = self.extract_fee_data(row, column_map, academic_year, term)
-                        validation_result = self.validate_fee_data(fee_data)
-                        
-                        if not validation_result['is_valid']:
-                            results['error_count'] += 1
-                            results['errors'].append(f"Row {row_num}: {validation_result['error']}")
-                            continue
-                        
-                        # Create or update fee
-                        fee, created = self.create_or_update_fee(fee_data, update_existing)
-                        
-                        if created:
-                            results['success_count'] += 1
-                        else:
-                            if update_existing:
-                                results['success_count'] += 1
-                            else:
-                                results['skipped'] += 1
-                                results['warnings'].append(f"Row {row_num}: Fee already exists for student {fee_data['student_id']} and category {fee_data['category_name']}")
-                        
-                    except Exception as e:
-                        results['error_count'] += 1
-                        results['errors'].append(f"Row {row_num}: {str(e)}")
-                        continue
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Excel processing error: {str(e)}")
-            raise Exception(f"Error reading Excel file: {str(e)}")
-    
-    def process_csv_file(self, file, academic_year, term, update_existing):
-        """Process CSV file for bulk fee import"""
-        results = {
-            'success_count': 0,
-            'error_count': 0,
-            'errors': [],
-            'warnings': [],
-            'skipped': 0
-        }
-        
-        try:
-            # Read CSV file
-            file_content = file.read().decode('utf-8')
-            csv_reader = csv.DictReader(StringIO(file_content))
-            
-            # Map columns
-            column_map = self.map_columns(csv_reader.fieldnames)
-            
-            # Validate required columns
-            missing_columns = self.validate_required_columns(column_map)
-            if missing_columns:
-                results['errors'].append(f"Missing required columns: {', '.join(missing_columns)}")
-                return results
-            
-            # Process data rows
-            with transaction.atomic():
-                for row_num, row in enumerate(csv_reader, start=2):
-                    try:
-                        fee_data = self.extract_fee_data_from_dict(row, column_map, academic_year, term)
-                        validation_result = self.validate_fee_data(fee_data)
-                        
-                        if not validation_result['is_valid']:
-                            results['error_count'] += 1
-                            results['errors'].append(f"Row {row_num}: {validation_result['error']}")
-                            continue
-                        
-                        # Create or update fee
-                        fee, created = self.create_or_update_fee(fee_data, update_existing)
-                        
-                        if created:
-                            results['success_count'] += 1
-                        else:
-                            if update_existing:
-                                results['success_count'] += 1
-                            else:
-                                results['skipped'] += 1
-                                results['warnings'].append(f"Row {row_num}: Fee already exists for student {fee_data['student_id']} and category {fee_data['category_name']}")
-                        
-                    except Exception as e:
-                        results['error_count'] += 1
-                        results['errors'].append(f"Row {row_num}: {str(e)}")
-                        continue
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"CSV processing error: {str(e)}")
-            raise Exception(f"Error reading CSV file: {str(e)}")
-    
-    def map_columns(self, headers):
-        """Map column headers to field names"""
-        column_map = {}
-        standard_columns = {
-            'student_id': ['student_id', 'student', 'student id', 'id'],
-            'category_name': ['category', 'fee_category', 'category_name', 'fee type', 'fee_type'],
-            'amount_payable': ['amount', 'amount_payable', 'payable', 'fee_amount', 'total'],
-            'amount_paid': ['amount_paid', 'paid', 'paid_amount'],
-            'due_date': ['due_date', 'due date', 'due'],
-            'payment_status': ['payment_status', 'status', 'payment status'],
-            'description': ['description', 'notes', 'remarks']
-        }
-        
-        for header in headers:
-            if header is None:
-                continue
-                
-            header_lower = str(header).lower().strip()
-            for field, possible_names in standard_columns.items():
-                if header_lower in possible_names and field not in column_map:
-                    column_map[field] = header
-                    break
-        
-        return column_map
-    
-    def validate_required_columns(self, column_map):
-        """Validate that all required columns are present"""
-        required_columns = ['student_id', 'category_name', 'amount_payable']
-        missing = []
-        
-        for col in required_columns:
-            if col not in column_map:
-                missing.append(col)
-        
-        return missing
-    
-    def extract_fee_data(self, row, column_map, academic_year, term):
-        """Extract fee data from Excel row"""
-        fee_data = {
-            'student_id': self.get_cell_value(row, column_map, 'student_id'),
-            'category_name': self.get_cell_value(row, column_map, 'category_name'),
-            'amount_payable': self.get_cell_value(row, column_map, 'amount_payable'),
-            'amount_paid': self.get_cell_value(row, column_map, 'amount_paid', default=0),
-            'due_date': self.get_cell_value(row, column_map, 'due_date'),
-            'payment_status': self.get_cell_value(row, column_map, 'payment_status', default='unpaid'),
-            'description': self.get_cell_value(row, column_map, 'description', default=''),
-            'academic_year': academic_year,
-            'term': term
-        }
-        
-        return fee_data
-    
-    def extract_fee_data_from_dict(self, row, column_map, academic_year, term):
-        """Extract fee data from CSV row dictionary"""
-        fee_data = {
-            'student_id': self.get_dict_value(row, column_map, 'student_id'),
-            'category_name': self.get_dict_value(row, column_map, 'category_name'),
-            'amount_payable': self.get_dict_value(row, column_map, 'amount_payable'),
-            'amount_paid': self.get_dict_value(row, column_map, 'amount_paid', default=0),
-            'due_date': self.get_dict_value(row, column_map, 'due_date'),
-            'payment_status': self.get_dict_value(row, column_map, 'payment_status', default='unpaid'),
-            'description': self.get_dict_value(row, column_map, 'description', default=''),
-            'academic_year': academic_year,
-            'term': term
-        }
-        
-        return fee_data
-    
-    def get_cell_value(self, row, column_map, field, default=None):
-        """Get value from Excel row using column mapping"""
-        if field not in column_map:
-            return default
-        
-        header = column_map[field]
-        headers = [k for k, v in column_map.items() if v == header]
-        if not headers:
-            return default
-        
-        # Find the index of the header in the original headers
-        # This is simplified - in practice, you'd need to track the original header order
-        index = list(column_map.values()).index(header)
-        if index < len(row):
-            value = row[index]
-            return value if value not in [None, ''] else default
-        
-        return default
-    
-    def get_dict_value(self, row, column_map, field, default=None):
-        """Get value from CSV row dictionary using column mapping"""
-        if field not in column_map:
-            return default
-        
-        header = column_map[field]
-        value = row.get(header, default)
-        return value if value not in [None, ''] else default
-    
-    def validate_fee_data(self, fee_data):
-        """Validate fee data before creation with case-insensitive category handling"""
-        try:
-            # Check required fields
-            if not fee_data['student_id']:
-                return {'is_valid': False, 'error': 'Student ID is required'}
-            
-            if not fee_data['category_name']:
-                return {'is_valid': False, 'error': 'Category name is required'}
-            
-            # Validate student exists
-            try:
-                student = Student.objects.get(student_id=fee_data['student_id'])
-                fee_data['student'] = student
-            except Student.DoesNotExist:
-                return {'is_valid': False, 'error': f"Student with ID {fee_data['student_id']} not found"}
-            
-            # IMPORTANT FIX: Use case-insensitive category lookup
-            category_name = fee_data['category_name']
-            category, error = find_fee_category(category_name)
-            
-            if error:
-                return {'is_valid': False, 'error': error}
-            
-            fee_data['category'] = category
-            fee_data['category_name'] = category.name  # Store the actual uppercase name
-            
-            # Validate amounts
-            try:
-                amount_payable = Decimal(str(fee_data['amount_payable']))
-                if amount_payable < 0:
-                    return {'is_valid': False, 'error': 'Amount payable cannot be negative'}
-                fee_data['amount_payable'] = amount_payable
-            except (InvalidOperation, ValueError, TypeError):
-                return {'is_valid': False, 'error': 'Invalid amount payable'}
-            
-            try:
-                amount_paid = Decimal(str(fee_data['amount_paid'] or 0))
-                if amount_paid < 0:
-                    return {'is_valid': False, 'error': 'Amount paid cannot be negative'}
-                fee_data['amount_paid'] = amount_paid
-            except (InvalidOperation, ValueError, TypeError):
-                return {'is_valid': False, 'error': 'Invalid amount paid'}
-            
-            # Validate due date
-            if fee_data['due_date']:
-                try:
-                    if isinstance(fee_data['due_date'], str):
-                        due_date = datetime.strptime(fee_data['due_date'], '%Y-%m-%d').date()
-                    else:
-                        due_date = fee_data['due_date']
-                    fee_data['due_date'] = due_date
-                except (ValueError, TypeError):
-                    return {'is_valid': False, 'error': 'Invalid due date format. Use YYYY-MM-DD'}
-            else:
-                # Set default due date (30 days from now)
-                fee_data['due_date'] = timezone.now().date() + timedelta(days=30)
-            
-            # Validate payment status
-            valid_statuses = ['paid', 'unpaid', 'partial', 'overdue']
-            status = (fee_data['payment_status'] or 'unpaid').lower()
-            if status not in valid_statuses:
-                return {'is_valid': False, 'error': f'Invalid payment status. Must be one of: {", ".join(valid_statuses)}'}
-            fee_data['payment_status'] = status
-            
-            return {'is_valid': True}
-            
-        except Exception as e:
-            return {'is_valid': False, 'error': f'Validation error: {str(e)}'}
-    
-    def create_or_update_fee(self, fee_data, update_existing):
-        """Create or update fee record"""
-        # Check if fee already exists
-        existing_fee = Fee.objects.filter(
-            student=fee_data['student'],
-            category=fee_data['category'],
-            academic_year=fee_data['academic_year'],
-            term=fee_data['term']
-        ).first()
-        
-        if existing_fee:
-            if update_existing:
-                # Update existing fee
-                existing_fee.amount_payable = fee_data['amount_payable']
-                existing_fee.amount_paid = fee_data['amount_paid']
-                existing_fee.balance = fee_data['amount_payable'] - fee_data['amount_paid']
-                existing_fee.due_date = fee_data['due_date']
-                existing_fee.payment_status = fee_data['payment_status']
-                existing_fee.description = fee_data['description']
-                existing_fee.save()
-                return existing_fee, False
-            else:
-                return existing_fee, False
-        else:
-            # Create new fee
-            fee = Fee.objects.create(
-                student=fee_data['student'],
-                category=fee_data['category'],
-                academic_year=fee_data['academic_year'],
-                term=fee_data['term'],
-                amount_payable=fee_data['amount_payable'],
-                amount_paid=fee_data['amount_paid'],
-                balance=fee_data['amount_payable'] - fee_data['amount_paid'],
-                due_date=fee_data['due_date'],
-                payment_status=fee_data['payment_status'],
-                description=fee_data['description'],
-                recorded_by=self.request.user
-            )
-            return fee, True
-    
-    def show_import_results(self, request, results):
-        """Show import results to user"""
-        # Clear previous results first
-        if 'import_errors' in request.session:
-            del request.session['import_errors']
-        if 'skipped_warnings' in request.session:
-            del request.session['skipped_warnings']
-    
-        if results['success_count'] > 0:
-            messages.success(request, f'Successfully imported {results["success_count"]} fee records')
-    
-        if results['error_count'] > 0:
-            messages.error(request, f'Failed to import {results["error_count"]} records. Check errors below.')
-            # Store errors in session for display
-            request.session['import_errors'] = results['errors'][:10]  # Show first 10 errors
-    
-        if results['skipped'] > 0:
-            messages.warning(request, f'Skipped {results["skipped"]} existing records')
-            # Store skipped warnings
-            request.session['skipped_warnings'] = results['warnings'][:5]
-    
-        if results['warnings']:
-            for warning in results['warnings'][:5]:  # Show first 5 warnings
-                messages.warning(request, warning)
-    
-        # Debug: Print to console
-        print("\n" + "="*50)
-        print("IMPORT RESULTS:")
-        print(f"Success: {results['success_count']}")
-        print(f"Errors: {results['error_count']}")
-        print(f"Skipped: {results['skipped']}")
-        print(f"Warnings: {len(results['warnings'])}")
-    
-        if results['error_count'] > 0:
-            print("\nERRORS:")
-            for error in results['errors'][:5]:
-                print(f"  - {error}")
-    
-        if results['warnings']:
-            print("\nWARNINGS:")
-            for warning in results['warnings'][:5]:
-                print(f"  - {warning}")
-        print("="*50 + "\n")
-    
-        # Save the session
-        request.session.modified = True
-    
     def get_template_headers(self):
         """Get template headers for download"""
         return [
@@ -899,11 +522,18 @@ class FeeListView(LoginRequiredMixin, ListView):
     template_name = 'core/finance/fees/fee_list.html'
     paginate_by = 20
     
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = FeeFilterForm(self.request.GET)
+            # Students are picked through fee_student_search, not a <select> of every student
+            self._filter_form.fields['student'].widget = HiddenInput()
+        return self._filter_form
+    
     def get_queryset(self):
         queryset = super().get_queryset().select_related('student', 'category', 'bill', 'generation_batch')
         
         # Apply filters from GET parameters
-        form = FeeFilterForm(self.request.GET)
+        form = self.get_filter_form()
         if form.is_valid():
             academic_year = form.cleaned_data.get('academic_year')
             term = form.cleaned_data.get('term')
@@ -933,77 +563,35 @@ class FeeListView(LoginRequiredMixin, ListView):
             if generation_status:
                 queryset = queryset.filter(generation_status=generation_status)
         
-        # Apply user-specific filters
+        # Apply user-specific filters; the scope keys the cached statistics
+        self.stats_scope = 'all'
         if is_student(self.request.user):
             queryset = queryset.filter(student=self.request.user.student)
+            self.stats_scope = f'student:{self.request.user.student.pk}'
         elif is_teacher(self.request.user):
             # Get classes taught by this teacher
-            class_levels = ClassAssignment.objects.filter(
+            class_levels = sorted(set(ClassAssignment.objects.filter(
                 teacher=self.request.user.teacher
-            ).values_list('class_level', flat=True)
+            ).values_list('class_level', flat=True)))
             queryset = queryset.filter(student__class_level__in=class_levels)
+            # A reassigned teacher gets a new scope rather than their old classes' figures
+            self.stats_scope = f"teacher:{','.join(class_levels)}"
         
         return queryset.order_by('-date_recorded')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get the form with initial data including generation_status
-        form_data = self.request.GET.copy()
-        form = FeeFilterForm(form_data)
+        form = self.get_filter_form()
         context['filter_form'] = form
+        context['selected_student'] = form.cleaned_data.get('student') if form.is_valid() else None
         
-        # Add summary statistics - include generation status breakdown
-        queryset = self.get_queryset()
-        
-        # Generation status counts
-        context['draft_count'] = queryset.filter(generation_status='DRAFT').count()
-        context['generated_count'] = queryset.filter(generation_status='GENERATED').count()
-        context['verified_count'] = queryset.filter(generation_status='VERIFIED').count()
-        context['locked_count'] = queryset.filter(generation_status='LOCKED').count()
-        
-        # Keep existing statistics
-        total_payable = queryset.aggregate(Sum('amount_payable'))['amount_payable__sum'] or Decimal('0.00')
-        total_paid = queryset.aggregate(Sum('amount_paid'))['amount_paid__sum'] or Decimal('0.00')
-        total_balance = total_payable - total_paid
-        
-        if total_payable > 0:
-            completion_rate = (total_paid / total_payable) * 100
-        else:
-            completion_rate = 0
-        
-        paid_count = queryset.filter(payment_status='paid').count()
-        pending_count = queryset.filter(payment_status__in=['unpaid', 'partial', 'overdue']).count()
-        
-        unpaid_count = queryset.filter(payment_status='unpaid').count()
-        partial_count = queryset.filter(payment_status='partial').count()
-        overdue_count = queryset.filter(payment_status='overdue').count()
-        
-        categories_in_view = FeeCategory.objects.filter(
-            id__in=queryset.values_list('category', flat=True).distinct()
-        )
-        category_display_map = {cat.id: cat.get_name_display() for cat in categories_in_view}
-        
+        # Generation and payment status breakdown in one (cached) aggregate
+        context.update(get_fee_statistics(self.object_list, self.request.GET, self.stats_scope))
         context.update({
-            'total_payable': total_payable,
-            'total_paid': total_paid,
-            'total_balance': total_balance,
-            'completion_rate': completion_rate,
-            'paid_count': paid_count,
-            'pending_count': pending_count,
-            'unpaid_count': unpaid_count,
-            'partial_count': partial_count,
-            'overdue_count': overdue_count,
             'is_admin': is_admin(self.request.user),
             'is_teacher': is_teacher(self.request.user),
-            'category_display_map': category_display_map,
         })
-        
-        if is_admin(self.request.user) or is_teacher(self.request.user):
-            context['all_students'] = Student.objects.filter(is_active=True).order_by('first_name', 'last_name')
-        else:
-            context['all_students'] = Student.objects.none()
-        
         return context
     
     def get(self, request, *args, **kwargs):
@@ -1066,6 +654,55 @@ class FeeListView(LoginRequiredMixin, ListView):
         return response
 
 
+class FeeStudentSearchView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Paginated student lookup for the fee list's student filter and picker"""
+    page_size = 20
+    
+    def test_func(self):
+        return is_admin(self.request.user) or is_teacher(self.request.user)
+    
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        
+        students = Student.objects.filter(is_active=True)
+        if not is_admin(request.user):
+            students = students.filter(class_level__in=ClassAssignment.objects.filter(
+                teacher=request.user.teacher
+            ).values('class_level'))
+        if query:
+            students = students.filter(
+                Q(first_name__icontains=query) |
+                Q(last_name__icontains=query) |
+                Q(student_id__icontains=query) |
+                Q(class_level__iexact=query)
+            )
+        
+        start = (page - 1) * self.page_size
+        # One extra row tells us whether there is another page
+        rows = list(
+            students.order_by('first_name', 'last_name', 'pk')
+            .only('pk', 'student_id', 'first_name', 'middle_name', 'last_name', 'class_level')
+            [start:start + self.page_size + 1]
+        )
+        return JsonResponse({
+            'results': [
+                {
+                    'id': student.pk,
+                    'student_id': student.student_id,
+                    'name': student.get_full_name(),
+                    'class_level': student.get_class_level_display(),
+                }
+                for student in rows[:self.page_size]
+            ],
+            'page': page,
+            'has_more': len(rows) > self.page_size,
+        })
+
+
 class FeeDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = Fee
     template_name = 'core/finance/fees/fee_dashboard.html'
@@ -1354,121 +991,53 @@ class GenerateTermFeesView(LoginRequiredMixin, UserPassesTestMixin, View):
         return render(request, 'core/finance/fees/generate_term_fees.html', context)
     
     def post(self, request):
-        """Generate DRAFT fees for current term"""
+        """Generate DRAFT fees for current term (or preview the counts with dry_run)"""
+        current_term = AcademicTerm.objects.filter(is_active=True).select_related('academic_year').first()
+        if not current_term:
+            messages.error(request, 'No active academic term found')
+            return redirect('fee_list')
+        
+        dry_run = bool(request.POST.get('dry_run'))
         try:
-            with transaction.atomic():
-                current_term = AcademicTerm.objects.filter(is_active=True).first()
-            if not current_term:
-                messages.error(request, 'No active academic term found')
-                return redirect('fee_list')
-            
-            # Create a new batch record
-            batch = FeeGenerationBatch.objects.create(
-                academic_term=current_term,
-                generated_by=request.user,
-                status='DRAFT'
-            )
-            
-            # Get all active students
-            active_students = Student.objects.filter(is_active=True)
-            
-            # Get mandatory fee categories
-            mandatory_categories = FeeCategory.objects.filter(
-                is_mandatory=True,
-                is_active=True
+            result = generate_term_batch(
+                current_term,
+                request.user,
+                notes=request.POST.get('batch_notes', '').strip(),
+                dry_run=dry_run
             )
-            
-            created_count = 0
-            skipped_count = 0
-            
-            for student in active_students:
-                # Check if student already has DRAFT fees for this term
-                existing_draft_fees = Fee.objects.filter(
-                    student=student,
-                    academic_term=current_term,
-                    generation_status='DRAFT'
-                )
-                
-                if existing_draft_fees.exists():
-                    skipped_count += 1
-                    continue  # Skip if already has draft fees
-                
-                # Generate fees for each applicable category
-                for category in mandatory_categories:
-                    # Check if category applies to student's class
-                    # FIXED: Use student.class_level instead of student.current_class
-                    if category.class_levels and student.class_level:
-                        # Check if student's class level is in the category's applicable classes
-                        applicable_classes = [cls.strip() for cls in category.class_levels.split(',')]
-                        if student.class_level in applicable_classes:
-                            amount = category.default_amount
-                            
-                            # Create DRAFT fee with future due date
-                            Fee.objects.create(
-                                student=student,
-                                category=category,
-                                academic_year=current_term.academic_year,
-                                term=current_term.period_number,
-                                academic_term=current_term,
-                                amount_payable=amount,
-                                amount_paid=Decimal('0.00'),
-                                balance=amount,
-                                payment_status='unpaid',
-                                generation_status='DRAFT',
-                                generation_batch=batch,
-                                due_date=timezone.now().date() + timedelta(days=365),
-                                recorded_by=request.user
-                            )
-                            created_count += 1
-                    else:
-                        # If no class restrictions, apply to all students
-                        amount = category.default_amount
-                        
-                        # Create DRAFT fee with future due date
-                        Fee.objects.create(
-                            student=student,
-                            category=category,
-                            academic_year=current_term.academic_year,
-                            term=current_term.period_number,
-                            academic_term=current_term,
-                            amount_payable=amount,
-                            amount_paid=Decimal('0.00'),
-                            balance=amount,
-                            payment_status='unpaid',
-                            generation_status='DRAFT',
-                            generation_batch=batch,
-                            due_date=timezone.now().date() + timedelta(days=365),
-                            recorded_by=request.user
-                        )
-                        created_count += 1
-            
-                # Update batch statistics
-                batch.total_students = active_students.count()
-                batch.total_fees = created_count
-                batch.total_amount = Fee.objects.filter(
-                    generation_batch=batch
-                ).aggregate(total=Sum('amount_payable'))['total'] or Decimal('0.00')
-                batch.status = 'GENERATED'
-                batch.save()
-            
-                if created_count > 0:
-                    messages.success(
-                        request, 
-                        f"Successfully generated {created_count} DRAFT fees for {active_students.count()} students. "
-                        f"{skipped_count} students already had draft fees."
-                    )
-                    return redirect('review_term_fees', batch_id=batch.id)
-                else:
-                    messages.warning(
-                        request,
-                        f"No new fees generated. All {active_students.count()} students already have draft fees."
-                    )
-                    return redirect('generate_term_fees')
-            
         except Exception as e:
             logger.error(f"Error generating term fees: {str(e)}")
             messages.error(request, f'Error generating fees: {str(e)}')
             return redirect('generate_term_fees')
+        
+        if dry_run:
+            breakdown = ', '.join(f"{name}: {count}" for name, count in sorted(result.by_category.items()))
+            messages.info(request, result.summary() + (f" ({breakdown})" if breakdown else ''))
+            return redirect('generate_term_fees')
+        
+        if result.created > 0:
+            messages.success(request, result.summary())
+            return redirect('review_term_fees', batch_id=result.batch.id)
+        
+        messages.warning(
+            request,
+            f"No new fees generated. All {result.students} students already have fees for this term."
+        )
+        return redirect('generate_term_fees')
+
+class FeeImportProgressAPI(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Progress of the user's background fee import"""
+    
+    def test_func(self):
+        return is_admin(self.request.user)
+    
+    def get(self, request):
+        import_id = request.GET.get('import_id')
+        job = FeeImportJob(import_id) if import_id else FeeImportJob.latest_for_user(request.user.id)
+        if job is None or job.progress.get('user_id') != request.user.id:
+            return JsonResponse({'success': True, 'progress': {}})
+        return JsonResponse({'success': True, 'progress': job.public_progress()})
+
 
 # NEW: Bulk Fee Operations
 class BulkFeeUpdateView(LoginRequiredMixin, UserPassesTestMixin, View):
@@ -1609,56 +1178,50 @@ class BulkFeeCreationView(LoginRequiredMixin, UserPassesTestMixin, View):
             due_date = form.cleaned_data['due_date']
             description = form.cleaned_data.get('description', '')
             
-            # Convert student IDs to list
+            generation_status = form.cleaned_data.get('generation_status') or 'DRAFT'
+            dry_run = bool(request.POST.get('dry_run'))
+            
+            # Convert student IDs to list (commas or one per line)
             if isinstance(student_ids, str):
-                student_id_list = [id.strip() for id in student_ids.split(',') if id.strip()]
+                student_id_list = list(dict.fromkeys(
+                    id.strip() for id in student_ids.replace('\n', ',').split(',') if id.strip()
+                ))
             else:
                 student_id_list = student_ids
             
-            created_count = 0
-            skipped_count = 0
-            
-            with transaction.atomic():
-                for student_id in student_id_list:
-                    try:
-                        student = Student.objects.get(student_id=student_id)
-                        
-                        # Check if fee already exists
-                        if Fee.objects.filter(
-                            student=student,
-                            category=category,
-                            academic_year=academic_year,
-                            term=term
-                        ).exists():
-                            skipped_count += 1
-                            continue
-                        
-                        # Create fee
-                        Fee.objects.create(
-                            student=student,
-                            category=category,
-                            academic_year=academic_year,
-                            term=term,
-                            amount_payable=amount_payable,
-                            amount_paid=Decimal('0.00'),
-                            balance=amount_payable,
-                            due_date=due_date,
-                            payment_status='unpaid',
-                            description=description,
-                            recorded_by=request.user
-                        )
-                        created_count += 1
-                        
-                    except Student.DoesNotExist:
-                        messages.warning(request, f"Student with ID {student_id} not found")
-                    except Exception as e:
-                        logger.error(f"Error creating fee for student {student_id}: {str(e)}")
-                        messages.error(request, f"Error creating fee for student {student_id}: {str(e)}")
+            students = dict(
+                Student.objects.filter(student_id__in=student_id_list)
+                .values_list('student_id', 'pk')
+            )
+            for student_id in student_id_list:
+                if student_id not in students:
+                    messages.warning(request, f"Student with ID {student_id} not found")
+            
+            generator = TermFeeGenerator(
+                academic_year,
+                term,
+                request.user,
+                academic_term=find_academic_term(academic_year, term),
+                due_date=due_date,
+                generation_status=generation_status,
+                notes=description,
+                dry_run=dry_run
+            )
+            # The listed students get the chosen category whatever their class
+            result = generator.generate(
+                [(pk, None) for pk in students.values()],
+                [category],
+                amount=amount_payable,
+                by_class_level=False
+            )
             
-            if created_count > 0:
-                messages.success(request, f'Successfully created {created_count} fee records')
-            if skipped_count > 0:
-                messages.warning(request, f'Skipped {skipped_count} existing fee records')
+            if dry_run:
+                messages.info(request, result.summary())
+                return render(request, 'core/finance/fees/bulk_fee_creation.html', {'form': form})
+            if result.created > 0:
+                messages.success(request, f'Successfully created {result.created} fee records')
+            if result.skipped > 0:
+                messages.warning(request, f'Skipped {result.skipped} existing fee records')
             
             return redirect('fee_list')
             
@@ -1989,6 +1552,30 @@ class FeeStatusReportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ws.column_dimensions[column].width = adjusted_width
 
 
+class StudentArrearsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Download every student in arrears as CSV (streamed) or XLSX"""
+    
+    def test_func(self):
+        return is_admin(self.request.user)
+    
+    def get(self, request):
+        rows = iter_student_arrears(
+            request.GET.get('class_level') or None,
+            use_balance_table=request.GET.get('source') == 'table',
+        )
+        filename = f"student_arrears_{timezone.now().strftime('%Y%m%d')}"
+        
+        if request.GET.get('format') == 'xlsx':
+            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+            write_arrears_xlsx(rows, response)
+            return response
+        
+        response = StreamingHttpResponse(stream_arrears_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+
+
 class FeeDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'core/finance/fees/fee_dashboard.html'
     
@@ -2040,84 +1627,18 @@ class FeeDashboardView(LoginRequiredMixin, TemplateView):
 # Fee generation automation
 def generate_term_fees(request_user=None):
     """Automatically generate DRAFT fees for all students for the current term"""
-    current_term = AcademicTerm.objects.filter(is_active=True).first()
+    current_term = AcademicTerm.objects.filter(is_active=True).select_related('academic_year').first()
     if not current_term:
         return 0
     
     try:
-        with transaction.atomic():
-            # Create a new batch record
-            if request_user and request_user.is_authenticated:
-                generated_by = request_user
-            else:
-                # Fallback: try to find an admin user or use the first superuser
-                try:
-                    generated_by = User.objects.filter(is_superuser=True).first()
-                except:
-                    generated_by = None
-            
-            batch = FeeGenerationBatch.objects.create(
-                academic_term=current_term,
-                generated_by=generated_by,
-                status='DRAFT'
-            )
-            
-            # Get all active students
-            students = Student.objects.filter(is_active=True)
-            
-            # Get all mandatory fee categories
-            categories = FeeCategory.objects.filter(
-                is_active=True,
-                is_mandatory=True
-            )
-            
-            created_count = 0
-            
-            for student in students:
-                for category in categories:
-                    # Check if category applies to student's class
-                    if (category.class_levels and 
-                        student.class_level not in [level.strip() for level in category.class_levels.split(',')]):
-                        continue
-                    
-                    # Check if fee already exists
-                    if Fee.objects.filter(
-                        student=student,
-                        category=category,
-                        academic_year=current_term.academic_year,
-                        term=current_term.term,
-                        generation_status__in=['DRAFT', 'GENERATED', 'VERIFIED']
-                    ).exists():
-                        continue
-                    
-                    # Create DRAFT fee with future due date
-                    Fee.objects.create(
-                        student=student,
-                        category=category,
-                        academic_year=current_term.academic_year,
-                        term=current_term.term,
-                        academic_term=current_term,
-                        amount_payable=category.default_amount,
-                        amount_paid=Decimal('0.00'),
-                        balance=category.default_amount,
-                        payment_status='unpaid',
-                        generation_status='DRAFT',
-                        generation_batch=batch,
-                        due_date=timezone.now().date() + timedelta(days=365),  # Far future for drafts
-                        recorded_by=generated_by
-                    )
-                    created_count += 1
-            
-            # Update batch statistics
-            batch.total_students = students.count()
-            batch.total_fees = created_count
-            batch.total_amount = Fee.objects.filter(
-                generation_batch=batch
-            ).aggregate(total=Sum('amount_payable'))['total'] or Decimal('0.00')
-            batch.status = 'GENERATED'
-            batch.save()
-            
-            return created_count
+        if request_user and request_user.is_authenticated:
+            generated_by = request_user
+        else:
+            # Fallback: the first superuser owns system-generated batches
+            generated_by = system_user()
+        
+        return generate_term_batch(current_term, generated_by).created
             
     except Exception as e:
         logger.error(f"Error in automated fee generation: {str(e)}")
@@ -22,8 +22,7 @@ from django.views import View
 
 import json
 import logging
-from openpyxl import load_workbook
-from io import BytesIO, StringIO
+from io import StringIO
 import csv
 from decimal import Decimal, InvalidOperation
 from channels.layers import get_channel_layer
@@ -33,7 +32,6 @@ import re
 from core.models.configuration import SchoolConfiguration, ReportCardConfiguration, PromotionConfiguration
 from django.contrib.auth import get_user_model
 from ..mixins import TwoFactorLoginRequiredMixin, AdminRequiredMixin, AuditLogMixin
-from .base_views import *
 from ..models import (
     Grade, Assignment, StudentAssignment, ReportCard, Student, 
     Subject, ClassAssignment, AcademicTerm, AuditLog, Teacher,
@@ -51,6 +49,8 @@ from ..forms import (
 
 from ..utils import is_admin, is_teacher, is_student, is_parent
 from ..utils.validation import validate_grade_data, validate_bulk_grade_data
+from ..services.grade_upload import GradeUploadJob
+from ..tasks import run_task, process_bulk_grade_upload
 
 
 User = get_user_model()
@@ -2356,21 +2356,9 @@ class BulkGradeUploadView(TwoFactorLoginRequiredMixin, UserPassesTestMixin, View
         return is_admin(self.request.user) or is_teacher(self.request.user)
     
     def get(self, request):
-        """Handle GET request with progress tracking initialization"""
+        """Render the upload form"""
         try:
             form = BulkGradeUploadForm(request=request)
-            
-            # Initialize session for progress tracking
-            session_key = f"bulk_upload_{request.user.id}"
-            request.session[session_key] = {
-                'status': 'ready',
-                'processed': 0,
-                'total': 0,
-                'errors': [],
-                'started_at': None,
-                'completed_at': None
-            }
-            
             return render(request, self.template_name, {'form': form})
             
         except Exception as e:
@@ -2378,318 +2366,59 @@ class BulkGradeUploadView(TwoFactorLoginRequiredMixin, UserPassesTestMixin, View
             messages.error(request, 'Error loading upload form. Please try again.')
             return redirect('grade_list')
     
-    @transaction.atomic
     def post(self, request):
-        """Handle file upload with progress tracking"""
+        """Store the file and hand it to a background task; progress is polled via BulkUploadProgressAPI"""
         form = BulkGradeUploadForm(request.POST, request.FILES, request=request)
         
+        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        
         if not form.is_valid():
+            if is_ajax:
+                return JsonResponse({'success': False, 'error': form.errors.as_text()}, status=400)
             return render(request, self.template_name, {'form': form})
         
         try:
-            # Initialize progress tracking
-            session_key = f"bulk_upload_{request.user.id}"
-            progress_data = {
-                'status': 'processing',
-                'processed': 0,
-                'total': 0,
-                'errors': [],
-                'started_at': timezone.now().isoformat(),
-                'completed_at': None,
-                'session_id': f"{request.user.id}_{int(timezone.now().timestamp())}"
-            }
-            request.session[session_key] = progress_data
-            request.session.modified = True
-            
-            # Process the file
-            result = self.process_uploaded_file(
+            job = GradeUploadJob.create(
                 form.cleaned_data['file'],
                 form.cleaned_data['assignment'],
                 form.cleaned_data['term'],
-                session_key,
-                request
+                request.user
             )
+            run_task(process_bulk_grade_upload, job.upload_id)
             
-            # Update progress to completed
-            progress_data['status'] = 'completed'
-            progress_data['completed_at'] = timezone.now().isoformat()
-            progress_data['processed'] = result['success_count']
-            progress_data['errors'] = result['error_messages']
-            request.session[session_key] = progress_data
-            request.session.modified = True
+            if is_ajax:
+                return JsonResponse({'success': True, 'upload_id': job.upload_id})
             
-            # Handle results
-            self.handle_upload_result(request, result)
-            
-            return redirect('grade_list')
+            messages.info(
+                request,
+                'Your grade file is being processed. Progress is shown on the upload page.'
+            )
+            return redirect('grade_bulk_upload')
             
         except Exception as e:
             logger.error(f"Bulk grade upload failed: {str(e)}", exc_info=True)
-            
-            # Update progress with error
-            if 'session_key' in locals():
-                progress_data['status'] = 'failed'
-                progress_data['error'] = str(e)
-                progress_data['completed_at'] = timezone.now().isoformat()
-                request.session[session_key] = progress_data
-                request.session.modified = True
-            
+            if is_ajax:
+                return JsonResponse({'success': False, 'error': 'Failed to queue uploaded file'}, status=500)
             messages.error(request, 'Failed to process uploaded file. Please check the format and try again.')
             return render(request, self.template_name, {'form': form})
-    
-    def process_uploaded_file(self, file, assignment, term, session_key, request):
-        """Process uploaded file with progress updates"""
-        success_count = 0
-        error_messages = []
-        
-        file_extension = file.name.split('.')[-1].lower()
-        
-        try:
-            # Update total count based on file type
-            total_rows = self._estimate_total_rows(file, file_extension)
-            
-            # Update progress with total
-            progress_data = request.session.get(session_key, {})
-            progress_data['total'] = total_rows
-            request.session[session_key] = progress_data
-            request.session.modified = True
-            
-            if file_extension == 'csv':
-                result = self.process_csv_file(file, assignment, term, session_key, request)
-            elif file_extension in ['xlsx', 'xls']:
-                result = self.process_excel_file(file, assignment, term, session_key, request)
-            else:
-                raise ValidationError("Unsupported file format. Please upload CSV or Excel files.")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"File processing error: {str(e)}")
-            raise ValidationError(f"Error processing file: {str(e)}")
-    
-    def _estimate_total_rows(self, file, file_extension):
-        """Estimate total rows in the file"""
-        try:
-            if file_extension == 'csv':
-                # Reset file pointer
-                file.seek(0)
-                decoded_file = file.read().decode('utf-8').splitlines()
-                return len(decoded_file) - 1  # Subtract header row
-            elif file_extension in ['xlsx', 'xls']:
-                from openpyxl import load_workbook
-                wb = load_workbook(filename=BytesIO(file.read()), read_only=True)
-                sheet = wb.active
-                return sheet.max_row - 1  # Subtract header row
-            return 0
-        except Exception as e:
-            logger.warning(f"Could not estimate total rows: {str(e)}")
-            return 0
-    
-    def process_csv_file(self, file, assignment, term, session_key, request):
-        """Process CSV file with progress updates"""
-        success_count = 0
-        error_messages = []
-        processed_count = 0
-        
-        try:
-            # Try different encodings
-            for encoding in ['utf-8', 'latin-1', 'cp1252']:
-                try:
-                    file.seek(0)
-                    decoded_file = file.read().decode(encoding).splitlines()
-                    reader = csv.DictReader(decoded_file)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                raise ValidationError("Unable to decode file. Please use UTF-8 encoding.")
-            
-            for row_num, row in enumerate(reader, 2):
-                try:
-                    self.process_grade_row(row, assignment, term)
-                    success_count += 1
-                except Exception as e:
-                    error_messages.append(f"Row {row_num}: {str(e)}")
-                
-                # Update progress every 10 rows
-                processed_count += 1
-                if processed_count % 10 == 0:
-                    self._update_progress(session_key, request, processed_count, success_count)
-            
-            return {'success_count': success_count, 'error_messages': error_messages}
-            
-        except Exception as e:
-            logger.error(f"CSV processing failed: {str(e)}", exc_info=True)
-            raise
-    
-    def _update_progress(self, session_key, request, processed, success):
-        """Update progress in session"""
-        try:
-            if session_key in request.session:
-                progress_data = request.session[session_key]
-                progress_data['processed'] = processed
-                progress_data['success'] = success
-                request.session[session_key] = progress_data
-                request.session.modified = True
-        except Exception as e:
-            logger.warning(f"Failed to update progress: {str(e)}")
-    
-    def process_excel_file(self, file, assignment, term):
-        """Process Excel file with error handling"""
-        success_count = 0
-        error_messages = []
-        
-        try:
-            wb = load_workbook(filename=BytesIO(file.read()))
-            sheet = wb.active
-            
-            if sheet.max_row < 2:
-                raise ValidationError("Excel file must contain data rows.")
-            
-            headers = [cell.value for cell in sheet[1]]
-            required_headers = ['student_id', 'score']
-            
-            for required in required_headers:
-                if required not in [h.lower() for h in headers]:
-                    raise ValidationError(f"Missing required column: {required}")
-            
-            for row_num, row in enumerate(sheet.iter_rows(min_row=2), 2):
-                try:
-                    row_data = dict(zip(headers, [cell.value for cell in row]))
-                    self.process_grade_row(row_data, assignment, term)
-                    success_count += 1
-                except Exception as e:
-                    error_messages.append(f"Row {row_num}: {str(e)}")
-            
-            return {'success_count': success_count, 'error_messages': error_messages}
-            
-        except Exception as e:
-            logger.error(f"Excel processing failed: {str(e)}", exc_info=True)
-            raise
-    
-    def process_grade_row(self, row, assignment, term):
-        """Process individual grade row with validation"""
-        try:
-            # Normalize column names
-            row = {k.lower().strip(): v for k, v in row.items() if k is not None}
-            
-            # Validate required fields
-            student_id = row.get('student_id') or row.get('student id')
-            if not student_id:
-                raise ValueError("Missing student ID")
-            
-            # Get student with validation
-            try:
-                student = Student.objects.get(student_id=str(student_id).strip())
-            except Student.DoesNotExist:
-                raise ValueError(f"Student with ID '{student_id}' not found")
-            except Student.MultipleObjectsReturned:
-                raise ValueError(f"Multiple students found with ID '{student_id}'")
-            
-            # Validate score
-            score_str = row.get('score')
-            if not score_str:
-                raise ValueError("Missing score")
-            
-            try:
-                score = float(score_str)
-                if score < 0 or score > assignment.max_score:
-                    raise ValueError(f"Score {score} is outside valid range (0-{assignment.max_score})")
-            except (ValueError, TypeError):
-                raise ValueError(f"Invalid score format: '{score_str}'. Must be a number.")
-            
-            # Process the grade
-            self.create_or_update_grade(student, assignment, term, score)
-            
-        except Exception as e:
-            logger.warning(f"Grade row processing failed: {str(e)}")
-            raise
-    
-    def create_or_update_grade(self, student, assignment, term, score):
-        """Create or update grade record atomically"""
-        academic_year = assignment.class_assignment.academic_year.replace('-', '/')
-        
-        # Update or create Grade record
-        grade, created = Grade.objects.update_or_create(
-            student=student,
-            subject=assignment.subject,
-            class_assignment=assignment.class_assignment,
-            academic_year=academic_year,
-            term=term,
-            defaults=self.get_grade_defaults(assignment, score)
-        )
-        
-        # Update student assignment
-        StudentAssignment.objects.update_or_create(
-            student=student,
-            assignment=assignment,
-            defaults={
-                'score': score,
-                'status': 'GRADED',
-                'graded_at': timezone.now()
-            }
-        )
-    
-    def get_grade_defaults(self, assignment, score):
-        """Get default values for grade based on assignment type"""
-        score_field = f"{assignment.assignment_type.lower()}_score"
-        defaults = {
-            'homework_score': 0,
-            'classwork_score': 0,
-            'test_score': 0,
-            'exam_score': 0,
-        }
-        defaults[score_field] = score
-        return defaults
-    
-    def handle_upload_result(self, request, result):
-        """Handle upload results and display appropriate messages"""
-        if result['success_count'] > 0:
-            messages.success(
-                request, 
-                f'Successfully processed {result["success_count"]} grade records.'
-            )
-        
-        if result['error_messages']:
-            # Show first 5 errors
-            for msg in result['error_messages'][:5]:
-                messages.warning(request, msg)
-            
-            if len(result['error_messages']) > 5:
-                messages.warning(
-                    request, 
-                    f'... and {len(result["error_messages"]) - 5} more errors. '
-                    'Please check the file format and try again.'
-                )
-            
-            messages.info(
-                request,
-                'Some records could not be processed. Please correct the errors and try again.'
-            )
 
 
-# Add this to grade_views.py
 class BulkUploadProgressAPI(TwoFactorLoginRequiredMixin, View):
     """API endpoint to get bulk upload progress"""
     
+    def _get_job(self, request):
+        upload_id = request.GET.get('upload_id') or request.POST.get('upload_id')
+        job = GradeUploadJob(upload_id) if upload_id else GradeUploadJob.latest_for_user(request.user.id)
+        if job is None or job.progress.get('user_id') != request.user.id:
+            return None
+        return job
+    
     def get(self, request):
         try:
-            session_key = f"bulk_upload_{request.user.id}"
-            progress_data = request.session.get(session_key, {})
-            
-            # Clean up old completed sessions
-            if progress_data.get('status') == 'completed':
-                completed_at = progress_data.get('completed_at')
-                if completed_at:
-                    completed_time = timezone.datetime.fromisoformat(completed_at)
-                    if timezone.now() - completed_time > timedelta(minutes=5):
-                        del request.session[session_key]
-                        request.session.modified = True
-                        progress_data = {}
-            
+            job = self._get_job(request)
             return JsonResponse({
                 'success': True,
-                'progress': progress_data
+                'progress': job.public_progress() if job else {}
             })
             
         except Exception as e:
@@ -2698,6 +2427,16 @@ class BulkUploadProgressAPI(TwoFactorLoginRequiredMixin, View):
                 'success': False,
                 'error': 'Failed to get progress'
             }, status=500)
+    
+    def post(self, request):
+        """Resume a failed upload from its last committed row"""
+        job = self._get_job(request)
+        if job is None or job.progress.get('status') != 'failed':
+            return JsonResponse({'success': False, 'error': 'No failed upload to resume'}, status=400)
+        
+        job.requeue()
+        run_task(process_bulk_grade_upload, job.upload_id)
+        return JsonResponse({'success': True, 'progress': job.public_progress()})
 
 class GradeUploadTemplateView(View):
     def get(self, request):
@@ -4915,6 +4654,15 @@ class GradeConfigurationView(TwoFactorLoginRequiredMixin, AdminRequiredMixin, Up
         
         return context
     
+    # Changing any of these makes stored totals or grades stale
+    RECOMPUTE_FIELDS = (
+        'homework_weight', 'classwork_weight', 'test_weight', 'exam_weight',
+        'grade_1_min', 'grade_2_min', 'grade_3_min', 'grade_4_min',
+        'grade_5_min', 'grade_6_min', 'grade_7_min', 'grade_8_min',
+        'letter_a_plus_min', 'letter_a_min', 'letter_b_plus_min', 'letter_b_min',
+        'letter_c_plus_min', 'letter_c_min', 'letter_d_plus_min', 'letter_d_min',
+    )
+    
     def form_valid(self, form):
         """Handle form submission"""
         response = super().form_valid(form)
@@ -4924,7 +4672,29 @@ class GradeConfigurationView(TwoFactorLoginRequiredMixin, AdminRequiredMixin, Up
         from django.core.cache import cache
         cache.delete_pattern('grade_calculations_*')
         
+        if set(form.changed_data) & set(self.RECOMPUTE_FIELDS):
+            self._queue_grade_recompute()
+        
         return response
+    
+    def _queue_grade_recompute(self):
+        """Recompute the current academic year's grades in the background"""
+        from core.tasks import recompute_grades, run_task
+        
+        academic_year = self.object.get_current_academic_year_name()
+        try:
+            run_task(recompute_grades, academic_year=academic_year, user_id=self.request.user.id)
+            messages.info(
+                self.request,
+                f'Grades for {academic_year} are being recalculated with the new settings.'
+            )
+        except Exception as e:
+            logger.error(f"Could not queue grade recompute: {str(e)}")
+            messages.warning(
+                self.request,
+                'Existing grades could not be recalculated automatically. '
+                'Run "manage.py recompute_grades" to update them.'
+            )
 
 
 class GradeCalculatorView(TwoFactorLoginRequiredMixin, UserPassesTestMixin, TemplateView):
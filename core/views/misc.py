@@ -6,11 +6,12 @@ from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import logging
 
 from core.models import Notification
+from core.services.context_fragments import invalidate_notifications
+from core.services.notification_counter import set_unread_count
+from core.services.notification_push import push
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,8 @@ class NotificationListView(LoginRequiredMixin, ListView):
         unread_notifications = request.user.notifications.filter(is_read=False)
         if unread_notifications.exists():
             unread_notifications.update(is_read=True)
+            invalidate_notifications(request.user.id)
+            set_unread_count(request.user.id, 0)
             self.send_ws_update(request.user, 'mark_all_read', 0)
         return super().get(request, *args, **kwargs)
     
@@ -40,25 +43,16 @@ class NotificationListView(LoginRequiredMixin, ListView):
             count = unread_notifications.count()
             if count > 0:
                 unread_notifications.update(is_read=True)
+                invalidate_notifications(request.user.id)
+                set_unread_count(request.user.id, 0)
                 self.send_ws_update(request.user, 'mark_all_read', 0)
             return JsonResponse({'status': 'success', 'count': count})
         return JsonResponse({'status': 'error', 'message': 'Method not allowed'}, status=405)
 
     def send_ws_update(self, user, action, unread_count=None):
-        """Send WebSocket update for notification changes"""
+        """Send WebSocket update; the consumer reads the count from the counter"""
         try:
-            if unread_count is None:
-                unread_count = Notification.get_unread_count_for_user(user)
-            
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'notifications_{user.id}',
-                {
-                    'type': 'notification_update',
-                    'action': action,
-                    'unread_count': unread_count
-                }
-            )
+            push(user.id, action)
         except Exception as e:
             logger.error(f"WebSocket update failed: {str(e)}")
 
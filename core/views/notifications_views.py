@@ -8,11 +8,12 @@ from django.urls import reverse
 from django.utils import timezone
 from django.db import models
 from django.shortcuts import get_object_or_404
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import logging
 
 from core.models import Notification, Announcement, UserAnnouncementView
+from core.services.context_fragments import invalidate_notifications
+from core.services.notification_counter import set_unread_count
+from core.services.notification_push import push
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +93,8 @@ class NotificationListView(LoginRequiredMixin, ListView):
             unread_notifications = request.user.notifications.filter(is_read=False)
             if unread_notifications.exists():
                 unread_notifications.update(is_read=True)
+                invalidate_notifications(request.user.id)
+                set_unread_count(request.user.id, 0)
                 self.send_ws_update(request.user, 'mark_all_read', 0)
         except Exception as e:
             logger.error(f"Error marking notifications as read: {str(e)}")
@@ -106,6 +109,8 @@ class NotificationListView(LoginRequiredMixin, ListView):
                 count = unread_notifications.count()
                 if count > 0:
                     unread_notifications.update(is_read=True)
+                    invalidate_notifications(request.user.id)
+                    set_unread_count(request.user.id, 0)
                     self.send_ws_update(request.user, 'mark_all_read', 0)
                 return JsonResponse({'status': 'success', 'count': count})
             
@@ -114,18 +119,10 @@ class NotificationListView(LoginRequiredMixin, ListView):
             logger.error(f"Error in NotificationListView POST: {str(e)}")
             return JsonResponse({'status': 'error', 'message': 'Internal server error'}, status=500)
 
-    def send_ws_update(self, user, action, unread_count):
-        """Send WebSocket update"""
+    def send_ws_update(self, user, action, unread_count=None):
+        """Send WebSocket update; the consumer reads the count from the counter"""
         try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'notifications_{user.id}',
-                {
-                    'type': 'notification_update',
-                    'action': action,
-                    'unread_count': unread_count
-                }
-            )
+            push(user.id, action)
         except Exception as e:
             logger.error(f"WebSocket update failed: {str(e)}")
 
@@ -174,19 +171,12 @@ def mark_all_notifications_read(request):
         
         if count > 0:
             unread_notifications.update(is_read=True)
+            invalidate_notifications(request.user.id)
+            set_unread_count(request.user.id, 0)
             
             # Send WebSocket update
             try:
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f'notifications_{request.user.id}',
-                    {
-                        'type': 'notification_update',
-                        'action': 'mark_all_read',
-                        # ✅ FIXED: Use the correct method with error handling
-                        'unread_count': Notification.get_unread_count_for_user(request.user)
-                    }
-                )
+                push(request.user.id, 'mark_all_read')
             except Exception as e:
                 logger.error(f"WebSocket update failed: {str(e)}")
                 
@@ -249,17 +239,7 @@ def send_ws_notification_update(user):
     Send WebSocket update for notification count
     """
     try:
-        channel_layer = get_channel_layer()
-        # ✅ FIXED: Use the correct method with error handling
-        unread_count = Notification.get_unread_count_for_user(user)
-        async_to_sync(channel_layer.group_send)(
-            f'notifications_{user.id}',
-            {
-                'type': 'notification_update',
-                'action': 'count_update',
-                'unread_count': unread_count
-            }
-        )
+        push(user.id, 'count_update')
     except Exception as e:
         logger.error(f"WebSocket notification update failed: {str(e)}")
 
@@ -22,7 +22,8 @@ from reportlab.lib.units import inch
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib import colors
-from core.utils.main import get_attendance_summary, get_student_position_in_class
+from core.utils.main import get_attendance_summary
+from core.services.class_ranking import get_class_position
 
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
@@ -36,7 +37,7 @@ from core.utils import (
     get_grade_color, get_performance_level, format_date,
     calculate_total_score, validate_academic_year,
     check_report_card_permission, can_edit_grades,
-    get_student_position_in_class, get_attendance_summary,
+    get_attendance_summary,
     get_class_level_display
 )
 
@@ -525,8 +526,6 @@ class ReportCardView(LoginRequiredMixin, UserPassesTestMixin, View):
         # FIXED: Get attendance data with proper parameters
         attendance_data = self._get_attendance_data(student, academic_year, term)
         
-        position_in_class = self._calculate_position_in_class(student, academic_year, term)
-        
         # Get additional information
         additional_info = self._get_additional_info(student, academic_year, term)
 
@@ -1080,96 +1079,8 @@ class ReportCardView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 
     def _calculate_position_in_class(self, student, academic_year, term):
-        """Calculate student's position in class - FIXED VERSION"""
-        try:
-            print(f"\n{'='*60}")
-            print(f"DEBUG: Calculating position for {student.get_full_name()}")
-            print(f"Student ID: {student.student_id}")
-            print(f"Class: {student.class_level} ({student.get_class_level_display()})")
-            print(f"Academic Year: {academic_year}, Term: {term}")
-            print(f"{'='*60}")
-        
-            # Get all active students in the same class
-            classmates = Student.objects.filter(
-                class_level=student.class_level,
-                is_active=True
-            ).select_related('user')
-        
-            print(f"Found {classmates.count()} classmates in class {student.class_level}")
-        
-            if classmates.count() <= 1:
-                print("Only one student in class, returning 1st position")
-                return "1st"
-        
-            student_averages = []
-        
-            # Calculate average for each student
-            for classmate in classmates:
-                try:
-                    # Get grades for this specific period
-                    grades = Grade.objects.filter(
-                        student=classmate,
-                        academic_year=academic_year,
-                        term=term
-                    )
-                
-                    if grades.exists():
-                        # Calculate average
-                        avg_result = grades.aggregate(avg_score=Avg('total_score'))
-                        avg_score = avg_result['avg_score']
-                    
-                        if avg_score is not None:
-                            student_averages.append({
-                                'student_id': classmate.id,
-                                'name': classmate.get_full_name(),
-                                'average': float(avg_score),
-                                'student_code': classmate.student_id
-                            })
-                            print(f"  {classmate.get_full_name()}: {float(avg_score):.1f}%")
-                        else:
-                            print(f"  {classmate.get_full_name()}: No valid scores")
-                    else:
-                        print(f"  {classmate.get_full_name()}: No grades found")
-                    
-                except Exception as e:
-                    print(f"  Error calculating for {classmate.get_full_name()}: {e}")
-                    continue
-        
-            print(f"\nTotal students with valid averages: {len(student_averages)}")
-        
-            # Sort by average (descending)
-            if student_averages:
-                student_averages.sort(key=lambda x: x['average'], reverse=True)
-            
-                # Find current student's position
-                for index, student_data in enumerate(student_averages, 1):
-                    if student_data['student_id'] == student.id:
-                        # Format position
-                        if index == 1:
-                            ordinal = "1st"
-                        elif index == 2:
-                            ordinal = "2nd"
-                        elif index == 3:
-                            ordinal = "3rd"
-                        else:
-                            ordinal = f"{index}th"
-                    
-                        position = f"{ordinal} of {len(student_averages)}"
-                        print(f"Position calculated: {position}")
-                        return position
-            
-                print(f"Current student {student.get_full_name()} not found in rankings!")
-                return "Not ranked"
-            else:
-                print("No students with valid averages found")
-                return "Not ranked"
-
-
-        except Exception as e:
-            print(f"\n❌ ERROR in _calculate_position_in_class: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return "Error calculating position"
+        """Student's position from the cached class ranking"""
+        return get_class_position(student, academic_year, term)
 
 
     def _calculate_reopening_date(self, academic_term):
@@ -1288,10 +1199,17 @@ class ReportCardPDFView(LoginRequiredMixin, View):
             bottomMargin=72
         )
         
-        # Container for the 'Flowable' objects
+        # Build PDF
+        doc.build(self.build_story(
+            student, academic_year, term, grades, average_score, overall_grade,
+            attendance_data, additional_info, school_config
+        ))
+        return response
+    
+    def build_story(self, student, academic_year, term, grades, average_score, overall_grade,
+                    attendance_data, additional_info, school_config):
+        """Flowables for one report card; shared with the batch renderer"""
         elements = []
-        
-        # Add content to PDF
         self._create_pdf_header(elements, student, academic_year, term, school_config)
         self._create_additional_info_section(elements, additional_info)
         self._create_attendance_section(elements, attendance_data)
@@ -1299,10 +1217,7 @@ class ReportCardPDFView(LoginRequiredMixin, View):
         self._create_grades_table(elements, grades)
         self._create_summary_section(elements, average_score, overall_grade)
         self._create_signature_section(elements)
-        
-        # Build PDF
-        doc.build(elements)
-        return response
+        return elements
     
     def _get_additional_info(self, student, academic_year, term):
         """Get additional information for PDF"""
@@ -1315,8 +1230,8 @@ class ReportCardPDFView(LoginRequiredMixin, View):
             vacation_date = academic_term.end_date if academic_term else None
             reopening_date = self._calculate_reopening_date(academic_term) if academic_term else None
             
-            # Get class position using utils
-            position_in_class = get_student_position_in_class(student, academic_year, term)
+            # Class position from the cached class ranking
+            position_in_class = get_class_position(student, academic_year, term)
             
             return {
                 'vacation_date': format_date(vacation_date) if vacation_date else "To be announced",
@@ -1538,10 +1453,10 @@ class ReportCardPDFView(LoginRequiredMixin, View):
         for grade in grades:
             row = [
                 grade.subject.name,
-                f"{grade.homework_score or 0:.1f}",
-                f"{grade.classwork_score or 0:.1f}",
-                f"{grade.test_score or 0:.1f}",
-                f"{grade.exam_score or 0:.1f}",
+                f"{grade.homework_percentage or 0:.1f}",
+                f"{grade.classwork_percentage or 0:.1f}",
+                f"{grade.test_percentage or 0:.1f}",
+                f"{grade.exam_percentage or 0:.1f}",
                 f"{grade.total_score or 0:.1f}",
                 grade.letter_grade or "N/A"
             ]
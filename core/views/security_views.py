@@ -40,6 +40,8 @@ except ImportError:
     pass
 
 from core.forms import UserBlockForm, MaintenanceModeForm, UserSearchForm, ScheduledMaintenanceForm
+from core.services.security_state import get_security_state
+from core.geo_utils import enrich_ips
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -366,28 +368,11 @@ def maintenance_mode_page(request):
     
     # User cannot bypass - show maintenance page
     try:
-        maintenance = MaintenanceMode.objects.filter(is_active=True).first()
-        if maintenance and maintenance.is_currently_active():
-            message = maintenance.message
-        else:
-            # Fallback to settings
-            message = getattr(settings, 'MAINTENANCE_MESSAGE', 'The system is currently under maintenance. Please check back later.')
+        message = get_security_state().maintenance_message()
     except Exception as e:
         logger.error(f"Error checking maintenance mode: {e}")
         message = getattr(settings, 'MAINTENANCE_MESSAGE', 'The system is currently under maintenance. Please check back later.')
     
-    # Check for scheduled maintenance message
-    try:
-        scheduled_maintenance = ScheduledMaintenance.objects.filter(
-            is_active=True
-        ).first()
-        
-        if scheduled_maintenance and scheduled_maintenance.is_currently_active():
-            message = scheduled_maintenance.message
-    except Exception as e:
-        logger.error(f"Error checking scheduled maintenance: {e}")
-        pass
-    
     context = {
         'message': message,
         'maintenance_mode': True,
@@ -510,9 +495,15 @@ def security_events_api(request):
     if not request.user.is_staff:
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    recent_events = AuditLog.objects.filter(
+    recent_events = list(AuditLog.objects.filter(
         action__in=['BLOCK', 'UNBLOCK', 'LOGIN_FAILED', 'MAINTENANCE_START', 'MAINTENANCE_END']
-    ).order_by('-timestamp')[:20]
+    ).select_related('user').order_by('-timestamp')[:20])
+    
+    try:
+        locations = enrich_ips(event.ip_address for event in recent_events)
+    except Exception as e:
+        logger.warning(f"GeoIP lookup failed: {str(e)}")
+        locations = {}
     
     events_data = []
     for event in recent_events:
@@ -523,6 +514,7 @@ def security_events_api(request):
             'timestamp': event.timestamp.isoformat(),
             'details': event.details,
             'ip_address': event.ip_address,
+            'location': locations.get(event.ip_address, {}),
         })
     
     return JsonResponse({'events': events_data})
@@ -1100,3 +1092,23 @@ def system_health_api(request):
     
     return JsonResponse(health_data)
 
+
+def request_profile_api(request):
+    """Per-view request profiles: timings, query counts, cache use and slow-request samples"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    from core.services import request_profiler
+    
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        limit = 50
+    data = request_profiler.report(
+        sort=request.GET.get('sort', 'wall_ms_sum'),
+        limit=limit,
+        include_slow=request.GET.get('slow', '1') != '0',
+    )
+    data['timestamp'] = timezone.now().isoformat()
+    return JsonResponse(data)
+
@@ -16,6 +16,7 @@ from collections import defaultdict
 from core.permissions import is_admin, is_teacher, is_student, is_parent
 from ..models import TimeSlot, Timetable, TimetableEntry, Teacher, Subject, Student, ClassAssignment, AcademicTerm
 from ..forms import TimeSlotForm, TimetableForm, TimetableEntryForm, TimetableFilterForm
+from ..services.period_clock import get_period_clock
 from ..models import CLASS_LEVEL_CHOICES
 from django.views.decorators.http import require_POST
 from django.urls import reverse
@@ -660,12 +661,8 @@ class TimetableCalendarView(LoginRequiredMixin, TemplateView):
     
     def format_timetable_entry(self, entry):
         """Format timetable entry for calendar display"""
-        is_current = False
-        
         # Check if this is the current period
-        now = timezone.now()
-        if entry.time_slot.start_time <= now.time() <= entry.time_slot.end_time:
-            is_current = True
+        is_current = get_period_clock().is_current(entry.time_slot.start_time, entry.time_slot.end_time)
         
         return {
             'id': f"timetable_{entry.id}",
@@ -1220,6 +1217,7 @@ class TeacherTimetableView(LoginRequiredMixin, TemplateView):
         context['days_order'] = days_order
         
         # Organize entries by day and time slot
+        clock = get_period_clock()
         periods_by_day = {}
         
         for day_num, day_name in days_order:
@@ -1231,14 +1229,9 @@ class TeacherTimetableView(LoginRequiredMixin, TemplateView):
             # Organize by time slot
             for entry in day_entries:
                 # Determine if this is current period
-                start_datetime = timezone.make_aware(
-                    timezone.datetime.combine(now.date(), entry.time_slot.start_time)
+                is_current = day_num == today_day and clock.is_current(
+                    entry.time_slot.start_time, entry.time_slot.end_time
                 )
-                end_datetime = timezone.make_aware(
-                    timezone.datetime.combine(now.date(), entry.time_slot.end_time)
-                )
-                
-                is_current = start_datetime <= now <= end_datetime and day_num == today_day
                 
                 period_data = {
                     'subject': entry.subject.name,
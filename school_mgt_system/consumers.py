@@ -1,18 +1,29 @@
 # school_mgt_system/consumers.py
+import asyncio
 import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from core.services.notification_counter import aget_unread_count
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """
-    Handles real-time notifications and announcements
+    Handles real-time notifications and announcements.
+    
+    Unread counts come from the cache counter, never the database. Pushes
+    arriving within NOTIFICATION_PUSH_DEBOUNCE seconds of each other are
+    sent to the client as one frame.
     """
+    # Seconds to wait for more pushes before sending a frame
+    push_debounce = getattr(settings, 'NOTIFICATION_PUSH_DEBOUNCE', 0.25)
+    
     async def connect(self):
         """Handle WebSocket connection for notifications"""
         try:
@@ -25,6 +36,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.user = self.scope["user"]
             self.user_id = self.user.id
             self.notification_group = f'notifications_{self.user_id}'
+            self.pending_events = []
+            self.flush_task = None
             
             # Join notification group
             await self.channel_layer.group_add(
@@ -32,6 +45,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
+            # Join the announcement broadcast groups for this user's roles and classes
+            self.broadcast_groups = await self.get_broadcast_groups()
+            for group in self.broadcast_groups:
+                await self.channel_layer.group_add(group, self.channel_name)
+            
             await self.accept()
             
             # Send initial unread count
@@ -53,11 +71,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         try:
+            if getattr(self, 'flush_task', None) is not None:
+                self.flush_task.cancel()
             if hasattr(self, 'notification_group'):
                 await self.channel_layer.group_discard(
                     self.notification_group,
                     self.channel_name
                 )
+            for group in getattr(self, 'broadcast_groups', []):
+                await self.channel_layer.group_discard(group, self.channel_name)
                 
             logger.info(f"🔌 Notification WebSocket disconnected for user {getattr(self, 'user', 'Unknown')}")
         except Exception as e:
@@ -93,42 +115,94 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
 
-    @sync_to_async
-    def get_unread_count(self):
+    async def get_unread_count(self):
         """Get unread notification count for the user"""
         try:
-            from core.models import Notification
-            return Notification.get_unread_count_for_user(self.user)
+            return await aget_unread_count(self.user_id)
         except Exception as e:
             logger.error(f"❌ Error getting unread count: {str(e)}")
             return 0
 
+    @sync_to_async
+    def get_broadcast_groups(self):
+        """Announcement groups for the connected user"""
+        try:
+            from core.services.announcement_fanout import broadcast_groups_for_user
+            return broadcast_groups_for_user(self.user)
+        except Exception as e:
+            logger.error(f"❌ Error resolving announcement groups: {str(e)}")
+            return []
+
     # ===== NOTIFICATION HANDLERS =====
 
     async def notification_update(self, event):
-        """Handle notification updates from the system"""
+        """Handle notification updates from the system (see core.services.notification_push)"""
+        events = event.get('events')
+        if events is None:
+            # Single-event message in the older format
+            events = [{key: value for key, value in event.items() if key not in ('type', 'unread_count')}]
+        self.queue_events(events)
+
+    async def new_notification(self, event):
+        """Handle new notification creation from the system"""
+        self.queue_events([{'action': 'new_notification', 'notification': event.get('notification', {})}])
+
+    async def send_notification(self, event):
+        """Ad-hoc alerts sent straight to the group (grades, attendance)"""
+        notification = event.get('notification_data') or {
+            key: value for key, value in event.items() if key != 'type'
+        }
+        self.queue_events([{'action': 'new_notification', 'notification': notification}])
+
+    def queue_events(self, events):
+        self.pending_events.extend(events)
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_events())
+
+    async def flush_events(self):
+        """Send everything queued during the debounce window as one frame"""
         try:
-            await self.send(text_data=json.dumps({
+            await asyncio.sleep(self.push_debounce)
+            events, self.pending_events = self.pending_events, []
+            self.flush_task = None
+            
+            notifications = [item['notification'] for item in events if item.get('notification')]
+            frame = {
                 'type': 'notification_update',
-                'action': event.get('action'),
-                'notification_id': event.get('notification_id'),
-                'unread_count': event.get('unread_count', 0),
-                'timestamp': event.get('timestamp', timezone.now().isoformat())
-            }))
+                'action': events[-1].get('action') if len(events) == 1 else 'batch',
+                'actions': [item.get('action') for item in events],
+                'notifications': notifications,
+                'notification_ids': [item['notification_id'] for item in events if item.get('notification_id')],
+                'unread_count': await self.get_unread_count(),
+                'timestamp': timezone.now().isoformat(),
+            }
+            if len(events) == 1:
+                frame['notification_id'] = events[0].get('notification_id')
+                frame['notification'] = events[0].get('notification')
+            await self.send(text_data=json.dumps(frame))
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
+            self.flush_task = None
             logger.error(f"❌ Error sending notification update: {str(e)}")
 
-    async def new_notification(self, event):
-        """Handle new notification creation from the system"""
+    async def announcement_broadcast(self, event):
+        """Handle an announcement sent once to a whole audience group"""
         try:
             await self.send(text_data=json.dumps({
-                'type': 'new_notification',
-                'notification': event.get('notification', {}),
-                'unread_count': event.get('unread_count', 0),
+                'type': 'new_announcement',
+                'announcement_id': event.get('announcement_id'),
+                'title': event.get('title'),
+                'message': event.get('message'),
+                'priority': event.get('priority'),
+                'link': event.get('link'),
                 'timestamp': event.get('timestamp', timezone.now().isoformat())
             }))
+            # Unread counts differ per user; the fan-out task moves each counter,
+            # and the refreshed count goes out with the next debounced frame
+            self.queue_events([{'action': 'count_update'}])
         except Exception as e:
-            logger.error(f"❌ Error sending new notification: {str(e)}")
+            logger.error(f"❌ Error sending announcement broadcast: {str(e)}")
 
 
 class SecurityConsumer(AsyncWebsocketConsumer):
@@ -118,12 +118,14 @@ if IS_PRODUCTION:
 MIDDLEWARE = [
     # Django core middleware
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.request_profiling.RequestProfilingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.user_roles.UserRolesMiddleware',
     'django_otp.middleware.OTPMiddleware',
     'axes.middleware.AxesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -134,14 +136,9 @@ MIDDLEWARE = [
     'core.middleware.error_handling.ErrorHandlingMiddleware',
     'core.middleware.session_timeout.SessionTimeoutMiddleware',
     'core.middleware.csrf_protection.CSRFProtectionMiddleware',
-    'core.middleware.security.FinancialSecurityMiddleware',
-    'core.middleware.rate_limit.RateLimitMiddleware',
+    # Rate limits, user block, maintenance mode and security/CSP headers
+    'core.middleware.security_stack.SecurityStackMiddleware',
     'core.middleware.password_rotation.PasswordRotationMiddleware',
-    'core.middleware.user_block.UserBlockMiddleware',
-    'core.middleware.maintenance.MaintenanceModeMiddleware',
-    'core.middleware.notification.NotificationMiddleware',
-    'core.middleware.security_headers.SecurityHeadersMiddleware',
-    'core.middleware.csp.ContentSecurityPolicyMiddleware',
     'core.middleware.request_logging.RequestLoggingMiddleware',
     'core.middleware.legacy.LegacyMiddlewareCompatibility',
 ]
@@ -153,12 +150,12 @@ if DEBUG_TOOLBAR and not IS_TESTING:
 if IS_PRODUCTION and config('CSP_ENABLED', default=True, cast=bool):
     try:
         import csp
-        # Insert after SecurityHeadersMiddleware
-        csp_index = MIDDLEWARE.index('core.middleware.csp.ContentSecurityPolicyMiddleware')
-        MIDDLEWARE.pop(csp_index)  # Remove our custom CSP
-        MIDDLEWARE.insert(csp_index, 'csp.middleware.CSPMiddleware')
+        # django-csp takes over the Content-Security-Policy header
+        stack_index = MIDDLEWARE.index('core.middleware.security_stack.SecurityStackMiddleware')
+        MIDDLEWARE.insert(stack_index + 1, 'csp.middleware.CSPMiddleware')
+        SECURITY_STACK_CSP = False
     except ImportError:
-        # Keep our custom CSP middleware
+        # Keep the security stack's own CSP header
         pass
 # ==================== URL CONFIGURATION ====================
 ROOT_URLCONF = 'school_mgt_system.urls'
@@ -375,7 +372,8 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # Custom session settings
 MAX_USER_SESSIONS = 3  # Maximum number of concurrent sessions per user
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Use database-backed sessions
+# Seconds last_activity may lag before SessionTimeoutMiddleware writes it again
+SESSION_ACTIVITY_GRANULARITY = config('SESSION_ACTIVITY_GRANULARITY', default=300, cast=int)
 
 # Session serialization - use JSON for better compatibility
 SESSION_SERIALIZER = 'django.contrib.sessions.serializers.JSONSerializer'
@@ -498,6 +496,12 @@ else:
                 }
             }
 
+# Sessions: with Redis available, read sessions from the cache and write
+# through to the database (core.session_backend); otherwise stay on the DB.
+if globals().get('CACHES', {}).get('default', {}).get('BACKEND', '').startswith('django_redis'):
+    SESSION_ENGINE = config('SESSION_ENGINE', default='core.session_backend')
+    SESSION_CACHE_ALIAS = 'default'
+
 # ==================== CHANNEL LAYERS ====================
 if not (IS_DOCKER or IS_DOCKER_COMPOSE):
     # Use InMemoryChannelLayer for local development with better settings
@@ -531,6 +535,7 @@ else:
 # WebSocket configuration
 WEBSOCKET_URL = '/ws/'
 WEBSOCKET_HEARTBEAT_INTERVAL = 30  # seconds
+NOTIFICATION_PUSH_DEBOUNCE = config('NOTIFICATION_PUSH_DEBOUNCE', default=0.25, cast=float)  # seconds
 
 # ==================== CELERY CONFIGURATION ====================
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=f"{REDIS_URL}/0")
@@ -589,6 +594,21 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(minute='*/5'),
         'options': {'expires': 300},
     },
+    'refresh-fee-statuses': {
+        'task': 'core.tasks.refresh_fee_statuses',
+        'schedule': crontab(hour=0, minute=30),
+        'options': {'expires': 3600},
+    },
+    'rebuild-student-balances': {
+        'task': 'core.tasks.rebuild_student_balances',
+        'schedule': crontab(hour=1, minute=0),
+        'options': {'expires': 3600},
+    },
+    'reconcile-unread-counters': {
+        'task': 'core.tasks.reconcile_unread_counters',
+        'schedule': crontab(minute='*/15'),
+        'options': {'expires': 900},
+    },
 }
 
 # ==================== DJANGO REST FRAMEWORK ====================
@@ -617,8 +637,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.security.throttling.AnonSlidingWindowThrottle',
+        'core.security.throttling.UserSlidingWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -832,6 +852,21 @@ MAX_LOGIN_ATTEMPTS = config('MAX_LOGIN_ATTEMPTS', default=5, cast=int)
 # Rate Limiting
 RATE_LIMIT_REQUESTS = config('RATE_LIMIT_REQUESTS', default=100, cast=int)
 RATE_LIMIT_WINDOW = config('RATE_LIMIT_WINDOW', default=60, cast=int)
+# Per-route policies for core.security.rate_limiter; counters are kept apart per policy
+RATE_LIMIT_POLICIES = {
+    'general': {'requests': RATE_LIMIT_REQUESTS, 'window': RATE_LIMIT_WINDOW},
+    'financial': {
+        'requests': config('FINANCIAL_RATE_LIMIT_REQUESTS', default=100, cast=int),
+        'window': config('FINANCIAL_RATE_LIMIT_WINDOW', default=60, cast=int),
+    },
+}
+
+# Request profiling (core.middleware.request_profiling)
+# Off by default; opt in per deployment (patches cache/template classes, writes to Redis)
+REQUEST_PROFILING_ENABLED = config('REQUEST_PROFILING_ENABLED', default=False, cast=bool)
+PROFILER_SLOW_REQUEST_MS = config('PROFILER_SLOW_REQUEST_MS', default=1000, cast=int)
+PROFILER_SLOW_SAMPLES = config('PROFILER_SLOW_SAMPLES', default=50, cast=int)
+PROFILER_FLUSH_INTERVAL = config('PROFILER_FLUSH_INTERVAL', default=10, cast=int)
 
 # Academic settings
 ACADEMIC_YEAR_FORMAT = 'YYYY/YYYY'
@@ -858,6 +893,11 @@ ALLOWED_MIME_TYPES = [
     'text/plain', 'text/csv',
 ]
 
+# GeoLite2 database used to attach locations to audit and security IPs
+GEOIP_PATH = config('GEOIP_PATH', default=str(BASE_DIR / 'data' / 'geoip' / 'GeoLite2-City'))
+GEOIP_CITY = config('GEOIP_CITY', default='GeoLite2-City.mmdb')
+GEOIP_LRU_SIZE = config('GEOIP_LRU_SIZE', default=4096, cast=int)
+
 # Health check configuration
 HEALTH_CHECKS = {
     'database': 'django_healthchecks.contrib.check_database',